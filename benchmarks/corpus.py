@@ -0,0 +1,95 @@
+"""
+Synthetic server links for benchmarks
+Deterministic mixes of vless/vmess/ss/trojan/tuic/hy2 links shaped like
+real subscription content.
+"""
+
+import base64
+import json
+import random
+import uuid
+from typing import List
+
+PROTOCOLS = ("vless", "vmess", "shadowsocks", "trojan", "tuic", "hysteria2")
+COUNTRIES = ("DE", "NL", "FI", "US", "TR", "AE", "JP", "SG", "FR", "GB")
+SS_METHODS = ("aes-128-gcm", "aes-256-gcm", "chacha20-ietf-poly1305")
+
+
+def _name(rng: random.Random, index: int) -> str:
+    # "<group> - <label>" is split into a group by the parser
+    return f"{rng.choice(COUNTRIES)} - node {index}"
+
+
+def _host(rng: random.Random) -> str:
+    if rng.random() < 0.5:
+        return ".".join(str(rng.randint(1, 254)) for _ in range(4))
+    return f"s{rng.randint(1, 99999)}.example{rng.randint(1, 50)}.net"
+
+
+def make_link(protocol: str, rng: random.Random, index: int) -> str:
+    host = _host(rng)
+    port = (
+        rng.choice((443, 8443, 2053, 2083))
+        if rng.random() < 0.7
+        else rng.randint(1024, 65000)
+    )
+    name = _name(rng, index)
+    user_id = str(uuid.UUID(int=rng.getrandbits(128)))
+    sni = f"cdn{rng.randint(1, 500)}.example.com"
+
+    if protocol == "vless":
+        if rng.random() < 0.3:
+            query = (
+                f"security=reality&sni={sni}&fp=chrome&flow=xtls-rprx-vision"
+                f"&publicKey={rng.getrandbits(128):032x}&shortId={rng.getrandbits(32):08x}"
+            )
+        else:
+            query = (
+                f"security=tls&sni={sni}&fp=chrome&type=ws&path=/ws{rng.randint(1, 99)}"
+            )
+        return f"vless://{user_id}@{host}:{port}?{query}#{name}"
+    if protocol == "vmess":
+        config = {
+            "v": "2",
+            "ps": name,
+            "add": host,
+            "port": str(port),
+            "id": user_id,
+            "aid": "0",
+            "net": rng.choice(("ws", "tcp", "grpc")),
+            "type": "none",
+            "host": sni,
+            "path": f"/v{rng.randint(1, 99)}",
+            "tls": "tls",
+            "sni": sni,
+        }
+        encoded = base64.b64encode(json.dumps(config).encode("utf-8")).decode("utf-8")
+        return f"vmess://{encoded}"
+    if protocol == "shadowsocks":
+        user_info = f"{rng.choice(SS_METHODS)}:{rng.getrandbits(96):024x}"
+        encoded = (
+            base64.b64encode(user_info.encode("utf-8")).decode("utf-8").rstrip("=")
+        )
+        return f"ss://{encoded}@{host}:{port}#{name}"
+    if protocol == "trojan":
+        return f"trojan://{rng.getrandbits(96):024x}@{host}:{port}?sni={sni}&fp=firefox#{name}"
+    if protocol == "tuic":
+        return (
+            f"tuic://{user_id}:{rng.getrandbits(64):016x}@{host}:{port}"
+            f"?sni={sni}&congestion_control=bbr&alpn=h3#{name}"
+        )
+    if protocol == "hysteria2":
+        return f"hysteria2://{rng.getrandbits(96):024x}@{host}:{port}?sni={sni}&insecure=1#{name}"
+    raise ValueError(f"unknown protocol {protocol}")
+
+
+def make_links(count: int, seed: int = 0, duplicate_ratio: float = 0.0) -> List[str]:
+    """`count` links cycling through PROTOCOLS; a share of them repeat earlier ones."""
+    rng = random.Random(seed)
+    links: List[str] = []
+    for index in range(count):
+        if links and rng.random() < duplicate_ratio:
+            links.append(rng.choice(links))
+        else:
+            links.append(make_link(PROTOCOLS[index % len(PROTOCOLS)], rng, index))
+    return links
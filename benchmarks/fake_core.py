@@ -0,0 +1,332 @@
+"""
+Stand-in proxy core and target server for offline benchmarks
+`run -c config.json` accepts the sing-box or Xray test config that
+TestCoreManager writes, opens its HTTP inbounds and forwards every request
+to a local target server instead of the internet, injecting per-server
+latency, loss, bandwidth limits and dead servers. The target server answers
+generate_204 style URLs with 204 and streams bytes for download URLs.
+
+    python benchmarks/fake_core.py target --port 18080
+    python benchmarks/fake_core.py --target 127.0.0.1:18080 run -c test.json
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import re
+import sys
+import threading
+import time
+import zlib
+from typing import Any, Dict, Optional, Tuple
+
+DEFAULT_PROFILE = {
+    "latency_ms": [20, 250],  # Per-server base latency range
+    "jitter_ms": 20,  # Extra random delay per request
+    "loss": 0.02,  # Share of requests dropped without a reply
+    "failure_rate": 0.05,  # Share of servers that never work
+    "bandwidth_bps": [256 * 1024, 8 * 1024 * 1024],  # Per-server download cap
+}
+CHUNK_SIZE = 16 * 1024
+# "/10MB.zip", "/512KB", "/bytes/1000" -> number of bytes to stream
+SIZE_PATTERN = re.compile(r"(\d+)\s*(KB|MB|GB)?", re.IGNORECASE)
+SIZE_UNITS = {None: 1, "KB": 1024, "MB": 1024**2, "GB": 1024**3}
+STREAM_BLOCK = b"\0" * CHUNK_SIZE
+
+
+async def _read_head(reader: asyncio.StreamReader) -> Optional[bytes]:
+    try:
+        return await reader.readuntil(b"\r\n\r\n")
+    except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, OSError):
+        return None
+
+
+def _close(writer: asyncio.StreamWriter):
+    try:
+        writer.close()
+    except OSError:
+        pass
+
+
+# --- Target server ---
+
+
+class TargetServer:
+    """Answers every request with 204, or with N bytes when the path names a size."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        self.host = host
+        self.port = port
+        self._server = None
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def _handle(self, reader, writer):
+        # CONNECT tunnels used by TCP pings send nothing and just hang up
+        head = await _read_head(reader)
+        if not head:
+            _close(writer)
+            return
+        path = head.split(b"\r\n", 1)[0].split(b" ")[1].decode("latin-1")
+        match = SIZE_PATTERN.search(path.rsplit("/", 1)[-1])
+        try:
+            if not match:
+                writer.write(
+                    b"HTTP/1.1 204 No Content\r\nContent-Length: 0\r\n"
+                    b"Connection: close\r\n\r\n"
+                )
+            else:
+                size = (
+                    int(match.group(1))
+                    * SIZE_UNITS[match.group(2) and match.group(2).upper()]
+                )
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\nContent-Type: application/octet-stream\r\n"
+                    b"Connection: close\r\n"
+                    + f"Content-Length: {size}\r\n\r\n".encode()
+                )
+                while size > 0:
+                    writer.write(STREAM_BLOCK[: min(size, CHUNK_SIZE)])
+                    size -= CHUNK_SIZE
+                    await writer.drain()
+            await writer.drain()
+        except (ConnectionError, OSError):
+            pass
+        _close(writer)
+
+
+# --- Fake core ---
+
+
+def _outbound_address(outbound: Dict[str, Any]) -> Tuple[str, Any]:
+    """(host, port) of a sing-box or Xray outbound."""
+    if "server" in outbound:
+        return outbound["server"], outbound.get("server_port")
+    settings = outbound.get("settings", {})
+    for key in ("vnext", "servers"):
+        if settings.get(key):
+            entry = settings[key][0]
+            return entry.get("address"), entry.get("port")
+    return outbound.get("tag", ""), None
+
+
+def _inbound_routes(config: Dict[str, Any]) -> Dict[int, Dict[str, Any]]:
+    """Map each HTTP inbound port to the outbound its route rule points at."""
+    outbounds = {o.get("tag"): o for o in config.get("outbounds", [])}
+    by_inbound = {}
+    for rule in config.get("route", config.get("routing", {})).get("rules", []):
+        inbound = rule.get("inbound") or rule.get("inboundTag")
+        outbound = rule.get("outbound") or rule.get("outboundTag")
+        for tag in inbound if isinstance(inbound, list) else [inbound]:
+            by_inbound[tag] = outbounds.get(outbound, {})
+
+    routes = {}
+    for inbound in config.get("inbounds", []):
+        if inbound.get("type", inbound.get("protocol")) != "http":
+            continue
+        port = inbound.get("listen_port", inbound.get("port"))
+        routes[int(port)] = by_inbound.get(inbound.get("tag"), {})
+    return routes
+
+
+class FakeServer:
+    """Network behaviour of one remote server, stable for a given address."""
+
+    def __init__(self, address: Tuple[str, Any], profile: Dict[str, Any], seed: int):
+        rng = random.Random(zlib.crc32(f"{address}|{seed}".encode()))
+        low, high = profile["latency_ms"]
+        self.latency = rng.uniform(low, high) / 1000.0
+        low, high = profile["bandwidth_bps"]
+        self.bandwidth = rng.uniform(low, high)
+        self.dead = rng.random() < profile["failure_rate"]
+        self.jitter = profile["jitter_ms"] / 1000.0
+        self.loss = profile["loss"]
+        self._rng = rng
+
+    def delay(self) -> float:
+        return self.latency + self._rng.random() * self.jitter
+
+    def dropped(self) -> bool:
+        return self._rng.random() < self.loss
+
+
+class FakeCore:
+    """Opens the config's HTTP inbounds and proxies them to the target server."""
+
+    def __init__(
+        self,
+        config: Dict[str, Any],
+        target: Tuple[str, int],
+        profile: Optional[Dict[str, Any]] = None,
+        seed: int = 0,
+    ):
+        self.target = target
+        self.profile = dict(DEFAULT_PROFILE, **(profile or {}))
+        self.servers = {
+            port: FakeServer(_outbound_address(outbound), self.profile, seed)
+            for port, outbound in _inbound_routes(config).items()
+        }
+        self.requests = 0
+        self._listeners = []
+
+    async def start(self):
+        # The first inbound is what TestCoreManager waits for, so open it last
+        ports = sorted(self.servers)
+        for port in ports[1:] + ports[:1]:
+            self._listeners.append(
+                await asyncio.start_server(
+                    lambda r, w, server=self.servers[port]: self._handle(r, w, server),
+                    "127.0.0.1",
+                    port,
+                    backlog=512,
+                )
+            )
+
+    async def _handle(self, reader, writer, server: FakeServer):
+        head = await _read_head(reader)
+        if not head:
+            _close(writer)
+            return
+        self.requests += 1
+        method, target, _ = head.split(b"\r\n", 1)[0].split(b" ", 2)
+
+        await asyncio.sleep(server.delay())
+        if server.dropped():
+            _close(writer)
+            return
+        if server.dead:
+            writer.write(b"HTTP/1.1 502 Bad Gateway\r\nContent-Length: 0\r\n\r\n")
+            await writer.drain()
+            _close(writer)
+            return
+
+        try:
+            up_reader, up_writer = await asyncio.open_connection(*self.target)
+        except OSError:
+            writer.write(b"HTTP/1.1 502 Bad Gateway\r\nContent-Length: 0\r\n\r\n")
+            _close(writer)
+            return
+
+        try:
+            if method == b"CONNECT":
+                writer.write(b"HTTP/1.1 200 Connection established\r\n\r\n")
+                await writer.drain()
+                await asyncio.gather(
+                    self._pipe(reader, up_writer),
+                    self._pipe(up_reader, writer, server.bandwidth),
+                )
+            else:
+                # Absolute-form request line -> origin-form for the target
+                path = re.sub(rb"^[a-z]+://[^/]*", b"", target) or b"/"
+                rest = head.split(b"\r\n", 1)[1]
+                up_writer.write(method + b" " + path + b" HTTP/1.1\r\n" + rest)
+                await up_writer.drain()
+                await self._pipe(up_reader, writer, server.bandwidth)
+        finally:
+            _close(up_writer)
+            _close(writer)
+
+    @staticmethod
+    async def _pipe(reader, writer, bandwidth: Optional[float] = None):
+        """Copy until EOF, pacing to `bandwidth` bytes/s when given."""
+        sent = 0
+        started = time.monotonic()
+        try:
+            while True:
+                data = await reader.read(CHUNK_SIZE)
+                if not data:
+                    break
+                writer.write(data)
+                await writer.drain()
+                sent += len(data)
+                if bandwidth:
+                    ahead = sent / bandwidth - (time.monotonic() - started)
+                    if ahead > 0:
+                        await asyncio.sleep(ahead)
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            if writer.can_write_eof():
+                try:
+                    writer.write_eof()
+                except OSError:
+                    pass
+
+
+def serve_in_thread(server):
+    """Run a TargetServer or FakeCore on a daemon thread; returns once listening."""
+    ready = threading.Event()
+    errors = []
+
+    def run():
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(server.start())
+        except OSError as e:
+            errors.append(e)
+            return
+        finally:
+            ready.set()
+        loop.run_forever()
+
+    threading.Thread(target=run, daemon=True).start()
+    ready.wait()
+    if errors:
+        raise errors[0]
+    return server
+
+
+def _raise_fd_limit():
+    # Thousands of inbounds need thousands of descriptors
+    try:
+        import resource
+    except ImportError:
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+
+async def _serve_forever(*servers):
+    for server in servers:
+        await server.start()
+    await asyncio.Event().wait()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline stand-in for the proxy core.")
+    parser.add_argument("--target", default="127.0.0.1:18080", help="target host:port")
+    parser.add_argument("--profile", help="JSON file overriding DEFAULT_PROFILE keys")
+    parser.add_argument("--seed", type=int, default=0, help="seed for server behaviour")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run = commands.add_parser("run", help="serve a core test config")
+    run.add_argument("-c", "--config", required=True)
+    target = commands.add_parser("target", help="serve the target endpoints")
+    target.add_argument("--port", type=int, default=18080)
+    args = parser.parse_args(argv)
+
+    if args.command == "target":
+        server = TargetServer(port=args.port)
+    else:
+        with open(args.config, encoding="utf-8") as f:
+            config = json.load(f)
+        profile = None
+        if args.profile:
+            with open(args.profile, encoding="utf-8") as f:
+                profile = json.load(f)
+        host, port = args.target.rsplit(":", 1)
+        _raise_fd_limit()
+        server = FakeCore(config, (host, int(port)), profile, args.seed)
+
+    try:
+        asyncio.run(_serve_forever(server))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,145 @@
+"""
+Offline probe benchmarks for Onix
+Runs the real TCP, URL and speed test sweeps and the health checker against
+benchmarks/fake_core.py and a local target server, so the probe pipelines
+can be load-tested at thousands of servers without a core binary or the
+internet.
+
+    python benchmarks/probe_benchmarks.py --servers 1000 --sweeps tcp,health
+    python benchmarks/probe_benchmarks.py --core xray --profile lossy.json
+"""
+
+import argparse
+import copy
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+import link_parser  # noqa: E402
+import settings_manager  # noqa: E402
+from benchmarks.corpus import make_links  # noqa: E402
+from benchmarks.fake_core import TargetServer, serve_in_thread  # noqa: E402
+from managers.server_manager import ServerManager, get_core_generator  # noqa: E402
+from managers.test_core_manager import TestCoreManager  # noqa: E402
+from services.health_checker import HealthChecker  # noqa: E402
+
+FAKE_CORE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_core.py")
+SWEEPS = ("tcp", "url", "speed", "health")
+RESULT_FIELDS = {"tcp": "tcp_ping", "url": "url_ping", "speed": "download_speed"}
+
+
+def _quiet_log(message, level=None):
+    pass
+
+
+def _summarize(name, servers, values, elapsed):
+    ok = [v for v in values if v not in (None, -1)]
+    result = {
+        "servers": len(servers),
+        "seconds": round(elapsed, 3),
+        "servers_per_second": round(len(servers) / elapsed, 1) if elapsed else 0.0,
+        "success_rate": round(len(ok) / len(servers), 3) if servers else 0.0,
+        "median": round(statistics.median(ok), 1) if ok else None,
+    }
+    print(
+        f"{name:<8} {result['servers']:>6} servers  {result['seconds']:8.2f} s  "
+        f"{result['servers_per_second']:8.1f} servers/s  "
+        f"{result['success_rate'] * 100:5.1f}% ok  median {result['median']}",
+        flush=True,
+    )
+    return result
+
+
+def run_sweep(sweep, settings, servers):
+    for server in servers:
+        for field in RESULT_FIELDS.values():
+            server.pop(field, None)
+
+    if sweep == "health":
+        return run_health(settings, servers)
+
+    manager = ServerManager(settings, {"log": _quiet_log})
+    runner = {
+        "tcp": manager.test_all_tcp,
+        "url": manager.test_all_urls,
+        "speed": manager.test_all_speed,
+    }[sweep]
+    started = time.perf_counter()
+    runner(servers)
+    elapsed = time.perf_counter() - started
+    manager.shutdown()
+    values = [server.get(RESULT_FIELDS[sweep]) for server in servers]
+    return _summarize(sweep, servers, values, elapsed)
+
+
+def run_health(settings, servers):
+    """One full health-check pass (TCP and URL) over every server."""
+    checker = HealthChecker(settings, _quiet_log)
+    core = TestCoreManager(
+        settings, _quiet_log, get_core_generator(settings["active_core"])
+    )
+    checker.set_test_core_manager(core)
+    done = threading.Event()
+    checker.set_progress_callback(
+        lambda current, total: current >= total and done.set()
+    )
+
+    started = time.perf_counter()
+    checker.start(servers, ["tcp", "url"], interval_seconds=3600)
+    done.wait()
+    elapsed = time.perf_counter() - started
+    checker.stop()
+    values = [
+        checker.get_server_stats(server["id"]).get("url_ema") for server in servers
+    ]
+    return _summarize("health", servers, values, elapsed)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark probes offline.")
+    parser.add_argument("--servers", type=int, default=200, help="servers to test")
+    parser.add_argument(
+        "--speed-servers", type=int, default=20, help="servers in the speed sweep"
+    )
+    parser.add_argument("--sweeps", default=",".join(SWEEPS), help="sweeps to run")
+    parser.add_argument("--core", choices=("sing-box", "xray"), default="sing-box")
+    parser.add_argument("--profile", help="fake core profile JSON (see fake_core.py)")
+    parser.add_argument("--seed", type=int, default=0, help="fake core seed")
+    parser.add_argument("--output", metavar="PATH", help="write the results as JSON")
+    args = parser.parse_args(argv)
+
+    sweeps = [sweep for sweep in args.sweeps.split(",") if sweep]
+    unknown = set(sweeps) - set(SWEEPS)
+    if unknown:
+        parser.error(f"unknown sweeps: {', '.join(sorted(unknown))}")
+
+    target = serve_in_thread(TargetServer())
+    command = [sys.executable, FAKE_CORE, "--target", f"127.0.0.1:{target.port}"]
+    command += ["--seed", str(args.seed)]
+    if args.profile:
+        command += ["--profile", os.path.abspath(args.profile)]
+
+    settings = copy.deepcopy(settings_manager.DEFAULT_SETTINGS)
+    settings["active_core"] = args.core
+    settings["test_core_command"] = command
+    servers = [link_parser.parse_server_link(link) for link in make_links(args.servers)]
+
+    results = {}
+    for sweep in sweeps:
+        subset = servers[: args.speed_servers] if sweep == "speed" else servers
+        results[f"{sweep}@{len(subset)}"] = run_sweep(sweep, settings, subset)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
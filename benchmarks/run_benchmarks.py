@@ -0,0 +1,262 @@
+"""
+Hot path benchmarks for Onix
+Times link parsing, link round-trips, server add/dedupe, test-config
+generation and settings save/load on synthetic corpora, records throughput
+and peak memory, and compares the results with baseline.json.
+
+    python benchmarks/run_benchmarks.py                  # compare with baseline
+    python benchmarks/run_benchmarks.py --sizes 1000     # quick run
+    python benchmarks/run_benchmarks.py --update         # re-baseline
+"""
+
+import argparse
+import copy
+import gc
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+import link_parser  # noqa: E402
+import settings_manager  # noqa: E402
+from benchmarks.corpus import make_links  # noqa: E402
+from managers.server_manager import ServerManager  # noqa: E402
+from managers.singbox_generator import SingboxConfigGenerator  # noqa: E402
+
+BASELINE_FILE = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "baseline.json"
+)
+DEFAULT_SIZES = (1000, 10000, 50000)
+# Links added on top of an existing list of `size` servers in server_add
+ADD_BATCH = 100
+DUPLICATE_RATIO = 0.1
+
+
+def _parsed(links):
+    return [link_parser.parse_server_link(link) for link in links]
+
+
+def _manager(configs):
+    manager = ServerManager({"servers": {}}, {})
+    for config in configs:
+        manager.server_groups.setdefault(config["group"], []).append(config)
+    return manager
+
+
+# --- Cases: setup(size) -> state, run(state) -> operations performed ---
+
+
+def setup_parse(size):
+    return make_links(size)
+
+
+def run_parse(links):
+    for link in links:
+        link_parser.parse_server_link(link)
+    return len(links)
+
+
+def setup_roundtrip(size):
+    return _parsed(make_links(size))
+
+
+def run_roundtrip(configs):
+    for config in configs:
+        link_parser.parse_server_link(link_parser.generate_server_link(config))
+    return len(configs)
+
+
+def setup_server_add(size):
+    manager = _manager(_parsed(make_links(size)))
+    return manager, make_links(ADD_BATCH, seed=1)
+
+
+def run_server_add(state):
+    manager, links = state
+    for link in links:
+        manager.add_manual_server(link, update_ui=False)
+    manager.shutdown()
+    return len(links)
+
+
+def setup_dedupe(size):
+    links = make_links(size, duplicate_ratio=DUPLICATE_RATIO)
+    return _manager(_parsed(links))
+
+
+def run_dedupe(manager):
+    count = len(manager.get_all_servers())
+    manager.remove_duplicate_servers()
+    manager.shutdown()
+    return count
+
+
+def setup_load_servers(size):
+    servers = {}
+    for config in _parsed(make_links(size)):
+        servers.setdefault(config["group"], []).append(config)
+    return json.dumps({"servers": servers})
+
+
+def run_load_servers(blob):
+    # Peak memory here is what the loaded server list costs
+    manager = ServerManager(json.loads(blob), {})
+    manager.load_servers()
+    manager.shutdown()
+    return len(manager.get_all_servers())
+
+
+def setup_test_config(size):
+    return (
+        SingboxConfigGenerator(),
+        _parsed(make_links(size)),
+        copy.deepcopy(settings_manager.DEFAULT_SETTINGS),
+    )
+
+
+def run_test_config(state):
+    generator, configs, settings = state
+    # Serialized like TestCoreManager does before starting the core
+    json.dumps(generator.generate_test_config(configs, settings), indent=2)
+    return len(configs)
+
+
+def setup_settings(size):
+    settings = copy.deepcopy(settings_manager.DEFAULT_SETTINGS)
+    for config in _parsed(make_links(size)):
+        settings["servers"].setdefault(config["group"], []).append(config)
+    return settings
+
+
+def run_settings(settings):
+    settings_manager.save_settings(settings)
+    loaded = settings_manager.load_settings()
+    return sum(len(servers) for servers in loaded["servers"].values())
+
+
+CASES = {
+    "parse": (setup_parse, run_parse),
+    "roundtrip": (setup_roundtrip, run_roundtrip),
+    "server_add": (setup_server_add, run_server_add),
+    "dedupe": (setup_dedupe, run_dedupe),
+    "load_servers": (setup_load_servers, run_load_servers),
+    "test_config": (setup_test_config, run_test_config),
+    "settings_save_load": (setup_settings, run_settings),
+}
+
+
+def run_case(name, size, repeat):
+    """Best-of-`repeat` timing, then one traced run for peak memory."""
+    setup, run = CASES[name]
+    best = None
+    for _ in range(repeat):
+        state = setup(size)
+        gc.collect()
+        started = time.perf_counter()
+        ops = run(state)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+
+    state = setup(size)
+    gc.collect()
+    tracemalloc.start()
+    run(state)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {
+        "seconds": round(best, 6),
+        "ops_per_second": round(ops / best, 1) if best else 0.0,
+        "peak_mb": round(peak / (1024 * 1024), 3),
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Names of results that are slower or use more memory than allowed."""
+    regressions = []
+    for key, result in results.items():
+        base = baseline.get(key)
+        if not base:
+            continue
+        if result["ops_per_second"] < base["ops_per_second"] * (1 - tolerance):
+            regressions.append(
+                f"{key}: throughput {result['ops_per_second']:.0f}/s < {base['ops_per_second']:.0f}/s"
+            )
+        if result["peak_mb"] > base["peak_mb"] * (1 + tolerance) + 0.5:
+            regressions.append(
+                f"{key}: peak memory {result['peak_mb']:.1f} MB > {base['peak_mb']:.1f} MB"
+            )
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark Onix hot paths.")
+    parser.add_argument(
+        "--sizes",
+        default=",".join(map(str, DEFAULT_SIZES)),
+        help="comma separated corpus sizes",
+    )
+    parser.add_argument(
+        "--cases", default=",".join(CASES), help="comma separated case names"
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per case")
+    parser.add_argument(
+        "--tolerance", type=float, default=0.3, help="allowed regression ratio"
+    )
+    parser.add_argument(
+        "--update", action="store_true", help="merge these results into the baseline"
+    )
+    parser.add_argument(
+        "--output", metavar="PATH", help="also write the results as JSON"
+    )
+    args = parser.parse_args(argv)
+
+    sizes = [int(size) for size in args.sizes.split(",") if size]
+    cases = [case for case in args.cases.split(",") if case]
+    unknown = set(cases) - set(CASES)
+    if unknown:
+        parser.error(f"unknown cases: {', '.join(sorted(unknown))}")
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        # Never touch the user's settings file
+        settings_manager.SETTINGS_FILE = os.path.join(tmp, "settings.json")
+        for case in cases:
+            for size in sizes:
+                key = f"{case}@{size}"
+                results[key] = run_case(case, size, args.repeat)
+                r = results[key]
+                print(
+                    f"{key:<28} {r['seconds']:9.4f} s  {r['ops_per_second']:>12,.0f} ops/s  {r['peak_mb']:8.2f} MB peak",
+                    flush=True,
+                )
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    baseline = {}
+    if os.path.exists(BASELINE_FILE):
+        with open(BASELINE_FILE, encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    if args.update:
+        baseline.update(results)
+        with open(BASELINE_FILE, "w", encoding="utf-8") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Baseline updated with {len(results)} results")
+        return 0
+
+    regressions = compare(results, baseline, args.tolerance)
+    for line in regressions:
+        print(f"REGRESSION {line}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,146 @@
+"""
+Start-up budget check for Onix
+Measures import time and cold start in fresh interpreters and fails when a
+measurement exceeds the budget stored in startup_budget.json.
+
+    python benchmarks/startup_budget.py            # check against the budget
+    python benchmarks/startup_budget.py --update   # re-baseline the budget
+    python benchmarks/startup_budget.py --trace startup.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+BUDGET_FILE = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "startup_budget.json"
+)
+
+# Each measurement runs in a new interpreter and prints its duration in seconds
+IMPORT_SNIPPET = (
+    "import time; t = time.perf_counter(); import {module}; "
+    "print(time.perf_counter() - t)"
+)
+MEASUREMENTS = {
+    "import_ui_seconds": [
+        sys.executable,
+        "-c",
+        IMPORT_SNIPPET.format(module="ui.main_window"),
+    ],
+    "import_daemon_seconds": [
+        sys.executable,
+        "-c",
+        IMPORT_SNIPPET.format(module="daemon"),
+    ],
+    "cold_start_seconds": [sys.executable, os.path.abspath(__file__), "--child"],
+}
+
+
+def cold_start_child():
+    """Build and show the main window, then print seconds since process start."""
+    sys.path.insert(0, ROOT)
+    from utils.startup_profiler import get_startup_profiler
+
+    profiler = get_startup_profiler()
+    profiler.configure_from_env()
+
+    from PySide6.QtCore import QTimer
+    from PySide6.QtWidgets import QApplication
+
+    from managers.server_manager import ServerManager
+    from managers.singbox_manager import SingboxManager
+    from ui.main_window import PySideUI
+
+    app = QApplication(sys.argv[:1])
+    with profiler.phase("main_window"):
+        window = PySideUI(ServerManager({"servers": {}}, {}), SingboxManager({}, {}))
+    window.show()
+
+    def first_window():
+        profiler.mark("first_window")
+        profiler.write_chrome_trace()
+        print(profiler.summary()["marks"]["first_window"]["at"], flush=True)
+        # Exit without closing the window (which saves settings) or tearing
+        # down the interpreter; neither is part of start-up
+        os._exit(0)
+
+    QTimer.singleShot(0, first_window)
+    app.exec()
+
+
+def measure(command, runs, env):
+    samples = []
+    for _ in range(runs):
+        output = subprocess.check_output(command, cwd=ROOT, env=env, text=True)
+        samples.append(float(output.strip().splitlines()[-1]))
+    return statistics.median(samples)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Check Onix start-up against its budget."
+    )
+    parser.add_argument("--runs", type=int, default=5, help="runs per measurement")
+    parser.add_argument(
+        "--update", action="store_true", help="rewrite the budget from this machine"
+    )
+    parser.add_argument(
+        "--headroom", type=float, default=0.25, help="slack added by --update"
+    )
+    parser.add_argument(
+        "--trace", metavar="PATH", help="also write a Chrome trace of the cold start"
+    )
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    env = dict(os.environ)
+    env.setdefault("QT_QPA_PLATFORM", "offscreen")
+    if args.child:
+        return cold_start_child()
+
+    env.pop("ONIX_STARTUP_TRACE", None)
+    results = {
+        name: measure(command, args.runs, env) for name, command in MEASUREMENTS.items()
+    }
+    if args.trace:
+        env["ONIX_STARTUP_TRACE"] = os.path.abspath(args.trace)
+        subprocess.check_call(
+            MEASUREMENTS["cold_start_seconds"],
+            cwd=ROOT,
+            env=env,
+            stdout=subprocess.DEVNULL,
+        )
+        print(f"Chrome trace written to {env['ONIX_STARTUP_TRACE']}")
+
+    if args.update:
+        budget = {
+            name: round(value * (1 + args.headroom), 3)
+            for name, value in results.items()
+        }
+        with open(BUDGET_FILE, "w", encoding="utf-8") as f:
+            json.dump(budget, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Budget updated: {budget}")
+        return 0
+
+    with open(BUDGET_FILE, encoding="utf-8") as f:
+        budget = json.load(f)
+    failed = False
+    for name, value in results.items():
+        limit = budget.get(name)
+        status = "ok"
+        if limit is not None and value > limit:
+            status = "OVER BUDGET"
+            failed = True
+        print(
+            f"{name:<24} {value:7.3f} s  (budget {limit if limit is not None else '-'} s)  {status}"
+        )
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
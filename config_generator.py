@@ -1,22 +1,71 @@
 from constants import (
+    FAILOVER_SELECTOR_TAG,
+    FAILOVER_SLOT_PORT,
     GEOIP_RULE_SET_URL,
     GEOSITE_RULE_SET_URL,
     IRAN_GEOIP_RULE_SET_URL,
     IRAN_GEOSITE_RULE_SET_URL,
+    LOAD_BALANCER_GROUP_TAG,
+    LOAD_BALANCER_PROBE_INTERVAL,
+    LOAD_BALANCER_TOLERANCE,
     STATS_API_PORT,
     PROXY_HOST,
     PROXY_PORT,
+    TUN_INTERFACE_NAME,
+    URL_TEST_DEFAULT_URL,
 )
+from services.load_balancer import member_selector_tag, member_tag, port_ranges
+from services.traffic_shaper import hysteria_bandwidth
+from utils.rule_compiler import (
+    CIDR,
+    DOMAIN,
+    EXACT,
+    GEOIP,
+    GEOSITE,
+    KEYWORD,
+    PROCESS,
+    REGEX,
+    SUBDOMAIN,
+    SUFFIX,
+    routing_plan,
+)
+
 
+def generate_config_json(
+    server_config,
+    settings,
+    standby_servers=None,
+    balance_servers=None,
+    balance_weights=None,
+):
+    """Generates the complete sing-box configuration JSON.
 
-def generate_config_json(server_config, settings):
-    """Generates the complete sing-box configuration JSON."""
+    With `standby_servers`, the server and each standby become failover
+    slots behind a selector (see _build_failover_slots). With
+    `balance_servers`, traffic is spread over the server and those
+    (see _build_load_balancer), which takes precedence over standbys.
+    """
     dns_config, _ = _build_dns_config(settings)
     route_config = _build_route_config(settings)
+    slot_inbounds = []
 
     # --- Outbound Generation Logic ---
     outbounds = [{"type": "direct", "tag": "direct"}]
-    if server_config.get("is_chain"):
+    if balance_servers and not server_config.get("is_chain"):
+        balancer_outbounds, balancer_rules = _build_load_balancer(
+            [server_config, *balance_servers], balance_weights, settings
+        )
+        outbounds.extend(balancer_outbounds)
+        # Only traffic no other rule claimed is split between the members
+        route_config["rules"].extend(balancer_rules)
+    elif standby_servers and not server_config.get("is_chain"):
+        slot_outbounds, slot_inbounds, slot_rules = _build_failover_slots(
+            [server_config, *standby_servers], settings
+        )
+        outbounds.extend(slot_outbounds)
+        # Probe inbounds must reach their own slot before any other rule
+        route_config["rules"] = slot_rules + route_config["rules"]
+    elif server_config.get("is_chain"):
         # It's a chain configuration
         chain_outbounds = _build_chained_outbounds(server_config, settings)
         outbounds.extend(chain_outbounds)
@@ -34,7 +83,7 @@ def generate_config_json(server_config, settings):
         },
         "experimental": {
             "cache_file": {"enabled": True, "path": "cache.db", "store_fakeip": True},
-            "stats": {"listen": PROXY_HOST, "listen_port": STATS_API_PORT},
+            "clash_api": {"external_controller": f"{PROXY_HOST}:{STATS_API_PORT}"},
         },
         "dns": dns_config,
         "inbounds": [
@@ -43,7 +92,7 @@ def generate_config_json(server_config, settings):
                     {
                         "type": "tun",
                         "tag": "tun-in",
-                        "interface_name": "onix_tun",
+                        "interface_name": TUN_INTERFACE_NAME,
                         "inet4_address": "172.19.0.1/24",
                         "mtu": 9000,
                         "auto_route": True,
@@ -66,6 +115,7 @@ def generate_config_json(server_config, settings):
                 "listen": PROXY_HOST,
                 "listen_port": PROXY_PORT,
             },
+            *slot_inbounds,
         ],
         "outbounds": outbounds,
         "route": route_config,
@@ -90,17 +140,10 @@ def _build_dns_config(settings):
             ]
         )
 
-    bypass_domains_str = settings.get("bypass_domains")
-    bypass_domains_list = [
-        d.strip() for d in bypass_domains_str.split(",") if d.strip()
-    ]
-    non_geosite_bypass_domains = [
-        d for d in bypass_domains_list if not d.startswith("domain:geosite:")
-    ]
-
     dns_rules = []
-    if non_geosite_bypass_domains:
-        dns_rules.append({"domain": non_geosite_bypass_domains, "server": "dns_direct"})
+    bypass_domains = _singbox_domain_fields(routing_plan(settings))
+    if bypass_domains:
+        dns_rules.append({**bypass_domains, "server": "dns_direct"})
 
     return {
         "servers": dns_servers,
@@ -110,135 +153,100 @@ def _build_dns_config(settings):
     }, dns_rules
 
 
-def _build_route_config(settings):
-    bypass_domains_str = settings.get("bypass_domains")
-    bypass_domains_list = [
-        d.strip() for d in bypass_domains_str.split(",") if d.strip()
-    ]
+# sing-box rule fields of the domain pattern kinds
+_SINGBOX_DOMAIN_FIELDS = {
+    EXACT: "domain",
+    DOMAIN: "domain",
+    SUFFIX: "domain_suffix",
+    SUBDOMAIN: "domain_suffix",
+    KEYWORD: "domain_keyword",
+    REGEX: "domain_regex",
+}
+
+
+def _singbox_domain_fields(plan):
+    """Bypass domains of a routing plan as sing-box domain_* fields."""
+    fields = {}
+    for kind, value in plan.bypass_domains:
+        if kind == SUBDOMAIN:
+            value = f".{value}"
+        fields.setdefault(_SINGBOX_DOMAIN_FIELDS[kind], []).append(value)
+    return fields
+
+
+def _rule_set_tag(kind, code, rule_sets):
+    """Tag of a geosite/geoip rule-set, adding its definition once."""
+    tag = f"{kind}-{code}"
+    if tag not in rule_sets:
+        if kind == GEOSITE:
+            url = GEOSITE_RULE_SET_URL.format(code=code)
+            if code == "ir" or code == "tld-ir":
+                url = IRAN_GEOSITE_RULE_SET_URL
+        else:
+            url = GEOIP_RULE_SET_URL.format(code=code)
+            if code == "ir":
+                url = IRAN_GEOIP_RULE_SET_URL
+        rule_sets[tag] = {
+            "tag": tag,
+            "type": "remote",
+            "format": "binary",
+            "url": url,
+            "download_detour": "direct",
+        }
+    return tag
 
-    bypass_ips_str = settings.get("bypass_ips")
-    bypass_ips_list = [i.strip() for i in bypass_ips_str.split(",") if i.strip()]
 
+def _build_route_config(settings):
+    plan = routing_plan(settings)
     route_rules = []
-    rule_sets = []
+    rule_sets = {}
 
     # Add a rule to route DNS queries to the dns-out outbound
     route_rules.append({"protocol": ["dns"], "outbound": "dns"})
 
     # Add custom rules from settings
-    custom_routing_rules = settings.get("custom_routing_rules", [])
-    for rule in custom_routing_rules:
-        rule_type = rule.get("type")
-        rule_value = rule.get("value")
-        rule_action = rule.get("action")
-
-        if rule_type and rule_value and rule_action:
-            outbound_tag = "proxy-out" if rule_action == "proxy" else rule_action
-
-            if rule_type == "domain":
-                route_rules.append({"domain": rule_value, "outbound": outbound_tag})
-            elif rule_type == "ip":
-                route_rules.append({"ip_cidr": rule_value, "outbound": outbound_tag})
-            elif rule_type == "process":
-                route_rules.append(
-                    {"process_name": rule_value, "outbound": outbound_tag}
-                )
-            elif rule_type == "geosite":
-                rule_set_tag = f"geosite-{rule_value}"
-                route_rules.append({"rule_set": rule_set_tag, "outbound": outbound_tag})
-                # Add rule_set definition if not already present
-                if not any(rs.get("tag") == rule_set_tag for rs in rule_sets):
-                    url = GEOSITE_RULE_SET_URL.format(code=rule_value)
-                    if rule_value == "ir" or rule_value == "tld-ir":
-                        url = IRAN_GEOSITE_RULE_SET_URL
-                    rule_sets.append(
-                        {
-                            "tag": rule_set_tag,
-                            "type": "remote",
-                            "format": "binary",
-                            "url": url,
-                            "download_detour": "direct",
-                        }
-                    )
-            elif rule_type == "geoip":
-                rule_set_tag = f"geoip-{rule_value}"
-                route_rules.append({"rule_set": rule_set_tag, "outbound": outbound_tag})
-                # Add rule_set definition if not already present
-                if not any(rs.get("tag") == rule_set_tag for rs in rule_sets):
-                    url = GEOIP_RULE_SET_URL.format(code=rule_value)
-                    if rule_value == "ir":
-                        url = IRAN_GEOIP_RULE_SET_URL
-                    rule_sets.append(
-                        {
-                            "tag": rule_set_tag,
-                            "type": "remote",
-                            "format": "binary",
-                            "url": url,
-                            "download_detour": "direct",
-                        }
-                    )
-
-    # GeoIP handling
-    geoip_codes = [
-        i.replace("geoip:", "") for i in bypass_ips_list if i.startswith("geoip:")
-    ]
-    ip_cidr_rules = [i for i in bypass_ips_list if not i.startswith("geoip:")]
-
-    if "private" in geoip_codes:
+    for rule in plan.rules:
+        outbound_tag = "proxy-out" if rule.action == "proxy" else rule.action
+        if rule.kind in _SINGBOX_DOMAIN_FIELDS:
+            value = f".{rule.value}" if rule.kind == SUBDOMAIN else rule.value
+            match = {_SINGBOX_DOMAIN_FIELDS[rule.kind]: [value]}
+        elif rule.kind == CIDR:
+            match = {"ip_cidr": [rule.value]}
+        elif rule.kind == PROCESS:
+            match = {"process_name": [rule.value]}
+        elif rule.kind == GEOIP and rule.value == "private":
+            match = {"ip_is_private": True}
+        else:
+            match = {"rule_set": [_rule_set_tag(rule.kind, rule.value, rule_sets)]}
+        route_rules.append({**match, "outbound": outbound_tag})
+
+    if plan.bypass_private:
         route_rules.append({"ip_is_private": True, "outbound": "direct"})
-        geoip_codes.remove("private")
 
-    if geoip_codes:
-        rule_set_tags = [f"geoip-{code}" for code in geoip_codes]
+    if plan.bypass_geoips:
+        rule_set_tags = [
+            _rule_set_tag(GEOIP, code, rule_sets) for code in plan.bypass_geoips
+        ]
         route_rules.append({"rule_set": rule_set_tags, "outbound": "direct"})
-        for code in geoip_codes:
-            url = GEOIP_RULE_SET_URL.format(code=code)
-            if code == "ir":
-                url = IRAN_GEOIP_RULE_SET_URL
-            rule_sets.append(
-                {
-                    "tag": f"geoip-{code}",
-                    "type": "remote",
-                    "format": "binary",
-                    "url": url,
-                    "download_detour": "direct",
-                }
-            )
-
-    if ip_cidr_rules:
-        route_rules.append({"ip_cidr": ip_cidr_rules, "outbound": "direct"})
-
-    # Geosite handling
-    geosite_domains = [
-        d.replace("domain:geosite:", "")
-        for d in bypass_domains_list
-        if d.startswith("domain:geosite:")
-    ]
-    other_domains = [
-        d for d in bypass_domains_list if not d.startswith("domain:geosite:")
-    ]
-
-    if geosite_domains:
-        geosite_rule_set_tags = [f"geosite-{code}" for code in geosite_domains]
+
+    if plan.bypass_cidrs:
+        route_rules.append({"ip_cidr": list(plan.bypass_cidrs), "outbound": "direct"})
+
+    if plan.bypass_geosites:
+        geosite_rule_set_tags = [
+            _rule_set_tag(GEOSITE, code, rule_sets) for code in plan.bypass_geosites
+        ]
         route_rules.append({"rule_set": geosite_rule_set_tags, "outbound": "direct"})
-        for code in geosite_domains:
-            url = GEOSITE_RULE_SET_URL.format(code=code)
-            if code == "ir" or code == "tld-ir":
-                url = IRAN_GEOSITE_RULE_SET_URL
-            rule_sets.append(
-                {
-                    "tag": f"geosite-{code}",
-                    "type": "remote",
-                    "format": "binary",
-                    "url": url,
-                    "download_detour": "direct",
-                }
-            )
 
-    if other_domains:
-        route_rules.append({"domain": other_domains, "outbound": "direct"})
+    bypass_domains = _singbox_domain_fields(plan)
+    if bypass_domains:
+        route_rules.append({**bypass_domains, "outbound": "direct"})
 
-    return {"rules": route_rules, "rule_set": rule_sets, "final": "proxy-out"}
+    return {
+        "rules": route_rules,
+        "rule_set": list(rule_sets.values()),
+        "final": "proxy-out",
+    }
 
 
 def _build_outbound_config(
@@ -368,12 +376,7 @@ def _build_outbound_config(
         outbound["tls"] = tls_config
 
     elif protocol == "hysteria2":
-        try:
-            up_mbps = int(settings.get("hy2_up_mbps", 50))
-            down_mbps = int(settings.get("hy2_down_mbps", 100))
-        except (ValueError, TypeError):
-            up_mbps = 50
-            down_mbps = 100
+        up_mbps, down_mbps = hysteria_bandwidth(settings)
 
         outbound.update(
             {
@@ -433,6 +436,100 @@ def _build_outbound_config(
     return outbound
 
 
+def failover_slot_tag(index):
+    """Outbound tag of failover slot `index` (0 is the selected server)."""
+    return f"failover-{index}"
+
+
+def _build_failover_slots(servers, settings):
+    """Outbounds, probe inbounds and route rules for warm failover standbys.
+
+    Every server gets its own outbound, all grouped under a selector tagged
+    like the single outbound it replaces, so routes are unchanged and the
+    clash API can switch the live traffic to a standby without a restart.
+    Each slot also gets an HTTP inbound on FAILOVER_SLOT_PORT + index that
+    always routes to that slot, so standbys can be probed and kept warm.
+    """
+    outbounds = []
+    inbounds = []
+    rules = []
+    tags = []
+    for index, server in enumerate(servers):
+        tag = failover_slot_tag(index)
+        outbound = _build_outbound_config(server, settings, is_final_outbound=True)
+        outbound["tag"] = tag
+        outbounds.append(outbound)
+        inbounds.append(
+            {
+                "type": "http",
+                "tag": f"{tag}-in",
+                "listen": PROXY_HOST,
+                "listen_port": FAILOVER_SLOT_PORT + index,
+            }
+        )
+        rules.append({"inbound": [f"{tag}-in"], "outbound": tag})
+        tags.append(tag)
+
+    outbounds.append(
+        {
+            "type": "selector",
+            "tag": FAILOVER_SELECTOR_TAG,
+            "outbounds": tags,
+            "default": tags[0],
+            "interrupt_exist_connections": True,
+        }
+    )
+    return outbounds, inbounds, rules
+
+
+def _build_load_balancer(servers, weights, settings):
+    """Outbounds and route rules that spread connections over `servers`.
+
+    Each server gets an outbound and a selector in front of it; a route
+    rule sends the source port ranges of its weight share (see
+    port_ranges) to that selector. A urltest group over all members takes
+    the place of the single outbound, so rules and the final route still
+    work, and a member's selector is switched to it when the member fails.
+    """
+    if not weights or len(weights) != len(servers):
+        weights = [1.0 / len(servers)] * len(servers)
+
+    outbounds = []
+    tags = []
+    for index, server in enumerate(servers):
+        outbound = _build_outbound_config(server, settings, is_final_outbound=True)
+        outbound["tag"] = member_tag(index)
+        outbounds.append(outbound)
+        tags.append(outbound["tag"])
+    outbounds.append(
+        {
+            "type": "urltest",
+            "tag": LOAD_BALANCER_GROUP_TAG,
+            "outbounds": tags,
+            "url": URL_TEST_DEFAULT_URL,
+            "interval": LOAD_BALANCER_PROBE_INTERVAL,
+            "tolerance": LOAD_BALANCER_TOLERANCE,
+        }
+    )
+
+    rules = []
+    for index, ranges in enumerate(port_ranges(weights)):
+        if not ranges:
+            continue
+        selector = member_selector_tag(index)
+        outbounds.append(
+            {
+                "type": "selector",
+                "tag": selector,
+                "outbounds": [member_tag(index), LOAD_BALANCER_GROUP_TAG],
+                "default": member_tag(index),
+                "interrupt_exist_connections": True,
+            }
+        )
+        rules.append({"source_port_range": ranges, "outbound": selector})
+    return outbounds, rules
+
+
 def _build_chained_outbounds(chain_config, settings):
     """Builds a list of chained outbound configurations."""
     outbounds = []
@@ -1,5 +1,5 @@
+import sys
 from enum import Enum
-from PySide6.QtCore import QCoreApplication
 
 PROXY_HOST = "127.0.0.1"
 PROXY_PORT = 2082
@@ -10,6 +10,7 @@ CONFIG_FILENAME = "temp_config.json"
 SETTINGS_FILE = "settings.json"
 XRAY_LOG_FILE = "xray_core.log"
 SINGBOX_LOG_FILE = "singbox_core.log"
+ML_MODELS_FILE = "ml_models.json"
 APP_VERSION = "1.1.0"
 
 # --- Settings that require a restart to apply ---
@@ -28,8 +29,15 @@ class LogLevel(Enum):
 
 # --- UI Text Constants ---
 def tr(text):
-    """Helper function for translating constants."""
-    return QCoreApplication.translate("Constants", text)
+    """Helper function for translating constants.
+
+    Qt is only consulted when the GUI has already loaded it, so headless
+    consumers (daemon, tests, parsers) never import PySide6.
+    """
+    qt_core = sys.modules.get("PySide6.QtCore")
+    if qt_core is None:
+        return text
+    return qt_core.QCoreApplication.translate("Constants", text)
 
 
 NO_GROUPS = tr("No Groups")
@@ -151,12 +159,16 @@ THEME_NAME_DARK_BLUE = tr("Dark Blue")
 # --- Timeouts ---
 TCP_PING_TIMEOUT = 4  # Increased from 2 to 4 seconds
 URL_TEST_TIMEOUT = 8  # Increased from 5 to 8 seconds
+SPEED_TEST_TIMEOUT = 10  # Upper bound for a single download burst
 GET_EXTERNAL_IP_TIMEOUT = 5
 WAIT_FOR_PROXY_TIMEOUT = 5
 WAIT_FOR_PROXY_INTERVAL = 0.1
+CORE_STATS_TIMEOUT = 1  # Local core API calls should answer instantly
+CORE_STATS_STREAM_TIMEOUT = 5  # Max silence on the traffic feed before reconnecting
 
 # --- URLs ---
 URL_TEST_DEFAULT_URL = "http://www.gstatic.com/generate_204"
+SPEED_TEST_DEFAULT_URL = "http://speedtest.tele2.net/10MB.zip"
 GET_EXTERNAL_IP_URL = "https://api.ipify.org"
 GITHUB_RELEASES_URL = "https://github.com/AhmadAkd/onix/releases"
 GEOIP_DB_DOWNLOAD_URL = (
@@ -217,11 +229,17 @@ CONNECTION_CHECK_DELAY = 2000
 TEST_ENDPOINTS = {
     "tcp": {"host": "8.8.8.8", "port": 53, "timeout": TCP_PING_TIMEOUT},
     "url": {"url": URL_TEST_DEFAULT_URL, "timeout": URL_TEST_TIMEOUT},
+    "speed": {
+        "url": SPEED_TEST_DEFAULT_URL,
+        "timeout": SPEED_TEST_TIMEOUT,
+        "max_bytes": 2 * 1024 * 1024,  # Stop each burst after 2 MB
+    },
 }
 
 # Concurrency limits
 MAX_CONCURRENT_TESTS = 10
 MAX_CONCURRENT_CORE_TESTS = 5
+MAX_CONCURRENT_SPEED_TESTS = 3  # Parallel bursts share the local uplink
 
 # Health check settings
 HEALTH_CHECK_INTERVAL = 30  # seconds
@@ -229,10 +247,103 @@ HEALTH_CHECK_EMA_ALPHA = 0.3  # EMA smoothing factor
 HEALTH_CHECK_MAX_BACKOFF = 60  # seconds
 HEALTH_CHECK_MIN_BACKOFF = 1  # seconds
 
+# Probe bus settings
+PROBE_BUS_WORKERS = 4  # threads running scheduled probes for all monitors
+PROBE_RESULT_MAX_AGE = 2  # seconds a probe result is fresh enough to share
+LOAD_BALANCING_CHECK_INTERVAL = 30  # seconds between checks of the current server
+
+# Auto-failover settings
+FAILOVER_PROBE_INTERVAL = 0.5  # seconds between probes of the live tunnel
+FAILOVER_PROBE_TIMEOUT = 1.5  # seconds before a probe counts as failed
+FAILOVER_FAILURE_THRESHOLD = 2  # consecutive failed probes before switching
+FAILOVER_ALTERNATES = 5  # best alternate servers kept scored
+FAILOVER_STANDBY_COUNT = 2  # alternates loaded into the core as warm standbys
+FAILOVER_STANDBY_PROBE_INTERVAL = 3  # seconds between probes of each standby
+FAILOVER_RESCORE_INTERVAL = 5  # seconds between re-scoring the alternates
+FAILOVER_RESTART_GRACE = 10  # seconds the core gets to restart after a cold switch
+FAILOVER_SELECTOR_TAG = "proxy-out"  # sing-box selector outbound the routes use
+FAILOVER_SLOT_PORT = 2090  # probe inbound of failover slot i listens on this + i
+
+# Load balancer settings
+LOAD_BALANCER_MEMBERS = 4  # servers the load balancer mode spreads traffic over
+LOAD_BALANCER_PORT_BUCKETS = 256  # source port slices shared out by member weight
+LOAD_BALANCER_MIN_SHARE = 0.05  # smallest traffic share of a healthy member
+LOAD_BALANCER_PROBE_INTERVAL = "1m"  # core's own latency probe of each member
+LOAD_BALANCER_TOLERANCE = 50  # ms the urltest fallback group tolerates
+LOAD_BALANCER_MONITOR_INTERVAL = 5  # seconds between member health/traffic checks
+LOAD_BALANCER_GROUP_TAG = "proxy-out"  # group outbound the routes and fallbacks use
+
+# Predictive failover settings
+PREDICTIVE_WINDOW = 20  # probe samples kept per server for trend and variance
+PREDICTIVE_MIN_SAMPLES = 15  # samples needed before a trend is trusted
+PREDICTIVE_HORIZON = 10  # samples ahead the trend is projected
+PREDICTIVE_LATENCY_LIMIT = 1000  # ms of latency users notice
+PREDICTIVE_LOSS_LIMIT = 5.0  # percent packet loss users notice
+PREDICTIVE_JITTER_LIMIT = 300  # ms of jitter users notice
+PREDICTIVE_ERROR_LIMIT = 0.5  # share of failed probes users notice
+PREDICTIVE_FAILOVER_THRESHOLD = 0.9  # failure probability that triggers failover
+
+# AI analyzer settings
+AI_BASELINE_ALPHA = 0.05  # weight of each sample in a server's running baseline
+AI_BASELINE_WARMUP = 20  # samples before a server's baseline is trusted
+AI_EWMA_ALPHA = 0.3  # weight of each sample in the EWMA change chart
+AI_EWMA_LIMIT = 3.5  # chart deviations (in its own std devs) that signal a shift
+AI_CUSUM_SLACK = 0.5  # std devs of drift per sample the CUSUM ignores
+AI_CUSUM_THRESHOLD = 8.0  # accumulated std devs that signal a sustained shift
+AI_ANOMALY_HIGH_Z = 4.0  # z-score of a single sample that needs immediate action
+AI_SCORE_CHANGE = 0.05  # composite score change that re-evaluates a server
+AI_RECOMMENDATION_TTL = 3600  # seconds a recommendation stays active
+AI_ANALYSIS_INTERVAL = 30  # seconds between background re-evaluations
+
+# ML optimization settings
+ML_FEATURES = ("bandwidth", "connections", "response_time")  # model input order
+ML_TRAINING_CAPACITY = 5000  # recent training samples kept for fitting new models
+ML_MIN_TRAINING_SAMPLES = 10  # samples needed before a model can be fitted
+ML_RLS_FORGETTING = 0.999  # weight kept by older samples on each online update
+ML_RLS_INITIAL_COVARIANCE = 1000.0  # prior uncertainty of the model coefficients
+
+# Traffic shaping settings
+TUN_INTERFACE_NAME = "onix_tun"  # interface the core's TUN inbound creates
+SHAPING_IFB_INTERFACE = "onix_ifb"  # receives tunnel ingress so downloads can be shaped
+SHAPING_LINE_RATE_KBIT = 10_000_000  # ceiling of a direction without a limit
+SHAPING_MAX_ADDRESSES = 4096  # learned per-address filters kept at once
+SHAPING_COMMAND_TIMEOUT = 5  # seconds each tc/ip invocation may take
+
+# Real-time statistics settings
+STATISTICS_SAMPLE_INTERVAL = 1  # seconds between core counter reads
+STATISTICS_LATENCY_INTERVAL = 10  # seconds between tunnel latency probes
+
+# Traffic accounting settings
+TRAFFIC_SAMPLE_INTERVAL = 2  # seconds between connection snapshots
+TRAFFIC_TOP_N_CAPACITY = 256  # max distinct hosts/processes tracked at once
+TRAFFIC_DECAY_INTERVAL = 60  # seconds between counter decays
+TRAFFIC_DECAY_FACTOR = 0.5  # halve old traffic each decay so top talkers age out
+
+# Metrics exporter settings
+METRICS_EXPORTER_PORT = 9464  # local OpenMetrics scrape endpoint (opt-in)
+SWEEP_DURATION_BUCKETS = (1, 5, 10, 30, 60, 120, 300, 600)  # seconds
+
+# Startup profiling
+STARTUP_REPORT_DELAY = (
+    5000  # ms after the event loop starts to log timings and idle memory
+)
+
+# Headless daemon settings
+CONTROL_API_PORT = 9466  # local JSON control API of the headless daemon
+
 # Test retry settings
 TEST_RETRY_COUNT = 1
 TEST_RETRY_DELAY = 0.5  # seconds between retries
 
+# Download settings
+DOWNLOAD_CHUNK_SIZE = 256 * 1024  # bytes read and written at a time
+DOWNLOAD_SEGMENTS = 4  # parallel ranged requests for a large file
+DOWNLOAD_SEGMENT_MIN_SIZE = 4 * 1024 * 1024  # smallest file split into segments
+DOWNLOAD_RETRIES = 5  # attempts per segment before the download fails
+DOWNLOAD_RETRY_DELAY = 1  # seconds before the first retry, doubling after
+DOWNLOAD_TIMEOUT = 30  # seconds without data before a request is retried
+DOWNLOAD_STATE_INTERVAL = 1024 * 1024  # bytes between resume state saves
+
 # Core test settings
 CORE_TEST_STARTUP_DELAY = 2  # seconds to wait for core to start
 CORE_TEST_SHUTDOWN_DELAY = 1  # seconds to wait for core to stop
@@ -0,0 +1,330 @@
+"""
+Headless entry point for Onix
+Runs the server, subscription and core managers without Qt and exposes a
+local JSON control API for connect, switch, test and stats.
+"""
+
+import argparse
+import os
+import signal
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import settings_manager
+from constants import CONTROL_API_PORT, LogLevel, METRICS_EXPORTER_PORT, PROXY_HOST
+from managers.server_manager import ServerManager
+from managers.subscription_manager import SubscriptionManager
+from services.control_api import ControlApiError, ControlApiServer
+
+SAVE_DEBOUNCE_SECONDS = 2
+TEST_TYPES = ("url", "tcp", "speed")
+
+
+def console_log(debug: bool = False) -> Callable[[str, LogLevel], None]:
+    """Log callback that writes timestamped lines to stdout."""
+
+    def log(message: str, level: LogLevel = LogLevel.INFO):
+        if level == LogLevel.DEBUG and not debug:
+            return
+        stamp = time.strftime("%Y-%m-%d %H:%M:%S")
+        print(f"{stamp} [{level.value}] {message}", flush=True)
+
+    return log
+
+
+class OnixDaemon:
+    """Owns the managers for a GUI-less session and answers control API calls."""
+
+    def __init__(
+        self,
+        settings: Dict[str, Any],
+        log_callback: Callable[[str, LogLevel], None],
+    ):
+        self.settings = settings
+        self.log = log_callback
+        self.status = "Disconnected"
+        self.connected_server: Optional[Dict[str, Any]] = None
+        self.latency = -1
+        self.external_ip = None
+        self.speed = (0.0, 0.0)
+        self.statistics_service = None
+        self._save_timer = None
+        self._save_lock = threading.Lock()
+
+        self.server_manager = ServerManager(
+            settings,
+            {
+                "log": self.log,
+                "request_save": self._request_save,
+                "show_info": lambda title, msg: self.log(msg, LogLevel.INFO),
+                "show_warning": lambda title, msg: self.log(msg, LogLevel.WARNING),
+                "show_error": lambda title, msg: self.log(
+                    f"{title}: {msg}", LogLevel.ERROR
+                ),
+            },
+        )
+        self.subscription_manager = SubscriptionManager(
+            self.server_manager,
+            settings,
+            {
+                "log": self.log,
+                "show_info": lambda title, msg: self.log(msg, LogLevel.INFO),
+                "show_warning": lambda title, msg: self.log(msg, LogLevel.WARNING),
+                "show_error": lambda title, msg: self.log(
+                    f"{title}: {msg}", LogLevel.ERROR
+                ),
+            },
+        )
+        self.core_name = (
+            "Xray"
+            if settings.get("active_core", "sing-box").lower() == "xray"
+            else "sing-box"
+        )
+        self.connection_manager = self._create_connection_manager()
+
+    def _create_connection_manager(self):
+        callbacks = {
+            "log": self.log,
+            "on_status_change": self._on_status_change,
+            "on_connect": self._on_connect,
+            "on_stop": self._on_stop,
+            "on_ip_update": self._on_ip_update,
+            "on_speed_update": self._on_speed_update,
+            "schedule": lambda delay_ms, fn: threading.Timer(
+                delay_ms / 1000.0, fn
+            ).start(),
+        }
+        # Import lazily: only the selected core's manager is loaded
+        if self.core_name == "Xray":
+            from managers.xray_manager import XrayManager
+
+            return XrayManager(self.settings, callbacks)
+
+        from managers.singbox_manager import SingboxManager
+
+        return SingboxManager(self.settings, callbacks)
+
+    # --- Settings ---
+
+    def _request_save(self):
+        """Debounce settings writes like the GUI's save timer does."""
+        with self._save_lock:
+            if self._save_timer:
+                self._save_timer.cancel()
+            self._save_timer = threading.Timer(
+                SAVE_DEBOUNCE_SECONDS, self.server_manager.save_settings_to_disk
+            )
+            self._save_timer.daemon = True
+            self._save_timer.start()
+
+    # --- Core callbacks ---
+
+    def _on_status_change(self, status: str, color: str):
+        self.status = status
+
+    def _on_connect(self, latency: int):
+        self.status = "Connected"
+        self.latency = latency
+        if self.statistics_service is None:
+            from services.statistics_service import RealTimeStatisticsService
+
+            self.statistics_service = RealTimeStatisticsService(
+                self.log, core_name=self.core_name
+            )
+        if not self.statistics_service.is_monitoring():
+            self.statistics_service.start_monitoring()
+
+    def _on_stop(self):
+        self.status = "Disconnected"
+        self.latency = -1
+        self.external_ip = None
+        self.speed = (0.0, 0.0)
+        if self.statistics_service:
+            self.statistics_service.stop_monitoring()
+
+    def _on_ip_update(self, ip_address: str):
+        self.external_ip = ip_address
+
+    def _on_speed_update(self, upload: float, download: float):
+        self.speed = (upload, download)
+
+    # --- Control API handlers ---
+
+    def _find_server(self, server_id: str) -> Dict[str, Any]:
+        for server in self.server_manager.get_all_servers():
+            if server.get("id") == server_id:
+                return server
+        raise ControlApiError(f"unknown server '{server_id}'", status=404)
+
+    def _select_servers(self, body: Dict[str, Any]) -> List[Dict[str, Any]]:
+        if body.get("server_ids"):
+            return [self._find_server(server_id) for server_id in body["server_ids"]]
+        if body.get("group"):
+            if body["group"] not in self.server_manager.server_groups:
+                raise ControlApiError(f"unknown group '{body['group']}'", status=404)
+            return self.server_manager.get_servers_by_group(body["group"])
+        return self.server_manager.get_all_servers()
+
+    def get_status(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        server = self.connected_server or {}
+        return {
+            "status": self.status,
+            "core": self.core_name,
+            "running": bool(self.connection_manager.is_running),
+            "server": {"id": server.get("id"), "name": server.get("name")},
+            "latency_ms": self.latency,
+            "external_ip": self.external_ip,
+            "upload_speed": self.speed[0],
+            "download_speed": self.speed[1],
+        }
+
+    def list_servers(self, body: Dict[str, Any]) -> List[Dict[str, Any]]:
+        result = []
+        for group, servers in self.server_manager.server_groups.items():
+            if body.get("group") and body["group"] != group:
+                continue
+            for server in servers:
+                result.append(
+                    {
+                        "id": server.get("id"),
+                        "name": server.get("name"),
+                        "group": group,
+                        "protocol": server.get("protocol"),
+                        "tcp_ping": server.get("tcp_ping"),
+                        "url_ping": server.get("url_ping"),
+                        "download_speed": server.get("download_speed"),
+                    }
+                )
+        return result
+
+    def get_stats(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        if not self.statistics_service:
+            return {}
+        return self.statistics_service.get_statistics()
+
+    def connect(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        """Connect to a server; when already connected this switches servers."""
+        server_id = body.get("server_id")
+        if not server_id:
+            raise ControlApiError("server_id is required")
+        server = self._find_server(server_id)
+        self.connected_server = server
+        # start() stops a running core first and launches the new one
+        self.connection_manager.start(server)
+        return {"connecting": server_id, "name": server.get("name")}
+
+    def disconnect(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        self.connection_manager.stop()
+        self.connected_server = None
+        return {"status": "Disconnected"}
+
+    def run_test(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        test_type = body.get("type", "url")
+        if test_type not in TEST_TYPES:
+            raise ControlApiError(f"type must be one of {', '.join(TEST_TYPES)}")
+        servers = self._select_servers(body)
+        runner = {
+            "url": self.server_manager.test_all_urls,
+            "tcp": self.server_manager.test_all_tcp,
+            "speed": self.server_manager.test_all_speed,
+        }[test_type]
+        threading.Thread(target=runner, args=(servers,), daemon=True).start()
+        return {"started": test_type, "servers": len(servers)}
+
+    def update_subscriptions(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        subscriptions = self.settings.get("subscriptions", [])
+        self.subscription_manager.update_subscriptions(subscriptions)
+        return {"started": True, "subscriptions": len(subscriptions)}
+
+    # --- Lifecycle ---
+
+    def shutdown(self):
+        if self.connection_manager.is_running:
+            self.connection_manager.stop()
+        self.server_manager.shutdown()
+        with self._save_lock:
+            if self._save_timer:
+                self._save_timer.cancel()
+        self.server_manager.force_save_settings()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Run Onix without the GUI.")
+    parser.add_argument("--host", default=None, help="control API bind address")
+    parser.add_argument("--port", type=int, default=None, help="control API port")
+    parser.add_argument("--connect", metavar="SERVER_ID", help="connect on startup")
+    parser.add_argument(
+        "--health-check",
+        metavar="TYPES",
+        help="comma separated health check types to run, e.g. tcp,url",
+    )
+    parser.add_argument("--debug", action="store_true", help="print debug logs")
+    args = parser.parse_args(argv)
+
+    settings = settings_manager.load_settings()
+    log = console_log(args.debug or settings.get("log_level") == "Debug")
+
+    daemon = OnixDaemon(settings, log)
+    daemon.server_manager.load_servers()
+
+    host = args.host or settings.get("control_api_host", PROXY_HOST)
+    token = os.environ.get("ONIX_CONTROL_TOKEN") or settings.get(
+        "control_api_token", ""
+    )
+    if host not in ("127.0.0.1", "::1", "localhost") and not token:
+        log(
+            "Control API is reachable from other hosts without a token; "
+            "set ONIX_CONTROL_TOKEN.",
+            LogLevel.WARNING,
+        )
+    api = ControlApiServer(
+        daemon,
+        log,
+        host=host,
+        port=args.port or settings.get("control_api_port", CONTROL_API_PORT),
+        token=token,
+    )
+    if not api.start():
+        daemon.shutdown()
+        return 1
+
+    exporter = None
+    if settings.get("metrics_exporter_enabled", False):
+        from services.metrics_exporter import MetricsExporter
+
+        exporter = MetricsExporter(
+            log, port=settings.get("metrics_exporter_port", METRICS_EXPORTER_PORT)
+        )
+        exporter.watch_executor("servers", daemon.server_manager.thread_pool)
+        exporter.start()
+
+    if args.connect:
+        try:
+            daemon.connect({"server_id": args.connect})
+        except ControlApiError as e:
+            log(str(e), LogLevel.ERROR)
+    if args.health_check:
+        daemon.server_manager.start_health_check(
+            test_types=[t.strip() for t in args.health_check.split(",") if t.strip()]
+        )
+
+    stop_event = threading.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: stop_event.set())
+    log("Onix daemon running", LogLevel.SUCCESS)
+    # Wake up periodically so signals are handled on every platform
+    while not stop_event.wait(1):
+        pass
+
+    log("Shutting down Onix daemon", LogLevel.INFO)
+    api.stop()
+    if exporter:
+        exporter.stop()
+    daemon.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
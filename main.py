@@ -2,34 +2,46 @@ import os
 import sys
 import time
 
-from PySide6.QtWidgets import QApplication
-from PySide6.QtCore import QTranslator, QLocale, Qt
-from ui.main_window import PySideUI
-from managers.server_manager import ServerManager
-
-# Import specific core managers
-from managers.singbox_manager import SingboxManager
-from managers.xray_manager import XrayManager
-import settings_manager
-from utils.error_handler import (
-    get_global_error_handler,
-    safe_execute,
-    error_handler_decorator,
-)
-from utils.performance_monitor import (
-    get_global_performance_monitor,
-    PerformanceOptimizer,
-)
-from constants import LogLevel
+# Imported first so ONIX_STARTUP_TRACE can trace every module imported below
+from utils.startup_profiler import get_startup_profiler
+
+get_startup_profiler().configure_from_env()
+
+with get_startup_profiler().phase("imports"):
+    from PySide6.QtWidgets import QApplication
+    from PySide6.QtCore import QTranslator, QLocale, Qt, QTimer
+    from ui.main_window import PySideUI
+    from managers.server_manager import ServerManager
+
+    # Import specific core managers
+    from managers.singbox_manager import SingboxManager
+    from managers.xray_manager import XrayManager
+    import settings_manager
+    from utils.error_handler import (
+        get_global_error_handler,
+        safe_execute,
+        error_handler_decorator,
+    )
+    from utils.performance_monitor import (
+        get_global_performance_monitor,
+        PerformanceOptimizer,
+    )
+    from services.metrics_exporter import MetricsExporter
+    from constants import LogLevel, METRICS_EXPORTER_PORT, STARTUP_REPORT_DELAY
 
 
 @error_handler_decorator(error_type="main_function", critical=True)
 def main():
     """Main application entry point with comprehensive error handling."""
+    # Everything before this point is interpreter start-up and module imports
+    profiler = get_startup_profiler()
+    profiler.mark("imports_done")
+
     # Initialize global error handler and performance monitor
     error_handler = get_global_error_handler()
     performance_monitor = get_global_performance_monitor()
     performance_optimizer = PerformanceOptimizer(error_handler.log)
+    metrics_exporter = None
 
     try:
         # Start performance monitoring
@@ -41,150 +53,158 @@ def main():
             default_return=False,
         )
         # Load settings with error handling
-        settings = safe_execute(
-            settings_manager.load_settings,
-            error_handler=error_handler,
-            context="Loading application settings",
-            error_type="settings_load",
-            default_return={},
-        )
-
-        if not settings:
-            error_handler.log(
-                "Failed to load settings, using defaults", LogLevel.WARNING
+        with profiler.phase("settings"):
+            settings = safe_execute(
+                settings_manager.load_settings,
+                error_handler=error_handler,
+                context="Loading application settings",
+                error_type="settings_load",
+                default_return={},
             )
-            settings = {}
+
+            if not settings:
+                error_handler.log(
+                    "Failed to load settings, using defaults", LogLevel.WARNING
+                )
+                settings = {}
 
         # Create the Qt Application and the UI instance
-        app = QApplication([])
+        with profiler.phase("qt_application"):
+            app = QApplication([])
 
         # --- Language/Translator Setup ---
-        # Default to system language if not set
-        language = safe_execute(
-            lambda: settings.get("language", QLocale.system().name().split("_")[0]),
-            error_handler=error_handler,
-            context="Getting system language",
-            error_type="language_detection",
-            default_return="en",
-        )
+        with profiler.phase("translations"):
+            # Default to system language if not set
+            language = safe_execute(
+                lambda: settings.get("language", QLocale.system().name().split("_")[0]),
+                error_handler=error_handler,
+                context="Getting system language",
+                error_type="language_detection",
+                default_return="en",
+            )
 
-        # Save the determined language back to settings
-        settings["language"] = language
+            # Save the determined language back to settings
+            settings["language"] = language
 
-        translator = QTranslator()
+            translator = QTranslator()
 
-        # Construct the path to the translations directory
-        translations_path = os.path.join(os.path.dirname(__file__), "translations")
+            # Construct the path to the translations directory
+            translations_path = os.path.join(os.path.dirname(__file__), "translations")
 
-        # Load the translation file from the 'translations' directory
-        if language != "en":
-            translation_loaded = safe_execute(
-                lambda: translator.load(f"onix_{language}.qm", translations_path),
-                error_handler=error_handler,
-                context=f"Loading translation for {language}",
-                error_type="translation_load",
-                default_return=False,
-            )
-            if translation_loaded:
-                app.installTranslator(translator)
+            # Load the translation file from the 'translations' directory
+            if language != "en":
+                translation_loaded = safe_execute(
+                    lambda: translator.load(f"onix_{language}.qm", translations_path),
+                    error_handler=error_handler,
+                    context=f"Loading translation for {language}",
+                    error_type="translation_load",
+                    default_return=False,
+                )
+                if translation_loaded:
+                    app.installTranslator(translator)
 
         # --- RTL Support Setup ---
-        from ui.rtl_styles import is_rtl_language, apply_rtl_styles
-
-        # Check if language is RTL
-        is_rtl = safe_execute(
-            lambda: is_rtl_language(language),
-            error_handler=error_handler,
-            context="Checking RTL language support",
-            error_type="rtl_check",
-            default_return=False,
-        )
+        with profiler.phase("layout_direction"):
+            from ui.rtl_styles import is_rtl_language, apply_rtl_styles
 
-        if is_rtl:
-            # Set RTL layout direction
-            safe_execute(
-                lambda: app.setLayoutDirection(Qt.RightToLeft),
+            # Check if language is RTL
+            is_rtl = safe_execute(
+                lambda: is_rtl_language(language),
                 error_handler=error_handler,
-                context="Setting RTL layout direction",
-                error_type="rtl_layout",
-                default_return=None,
+                context="Checking RTL language support",
+                error_type="rtl_check",
+                default_return=False,
             )
 
-            # Apply RTL styles
-            safe_execute(
-                lambda: apply_rtl_styles(app, is_dark_mode=False),
-                error_handler=error_handler,
-                context="Applying RTL styles",
-                error_type="rtl_styles",
-                default_return=None,
-            )
+            if is_rtl:
+                # Set RTL layout direction
+                safe_execute(
+                    lambda: app.setLayoutDirection(Qt.RightToLeft),
+                    error_handler=error_handler,
+                    context="Setting RTL layout direction",
+                    error_type="rtl_layout",
+                    default_return=None,
+                )
 
-            error_handler.log(
-                f"RTL support enabled for language: {language}", LogLevel.INFO
-            )
-        else:
-            # Set LTR layout direction
-            safe_execute(
-                lambda: app.setLayoutDirection(Qt.LeftToRight),
-                error_handler=error_handler,
-                context="Setting LTR layout direction",
-                error_type="ltr_layout",
-                default_return=None,
-            )
+                # Apply RTL styles
+                safe_execute(
+                    lambda: apply_rtl_styles(app, is_dark_mode=False),
+                    error_handler=error_handler,
+                    context="Applying RTL styles",
+                    error_type="rtl_styles",
+                    default_return=None,
+                )
+
+                error_handler.log(
+                    f"RTL support enabled for language: {language}", LogLevel.INFO
+                )
+            else:
+                # Set LTR layout direction
+                safe_execute(
+                    lambda: app.setLayoutDirection(Qt.LeftToRight),
+                    error_handler=error_handler,
+                    context="Setting LTR layout direction",
+                    error_type="ltr_layout",
+                    default_return=None,
+                )
 
-            error_handler.log(f"LTR layout for language: {language}", LogLevel.INFO)
+                error_handler.log(f"LTR layout for language: {language}", LogLevel.INFO)
         # --- End RTL Support Setup ---
 
         # --- End Translator Setup ---
 
         # Initialize managers with error handling
-        server_manager = safe_execute(
-            lambda: ServerManager(settings, {}),
-            error_handler=error_handler,
-            context="Initializing server manager",
-            error_type="server_manager_init",
-            default_return=None,
-        )
-
-        if not server_manager:
-            error_handler.log("Failed to initialize server manager", LogLevel.ERROR)
-            return 1
-
-        # Initialize connection manager
-        active_core_name = settings.get("active_core", "sing-box")
-        if active_core_name == "xray":
-            connection_manager = safe_execute(
-                lambda: XrayManager(settings, {}),
-                error_handler=error_handler,
-                context="Initializing Xray manager",
-                error_type="xray_manager_init",
-                default_return=None,
-            )
-        else:  # Default to sing-box
-            connection_manager = safe_execute(
-                lambda: SingboxManager(settings, {}),
+        with profiler.phase("managers"):
+            server_manager = safe_execute(
+                lambda: ServerManager(settings, {}),
                 error_handler=error_handler,
-                context="Initializing Singbox manager",
-                error_type="singbox_manager_init",
+                context="Initializing server manager",
+                error_type="server_manager_init",
                 default_return=None,
             )
 
-        if not connection_manager:
-            error_handler.log("Failed to initialize connection manager", LogLevel.ERROR)
-            return 1
+            if not server_manager:
+                error_handler.log("Failed to initialize server manager", LogLevel.ERROR)
+                return 1
+
+            # Initialize connection manager
+            active_core_name = settings.get("active_core", "sing-box")
+            if active_core_name == "xray":
+                connection_manager = safe_execute(
+                    lambda: XrayManager(settings, {}),
+                    error_handler=error_handler,
+                    context="Initializing Xray manager",
+                    error_type="xray_manager_init",
+                    default_return=None,
+                )
+            else:  # Default to sing-box
+                connection_manager = safe_execute(
+                    lambda: SingboxManager(settings, {}),
+                    error_handler=error_handler,
+                    context="Initializing Singbox manager",
+                    error_type="singbox_manager_init",
+                    default_return=None,
+                )
+
+            if not connection_manager:
+                error_handler.log(
+                    "Failed to initialize connection manager", LogLevel.ERROR
+                )
+                return 1
 
         # Create the UI with managers
-        pyside_ui = safe_execute(
-            lambda: PySideUI(server_manager, connection_manager),
-            error_handler=error_handler,
-            context="Creating main UI",
-            error_type="ui_creation",
-            default_return=None,
-        )
+        with profiler.phase("main_window"):
+            pyside_ui = safe_execute(
+                lambda: PySideUI(server_manager, connection_manager),
+                error_handler=error_handler,
+                context="Creating main UI",
+                error_type="ui_creation",
+                default_return=None,
+            )
 
-        if not pyside_ui:
-            error_handler.log("Failed to create main UI", LogLevel.ERROR)
-            return 1
+            if not pyside_ui:
+                error_handler.log("Failed to create main UI", LogLevel.ERROR)
+                return 1
 
         # Define and connect callbacks with error handling
         server_manager_callbacks = {
@@ -197,6 +217,9 @@ def main():
             "on_ping_started": lambda config: pyside_ui.signals.ping_started.emit(
                 config
             ),
+            "on_speed_result": lambda config, speed: pyside_ui.signals.speed_test_result.emit(
+                config, speed
+            ),
             "on_health_check_progress": lambda current, total: pyside_ui.signals.health_check_progress.emit(
                 current, total
             ),
@@ -213,6 +236,7 @@ def main():
             "on_connect": pyside_ui.signals.connected.emit,
             "on_stop": pyside_ui.signals.stopped.emit,
             "on_ip_update": pyside_ui.signals.ip_updated.emit,
+            "on_speed_update": pyside_ui.signals.speed_updated.emit,
         }
 
         # Set callbacks with error handling
@@ -234,25 +258,59 @@ def main():
             default_return=None,
         )
 
+        # Optional OpenMetrics endpoint for unattended installs
+        if settings.get("metrics_exporter_enabled", False):
+            metrics_exporter = MetricsExporter(
+                error_handler.log,
+                port=settings.get("metrics_exporter_port", METRICS_EXPORTER_PORT),
+            )
+            metrics_exporter.watch_executor("servers", server_manager.thread_pool)
+            safe_execute(
+                lambda: metrics_exporter.start(),
+                error_handler=error_handler,
+                context="Starting metrics exporter",
+                error_type="metrics_exporter_start",
+                default_return=False,
+            )
+
         # Manually trigger initial data load for the UI
-        safe_execute(
-            lambda: server_manager.load_servers(),
-            error_handler=error_handler,
-            context="Loading initial server data",
-            error_type="server_load",
-            default_return=None,
-        )
+        with profiler.phase("load_servers"):
+            safe_execute(
+                lambda: server_manager.load_servers(),
+                error_handler=error_handler,
+                context="Loading initial server data",
+                error_type="server_load",
+                default_return=None,
+            )
 
         # Show the window and run the app
         app.setProperty("restart_requested", False)
 
-        safe_execute(
-            lambda: pyside_ui.show(),
-            error_handler=error_handler,
-            context="Showing main window",
-            error_type="ui_show",
-            default_return=None,
-        )
+        with profiler.phase("show_window"):
+            safe_execute(
+                lambda: pyside_ui.show(),
+                error_handler=error_handler,
+                context="Showing main window",
+                error_type="ui_show",
+                default_return=None,
+            )
+
+        # Milestones are taken from the event loop: once the first frame is
+        # out, and again after things settle to capture idle memory.
+        QTimer.singleShot(0, lambda: profiler.mark("first_window"))
+
+        def report_startup():
+            profiler.mark("idle")
+            pyside_ui.log(profiler.report())
+            if profiler.trace_path:
+                profiler.stop_tracing_imports()
+                try:
+                    path = profiler.write_chrome_trace()
+                    pyside_ui.log(f"Startup trace written to {path}", LogLevel.INFO)
+                except OSError as e:
+                    pyside_ui.log(f"Could not write startup trace: {e}", LogLevel.ERROR)
+
+        QTimer.singleShot(STARTUP_REPORT_DELAY, report_startup)
 
         exit_code = safe_execute(
             lambda: app.exec(),
@@ -315,6 +373,15 @@ def main():
                 default_return=None,
             )
 
+            if metrics_exporter:
+                safe_execute(
+                    lambda: metrics_exporter.stop(),
+                    error_handler=error_handler,
+                    context="Stopping metrics exporter",
+                    error_type="metrics_exporter_stop",
+                    default_return=None,
+                )
+
             # Optimize memory before exit
             safe_execute(
                 lambda: performance_optimizer.optimize_memory(),
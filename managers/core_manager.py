@@ -6,6 +6,11 @@ class CoreManager(ABC):
     Abstract base class for managing different proxy cores (like sing-box, Xray, etc.).
     """
 
+    # Whether start() honours standby_servers and switch_to_standby works
+    supports_standby = False
+    # Whether start() honours balance_servers (load balancer mode)
+    supports_balancing = False
+
     def __init__(self, settings, callbacks):
         self.settings = settings
         self.callbacks = callbacks
@@ -13,8 +18,17 @@ class CoreManager(ABC):
         self.process = None
 
     @abstractmethod
-    def start(self, config):
-        """Starts the core with the given server configuration."""
+    def start(
+        self, config, standby_servers=None, balance_servers=None, balance_weights=None
+    ):
+        """Starts the core with the given server configuration.
+
+        `standby_servers` are alternates the core keeps ready so that
+        `switch_to_standby` can move traffic to them without a restart;
+        cores that cannot do this ignore them. `balance_servers` spreads
+        traffic over `config` and those at once, `balance_weights` giving
+        each member's share.
+        """
         pass
 
     @abstractmethod
@@ -27,5 +41,19 @@ class CoreManager(ABC):
         """Checks if the connection through the core is successful."""
         pass
 
+    def switch_to_standby(self, index):
+        """Move live traffic to standby `index` (0 is the started server).
+
+        Returns False when the core has no warm standbys to switch to.
+        """
+        return False
+
+    def set_balance_member(self, index, enabled):
+        """Give load balancer member `index` its traffic back, or hand it on.
+
+        Returns False when the core balances on its own health checks.
+        """
+        return False
+
     def log(self, message, level):
         self.callbacks.get("log", lambda msg, lvl: None)(message, level)
@@ -1,6 +1,7 @@
 import base64
 import binascii
 import threading
+import time
 import uuid
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import Dict, List, Optional, Any, Protocol
@@ -12,16 +13,21 @@ import settings_manager
 from constants import (
     LogLevel,
     MAX_CONCURRENT_TESTS,
+    MAX_CONCURRENT_SPEED_TESTS,
     HEALTH_CHECK_INTERVAL,
+    SWEEP_DURATION_BUCKETS,
     TEST_ENDPOINTS,
 )
 
 # Removed unused import: constants
+from managers.server_record import to_record
 from managers.singbox_generator import SingboxConfigGenerator
 from managers.xray_generator import XrayConfigGenerator
 from managers.test_core_manager import TestCoreManager
 from services.health_checker import HealthChecker
 from services.ping_service import proxy_tcp_connect, url_latency_via_proxy
+from services.speed_test_service import download_throughput_via_proxy
+from utils.metrics import TrackedExecutor, get_metrics_registry
 
 
 # --- Callback Protocol ---
@@ -33,6 +39,7 @@ class ServerManagerCallbacks(Protocol):
         self, server: Dict[str, Any], ping_result: int, test_type: str
     ) -> None: ...
 
+    def on_speed_result(self, server: Dict[str, Any], speed: float) -> None: ...
     def on_ping_started(self, config: Dict[str, Any]) -> None: ...
     def on_update_start(self) -> None: ...
     def on_update_finish(self, errors: Optional[List[Exception]] = None) -> None: ...
@@ -65,7 +72,7 @@ class ServerManager:
         self.callbacks = callbacks
         self.server_groups: Dict[str, List[Dict[str, Any]]] = {}
         # Use a single ThreadPoolExecutor for all background tasks
-        self.thread_pool = ThreadPoolExecutor(max_workers=MAX_CONCURRENT_TESTS)
+        self.thread_pool = TrackedExecutor(max_workers=MAX_CONCURRENT_TESTS)
         self._cancel_event = threading.Event()
         self.is_testing = False
         self._test_lock = threading.Lock()
@@ -76,6 +83,11 @@ class ServerManager:
         self._health_checker = HealthChecker(settings, self.log)
         self._health_checker.set_test_callback(self._on_health_check_result)
 
+    @property
+    def health_checker(self) -> HealthChecker:
+        """The periodic health checker, whose stats other services read."""
+        return self._health_checker
+
     def shutdown(self):
         """Shuts down the thread pool. Should be called on application exit."""
         self.log("Shutting down server manager thread pool.", LogLevel.DEBUG)
@@ -116,6 +128,8 @@ class ServerManager:
                     if "id" not in server_config or not server_config.get("id"):
                         server_config["id"] = str(uuid.uuid4())
                         settings_modified = True
+                # Compact records in place; settings["servers"] shares the lists
+                server_list[:] = [to_record(server) for server in server_list]
 
         if settings_modified:
             self.log(
@@ -147,10 +161,11 @@ class ServerManager:
         update_ui: bool = True,
         callbacks: Optional[ServerManagerCallbacks] = None,
     ) -> bool:
-        config: Optional[Dict[str, Any]] = link_parser.parse_server_link(server_link)
-        if not config:
+        parsed: Optional[Dict[str, Any]] = link_parser.parse_server_link(server_link)
+        if not parsed:
             self.log(f"Failed to parse server link: {server_link}", LogLevel.ERROR)
             return False
+        config = to_record(parsed)
 
         with self._server_lock:
             # Generate unique ID for the server
@@ -196,7 +211,8 @@ class ServerManager:
 
     def delete_group(self, group_name: str) -> None:
         if group_name in self.server_groups:
-            del self.server_groups[group_name]
+            for server in self.server_groups.pop(group_name):
+                self._health_checker.forget_server(server.get("id"))
             self.log(f"Deleted group: {group_name}", LogLevel.INFO)
             self.callbacks.get("on_servers_loaded", lambda: None)()
         else:
@@ -217,6 +233,7 @@ class ServerManager:
         ]
 
         if len(self.server_groups[group_name]) < initial_len:
+            self._health_checker.forget_server(config_to_delete.get("id"))
             self.log(f"Deleted server: {config_to_delete.get('name')}", LogLevel.INFO)
             if not self.server_groups[group_name]:
                 del self.server_groups[group_name]
@@ -460,6 +477,7 @@ class ServerManager:
             return
 
         self.log(f"Starting URL test for {len(servers)} servers", LogLevel.INFO)
+        started = time.monotonic()
 
         # Use persistent test core manager
         if self._test_core_manager is None:
@@ -492,6 +510,7 @@ class ServerManager:
             self._test_core_manager.stop()
         else:
             self.log("Failed to start test core", LogLevel.ERROR)
+        self._observe_sweep("url", started)
 
     def test_all_tcp(self, servers: List[dict]) -> None:
         """Test TCP latency for specific servers."""
@@ -499,6 +518,7 @@ class ServerManager:
             return
 
         self.log(f"Starting TCP test for {len(servers)} servers", LogLevel.INFO)
+        started = time.monotonic()
 
         # Use persistent test core manager
         if self._test_core_manager is None:
@@ -534,6 +554,83 @@ class ServerManager:
             self._test_core_manager.stop()
         else:
             self.log("Failed to start test core", LogLevel.ERROR)
+        self._observe_sweep("tcp", started)
+
+    def test_all_speed(self, servers: List[dict]) -> None:
+        """Rank servers by throughput with bounded download bursts."""
+        if not servers:
+            return
+
+        self.log(f"Starting speed test for {len(servers)} servers", LogLevel.INFO)
+        started = time.monotonic()
+
+        # Use persistent test core manager
+        if self._test_core_manager is None:
+            active_core_name = self.settings.get("active_core", "sing-box")
+            generator = get_core_generator(active_core_name)
+            self._test_core_manager = TestCoreManager(
+                self.settings, self.log, generator
+            )
+
+        if not self._test_core_manager.start(servers):
+            self.log("Failed to start test core", LogLevel.ERROR)
+            return
+
+        # Bursts run on their own small pool: the shared pool is sized for
+        # latency probes, and too many parallel downloads would just split
+        # the local link between servers and skew the ranking.
+        with ThreadPoolExecutor(max_workers=MAX_CONCURRENT_SPEED_TESTS) as pool:
+            futures = {}
+            for server in servers:
+                server_id = server.get("id")
+                if not server_id:
+                    continue
+
+                proxy_address = self._test_core_manager.get_proxy_address(server_id)
+                if not proxy_address:
+                    self.log(
+                        f"No proxy address for server {server.get('name')}",
+                        LogLevel.WARNING,
+                    )
+                    continue
+
+                future = pool.submit(
+                    download_throughput_via_proxy,
+                    proxy_address,
+                    is_cancelled=self._cancel_event.is_set,
+                )
+                futures[future] = server
+
+            for future in as_completed(futures):
+                if self._cancel_event.is_set():
+                    break
+                try:
+                    result = future.result()
+                except Exception as e:
+                    self.log(f"Speed test error: {e}", LogLevel.ERROR)
+                    result = -1
+                self._process_speed_result(futures[future], result)
+
+        self._test_core_manager.stop()
+        self._observe_sweep("speed", started)
+        self.callbacks.get("on_servers_updated", lambda: None)()
+
+    def _observe_sweep(self, test_type: str, started: float) -> None:
+        """Record how long a whole test sweep took."""
+        get_metrics_registry().histogram(
+            "onix_test_sweep_seconds",
+            "Duration of server test sweeps",
+            {"test": test_type},
+            buckets=SWEEP_DURATION_BUCKETS,
+        ).observe(time.monotonic() - started)
+
+    def _process_speed_result(self, server: dict, speed: float) -> None:
+        """Store a throughput result next to the ping values and notify the UI."""
+        server["download_speed"] = round(speed) if speed > 0 else -1
+
+        self.callbacks.get("on_speed_result", lambda s, v: None)(
+            server, server["download_speed"]
+        )
 
     def _process_ping_result(
         self, server: dict, ping_result: int, test_type: str
@@ -0,0 +1,296 @@
+"""
+Compact server records for Onix
+ServerRecord is a slot-based, dict-compatible replacement for the plain
+server dicts produced by link_parser. Repeated values (group, protocol,
+transport, ...) are interned and numeric fields live in the columns of a
+shared ServerTable. Unique strings (ids, names, hosts, credentials) still
+dominate, so the saving is modest (roughly 30% for a large server list);
+the main gain is that pings can be read as numpy arrays.
+"""
+
+import sys
+import threading
+from array import array
+from collections import deque
+from collections.abc import Mapping, MutableMapping
+from typing import Any, Dict, Iterable, Iterator, Optional
+
+# Numeric fields stored column-wise in the ServerTable
+NUMERIC_FIELDS = ("port", "alter_id", "tcp_ping", "url_ping", "ping", "download_speed")
+
+# Fields most servers have, kept in slots; rarer ones (REALITY keys, TUIC,
+# Hysteria2 and WireGuard options, ...) go to a small per-record dict
+OBJECT_FIELDS = (
+    "id",
+    "name",
+    "group",
+    "protocol",
+    "server",
+    "uuid",
+    "password",
+    "method",
+    "security",
+    "tls_enabled",
+    "tls_type",
+    "sni",
+    "flow",
+    "fp",
+    "transport",
+    "ws_path",
+    "ws_host",
+)
+
+# Fields whose values repeat across servers and are worth interning
+INTERNED_FIELDS = frozenset(
+    (
+        "group",
+        "protocol",
+        "server",
+        "method",
+        "security",
+        "tls_type",
+        "sni",
+        "flow",
+        "fp",
+        "transport",
+        "ws_path",
+        "ws_host",
+        "congestion_control",
+        "udp_relay_mode",
+        "alpn",
+        "obfs",
+    )
+)
+
+FIELD_ORDER = OBJECT_FIELDS[:5] + ("port",) + OBJECT_FIELDS[5:] + NUMERIC_FIELDS[1:]
+_OBJECT_SET = frozenset(OBJECT_FIELDS)
+_NUMERIC_SET = frozenset(NUMERIC_FIELDS)
+_MISSING = object()
+
+
+class ServerTable:
+    """Columnar int64 storage for the numeric fields of many ServerRecords."""
+
+    NO_VALUE = -(2**63)  # Marks a field the record does not have
+    _MIN, _MAX = -(2**63) + 1, 2**63 - 1
+
+    def __init__(self):
+        self.columns = {name: array("q") for name in NUMERIC_FIELDS}
+        self._free = []
+        # Rows released by ServerRecord.__del__; deque.append is atomic, so
+        # the finalizer never takes _lock (it may run from a GC pass on a
+        # thread that already holds it)
+        self._released = deque()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.columns["port"])
+
+    def allocate(self) -> int:
+        with self._lock:
+            self._drain_released()
+            if self._free:
+                return self._free.pop()
+            for column in self.columns.values():
+                column.append(self.NO_VALUE)
+            return len(self.columns["port"]) - 1
+
+    def release(self, row: int):
+        """Queue `row` for reuse; safe to call from a finalizer."""
+        self._released.append(row)
+
+    def _drain_released(self):
+        # Called with _lock held
+        while True:
+            try:
+                row = self._released.popleft()
+            except IndexError:
+                return
+            for column in self.columns.values():
+                column[row] = self.NO_VALUE
+            self._free.append(row)
+
+    def get(self, name: str, row: int) -> int:
+        return self.columns[name][row]
+
+    def set(self, name: str, row: int, value: int):
+        self.columns[name][row] = value
+
+    def accepts(self, value: Any) -> bool:
+        return type(value) is int and self._MIN <= value <= self._MAX
+
+    def column(self, name: str, rows: Optional[Iterable[int]] = None):
+        """Values of a numeric field as a float64 numpy array, NaN where missing."""
+        import numpy as np
+
+        data = np.array(self.columns[name], dtype=np.int64)
+        if rows is not None:
+            data = data[np.fromiter(rows, dtype=np.intp)]
+        values = data.astype(np.float64)
+        values[data == self.NO_VALUE] = np.nan
+        return values
+
+
+class ServerRecord(MutableMapping):
+    """A server configuration that behaves like the dict it replaces."""
+
+    __slots__ = OBJECT_FIELDS + ("_table", "_row", "_extra")
+
+    def __init__(
+        self,
+        data: Optional[Mapping] = None,
+        table: Optional[ServerTable] = None,
+        **kwargs,
+    ):
+        self._table = table if table is not None else get_server_table()
+        self._row = self._table.allocate()
+        self._extra = None
+        if data:
+            for key, value in data.items():
+                self[key] = value
+        for key, value in kwargs.items():
+            self[key] = value
+
+    def __del__(self):
+        try:
+            self._table.release(self._row)
+        except (AttributeError, TypeError):
+            # Partially constructed, or the interpreter is shutting down
+            pass
+
+    @property
+    def row(self) -> int:
+        """Row of this record's numeric fields in its ServerTable."""
+        return self._row
+
+    # --- Mapping protocol ---
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if key in _OBJECT_SET:
+            return getattr(self, key, default)
+        if key in _NUMERIC_SET:
+            value = self._table.columns[key][self._row]
+            if value != ServerTable.NO_VALUE:
+                return value
+        if self._extra:
+            return self._extra.get(key, default)
+        return default
+
+    def __getitem__(self, key: str) -> Any:
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key: str, value: Any):
+        if type(value) is str and key in INTERNED_FIELDS:
+            value = sys.intern(value)
+        if key in _NUMERIC_SET:
+            if self._table.accepts(value):
+                self._table.set(key, self._row, value)
+                if self._extra:
+                    self._extra.pop(key, None)
+                return
+            # None, floats, bools and strings keep their exact type
+            self._table.set(key, self._row, ServerTable.NO_VALUE)
+        elif key in _OBJECT_SET:
+            setattr(self, key, value)
+            return
+        if self._extra is None:
+            self._extra = {}
+        self._extra[key] = value
+
+    def __delitem__(self, key: str):
+        if key in _OBJECT_SET:
+            if getattr(self, key, _MISSING) is _MISSING:
+                raise KeyError(key)
+            delattr(self, key)
+            return
+        found = False
+        if key in _NUMERIC_SET:
+            found = self._table.get(key, self._row) != ServerTable.NO_VALUE
+            self._table.set(key, self._row, ServerTable.NO_VALUE)
+        if self._extra and key in self._extra:
+            del self._extra[key]
+            found = True
+        if not found:
+            raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        for key in FIELD_ORDER:
+            if key in _NUMERIC_SET:
+                if self._table.get(key, self._row) != ServerTable.NO_VALUE:
+                    yield key
+            elif getattr(self, key, _MISSING) is not _MISSING:
+                yield key
+        if self._extra:
+            yield from list(self._extra)
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def __contains__(self, key: object) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    # --- dict compatibility ---
+
+    def copy(self) -> "ServerRecord":
+        return ServerRecord(self, self._table)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {key: self[key] for key in self}
+
+    def __reduce__(self):
+        return ServerRecord, (self.to_dict(),)
+
+    def __repr__(self) -> str:
+        return f"ServerRecord({self.to_dict()!r})"
+
+
+def to_record(server: Mapping, table: Optional[ServerTable] = None) -> ServerRecord:
+    """Return `server` as a ServerRecord, converting plain dicts."""
+    if isinstance(server, ServerRecord):
+        return server
+    return ServerRecord(server, table)
+
+
+def numeric_column(servers: Iterable[Mapping], field: str):
+    """`field` of each server as a float64 numpy array, NaN where missing.
+
+    Records in the shared table are read straight from its column; plain
+    dicts fall back to a per-item loop.
+    """
+    import numpy as np
+
+    servers = list(servers)
+    table = get_server_table()
+    if all(isinstance(s, ServerRecord) and s._table is table for s in servers):
+        return table.column(field, [s._row for s in servers])
+
+    def as_float(value):
+        if type(value) in (int, float):
+            return float(value)
+        return np.nan
+
+    return np.fromiter(
+        (as_float(s.get(field)) for s in servers), dtype=np.float64, count=len(servers)
+    )
+
+
+def json_default(obj: Any) -> Any:
+    """`default=` hook so json can serialize ServerRecords."""
+    if isinstance(obj, Mapping):
+        return dict(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+# Global server table instance
+_server_table = None
+
+
+def get_server_table() -> ServerTable:
+    """Get the global server table."""
+    global _server_table
+    if _server_table is None:
+        _server_table = ServerTable()
+    return _server_table
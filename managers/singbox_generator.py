@@ -1,13 +1,13 @@
+import config_generator
 from constants import (
-    GEOIP_RULE_SET_URL,
-    GEOSITE_RULE_SET_URL,
-    IRAN_GEOIP_RULE_SET_URL,
-    IRAN_GEOSITE_RULE_SET_URL,
     STATS_API_PORT,
     PROXY_HOST,
     PROXY_PORT,
     SINGBOX_LOG_FILE,
+    TUN_INTERFACE_NAME,
 )
+from services.traffic_shaper import hysteria_bandwidth
+from utils.rule_compiler import routing_plan
 from .base_generator import BaseConfigGenerator
 
 
@@ -87,7 +87,7 @@ class SingboxConfigGenerator(BaseConfigGenerator):
                     "path": "cache.db",
                     "store_fakeip": True,
                 },
-                "stats": {"listen": PROXY_HOST, "listen_port": STATS_API_PORT},
+                "clash_api": {"external_controller": f"{PROXY_HOST}:{STATS_API_PORT}"},
             },
             "dns": dns_config,
             "inbounds": [
@@ -96,7 +96,7 @@ class SingboxConfigGenerator(BaseConfigGenerator):
                         {
                             "type": "tun",
                             "tag": "tun-in",
-                            "interface_name": "onix_tun",
+                            "interface_name": TUN_INTERFACE_NAME,
                             "inet4_address": "172.19.0.1/24",
                             "mtu": 9000,
                             "auto_route": True,
@@ -144,19 +144,10 @@ class SingboxConfigGenerator(BaseConfigGenerator):
                 ]
             )
 
-        bypass_domains_str = settings.get("bypass_domains")
-        bypass_domains_list = [
-            d.strip() for d in bypass_domains_str.split(",") if d.strip()
-        ]
-        non_geosite_bypass_domains = [
-            d for d in bypass_domains_list if not d.startswith("domain:geosite:")
-        ]
-
         dns_rules = []
-        if non_geosite_bypass_domains:
-            dns_rules.append(
-                {"domain": non_geosite_bypass_domains, "server": "dns_direct"}
-            )
+        bypass_domains = config_generator._singbox_domain_fields(routing_plan(settings))
+        if bypass_domains:
+            dns_rules.append({**bypass_domains, "server": "dns_direct"})
 
         return {
             "servers": dns_servers,
@@ -166,142 +157,8 @@ class SingboxConfigGenerator(BaseConfigGenerator):
         }, dns_rules
 
     def _build_route_config(self, settings):
-        bypass_domains_str = settings.get("bypass_domains")
-        bypass_domains_list = [
-            d.strip() for d in bypass_domains_str.split(",") if d.strip()
-        ]
-
-        bypass_ips_str = settings.get("bypass_ips")
-        bypass_ips_list = [i.strip() for i in bypass_ips_str.split(",") if i.strip()]
-
-        route_rules = []
-        rule_sets = []
-
-        # Add a rule to route DNS queries to the dns-out outbound
-        route_rules.append({"protocol": ["dns"], "outbound": "dns"})
-
-        # Add custom rules from settings
-        custom_routing_rules = settings.get("custom_routing_rules", [])
-        for rule in custom_routing_rules:
-            rule_type = rule.get("type")
-            rule_value = rule.get("value")
-            rule_action = rule.get("action")
-
-            if rule_type and rule_value and rule_action:
-                outbound_tag = "proxy-out" if rule_action == "proxy" else rule_action
-
-                if rule_type == "domain":
-                    route_rules.append({"domain": rule_value, "outbound": outbound_tag})
-                elif rule_type == "ip":
-                    route_rules.append(
-                        {"ip_cidr": rule_value, "outbound": outbound_tag}
-                    )
-                elif rule_type == "process":
-                    route_rules.append(
-                        {"process_name": rule_value, "outbound": outbound_tag}
-                    )
-                elif rule_type == "geosite":
-                    rule_set_tag = f"geosite-{rule_value}"
-                    route_rules.append(
-                        {"rule_set": rule_set_tag, "outbound": outbound_tag}
-                    )
-                    # Add rule_set definition if not already present
-                    if not any(rs.get("tag") == rule_set_tag for rs in rule_sets):
-                        url = GEOSITE_RULE_SET_URL.format(code=rule_value)
-                        if rule_value == "ir" or rule_value == "tld-ir":
-                            url = IRAN_GEOSITE_RULE_SET_URL
-                        rule_sets.append(
-                            {
-                                "tag": rule_set_tag,
-                                "type": "remote",
-                                "format": "binary",
-                                "url": url,
-                                "download_detour": "direct",
-                            }
-                        )
-                elif rule_type == "geoip":
-                    rule_set_tag = f"geoip-{rule_value}"
-                    route_rules.append(
-                        {"rule_set": rule_set_tag, "outbound": outbound_tag}
-                    )
-                    # Add rule_set definition if not already present
-                    if not any(rs.get("tag") == rule_set_tag for rs in rule_sets):
-                        url = GEOIP_RULE_SET_URL.format(code=rule_value)
-                        if rule_value == "ir":
-                            url = IRAN_GEOIP_RULE_SET_URL
-                        rule_sets.append(
-                            {
-                                "tag": rule_set_tag,
-                                "type": "remote",
-                                "format": "binary",
-                                "url": url,
-                                "download_detour": "direct",
-                            }
-                        )
-
-        # GeoIP handling
-        geoip_codes = [
-            i.replace("geoip:", "") for i in bypass_ips_list if i.startswith("geoip:")
-        ]
-        ip_cidr_rules = [i for i in bypass_ips_list if not i.startswith("geoip:")]
-
-        if "private" in geoip_codes:
-            route_rules.append({"ip_is_private": True, "outbound": "direct"})
-            geoip_codes.remove("private")
-
-        if geoip_codes:
-            rule_set_tags = [f"geoip-{code}" for code in geoip_codes]
-            route_rules.append({"rule_set": rule_set_tags, "outbound": "direct"})
-            for code in geoip_codes:
-                url = GEOIP_RULE_SET_URL.format(code=code)
-                if code == "ir":
-                    url = IRAN_GEOIP_RULE_SET_URL
-                rule_sets.append(
-                    {
-                        "tag": f"geoip-{code}",
-                        "type": "remote",
-                        "format": "binary",
-                        "url": url,
-                        "download_detour": "direct",
-                    }
-                )
-
-        if ip_cidr_rules:
-            route_rules.append({"ip_cidr": ip_cidr_rules, "outbound": "direct"})
-
-        # Geosite handling
-        geosite_domains = [
-            d.replace("domain:geosite:", "")
-            for d in bypass_domains_list
-            if d.startswith("domain:geosite:")
-        ]
-        other_domains = [
-            d for d in bypass_domains_list if not d.startswith("domain:geosite:")
-        ]
-
-        if geosite_domains:
-            geosite_rule_set_tags = [f"geosite-{code}" for code in geosite_domains]
-            route_rules.append(
-                {"rule_set": geosite_rule_set_tags, "outbound": "direct"}
-            )
-            for code in geosite_domains:
-                url = GEOSITE_RULE_SET_URL.format(code=code)
-                if code == "ir" or code == "tld-ir":
-                    url = IRAN_GEOSITE_RULE_SET_URL
-                rule_sets.append(
-                    {
-                        "tag": f"geosite-{code}",
-                        "type": "remote",
-                        "format": "binary",
-                        "url": url,
-                        "download_detour": "direct",
-                    }
-                )
-
-        if other_domains:
-            route_rules.append({"domain": other_domains, "outbound": "direct"})
-
-        return {"rules": route_rules, "rule_set": rule_sets, "final": "proxy-out"}
+        # Same rules as the connect-time generator, from the compiled plan
+        return config_generator._build_route_config(settings)
 
     def _build_outbound_config(self, server_config, settings, tag="proxy-out"):
         protocol = server_config.get("protocol")
@@ -429,12 +286,7 @@ class SingboxConfigGenerator(BaseConfigGenerator):
             outbound["tls"] = tls_config
 
         elif protocol == "hysteria2":
-            try:
-                up_mbps = int(settings.get("hy2_up_mbps", 50))
-                down_mbps = int(settings.get("hy2_down_mbps", 100))
-            except (ValueError, TypeError):
-                up_mbps = 50
-                down_mbps = 100
+            up_mbps, down_mbps = hysteria_bandwidth(settings)
 
             outbound.update(
                 {
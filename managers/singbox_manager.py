@@ -1,6 +1,6 @@
 import subprocess
 import os
-import requests
+import sys
 import time
 import json
 import threading
@@ -11,25 +11,40 @@ import network_tester
 import system_proxy
 import constants  # This was already present, but let's ensure it's correct.
 from managers.core_manager import CoreManager
+from utils.metrics import get_metrics_registry
+from utils.rule_compiler import routing_plan
+from services.load_balancer import member_selector_tag, member_tag
 import config_generator
+from services.core_stats_client import ClashApiStatsClient
 from constants import (
     PROXY_SERVER_ADDRESS,
     LogLevel,
-    STATS_API_PORT,
     CONNECTION_STOP_DELAY,
+    FAILOVER_SELECTOR_TAG,
+    LOAD_BALANCER_GROUP_TAG,
     CONNECTION_CHECK_DELAY,
     SINGBOX_LOG_FILE,
+    SINGBOX_EXECUTABLE_NAMES,
 )
 
 
 class SingboxManager(CoreManager):
+    supports_standby = True
+    supports_balancing = True
+
     def __init__(self, settings, callbacks):
         super().__init__(settings, callbacks)
         self.stats_thread = None
         self.stop_stats_thread = threading.Event()
         self.connection_check_timer = None
-
-    def start(self, config):
+        self.standby_servers = []
+        self.balance_servers = []
+        self.balance_weights = None
+        self._api_client = None
+
+    def start(
+        self, config, standby_servers=None, balance_servers=None, balance_weights=None
+    ):
         if self.is_running and self.process and self.process.poll() is None:
             self.log(
                 "Switching servers... Stopping previous connection first.",
@@ -38,6 +53,9 @@ class SingboxManager(CoreManager):
             self.stop()
             time.sleep(CONNECTION_STOP_DELAY)
 
+        self.standby_servers = list(standby_servers or [])
+        self.balance_servers = list(balance_servers or [])
+        self.balance_weights = balance_weights
         self.log("Starting connection...", LogLevel.INFO)
         self.callbacks.get("on_status_change", lambda s, c: None)(
             "Connecting...", "yellow"
@@ -52,11 +70,24 @@ class SingboxManager(CoreManager):
         )
         self.connection_check_timer.start()
 
+    @staticmethod
+    def _executable_name():
+        os_key = "windows" if os.name == "nt" else sys.platform.lower()
+        return SINGBOX_EXECUTABLE_NAMES.get(os_key, "sing-box")
+
     def _run_and_log(self, config):
         config_filename = None
         log_file = None
         try:
-            full_config = config_generator.generate_config_json(config, self.settings)
+            full_config = config_generator.generate_config_json(
+                config,
+                self.settings,
+                self.standby_servers,
+                self.balance_servers,
+                self.balance_weights,
+            )
+            for entry, reason in routing_plan(self.settings).rejected:
+                self.log(f"Skipped routing entry {entry!r}: {reason}", LogLevel.WARNING)
             with tempfile.NamedTemporaryFile(
                 mode="w", delete=False, suffix=".json", encoding="utf-8"
             ) as f:
@@ -64,8 +95,10 @@ class SingboxManager(CoreManager):
                 config_filename = f.name
 
             self.log("Validating configuration...", LogLevel.INFO)
+            executable_path = utils.get_resource_path(self._executable_name())
+            creation_flags = subprocess.CREATE_NO_WINDOW if os.name == "nt" else 0
             check_command = [
-                utils.get_resource_path("sing-box.exe"),
+                executable_path,
                 "check",
                 "-c",
                 config_filename,
@@ -75,7 +108,7 @@ class SingboxManager(CoreManager):
                 capture_output=True,
                 text=True,
                 encoding="utf-8",
-                creationflags=subprocess.CREATE_NO_WINDOW,
+                creationflags=creation_flags,
             )
 
             if result.returncode != 0:
@@ -89,7 +122,7 @@ class SingboxManager(CoreManager):
 
             self.log("Configuration is valid. Starting process...", LogLevel.INFO)
             command = [
-                utils.get_resource_path("sing-box.exe"),
+                executable_path,
                 "run",
                 "-c",
                 config_filename,
@@ -100,9 +133,14 @@ class SingboxManager(CoreManager):
                 stderr=subprocess.STDOUT,
                 text=True,
                 encoding="utf-8",
-                creationflags=subprocess.CREATE_NO_WINDOW,
+                creationflags=creation_flags,
             )
             self.is_running = True
+            get_metrics_registry().counter(
+                "onix_core_starts_total",
+                "Core processes launched",
+                {"core": "sing-box"},
+            ).inc()
 
             # Open the log file in append mode
             log_file = open(SINGBOX_LOG_FILE, "a", encoding="utf-8")
@@ -113,7 +151,7 @@ class SingboxManager(CoreManager):
 
         except FileNotFoundError:
             self.log(
-                f"Error: sing-box.exe not found at '{utils.get_resource_path('sing-box.exe')}'!",
+                f"Error: {self._executable_name()} not found at '{utils.get_resource_path(self._executable_name())}'!",
                 LogLevel.ERROR,
             )
         except Exception as e:
@@ -169,6 +207,14 @@ class SingboxManager(CoreManager):
         if not self.is_running:
             return
 
+        if self.balance_servers:
+            # The cache file may restore a fallback chosen before the restart
+            for index in range(len(self.balance_servers) + 1):
+                self.set_balance_member(index, True)
+        elif self.standby_servers:
+            # The cache file may restore a standby chosen before the restart
+            self.switch_to_standby(0)
+
         result = network_tester.url_test(PROXY_SERVER_ADDRESS)
         if result != -1:
             self.log(f"Connection successful! Latency: {result} ms.", LogLevel.SUCCESS)
@@ -188,6 +234,27 @@ class SingboxManager(CoreManager):
             )
             self.stop()
 
+    def switch_to_standby(self, index):
+        """Point the failover selector at slot `index` through the clash API."""
+        if not self.is_running or index > len(self.standby_servers):
+            return False
+        if self._api_client is None:
+            self._api_client = ClashApiStatsClient()
+        return self._api_client.select_outbound(
+            FAILOVER_SELECTOR_TAG, config_generator.failover_slot_tag(index)
+        )
+
+    def set_balance_member(self, index, enabled):
+        """Point member `index`'s selector at it, or at the urltest group."""
+        if not self.is_running or index > len(self.balance_servers):
+            return False
+        if self._api_client is None:
+            self._api_client = ClashApiStatsClient()
+        return self._api_client.select_outbound(
+            member_selector_tag(index),
+            member_tag(index) if enabled else LOAD_BALANCER_GROUP_TAG,
+        )
+
     def _fetch_ip_and_update(self):
         ip_address = network_tester.get_external_ip(PROXY_SERVER_ADDRESS)
         self.callbacks.get("on_ip_update", lambda ip: None)(ip_address)
@@ -197,45 +264,27 @@ class SingboxManager(CoreManager):
             return
 
         self.stop_stats_thread.clear()
-        self.stats_thread = threading.Thread(target=self._poll_stats, daemon=True)
+        self.stats_thread = threading.Thread(target=self._stream_stats, daemon=True)
         self.stats_thread.start()
 
-    def _poll_stats(self):
-        last_uplink = 0
-        last_downlink = 0
-        last_time = time.time()
-
-        while not self.stop_stats_thread.is_set():
-            try:
-                response = requests.get(f"http://127.0.0.1:{STATS_API_PORT}/stats")
-                stats = response.json()
-                current_uplink = stats.get("uplink_total", 0)
-                current_downlink = stats.get("downlink_total", 0)
-                current_time = time.time()
-
-                time_delta = current_time - last_time
-                if time_delta > 0:
-                    up_speed = (current_uplink - last_uplink) / time_delta
-                    down_speed = (current_downlink - last_downlink) / time_delta
+    def _stream_stats(self):
+        """Relay the core's pushed traffic feed to the speed callbacks."""
+        client = ClashApiStatsClient()
+        try:
+            while not self.stop_stats_thread.is_set():
+                # One long-lived request; each pushed line is a fresh sample
+                for up_speed, down_speed in client.stream_traffic(
+                    self.stop_stats_thread
+                ):
                     self.callbacks.get("on_speed_update", lambda u, d: None)(
                         up_speed, down_speed
                     )
 
-                last_uplink = current_uplink
-                last_downlink = current_downlink
-                last_time = current_time
-
-            except requests.exceptions.RequestException:
-                # API might not be ready yet, or sing-box stopped.
-                self.log("Stats API not ready yet or stopped.", LogLevel.DEBUG)
-            except Exception as e:
-                self.log(f"Error polling stats: {e}", LogLevel.ERROR)
-
-            # Check for stop signal before sleeping
-            if self.stop_stats_thread.is_set():
-                break
-
-            time.sleep(1)
+                # Feed ended: API not ready yet, or sing-box restarting
+                self.log("Traffic feed closed, reconnecting.", LogLevel.DEBUG)
+                self.stop_stats_thread.wait(1)
+        finally:
+            client.close()
 
     def log(self, message, level=LogLevel.INFO):
         self.callbacks.get("log", lambda msg, lvl: None)(message, level)
@@ -7,9 +7,11 @@ import requests
 import base64
 import binascii
 import threading
+import time
 from typing import Dict, List, Any, Optional, Callable, Tuple
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from constants import LogLevel
+from constants import LogLevel, SWEEP_DURATION_BUCKETS
+from utils.metrics import get_metrics_registry
 
 
 class SubscriptionManager:
@@ -56,6 +58,7 @@ class SubscriptionManager:
 
     def _update_subscriptions_task(self, subscriptions: List[Dict[str, Any]]) -> None:
         """Background task to update subscriptions."""
+        started = time.monotonic()
         try:
             self.callbacks.get("on_update_start", lambda: None)()
 
@@ -118,6 +121,10 @@ class SubscriptionManager:
 
             # Show errors if any
             if errors:
+                get_metrics_registry().counter(
+                    "onix_subscription_update_failures_total",
+                    "Subscriptions that failed to update",
+                ).inc(len(errors))
                 error_msg = "\n".join(errors)
                 self.callbacks.get("show_error", lambda t, m: None)(
                     "Subscription Update Errors", error_msg
@@ -129,6 +136,11 @@ class SubscriptionManager:
                 "Critical Error", f"Subscription update failed: {e}"
             )
         finally:
+            get_metrics_registry().histogram(
+                "onix_subscription_update_seconds",
+                "Duration of subscription updates",
+                buckets=SWEEP_DURATION_BUCKETS,
+            ).observe(time.monotonic() - started)
             self._update_in_progress = False
             self.callbacks.get("on_update_finish", lambda x: None)(None)
 
@@ -43,6 +43,19 @@ class TestCoreManager:
         self.server_ports = {}
         self.active_core = self.settings.get("active_core", "sing-box")
 
+    def _core_command(self):
+        # "test_core_command" swaps in another executable that understands
+        # `run -c <config>`, e.g. benchmarks/fake_core.py for offline runs
+        if self.settings.get("test_core_command"):
+            return list(self.settings["test_core_command"])
+
+        os_key = "windows" if sys.platform.startswith("win") else sys.platform.lower()
+        if self.active_core == "sing-box":
+            executable_name = SINGBOX_EXECUTABLE_NAMES.get(os_key, "sing-box")
+        else:
+            executable_name = XRAY_EXECUTABLE_NAMES.get(os_key, "xray")
+        return [utils.get_resource_path(executable_name)]
+
     def is_running(self):
         return self.process is not None and self.process.poll() is None
 
@@ -67,16 +80,7 @@ class TestCoreManager:
                 json.dump(test_config, f, indent=2)
                 self.temp_config_file = f.name
 
-            os_key = (
-                "windows" if sys.platform.startswith("win") else sys.platform.lower()
-            )
-            if self.active_core == "sing-box":
-                executable_name = SINGBOX_EXECUTABLE_NAMES.get(os_key, "sing-box")
-            else:
-                executable_name = XRAY_EXECUTABLE_NAMES.get(os_key, "xray")
-            executable_path = utils.get_resource_path(executable_name)
-
-            command = [executable_path, "run", "-c", self.temp_config_file]
+            command = [*self._core_command(), "run", "-c", self.temp_config_file]
             creationflags = (
                 subprocess.CREATE_NO_WINDOW if sys.platform.startswith("win") else 0
             )
@@ -1,10 +1,52 @@
+import re
+
 from constants import (
+    LOAD_BALANCER_GROUP_TAG,
+    LOAD_BALANCER_PROBE_INTERVAL,
+    URL_TEST_DEFAULT_URL,
     XRAY_LOG_FILE,
     PROXY_HOST,
     PROXY_PORT,
+    STATS_API_PORT,
+)
+from services.load_balancer import member_tag
+from utils.rule_compiler import (
+    CIDR,
+    DOMAIN,
+    EXACT,
+    GEOIP,
+    GEOSITE,
+    KEYWORD,
+    PROCESS,
+    REGEX,
+    SUBDOMAIN,
+    SUFFIX,
+    routing_plan,
 )
 from .base_generator import BaseConfigGenerator
 
+# Xray domain matcher prefixes of the domain pattern kinds. Bare domains
+# match their subdomains too, as users of v2ray style lists expect.
+_XRAY_DOMAIN_PREFIXES = {
+    DOMAIN: "domain:",
+    EXACT: "full:",
+    SUFFIX: "domain:",
+    KEYWORD: "keyword:",
+    REGEX: "regexp:",
+    GEOSITE: "geosite:",
+}
+
+
+def _xray_domain(kind, value):
+    if kind == SUBDOMAIN:
+        # "domain:" would match the parent domain itself too
+        return "regexp:\\." + re.escape(value) + "$"
+    return _XRAY_DOMAIN_PREFIXES[kind] + value
+
+
+def _xray_ip(kind, value):
+    return f"geoip:{value}" if kind == GEOIP else value
+
 
 class XrayConfigGenerator(BaseConfigGenerator):
     """Generates a configuration file for the Xray core."""
@@ -57,11 +99,26 @@ class XrayConfigGenerator(BaseConfigGenerator):
             "routing": routing_config,
         }
 
-    def generate_config_json(self, server_config, settings):
-        """Generates the complete Xray configuration JSON."""
-        outbound_config = self._build_outbound_config(server_config, settings)
+    def generate_config_json(
+        self, server_config, settings, balance_servers=None, balance_weights=None
+    ):
+        """Generates the complete Xray configuration JSON.
+
+        With `balance_servers`, traffic is spread over the server and those
+        (see _build_load_balancer).
+        """
         routing_config = self._build_routing_config(settings)
         dns_config = self._build_dns_config(settings)
+        extra = {}
+        if balance_servers:
+            proxy_outbounds, extra = self._build_load_balancer(
+                [server_config, *balance_servers],
+                balance_weights,
+                settings,
+                routing_config,
+            )
+        else:
+            proxy_outbounds = [self._build_outbound_config(server_config, settings)]
 
         return {
             "log": {
@@ -86,13 +143,83 @@ class XrayConfigGenerator(BaseConfigGenerator):
                 },
             ],
             "outbounds": [
-                outbound_config,
+                *proxy_outbounds,
                 {"protocol": "freedom", "tag": "direct"},
                 {"protocol": "blackhole", "tag": "block"},
             ],
             "routing": routing_config,
             "dns": dns_config,
+            **extra,
+            # Traffic counters for the statistics service, served over HTTP
+            "stats": {},
+            "metrics": {"tag": "metrics", "listen": f"{PROXY_HOST}:{STATS_API_PORT}"},
+            "policy": {
+                "system": {
+                    "statsOutboundUplink": True,
+                    "statsOutboundDownlink": True,
+                }
+            },
+        }
+
+    def _build_load_balancer(self, servers, weights, settings, routing_config):
+        """Member outbounds and the observatory for a leastLoad balancer.
+
+        The balancer takes the proxy outbound's tag; routing rules that
+        pointed at that outbound are moved to it, and a final rule sends
+        all other traffic there. Member costs follow the inverse of their
+        weights, and `expected` lets it use every healthy member.
+        """
+        if not weights or len(weights) != len(servers):
+            weights = [1.0 / len(servers)] * len(servers)
+        outbounds = [
+            self._build_outbound_config(server, settings, tag=member_tag(index))
+            for index, server in enumerate(servers)
+        ]
+        heaviest = max(weights)
+        routing_config["balancers"] = [
+            {
+                "tag": LOAD_BALANCER_GROUP_TAG,
+                "selector": [member_tag(index) for index in range(len(servers))],
+                "fallbackTag": member_tag(0),
+                "strategy": {
+                    "type": "leastLoad",
+                    "settings": {
+                        "expected": len(servers),
+                        "costs": [
+                            {
+                                "regexp": False,
+                                "match": member_tag(index),
+                                "value": round(heaviest / max(weight, 1e-6), 3),
+                            }
+                            for index, weight in enumerate(weights)
+                        ],
+                    },
+                },
+            }
+        ]
+        for rule in routing_config["rules"]:
+            if rule.get("outboundTag") == LOAD_BALANCER_GROUP_TAG:
+                del rule["outboundTag"]
+                rule["balancerTag"] = LOAD_BALANCER_GROUP_TAG
+        routing_config["rules"].append(
+            {
+                "type": "field",
+                "network": "tcp,udp",
+                "balancerTag": LOAD_BALANCER_GROUP_TAG,
+            }
+        )
+        observatory = {
+            "burstObservatory": {
+                "subjectSelector": [member_tag(index) for index in range(len(servers))],
+                "pingConfig": {
+                    "destination": URL_TEST_DEFAULT_URL,
+                    "interval": LOAD_BALANCER_PROBE_INTERVAL,
+                    "sampling": 3,
+                    "timeout": "5s",
+                },
+            }
         }
+        return outbounds, observatory
 
     def _build_dns_config(self, settings, use_proxy_dns=True):
         """Builds the DNS configuration for Xray."""
@@ -106,40 +233,36 @@ class XrayConfigGenerator(BaseConfigGenerator):
 
     def _build_routing_config(self, settings):
         """Builds the routing configuration for Xray."""
+        plan = routing_plan(settings)
         rules = []
-        bypass_domains = settings.get("bypass_domains", "").split(",")
-        bypass_ips = settings.get("bypass_ips", "").split(",")
+
+        # Add custom rules; they take precedence over the bypass lists
+        for rule in plan.rules:
+            outbound_tag = "proxy-out" if rule.action == "proxy" else rule.action
+            if rule.kind in (CIDR, GEOIP):
+                match = {"ip": [_xray_ip(rule.kind, rule.value)]}
+            elif rule.kind == PROCESS:
+                # Xray can't route by process
+                continue
+            else:
+                match = {"domain": [_xray_domain(rule.kind, rule.value)]}
+            rules.append({"type": "field", **match, "outboundTag": outbound_tag})
 
         # Add bypass rules
+        bypass_domains = [
+            _xray_domain(kind, value) for kind, value in plan.bypass_domains
+        ]
+        bypass_domains += [_xray_domain(GEOSITE, code) for code in plan.bypass_geosites]
         if bypass_domains:
             rules.append(
-                {
-                    "type": "field",
-                    "domain": [d.strip() for d in bypass_domains if d.strip()],
-                    "outboundTag": "direct",
-                }
+                {"type": "field", "domain": bypass_domains, "outboundTag": "direct"}
             )
+        bypass_ips = list(plan.bypass_cidrs)
+        if plan.bypass_private:
+            bypass_ips.append("geoip:private")
+        bypass_ips += [_xray_ip(GEOIP, code) for code in plan.bypass_geoips]
         if bypass_ips:
-            rules.append(
-                {
-                    "type": "field",
-                    "ip": [i.strip() for i in bypass_ips if i.strip()],
-                    "outboundTag": "direct",
-                }
-            )
-
-        # Add custom rules
-        for rule in settings.get("custom_routing_rules", []):
-            outbound_tag = (
-                "proxy-out" if rule.get("action") == "proxy" else rule.get("action")
-            )
-            rules.append(
-                {
-                    "type": "field",
-                    rule.get("type"): [rule.get("value")],
-                    "outboundTag": outbound_tag,
-                }
-            )
+            rules.append({"type": "field", "ip": bypass_ips, "outboundTag": "direct"})
 
         return {"rules": rules}
 
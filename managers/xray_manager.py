@@ -10,6 +10,7 @@ import utils
 import network_tester
 import system_proxy
 from managers.core_manager import CoreManager
+from utils.metrics import get_metrics_registry
 from managers.xray_generator import XrayConfigGenerator
 from constants import (
     PROXY_SERVER_ADDRESS,
@@ -31,12 +32,24 @@ class XrayManagerCallbacks(Protocol):
 
 
 class XrayManager(CoreManager):
+    supports_balancing = True
+
     def __init__(self, settings: Dict[str, Any], callbacks: XrayManagerCallbacks):
         super().__init__(settings, callbacks)
         self.config_generator = XrayConfigGenerator()
         self.connection_check_timer = None
-
-    def start(self, config: Dict[str, Any]) -> None:
+        self.balance_servers = []
+        self.balance_weights = None
+
+    def start(
+        self,
+        config: Dict[str, Any],
+        standby_servers=None,
+        balance_servers=None,
+        balance_weights=None,
+    ) -> None:
+        # Xray has no runtime outbound switch here, so failover restarts it;
+        # balancer members are health checked by its observatory
         if self.is_running and self.process and self.process.poll() is None:
             self.log(
                 "Switching servers... Stopping previous connection first.",
@@ -45,6 +58,8 @@ class XrayManager(CoreManager):
             self.stop()
             time.sleep(CONNECTION_STOP_DELAY)
 
+        self.balance_servers = list(balance_servers or [])
+        self.balance_weights = balance_weights
         self.log("Starting Xray connection...", LogLevel.INFO)
         self.callbacks.get("on_status_change", lambda s, c: None)(
             "Connecting...", "yellow"
@@ -63,7 +78,7 @@ class XrayManager(CoreManager):
         config_filename = None
         try:
             full_config = self.config_generator.generate_config_json(
-                config, self.settings
+                config, self.settings, self.balance_servers, self.balance_weights
             )
             with tempfile.NamedTemporaryFile(
                 mode="w", delete=False, suffix=".json", encoding="utf-8"
@@ -91,6 +106,9 @@ class XrayManager(CoreManager):
                 cwd=os.getcwd(),
             )
             self.is_running = True
+            get_metrics_registry().counter(
+                "onix_core_starts_total", "Core processes launched", {"core": "Xray"}
+            ).inc()
 
             with open(XRAY_LOG_FILE, "a", encoding="utf-8") as log_file:
                 if self.process.stdout is not None:
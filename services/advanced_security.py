@@ -8,11 +8,11 @@ import time
 import threading
 import subprocess
 import platform
-import socket
 from typing import Dict, Any, List, Optional, Callable
 from dataclasses import dataclass
 from enum import Enum
 from constants import LogLevel
+from services.probe_bus import get_probe_bus
 
 
 class SecurityLevel(Enum):
@@ -49,8 +49,8 @@ class KillSwitchManager:
     def __init__(self, log_callback: Optional[Callable[[str, LogLevel], None]] = None):
         self.log = log_callback or (lambda msg, level: print(f"[{level}] {msg}"))
         self._is_active = False
-        self._monitor_thread = None
-        self._stop_event = threading.Event()
+        self._probe_token = None
+        self._traffic_blocked = False
         self._original_routes = []
         self._backup_dns = []
         self._firewall_rules = []
@@ -71,16 +71,14 @@ class KillSwitchManager:
             # Set up firewall rules
             self._setup_firewall_rules(proxy_address, proxy_port)
 
-            # Start monitoring
+            # Start monitoring through the shared probe bus
             self._is_active = True
-            self._stop_event.clear()
-
-            self._monitor_thread = threading.Thread(
-                target=self._monitor_connection,
-                args=(proxy_address, proxy_port),
-                daemon=True,
+            self._probe_token = get_probe_bus().subscribe(
+                "tcp",
+                (proxy_address, proxy_port),
+                self._on_proxy_probe,
+                interval=2,  # Check every 2 seconds
             )
-            self._monitor_thread.start()
 
             self.log("Kill Switch activated successfully", LogLevel.SUCCESS)
             return True
@@ -98,9 +96,8 @@ class KillSwitchManager:
             self.log("Deactivating Kill Switch...", LogLevel.INFO)
 
             # Stop monitoring
-            self._stop_event.set()
-            if self._monitor_thread and self._monitor_thread.is_alive():
-                self._monitor_thread.join(timeout=5)
+            get_probe_bus().unsubscribe(self._probe_token)
+            self._probe_token = None
 
             # Restore network configuration
             self._restore_network_config()
@@ -287,37 +284,22 @@ class KillSwitchManager:
         except Exception as e:
             self.log(f"Error restoring network config: {e}", LogLevel.WARNING)
 
-    def _monitor_connection(self, proxy_address: str, proxy_port: int):
-        """Monitor connection and block traffic if proxy fails."""
-        while not self._stop_event.is_set():
-            try:
-                # Check if proxy is still working
-                if not self._is_proxy_working(proxy_address, proxy_port):
+    def _on_proxy_probe(self, kind: str, target, latency: int):
+        """Block traffic while the proxy is unreachable."""
+        try:
+            if latency == -1:
+                if not self._traffic_blocked:
                     self.log(
                         "Proxy connection lost! Blocking all traffic", LogLevel.ERROR
                     )
-                    self._block_all_traffic()
-                else:
-                    self._unblock_traffic()
+                self._traffic_blocked = True
+                self._block_all_traffic()
+            elif self._traffic_blocked:
+                self._traffic_blocked = False
+                self._unblock_traffic()
 
-                time.sleep(2)  # Check every 2 seconds
-
-            except Exception as e:
-                self.log(f"Error in connection monitoring: {e}", LogLevel.ERROR)
-                time.sleep(5)
-
-    def _is_proxy_working(self, proxy_address: str, proxy_port: int) -> bool:
-        """Check if proxy is working."""
-        try:
-            # Try to connect to proxy
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.settimeout(3)
-            result = sock.connect_ex((proxy_address, proxy_port))
-            sock.close()
-            return result == 0
-
-        except Exception:
-            return False
+        except Exception as e:
+            self.log(f"Error in connection monitoring: {e}", LogLevel.ERROR)
 
     def _block_all_traffic(self):
         """Block all network traffic."""
@@ -3,13 +3,38 @@ AI-Powered Optimization Service for Onix
 Provides intelligent optimization, predictive failover, and traffic analysis
 """
 
+import math
 import time
 import threading
 import statistics
-from typing import Dict, Any, List, Optional, Callable
+from typing import Dict, Any, Iterable, List, Optional, Callable, Tuple
 from dataclasses import dataclass
 from collections import deque, defaultdict
-from constants import LogLevel
+
+import numpy as np
+
+from constants import (
+    AI_ANALYSIS_INTERVAL,
+    AI_ANOMALY_HIGH_Z,
+    AI_BASELINE_ALPHA,
+    AI_BASELINE_WARMUP,
+    AI_CUSUM_SLACK,
+    AI_CUSUM_THRESHOLD,
+    AI_EWMA_ALPHA,
+    AI_EWMA_LIMIT,
+    AI_RECOMMENDATION_TTL,
+    AI_SCORE_CHANGE,
+    FAILOVER_FAILURE_THRESHOLD,
+    PREDICTIVE_ERROR_LIMIT,
+    PREDICTIVE_FAILOVER_THRESHOLD,
+    PREDICTIVE_HORIZON,
+    PREDICTIVE_JITTER_LIMIT,
+    PREDICTIVE_LATENCY_LIMIT,
+    PREDICTIVE_LOSS_LIMIT,
+    PREDICTIVE_MIN_SAMPLES,
+    PREDICTIVE_WINDOW,
+    LogLevel,
+)
 
 
 @dataclass
@@ -54,178 +79,482 @@ class TrafficPattern:
     anomaly_score: float
 
 
+# Metrics tracked per server: (direction in which they get worse, smallest
+# standard deviation assumed, so a metric that was constant still scores)
+_TRACKED_METRICS = {
+    "ping": (1, 1.0),
+    "download_speed": (-1, 0.5),
+    "packet_loss": (1, 0.5),
+    "jitter": (1, 1.0),
+}
+# Recommendation raised when a tracked metric shifts for the worse
+_SHIFT_RECOMMENDATIONS = {
+    "ping": (
+        "ping_optimization",
+        3,
+        "Ping latency is increasing on {server}. Consider switching servers or optimizing connection.",
+        0.15,
+        0.6,
+    ),
+    "download_speed": (
+        "speed_optimization",
+        4,
+        "Download speed is decreasing on {server}. Consider server load balancing or protocol optimization.",
+        0.25,
+        0.7,
+    ),
+    "packet_loss": (
+        "packet_loss_optimization",
+        3,
+        "Packet loss is increasing on {server}. Consider switching servers or protocols.",
+        0.2,
+        0.6,
+    ),
+    "jitter": (
+        "jitter_optimization",
+        2,
+        "Jitter is increasing on {server}. Consider switching servers or protocols.",
+        0.1,
+        0.5,
+    ),
+}
+_HISTORY_WINDOW = 1000  # Metrics the hourly usage pattern counts over
+_SUMMARY_WINDOW = 50  # Recent metrics the dashboard summary averages over
+_SUMMARY_FIELDS = ("ping", "download_speed", "upload_speed", "packet_loss")
+# Standard deviations of the EWMA chart relative to the baseline's
+_EWMA_SCALE = math.sqrt(AI_EWMA_ALPHA / (2 - AI_EWMA_ALPHA))
+
+
+class _MetricBaseline:
+    """Running baseline of one metric on one server.
+
+    The baseline is an exponentially weighted mean and variance, so every
+    sample is scored against the server's own recent behaviour in O(1).
+    Sustained shifts are detected two ways: a two-sided CUSUM of the
+    standardized samples catches small persistent changes, and an EWMA
+    chart catches larger ones within a few samples.
+    """
+
+    __slots__ = (
+        "min_std",
+        "count",
+        "mean",
+        "variance",
+        "ewma",
+        "cusum_high",
+        "cusum_low",
+    )
+
+    def __init__(self, min_std: float = 0.0):
+        self.min_std = min_std
+        self.count = 0
+        self.mean = 0.0
+        self.variance = 0.0
+        self.ewma = 0.0
+        self.cusum_high = 0.0
+        self.cusum_low = 0.0
+
+    @property
+    def std(self) -> float:
+        return max(math.sqrt(self.variance), self.min_std)
+
+    @property
+    def drift(self) -> float:
+        """EWMA chart position in standard deviations of the chart."""
+        std = self.std
+        if self.count < AI_BASELINE_WARMUP or std <= 0:
+            return 0.0
+        return (self.ewma - self.mean) / (std * _EWMA_SCALE)
+
+    def update(self, value: float) -> Tuple[float, int]:
+        """Add a sample; returns (z-score, shift).
+
+        The z-score is against the baseline before this sample, shift is +1
+        or -1 when a sustained change up or down was detected, otherwise 0.
+        """
+        z_score = 0.0
+        shift = 0
+        if self.count == 0:
+            self.mean = self.ewma = value
+        else:
+            std = max(math.sqrt(self.variance), self.min_std)
+            if self.count >= AI_BASELINE_WARMUP and std > 0:
+                z_score = (value - self.mean) / std
+                self.cusum_high = max(0.0, self.cusum_high + z_score - AI_CUSUM_SLACK)
+                self.cusum_low = max(0.0, self.cusum_low - z_score - AI_CUSUM_SLACK)
+                limit = AI_EWMA_LIMIT * std * _EWMA_SCALE
+                was_inside = abs(self.ewma - self.mean) <= limit
+                self.ewma += AI_EWMA_ALPHA * (value - self.ewma)
+                if self.cusum_high > AI_CUSUM_THRESHOLD:
+                    shift = 1
+                elif self.cusum_low > AI_CUSUM_THRESHOLD:
+                    shift = -1
+                elif was_inside and abs(self.ewma - self.mean) > limit:
+                    shift = 1 if self.ewma > self.mean else -1
+                if shift:
+                    self.cusum_high = self.cusum_low = 0.0
+            else:
+                self.ewma += AI_EWMA_ALPHA * (value - self.ewma)
+
+            diff = value - self.mean
+            increment = AI_BASELINE_ALPHA * diff
+            self.mean += increment
+            self.variance = (1 - AI_BASELINE_ALPHA) * (self.variance + diff * increment)
+        self.count += 1
+        return z_score, shift
+
+
+class _ServerState:
+    """Incremental analysis state of one server."""
+
+    __slots__ = ("baselines", "shifts", "score", "evaluated_score", "last_update")
+
+    def __init__(self):
+        self.baselines = {
+            name: _MetricBaseline(min_std)
+            for name, (_, min_std) in _TRACKED_METRICS.items()
+        }
+        self.shifts: Dict[str, int] = {}  # Metric -> shift not yet evaluated
+        self.score = 0.0
+        self.evaluated_score = 0.0
+        self.last_update = 0.0
+
+    @property
+    def samples(self) -> int:
+        return max(baseline.count for baseline in self.baselines.values())
+
+    def composite_score(self) -> float:
+        """Performance score in [0, 1] from the baseline means."""
+        ping = self.baselines["ping"]
+        speed = self.baselines["download_speed"]
+        loss = self.baselines["packet_loss"]
+        ping_score = max(0, 1 - (ping.mean / 100)) if ping.count else 0.0
+        speed_score = min(1, speed.mean / 100) if speed.count else 0.0
+        loss_score = max(0, 1 - (loss.mean / 10)) if loss.count else 1.0
+        return ping_score * 0.4 + speed_score * 0.4 + loss_score * 0.2
+
+
 class AIPerformanceAnalyzer:
-    """AI-powered performance analyzer."""
+    """AI-powered performance analyzer.
+
+    Each metric update only touches the state of its own server: running
+    baselines give its z-scores and change detectors flag sustained shifts.
+    Servers whose state changed are marked dirty, and the recommendation
+    engine re-evaluates just those, so a health sweep over thousands of
+    servers stays cheap.
+    """
 
     def __init__(self, log_callback: Optional[Callable[[str, LogLevel], None]] = None):
         self.log = log_callback or (lambda msg, level: print(f"[{level}] {msg}"))
-        self.metrics_history: deque = deque(maxlen=1000)
         self.patterns: Dict[str, TrafficPattern] = {}
-        self.recommendations: List[OptimizationRecommendation] = []
         self.anomaly_threshold = 2.0  # Standard deviations
         self.learning_rate = 0.1
         self.is_learning = True
         self._analysis_thread = None
         self._stop_analysis = threading.Event()
+        self._lock = threading.RLock()
+        self._servers: Dict[str, _ServerState] = {}
+        self._dirty: set = set()
+        # (server_id or "", kind) -> recommendation, replaced rather than stacked
+        self._recommendations: Dict[Tuple[str, str], OptimizationRecommendation] = {}
+        self._anomalies: deque = deque(maxlen=100)
+        # Local hour of each of the last _HISTORY_WINDOW metrics
+        self._hours: deque = deque()
+        self._hour_counts = [0] * 24
+        self._hour_cache = (0.0, 0.0, 0)  # (start, end, hour) of the last lookup
+        self._recent: deque = deque()
+        self._recent_sums = {name: [0.0, 0] for name in _SUMMARY_FIELDS}
+        self._recent_unstable = 0
+
+    @property
+    def recommendations(self) -> List[OptimizationRecommendation]:
+        """Active recommendations, in no particular order."""
+        with self._lock:
+            return list(self._recommendations.values())
 
     def add_metrics(self, metrics: PerformanceMetrics) -> None:
-        """Add new performance metrics for analysis."""
-        try:
-            self.metrics_history.append(metrics)
-
-            # Trigger real-time analysis
-            if len(self.metrics_history) >= 10:
-                self._analyze_realtime()
+        """Add new performance metrics for analysis.
 
+        Metrics that are NaN were not measured and leave their baseline as
+        it is.
+        """
+        try:
+            with self._lock:
+                self._record_history(metrics)
+                self._update_server(metrics)
         except Exception as e:
             self.log(f"Error adding metrics: {e}", LogLevel.ERROR)
 
-    def _analyze_realtime(self) -> None:
-        """Perform real-time analysis on recent metrics."""
+    def add_metrics_batch(self, metrics: Iterable[PerformanceMetrics]) -> None:
+        """Add the metrics of a whole sweep under one lock acquisition."""
         try:
-            if len(self.metrics_history) < 5:
-                return
+            with self._lock:
+                for entry in metrics:
+                    self._record_history(entry)
+                    self._update_server(entry)
+        except Exception as e:
+            self.log(f"Error adding metrics: {e}", LogLevel.ERROR)
 
-            recent_metrics = list(self.metrics_history)[-20:]  # Last 20 metrics
+    def add_health_result(self, server: dict, tcp_result: int, url_result: int):
+        """Feed one health check result in; -1 means the probe failed."""
+        latency = url_result if url_result != -1 else tcp_result
+        failed = latency == -1
+        self.add_metrics(
+            PerformanceMetrics(
+                timestamp=time.time(),
+                server_id=server.get("id", ""),
+                ping=math.nan if failed else float(latency),
+                download_speed=math.nan,
+                upload_speed=math.nan,
+                packet_loss=100.0 if failed else 0.0,
+                jitter=math.nan,
+                cpu_usage=0.0,
+                memory_usage=0.0,
+                network_usage=0.0,
+                connection_stability=0.0 if failed else 1.0,
+            )
+        )
 
-            # Detect anomalies
-            anomalies = self._detect_anomalies(recent_metrics)
-            if anomalies:
-                self._handle_anomalies(anomalies)
+    def _record_history(self, metrics: PerformanceMetrics) -> None:
+        """Count the metric in the hourly and recent sums."""
+        if len(self._hours) == _HISTORY_WINDOW:
+            self._hour_counts[self._hours.popleft()] -= 1
+        hour = self._local_hour(metrics.timestamp)
+        self._hours.append(hour)
+        self._hour_counts[hour] += 1
+
+        if len(self._recent) == _SUMMARY_WINDOW:
+            self._count_recent(self._recent.popleft(), -1)
+        self._recent.append(metrics)
+        self._count_recent(metrics, 1)
+
+    def _count_recent(self, metrics: PerformanceMetrics, sign: int) -> None:
+        for name, sums in self._recent_sums.items():
+            value = getattr(metrics, name)
+            if value == value:  # Not NaN
+                sums[0] += sign * value
+                sums[1] += sign
+        if metrics.connection_stability < 0.5:
+            self._recent_unstable += sign
+
+    def _local_hour(self, timestamp: float) -> int:
+        start, end, hour = self._hour_cache
+        if not start <= timestamp < end:
+            local = time.localtime(timestamp)
+            start = timestamp - local.tm_min * 60 - local.tm_sec - timestamp % 1
+            hour = local.tm_hour
+            self._hour_cache = (start, start + 3600, hour)
+        return hour
+
+    def _update_server(self, metrics: PerformanceMetrics) -> None:
+        """Update one server's baselines and detectors in O(1)."""
+        server_id = metrics.server_id
+        state = self._servers.get(server_id)
+        if state is None:
+            state = self._servers[server_id] = _ServerState()
+            self._dirty.add(server_id)
+        state.last_update = metrics.timestamp
+
+        for name, baseline in state.baselines.items():
+            value = getattr(metrics, name)
+            if value != value:  # Not measured
+                continue
+            z_score, shift = baseline.update(value)
+            if abs(z_score) > self.anomaly_threshold:
+                self._handle_anomaly(
+                    {
+                        "server_id": server_id,
+                        "metric": name,
+                        "value": value,
+                        "z_score": abs(z_score),
+                        "severity": (
+                            "high" if abs(z_score) > AI_ANOMALY_HIGH_Z else "medium"
+                        ),
+                    }
+                )
+            if shift:
+                state.shifts[name] = shift
+                self._dirty.add(server_id)
+
+        state.score = state.composite_score()
+        if abs(state.score - state.evaluated_score) > AI_SCORE_CHANGE:
+            self._dirty.add(server_id)
+
+    def _handle_anomaly(self, anomaly: Dict[str, Any]) -> None:
+        """Record an anomaly; high severity ones raise an immediate action."""
+        self._anomalies.append(anomaly)
+        if anomaly["severity"] != "high":
+            return
 
-            # Update patterns
-            self._update_traffic_patterns(recent_metrics)
+        key = (anomaly["server_id"], f"immediate_action:{anomaly['metric']}")
+        if key not in self._recommendations:
+            self.log(f"High severity anomaly detected: {anomaly}", LogLevel.WARNING)
+        self._recommendations[key] = OptimizationRecommendation(
+            recommendation_type="immediate_action",
+            priority=5,
+            description=f"High {anomaly['metric']} anomaly detected on server {anomaly['server_id']}",
+            expected_improvement=0.2,
+            confidence=0.8,
+            parameters={
+                "server_id": anomaly["server_id"],
+                "metric": anomaly["metric"],
+                "z_score": anomaly["z_score"],
+            },
+            timestamp=time.time(),
+        )
 
-            # Generate recommendations
-            self._generate_recommendations(recent_metrics)
+    def _generate_recommendations(self) -> None:
+        """Re-evaluate the servers whose state changed since the last call."""
+        try:
+            with self._lock:
+                current_time = time.time()
+                self._recommendations = {
+                    key: r
+                    for key, r in self._recommendations.items()
+                    if current_time - r.timestamp < AI_RECOMMENDATION_TTL
+                }
+                if not self._dirty:
+                    return
+
+                for server_id in self._dirty:
+                    self._evaluate_server(server_id, current_time)
+                self._dirty.clear()
+                self._evaluate_load_balancing(current_time)
 
         except Exception as e:
-            self.log(f"Error in real-time analysis: {e}", LogLevel.ERROR)
+            self.log(f"Error generating recommendations: {e}", LogLevel.ERROR)
 
-    def _detect_anomalies(
-        self, metrics: List[PerformanceMetrics]
-    ) -> List[Dict[str, Any]]:
-        """Detect performance anomalies using statistical analysis."""
-        try:
-            anomalies = []
-
-            if len(metrics) < 5:
-                return anomalies
-
-            # Group metrics by server
-            server_metrics = defaultdict(list)
-            for metric in metrics:
-                server_metrics[metric.server_id].append(metric)
-
-            for server_id, server_data in server_metrics.items():
-                if len(server_data) < 3:
-                    continue
-
-                # Calculate Z-scores for key metrics
-                pings = [m.ping for m in server_data]
-                speeds = [m.download_speed for m in server_data]
-
-                ping_mean = statistics.mean(pings)
-                ping_std = statistics.stdev(pings) if len(pings) > 1 else 0
-
-                speed_mean = statistics.mean(speeds)
-                speed_std = statistics.stdev(speeds) if len(speeds) > 1 else 0
-
-                # Check for anomalies
-                latest = server_data[-1]
-
-                if ping_std > 0:
-                    ping_z_score = abs((latest.ping - ping_mean) / ping_std)
-                    if ping_z_score > self.anomaly_threshold:
-                        anomalies.append(
-                            {
-                                "server_id": server_id,
-                                "metric": "ping",
-                                "value": latest.ping,
-                                "z_score": ping_z_score,
-                                "severity": "high" if ping_z_score > 3 else "medium",
-                            }
-                        )
-
-                if speed_std > 0:
-                    speed_z_score = abs(
-                        (latest.download_speed - speed_mean) / speed_std
-                    )
-                    if speed_z_score > self.anomaly_threshold:
-                        anomalies.append(
-                            {
-                                "server_id": server_id,
-                                "metric": "download_speed",
-                                "value": latest.download_speed,
-                                "z_score": speed_z_score,
-                                "severity": "high" if speed_z_score > 3 else "medium",
-                            }
-                        )
-
-            return anomalies
+    def _evaluate_server(self, server_id: str, current_time: float) -> None:
+        state = self._servers.get(server_id)
+        if state is None:
+            return
+        state.evaluated_score = state.score
 
-        except Exception as e:
-            self.log(f"Error detecting anomalies: {e}", LogLevel.ERROR)
-            return []
+        for name, shift in state.shifts.items():
+            kind, priority, description, improvement, confidence = (
+                _SHIFT_RECOMMENDATIONS[name]
+            )
+            key = (server_id, kind)
+            if shift != _TRACKED_METRICS[name][0]:
+                # Shifted for the better, the earlier advice no longer holds
+                self._recommendations.pop(key, None)
+                continue
+            baseline = state.baselines[name]
+            self._recommendations[key] = OptimizationRecommendation(
+                recommendation_type=kind,
+                priority=priority,
+                description=description.format(server=server_id),
+                expected_improvement=improvement,
+                confidence=confidence,
+                parameters={
+                    "server_id": server_id,
+                    "metric": name,
+                    "trend": baseline.drift,
+                    "current": baseline.ewma,
+                    "baseline": baseline.mean,
+                },
+                timestamp=current_time,
+            )
+        state.shifts.clear()
+
+    def _evaluate_load_balancing(self, current_time: float) -> None:
+        scores = {
+            server_id: state.score
+            for server_id, state in self._servers.items()
+            if state.samples >= 2
+        }
+        key = ("", "load_balancing")
+        if len(scores) < 2:
+            self._recommendations.pop(key, None)
+            return
 
-    def _handle_anomalies(self, anomalies: List[Dict[str, Any]]) -> None:
-        """Handle detected anomalies."""
-        try:
-            for anomaly in anomalies:
-                if anomaly["severity"] == "high":
-                    self.log(
-                        f"High severity anomaly detected: {anomaly}", LogLevel.WARNING
-                    )
+        best_server = max(scores.items(), key=lambda x: x[1])
+        worst_server = min(scores.items(), key=lambda x: x[1])
+        # Significant performance difference
+        if best_server[1] - worst_server[1] > 0.3:
+            self._recommendations[key] = OptimizationRecommendation(
+                recommendation_type="load_balancing",
+                priority=2,
+                description=f"Consider redistributing load from {worst_server[0]} to {best_server[0]}",
+                expected_improvement=0.2,
+                confidence=0.8,
+                parameters={
+                    "best_server": best_server[0],
+                    "worst_server": worst_server[0],
+                    "performance_diff": best_server[1] - worst_server[1],
+                },
+                timestamp=current_time,
+            )
+        else:
+            self._recommendations.pop(key, None)
+
+    def get_server_state(self, server_id: str) -> Dict[str, Any]:
+        """Baselines and detector state of a server, empty if unknown."""
+        with self._lock:
+            state = self._servers.get(server_id)
+            if state is None:
+                return {}
+            return {
+                "samples": state.samples,
+                "score": state.score,
+                "metrics": {
+                    name: {
+                        "samples": baseline.count,
+                        "mean": baseline.mean,
+                        "std": baseline.std,
+                        "ewma": baseline.ewma,
+                        "drift": baseline.drift,
+                        "cusum_high": baseline.cusum_high,
+                        "cusum_low": baseline.cusum_low,
+                    }
+                    for name, baseline in state.baselines.items()
+                },
+            }
 
-                    # Generate immediate recommendation
-                    recommendation = OptimizationRecommendation(
-                        recommendation_type="immediate_action",
-                        priority=5,
-                        description=f"High {anomaly['metric']} anomaly detected on server {anomaly['server_id']}",
-                        expected_improvement=0.2,
-                        confidence=0.8,
-                        parameters={
-                            "server_id": anomaly["server_id"],
-                            "metric": anomaly["metric"],
-                            "z_score": anomaly["z_score"],
-                        },
-                        timestamp=time.time(),
-                    )
-                    self.recommendations.append(recommendation)
+    def get_anomalies(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """Most recent anomalies, newest first."""
+        with self._lock:
+            return list(self._anomalies)[::-1][:limit]
+
+    def get_recommendations(self, limit: int = 10) -> List[OptimizationRecommendation]:
+        """Get current optimization recommendations."""
+        try:
+            self._generate_recommendations()
+            # Sort by priority and timestamp
+            sorted_recommendations = sorted(
+                self.recommendations,
+                key=lambda x: (x.priority, -x.timestamp),
+                reverse=True,
+            )
+            return sorted_recommendations[:limit]
 
         except Exception as e:
-            self.log(f"Error handling anomalies: {e}", LogLevel.ERROR)
+            self.log(f"Error getting recommendations: {e}", LogLevel.ERROR)
+            return []
 
-    def _update_traffic_patterns(self, metrics: List[PerformanceMetrics]) -> None:
-        """Update traffic patterns based on metrics."""
+    def _update_traffic_patterns(self) -> None:
+        """Rebuild the hourly patterns from the running hour counts."""
         try:
-            if len(metrics) < 10:
+            with self._lock:
+                hour_counts = {
+                    hour: count for hour, count in enumerate(self._hour_counts) if count
+                }
+            if sum(hour_counts.values()) < 10:
                 return
 
-            # Analyze time-based patterns
-            hours = [time.localtime(m.timestamp).tm_hour for m in metrics]
-            hour_counts = defaultdict(int)
-            for hour in hours:
-                hour_counts[hour] += 1
-
             # Find peak and low usage hours
             sorted_hours = sorted(hour_counts.items(), key=lambda x: x[1], reverse=True)
             peak_hours = [h for h, c in sorted_hours[:3]]
             low_hours = [h for h, c in sorted_hours[-3:]]
 
             # Calculate anomaly score
-            mean_usage = statistics.mean(hour_counts.values())
-            std_usage = (
-                statistics.stdev(hour_counts.values()) if len(hour_counts) > 1 else 0
-            )
+            counts = np.array(list(hour_counts.values()), dtype=np.float64)
+            std_usage = counts.std(ddof=1) if len(counts) > 1 else 0
             anomaly_score = 0
             if std_usage > 0:
-                anomaly_score = max(
-                    0, (max(hour_counts.values()) - mean_usage) / std_usage
-                )
+                anomaly_score = max(0, (counts.max() - counts.mean()) / std_usage)
 
-            # Update pattern
-            pattern = TrafficPattern(
+            self.patterns["hourly_usage"] = TrafficPattern(
                 pattern_type="hourly_usage",
                 confidence=0.7,
                 peak_hours=peak_hours,
@@ -234,198 +563,47 @@ class AIPerformanceAnalyzer:
                 anomaly_score=anomaly_score,
             )
 
-            self.patterns["hourly_usage"] = pattern
-
-        except Exception as e:
-            self.log(f"Error updating traffic patterns: {e}", LogLevel.ERROR)
-
-    def _generate_recommendations(self, metrics: List[PerformanceMetrics]) -> None:
-        """Generate optimization recommendations."""
-        try:
-            if len(metrics) < 5:
-                return
-
-            # Clear old recommendations
-            current_time = time.time()
-            self.recommendations = [
-                r for r in self.recommendations if current_time - r.timestamp < 3600
-            ]  # Keep for 1 hour
-
-            # Analyze performance trends
-            recent_pings = [m.ping for m in metrics[-10:]]
-            recent_speeds = [m.download_speed for m in metrics[-10:]]
-
-            # Ping optimization recommendation
-            if len(recent_pings) >= 3:
-                ping_trend = self._calculate_trend(recent_pings)
-                if ping_trend > 0.1:  # Increasing ping trend
-                    recommendation = OptimizationRecommendation(
-                        recommendation_type="ping_optimization",
-                        priority=3,
-                        description="Ping latency is increasing. Consider switching servers or optimizing connection.",
-                        expected_improvement=0.15,
-                        confidence=0.6,
-                        parameters={
-                            "trend": ping_trend,
-                            "current_ping": recent_pings[-1],
-                        },
-                        timestamp=current_time,
-                    )
-                    self.recommendations.append(recommendation)
-
-            # Speed optimization recommendation
-            if len(recent_speeds) >= 3:
-                speed_trend = self._calculate_trend(recent_speeds)
-                if speed_trend < -0.1:  # Decreasing speed trend
-                    recommendation = OptimizationRecommendation(
-                        recommendation_type="speed_optimization",
-                        priority=4,
-                        description="Download speed is decreasing. Consider server load balancing or protocol optimization.",
-                        expected_improvement=0.25,
-                        confidence=0.7,
-                        parameters={
-                            "trend": speed_trend,
-                            "current_speed": recent_speeds[-1],
-                        },
-                        timestamp=current_time,
-                    )
-                    self.recommendations.append(recommendation)
-
-            # Server load balancing recommendation
-            server_performance = self._analyze_server_performance(metrics)
-            if server_performance:
-                best_server = max(server_performance.items(), key=lambda x: x[1])
-                worst_server = min(server_performance.items(), key=lambda x: x[1])
-
-                # Significant performance difference
-                if best_server[1] - worst_server[1] > 0.3:
-                    recommendation = OptimizationRecommendation(
-                        recommendation_type="load_balancing",
-                        priority=2,
-                        description=f"Consider redistributing load from {worst_server[0]} to {best_server[0]}",
-                        expected_improvement=0.2,
-                        confidence=0.8,
-                        parameters={
-                            "best_server": best_server[0],
-                            "worst_server": worst_server[0],
-                            "performance_diff": best_server[1] - worst_server[1],
-                        },
-                        timestamp=current_time,
+            for hour, count in hour_counts.items():
+                if count >= 5 and f"hour_{hour}" not in self.patterns:
+                    self.patterns[f"hour_{hour}"] = TrafficPattern(
+                        pattern_type=f"hourly_pattern_{hour}",
+                        confidence=0.5,
+                        peak_hours=[hour],
+                        low_usage_hours=[],
+                        seasonal_trends={},
+                        anomaly_score=0,
                     )
-                    self.recommendations.append(recommendation)
-
-        except Exception as e:
-            self.log(f"Error generating recommendations: {e}", LogLevel.ERROR)
-
-    def _calculate_trend(self, values: List[float]) -> float:
-        """Calculate trend of a series of values."""
-        try:
-            if len(values) < 2:
-                return 0.0
-
-            n = len(values)
-            x = list(range(n))
-            y = values
-
-            # Calculate slope using linear regression
-            x_mean = sum(x) / n
-            y_mean = sum(y) / n
-
-            numerator = sum((x[i] - x_mean) * (y[i] - y_mean) for i in range(n))
-            denominator = sum((x[i] - x_mean) ** 2 for i in range(n))
-
-            if denominator == 0:
-                return 0.0
-
-            slope = numerator / denominator
-            return slope
-
-        except Exception:
-            return 0.0
-
-    def _analyze_server_performance(
-        self, metrics: List[PerformanceMetrics]
-    ) -> Dict[str, float]:
-        """Analyze performance of different servers."""
-        try:
-            server_metrics = defaultdict(list)
-            for metric in metrics:
-                server_metrics[metric.server_id].append(metric)
-
-            server_scores = {}
-            for server_id, server_data in server_metrics.items():
-                if len(server_data) < 2:
-                    continue
-
-                # Calculate composite performance score
-                avg_ping = statistics.mean([m.ping for m in server_data])
-                avg_speed = statistics.mean([m.download_speed for m in server_data])
-                avg_packet_loss = statistics.mean([m.packet_loss for m in server_data])
-
-                # Normalize scores (higher is better)
-                ping_score = max(0, 1 - (avg_ping / 100))  # 100ms = 0 score
-                speed_score = min(1, avg_speed / 100)  # 100 Mbps = 1 score
-                packet_loss_score = max(0, 1 - (avg_packet_loss / 10))  # 10% = 0 score
-
-                composite_score = (
-                    ping_score * 0.4 + speed_score * 0.4 + packet_loss_score * 0.2
-                )
-                server_scores[server_id] = composite_score
-
-            return server_scores
-
-        except Exception as e:
-            self.log(f"Error analyzing server performance: {e}", LogLevel.ERROR)
-            return {}
-
-    def get_recommendations(self, limit: int = 10) -> List[OptimizationRecommendation]:
-        """Get current optimization recommendations."""
-        try:
-            # Sort by priority and timestamp
-            sorted_recommendations = sorted(
-                self.recommendations,
-                key=lambda x: (x.priority, -x.timestamp),
-                reverse=True,
-            )
-            return sorted_recommendations[:limit]
 
         except Exception as e:
-            self.log(f"Error getting recommendations: {e}", LogLevel.ERROR)
-            return []
+            self.log(f"Error updating traffic patterns: {e}", LogLevel.ERROR)
 
     def get_traffic_patterns(self) -> Dict[str, TrafficPattern]:
         """Get current traffic patterns."""
+        self._update_traffic_patterns()
         return self.patterns.copy()
 
     def get_performance_summary(self) -> Dict[str, Any]:
         """Get performance summary for dashboard."""
         try:
-            if not self.metrics_history:
-                return {}
-
-            recent_metrics = list(self.metrics_history)[-50:]  # Last 50 metrics
-
-            summary = {
-                "total_metrics": len(self.metrics_history),
-                "recent_metrics": len(recent_metrics),
-                "avg_ping": statistics.mean([m.ping for m in recent_metrics]),
-                "avg_download_speed": statistics.mean(
-                    [m.download_speed for m in recent_metrics]
-                ),
-                "avg_upload_speed": statistics.mean(
-                    [m.upload_speed for m in recent_metrics]
-                ),
-                "avg_packet_loss": statistics.mean(
-                    [m.packet_loss for m in recent_metrics]
-                ),
-                "active_recommendations": len(self.recommendations),
-                "traffic_patterns": len(self.patterns),
-                "anomaly_count": len(
-                    [m for m in recent_metrics if m.connection_stability < 0.5]
-                ),
-            }
-
-            return summary
+            with self._lock:
+                if not self._hours:
+                    return {}
+
+                summary = {
+                    "total_metrics": len(self._hours),
+                    "recent_metrics": len(self._recent),
+                }
+                for name, (total, count) in self._recent_sums.items():
+                    summary[f"avg_{name}"] = total / count if count else 0.0
+                summary.update(
+                    {
+                        "active_recommendations": len(self._recommendations),
+                        "traffic_patterns": len(self.patterns),
+                        "anomaly_count": self._recent_unstable,
+                        "servers": len(self._servers),
+                    }
+                )
+                return summary
 
         except Exception as e:
             self.log(f"Error getting performance summary: {e}", LogLevel.ERROR)
@@ -456,63 +634,118 @@ class AIPerformanceAnalyzer:
         """Main analysis loop."""
         while not self._stop_analysis.is_set():
             try:
-                # Perform deep analysis every 5 minutes
-                if len(self.metrics_history) >= 20:
-                    self._deep_analysis()
-
-                time.sleep(300)  # 5 minutes
-
+                self._generate_recommendations()
+                self._update_traffic_patterns()
             except Exception as e:
                 self.log(f"Error in analysis loop: {e}", LogLevel.ERROR)
-                time.sleep(60)
-
-    def _deep_analysis(self) -> None:
-        """Perform deep analysis on historical data."""
-        try:
-            # Analyze long-term trends
-            all_metrics = list(self.metrics_history)
-            if len(all_metrics) < 50:
-                return
-
-            # Group by time periods
-            hourly_metrics = defaultdict(list)
-            for metric in all_metrics:
-                hour = time.localtime(metric.timestamp).tm_hour
-                hourly_metrics[hour].append(metric)
-
-            # Analyze hourly patterns
-            for hour, metrics in hourly_metrics.items():
-                if len(metrics) < 5:
-                    continue
-
-                # Calculate average metrics for analysis
-                statistics.mean([m.ping for m in metrics])
-                statistics.mean([m.download_speed for m in metrics])
-
-                # Update hourly pattern
-                if f"hour_{hour}" not in self.patterns:
-                    self.patterns[f"hour_{hour}"] = TrafficPattern(
-                        pattern_type=f"hourly_pattern_{hour}",
-                        confidence=0.5,
-                        peak_hours=[hour],
-                        low_usage_hours=[],
-                        seasonal_trends={},
-                        anomaly_score=0,
-                    )
-
-        except Exception as e:
-            self.log(f"Error in deep analysis: {e}", LogLevel.ERROR)
+            self._stop_analysis.wait(AI_ANALYSIS_INTERVAL)
+
+
+# Per-sample features of the failure predictor and the levels users notice
+_FEATURES = ("latency", "packet_loss", "jitter", "errors")
+_ERRORS = _FEATURES.index("errors")
+_LIMITS = np.array(
+    [
+        PREDICTIVE_LATENCY_LIMIT,
+        PREDICTIVE_LOSS_LIMIT,
+        PREDICTIVE_JITTER_LIMIT,
+        PREDICTIVE_ERROR_LIMIT,
+    ],
+    dtype=np.float64,
+)
+
+
+class _RollingWindow:
+    """The last `size` samples of several features in a ring buffer.
+
+    Sums of x, x² and i·x over the window (i = 0 for the oldest sample) are
+    kept up to date on every push, so mean, variance and the least-squares
+    slope cost O(features) instead of a pass over the window.
+    """
+
+    def __init__(self, size: int, features: int):
+        self.size = size
+        self.count = 0
+        self._buffer = np.zeros((size, features))
+        self._head = 0  # Slot the next sample goes to
+        self._sum = np.zeros(features)
+        self._sum_sq = np.zeros(features)
+        self._sum_ix = np.zeros(features)
+        self._pushes = 0
+
+    def push(self, sample) -> None:
+        sample = np.asarray(sample, dtype=np.float64)
+        if self.count == self.size:
+            oldest = self._buffer[self._head]
+            # Dropping the oldest sample moves every other one down an index
+            self._sum_ix -= self._sum - oldest
+            self._sum -= oldest
+            self._sum_sq -= oldest * oldest
+            self.count -= 1
+        self._sum_ix += self.count * sample
+        self._sum += sample
+        self._sum_sq += sample * sample
+        self._buffer[self._head] = sample
+        self._head = (self._head + 1) % self.size
+        self.count += 1
+        self._pushes += 1
+        if self._pushes % self.size == 0:
+            self._resum()
+
+    def values(self) -> np.ndarray:
+        """Samples in the window, oldest first."""
+        if self.count < self.size:
+            return self._buffer[: self.count].copy()
+        return np.roll(self._buffer, -self._head, axis=0)
+
+    def stats(self):
+        """Mean, variance and slope per sample of each feature."""
+        n = self.count
+        mean = self._sum / n
+        variance = np.maximum(self._sum_sq / n - mean * mean, 0.0)
+        if n < 2:
+            return mean, variance, np.zeros_like(mean)
+        sum_i = n * (n - 1) / 2
+        sum_ii = (n - 1) * n * (2 * n - 1) / 6
+        slope = (n * self._sum_ix - sum_i * self._sum) / (n * sum_ii - sum_i * sum_i)
+        return mean, variance, slope
+
+    def _resum(self):
+        # Subtracting dropped samples accumulates rounding error, so the
+        # sums are rebuilt from the buffer once per window
+        values = self.values()
+        index = np.arange(len(values), dtype=np.float64)[:, None]
+        self._sum = values.sum(axis=0)
+        self._sum_sq = (values * values).sum(axis=0)
+        self._sum_ix = (index * values).sum(axis=0)
 
 
 class PredictiveFailover:
-    """AI-powered predictive failover system."""
-
-    def __init__(self, log_callback: Optional[Callable[[str, LogLevel], None]] = None):
+    """Predicts server failures from rolling windows of probe results.
+
+    Each server keeps its last `window` samples of latency, packet loss,
+    jitter and failed probes. The least-squares trend of each is projected
+    `horizon` samples ahead, and the chance that the projection crosses the
+    level users notice, given the scatter around the trend, is the failure
+    probability. A server whose latency keeps climbing is flagged while it
+    still answers, not after it stops.
+    """
+
+    def __init__(
+        self,
+        log_callback: Optional[Callable[[str, LogLevel], None]] = None,
+        window: int = PREDICTIVE_WINDOW,
+        horizon: int = PREDICTIVE_HORIZON,
+    ):
         self.log = log_callback or (lambda msg, level: print(f"[{level}] {msg}"))
         self.failure_predictions: Dict[str, float] = {}
         self.server_health_scores: Dict[str, float] = {}
-        self.failover_threshold = 0.7
-        self.prediction_window = 300  # 5 minutes
+        self.failover_threshold = PREDICTIVE_FAILOVER_THRESHOLD
+        self.window = window
+        self.horizon = horizon
+        self._windows: Dict[str, _RollingWindow] = {}
+        self._last_latency: Dict[str, float] = {}
+        self._lock = threading.Lock()
 
     def update_server_health(self, server_id: str, metrics: PerformanceMetrics) -> None:
         """Update server health score based on metrics."""
@@ -531,38 +764,104 @@ class PredictiveFailover:
             )
 
             # Apply exponential moving average
-            if server_id in self.server_health_scores:
+            with self._lock:
+                previous = self.server_health_scores.get(server_id)
                 self.server_health_scores[server_id] = (
-                    0.7 * self.server_health_scores[server_id] + 0.3 * health_score
+                    health_score
+                    if previous is None
+                    else 0.7 * previous + 0.3 * health_score
                 )
-            else:
-                self.server_health_scores[server_id] = health_score
 
-            # Predict failure probability
-            self._predict_failure(server_id, health_score)
+            self.record_probe(
+                server_id, metrics.ping, metrics.packet_loss, metrics.jitter
+            )
 
         except Exception as e:
             self.log(f"Error updating server health: {e}", LogLevel.ERROR)
 
-    def _predict_failure(self, server_id: str, current_health: float) -> None:
-        """Predict failure probability for a server."""
-        try:
-            # Simple prediction based on health trend
-            if server_id in self.server_health_scores:
-                health_trend = current_health - self.server_health_scores[server_id]
-
-                # If health is declining rapidly, increase failure probability
-                if health_trend < -0.1:
-                    failure_prob = min(1.0, 0.5 + abs(health_trend) * 2)
-                else:
-                    failure_prob = max(0.0, 0.1 - current_health * 0.1)
+    def record_probe(
+        self,
+        server_id: str,
+        latency: float,
+        packet_loss: float = 0.0,
+        jitter: Optional[float] = None,
+    ) -> float:
+        """Add one probe result and return the server's failure probability.
+
+        A negative latency is a failed probe. Without `jitter` it is taken
+        as the change from the previous successful latency.
+        """
+        with self._lock:
+            window = self._windows.get(server_id)
+            if window is None:
+                window = self._windows[server_id] = _RollingWindow(
+                    self.window, len(_FEATURES)
+                )
+            previous = self._last_latency.get(server_id)
+            failed = latency < 0
+            if failed:
+                # Keep the latency series on its last known level, the
+                # failure itself goes to the error series
+                latency = previous if previous is not None else 0.0
+                jitter = 0.0
             else:
-                failure_prob = 0.1
-
-            self.failure_predictions[server_id] = failure_prob
-
-        except Exception as e:
-            self.log(f"Error predicting failure: {e}", LogLevel.ERROR)
+                if jitter is None:
+                    jitter = abs(latency - previous) if previous is not None else 0.0
+                self._last_latency[server_id] = latency
+            window.push((latency, packet_loss, jitter, 1.0 if failed else 0.0))
+            probability = self._predict_failure(server_id)
+            self.failure_predictions[server_id] = probability
+            return probability
+
+    def _features(self, server_id: str):
+        """Trend-projected value and its spread for each feature."""
+        window = self._windows[server_id]
+        n = window.count
+        mean, variance, slope = window.stats()
+        if n < max(PREDICTIVE_MIN_SAMPLES, 3):
+            # Too few samples for a trend to mean anything
+            return mean, variance, slope, mean, np.sqrt(variance)
+        # Line through the window evaluated `horizon` samples past the
+        # newest one, with the standard error of the line at that point:
+        # a sustained level matters, not the scatter of single probes
+        spread_i = n * (n * n - 1) / 12  # Σ (i - mean i)²
+        distance = (n - 1) / 2 + self.horizon
+        projected = mean + slope * distance
+        residual = np.maximum(n * variance - slope * slope * spread_i, 0.0) / (n - 2)
+        spread = np.sqrt(residual * (1 / n + distance * distance / spread_i))
+        # Failed probes are too sparse for a line through them to mean
+        # much; their share of the window is what counts
+        projected[_ERRORS] = mean[_ERRORS]
+        spread[_ERRORS] = np.sqrt(mean[_ERRORS] * (1 - mean[_ERRORS]) / n)
+        return mean, variance, slope, projected, spread
+
+    def _predict_failure(self, server_id: str) -> float:
+        """Probability that a feature of the server crosses its limit."""
+        _, _, _, projected, spread = self._features(server_id)
+        # A perfectly steady series still gets some benefit of the doubt
+        z = (projected - _LIMITS) / np.maximum(spread, 0.1 * _LIMITS)
+        return max(0.5 * (1 + math.erf(value / math.sqrt(2))) for value in z)
+
+    def get_server_features(self, server_id: str) -> Dict[str, float]:
+        """Mean, standard deviation, trend per sample and projection of each feature."""
+        with self._lock:
+            if server_id not in self._windows:
+                return {}
+            mean, variance, slope, projected, _ = self._features(server_id)
+            features = {"samples": float(self._windows[server_id].count)}
+        for i, name in enumerate(_FEATURES):
+            features[f"{name}_mean"] = float(mean[i])
+            features[f"{name}_std"] = float(np.sqrt(variance[i]))
+            features[f"{name}_trend"] = float(slope[i])
+            features[f"{name}_projected"] = float(projected[i])
+        return features
+
+    def reset_server(self, server_id: str) -> None:
+        """Forget a server's probe history."""
+        with self._lock:
+            self._windows.pop(server_id, None)
+            self._last_latency.pop(server_id, None)
+            self.failure_predictions.pop(server_id, None)
 
     def should_failover(self, server_id: str) -> bool:
         """Check if server should be failed over."""
@@ -581,9 +880,11 @@ class PredictiveFailover:
             if not alternatives:
                 return None
 
-            # Find server with highest health score
+            # Healthiest server, discounted by its chance of failing
             best_server = max(
-                alternatives, key=lambda s: self.server_health_scores.get(s, 0.5)
+                alternatives,
+                key=lambda s: self.server_health_scores.get(s, 0.5)
+                * (1 - self.failure_predictions.get(s, 0)),
             )
 
             return best_server
@@ -594,8 +895,107 @@ class PredictiveFailover:
 
     def get_failure_predictions(self) -> Dict[str, float]:
         """Get current failure predictions for all servers."""
-        return self.failure_predictions.copy()
+        with self._lock:
+            return self.failure_predictions.copy()
 
     def get_health_scores(self) -> Dict[str, float]:
         """Get current health scores for all servers."""
-        return self.server_health_scores.copy()
+        with self._lock:
+            return self.server_health_scores.copy()
+
+
+@dataclass
+class BacktestResult:
+    """How a failure predictor did on recorded probe history."""
+
+    incidents: int  # Degraded stretches users would have noticed
+    predicted: int  # Incidents alarmed before their first degraded sample
+    false_alarms: int  # Alarms with no incident following them
+    lead_times: List[float]  # Seconds from alarm to incident, per prediction
+    reactive_delay: float  # Mean seconds a consecutive-failure rule needs
+
+    @property
+    def mean_lead_time(self) -> float:
+        return statistics.mean(self.lead_times) if self.lead_times else 0.0
+
+
+def _degraded(latency: float, packet_loss: float) -> bool:
+    return (
+        latency < 0
+        or latency >= PREDICTIVE_LATENCY_LIMIT
+        or packet_loss >= PREDICTIVE_LOSS_LIMIT
+    )
+
+
+def backtest_failover(
+    history: Iterable[Tuple[float, str, float, float]],
+    predictor_factory: Optional[Callable[[], PredictiveFailover]] = None,
+    min_run: int = FAILOVER_FAILURE_THRESHOLD,
+    lookahead: Optional[int] = None,
+) -> BacktestResult:
+    """Replay (timestamp, server_id, latency, packet_loss) probe records.
+
+    An incident starts at the first of `min_run` or more degraded samples in
+    a row (failed, or latency or loss past its limit) and lasts until the
+    samples stay healthy for `lookahead` probes. It counts as predicted when
+    the predictor alarmed within `lookahead` samples before it, using only
+    the samples up to the alarm; an alarm that starts neither that close
+    before nor during an incident is a false alarm.
+    """
+    factory = predictor_factory or (lambda: PredictiveFailover(lambda m, level: None))
+    per_server: Dict[str, List[Tuple[float, float, float]]] = defaultdict(list)
+    for timestamp, server_id, latency, packet_loss in history:
+        per_server[server_id].append((timestamp, latency, packet_loss))
+
+    incidents = predicted = false_alarms = 0
+    lead_times: List[float] = []
+    delays: List[float] = []
+    for samples in per_server.values():
+        samples.sort(key=lambda sample: sample[0])
+        predictor = factory()
+        ahead = lookahead if lookahead is not None else 2 * predictor.horizon
+        times = [sample[0] for sample in samples]
+        degraded = [_degraded(latency, loss) for _, latency, loss in samples]
+        alarms = []
+        for _, latency, loss in samples:
+            predictor.record_probe("backtest", latency, loss)
+            alarms.append(predictor.should_failover("backtest"))
+
+        # Runs of degraded samples as [start, end) index pairs
+        runs: List[List[int]] = []
+        for i, bad in enumerate(degraded):
+            if bad and runs and runs[-1][1] == i:
+                runs[-1][1] = i + 1
+            elif bad:
+                runs.append([i, i + 1])
+        # Runs users notice; ones close to each other are a single incident
+        spans: List[List[int]] = []
+        for start, end in runs:
+            if spans and start - spans[-1][1] <= ahead:
+                spans[-1][1] = end
+            elif end - start >= min_run:
+                spans.append([start, end])
+                delays.append(times[start + min_run - 1] - times[start])
+        incidents += len(spans)
+
+        for start, _ in spans:
+            first = next(
+                (j for j in range(max(0, start - ahead), start) if alarms[j]), None
+            )
+            if first is not None:
+                predicted += 1
+                lead_times.append(times[start] - times[first])
+
+        for i, alarm in enumerate(alarms):
+            if not alarm or (i and alarms[i - 1]):
+                continue
+            if not any(start - ahead <= i < end + ahead for start, end in spans):
+                false_alarms += 1
+
+    return BacktestResult(
+        incidents,
+        predicted,
+        false_alarms,
+        lead_times,
+        statistics.mean(delays) if delays else 0.0,
+    )
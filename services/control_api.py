@@ -0,0 +1,179 @@
+"""
+Control API for Onix
+JSON-over-HTTP endpoint used to drive the headless daemon
+"""
+
+import hmac
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Mapping, Optional, Tuple
+
+from constants import CONTROL_API_PORT, LogLevel, PROXY_HOST
+
+# Host header values accepted when no token is set
+_LOCAL_HOSTS = frozenset(("127.0.0.1", "localhost", "::1"))
+
+
+class ControlApiError(Exception):
+    """Request error reported to the client with an HTTP status."""
+
+    def __init__(self, message: str, status: int = 400):
+        super().__init__(message)
+        self.status = status
+
+
+class ControlApiServer:
+    """Routes `METHOD /path` requests with JSON bodies to a controller object.
+
+    The controller provides the handlers named in ROUTES; each receives the
+    decoded JSON body and returns a JSON-serializable result. Without a
+    token, only requests a browser page cannot forge are served: addressed
+    to localhost, with no Origin, and POSTs with a JSON Content-Type.
+    """
+
+    ROUTES = {
+        ("GET", "/status"): "get_status",
+        ("GET", "/servers"): "list_servers",
+        ("GET", "/stats"): "get_stats",
+        ("POST", "/connect"): "connect",
+        ("POST", "/switch"): "connect",
+        ("POST", "/disconnect"): "disconnect",
+        ("POST", "/test"): "run_test",
+        ("POST", "/subscriptions/update"): "update_subscriptions",
+    }
+
+    def __init__(
+        self,
+        controller,
+        log_callback: Callable[[str, LogLevel], None],
+        host: str = PROXY_HOST,
+        port: int = CONTROL_API_PORT,
+        token: str = "",
+    ):
+        self.controller = controller
+        self.log = log_callback
+        self.host = host
+        self.port = port
+        self.token = token
+        self._server = None
+        self._thread = None
+
+    def dispatch(
+        self, method: str, path: str, body: Dict[str, Any], auth: Optional[str] = None
+    ) -> Tuple[int, Any]:
+        """Run the handler for a request and return (status, payload)."""
+        if self.token and not hmac.compare_digest(auth or "", f"Bearer {self.token}"):
+            return 401, {"error": "unauthorized"}
+
+        handler_name = self.ROUTES.get((method, path.split("?")[0].rstrip("/")))
+        if handler_name is None:
+            return 404, {"error": f"no route for {method} {path}"}
+
+        try:
+            return 200, getattr(self.controller, handler_name)(body)
+        except ControlApiError as e:
+            return e.status, {"error": str(e)}
+        except Exception as e:
+            self.log(
+                f"Control API handler '{handler_name}' failed: {e}", LogLevel.ERROR
+            )
+            return 500, {"error": str(e)}
+
+    def check_headers(
+        self, method: str, headers: Mapping[str, str]
+    ) -> Optional[Tuple[int, Any]]:
+        """(status, payload) rejecting a request before dispatch, or None.
+
+        With a token set the Authorization check in dispatch() is enough.
+        Without one, any web page could reach the API through the user's
+        browser, so cross-origin and DNS-rebinding requests are refused.
+        """
+        if self.token:
+            return None
+        if headers.get("Origin") is not None:
+            return 403, {"error": "cross-origin requests are not allowed"}
+        if _host_name(headers.get("Host") or "") not in _LOCAL_HOSTS:
+            return 403, {"error": "Host must be localhost"}
+        content_type = (headers.get("Content-Type") or "").split(";")[0]
+        if method == "POST" and content_type.strip().lower() != "application/json":
+            return 415, {"error": "Content-Type must be application/json"}
+        return None
+
+    def start(self) -> bool:
+        if self._server:
+            return True
+
+        api = self
+
+        class ControlHandler(BaseHTTPRequestHandler):
+            def _handle(self, method):
+                rejected = api.check_headers(method, self.headers)
+                if rejected:
+                    self._reply(*rejected)
+                    return
+                body = {}
+                length = int(self.headers.get("Content-Length") or 0)
+                if length:
+                    try:
+                        body = json.loads(self.rfile.read(length))
+                    except ValueError:
+                        self._reply(400, {"error": "body is not valid JSON"})
+                        return
+                    if not isinstance(body, dict):
+                        self._reply(400, {"error": "body must be a JSON object"})
+                        return
+                status, payload = api.dispatch(
+                    method, self.path, body, self.headers.get("Authorization")
+                )
+                self._reply(status, payload)
+
+            def _reply(self, status, payload):
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                self._handle("GET")
+
+            def do_POST(self):
+                self._handle("POST")
+
+            def log_message(self, *args):
+                pass
+
+        try:
+            self._server = ThreadingHTTPServer((self.host, self.port), ControlHandler)
+        except OSError as e:
+            self.log(
+                f"Control API could not bind port {self.port}: {e}", LogLevel.ERROR
+            )
+            return False
+
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        self.log(
+            f"Control API listening on http://{self.host}:{self.port}", LogLevel.INFO
+        )
+        return True
+
+    def stop(self):
+        if not self._server:
+            return
+        self._server.shutdown()
+        self._server.server_close()
+        self._server = None
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=2)
+
+
+def _host_name(host: str) -> str:
+    """Host header without its port; IPv6 literals lose their brackets."""
+    if host.startswith("["):
+        return host[1 : host.find("]")] if "]" in host else host
+    return host.rsplit(":", 1)[0].lower()
@@ -0,0 +1,254 @@
+"""
+Core Statistics Client for Onix
+Reads proxy traffic counters from the running core's local API
+"""
+
+import json
+import threading
+from array import array
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from constants import (
+    CORE_STATS_STREAM_TIMEOUT,
+    CORE_STATS_TIMEOUT,
+    PROXY_HOST,
+    STATS_API_PORT,
+)
+
+
+@dataclass
+class CoreTrafficSnapshot:
+    """Cumulative traffic counters reported by the core."""
+
+    upload_total: int = 0
+    download_total: int = 0
+    outbounds: Dict[str, Tuple[int, int]] = field(default_factory=dict)
+    connections: List[Dict[str, Any]] = field(default_factory=list)
+
+
+class CoreStatsClient:
+    """Base client that keeps one pooled keep-alive session to the core API."""
+
+    def __init__(
+        self,
+        host: str = PROXY_HOST,
+        port: int = STATS_API_PORT,
+        timeout: float = CORE_STATS_TIMEOUT,
+    ):
+        self.base_url = f"http://{host}:{port}"
+        self.timeout = timeout
+        self._session = requests.Session()
+        # The API is local; never send it through a system proxy that may
+        # point back at the core itself.
+        self._session.trust_env = False
+        self._session.mount(
+            "http://", HTTPAdapter(pool_connections=1, pool_maxsize=2, max_retries=0)
+        )
+
+    def _get_json(self, path: str) -> Optional[Any]:
+        try:
+            response = self._session.get(self.base_url + path, timeout=self.timeout)
+            if response.status_code != 200:
+                return None
+            return response.json()
+        except (requests.exceptions.RequestException, ValueError):
+            return None
+
+    def read_traffic(self) -> Optional[CoreTrafficSnapshot]:
+        """Return the current counters, or None if the API is not reachable."""
+        raise NotImplementedError
+
+    def close(self):
+        self._session.close()
+
+
+class ClashApiStatsClient(CoreStatsClient):
+    """sing-box clash API (`experimental.clash_api`)."""
+
+    def read_traffic(self) -> Optional[CoreTrafficSnapshot]:
+        data = self._get_json("/connections")
+        if not isinstance(data, dict):
+            return None
+
+        connections = data.get("connections") or []
+        outbounds: Dict[str, Tuple[int, int]] = {}
+        for conn in connections:
+            # The first chain entry is the outbound that carried the connection
+            chains = conn.get("chains") or ["unknown"]
+            up, down = outbounds.get(chains[0], (0, 0))
+            outbounds[chains[0]] = (
+                up + conn.get("upload", 0),
+                down + conn.get("download", 0),
+            )
+
+        return CoreTrafficSnapshot(
+            upload_total=data.get("uploadTotal", 0),
+            download_total=data.get("downloadTotal", 0),
+            outbounds=outbounds,
+            connections=connections,
+        )
+
+    def select_outbound(self, selector: str, outbound: str) -> bool:
+        """Point a selector outbound at `outbound`; True once the core accepted it."""
+        try:
+            response = self._session.put(
+                f"{self.base_url}/proxies/{selector}",
+                json={"name": outbound},
+                timeout=self.timeout,
+            )
+            return response.status_code in (200, 204)
+        except requests.exceptions.RequestException:
+            return False
+
+    def outbound_delay(self, tag: str, url: str, timeout: float) -> int:
+        """Latency in ms of a request to `url` through outbound `tag`, -1 on failure.
+
+        The core runs the request itself (`/proxies/<tag>/delay`), so this
+        tests that one outbound whatever the selectors point at.
+        """
+        try:
+            response = self._session.get(
+                f"{self.base_url}/proxies/{tag}/delay",
+                params={"url": url, "timeout": int(timeout * 1000)},
+                timeout=self.timeout + timeout,
+            )
+            if response.status_code != 200:
+                return -1
+            return int(response.json().get("delay", -1))
+        except (requests.exceptions.RequestException, ValueError, AttributeError):
+            return -1
+
+    def stream_traffic(
+        self, stop_event: threading.Event
+    ) -> Iterator[Tuple[float, float]]:
+        """Yield (up, down) bytes/s as the core pushes them on `/traffic`.
+
+        The whole feed arrives over one chunked response; the generator ends
+        when the core closes it, the read times out or `stop_event` is set.
+        """
+        try:
+            with self._session.get(
+                self.base_url + "/traffic",
+                stream=True,
+                timeout=(self.timeout, CORE_STATS_STREAM_TIMEOUT),
+            ) as response:
+                if response.status_code != 200:
+                    return
+                for line in response.iter_lines(chunk_size=None):
+                    if stop_event.is_set():
+                        return
+                    if not line:
+                        continue
+                    try:
+                        sample = json.loads(line)
+                    except ValueError:
+                        continue
+                    yield sample.get("up", 0), sample.get("down", 0)
+        except requests.exceptions.RequestException:
+            return
+
+
+class XrayMetricsStatsClient(CoreStatsClient):
+    """Xray StatsService counters exposed through the `metrics` expvar endpoint."""
+
+    def read_traffic(self) -> Optional[CoreTrafficSnapshot]:
+        data = self._get_json("/debug/vars")
+        if not isinstance(data, dict):
+            return None
+
+        outbound_stats = (data.get("stats") or {}).get("outbound") or {}
+        outbounds = {
+            tag: (counters.get("uplink", 0), counters.get("downlink", 0))
+            for tag, counters in outbound_stats.items()
+        }
+        return CoreTrafficSnapshot(
+            upload_total=sum(up for up, _ in outbounds.values()),
+            download_total=sum(down for _, down in outbounds.values()),
+            outbounds=outbounds,
+        )
+
+
+def get_core_stats_client(core_name: str) -> CoreStatsClient:
+    """Factory returning the stats client matching the active core."""
+    if core_name == "Xray":
+        return XrayMetricsStatsClient()
+    return ClashApiStatsClient()
+
+
+class RateRing:
+    """Fixed-size ring of cumulative counter samples used to derive rates."""
+
+    def __init__(self, capacity: int = 61):
+        self.capacity = capacity
+        self._timestamps = array("d", [0.0]) * capacity
+        self._upload = array("d", [0.0]) * capacity
+        self._download = array("d", [0.0]) * capacity
+        self._head = 0  # Next slot to write
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def clear(self):
+        self._head = 0
+        self._count = 0
+
+    def _index(self, age: int) -> int:
+        """Slot of the sample `age` steps back from the newest one."""
+        return (self._head - 1 - age) % self.capacity
+
+    def push(self, timestamp: float, upload_total: float, download_total: float):
+        if self._count:
+            last = self._index(0)
+            # Counters went backwards: the core restarted, start over
+            if (
+                upload_total < self._upload[last]
+                or download_total < self._download[last]
+            ):
+                self.clear()
+
+        self._timestamps[self._head] = timestamp
+        self._upload[self._head] = upload_total
+        self._download[self._head] = download_total
+        self._head = (self._head + 1) % self.capacity
+        self._count = min(self._count + 1, self.capacity)
+
+    def _rate_between(self, newer: int, older: int) -> Tuple[float, float]:
+        elapsed = self._timestamps[newer] - self._timestamps[older]
+        if elapsed <= 0:
+            return 0.0, 0.0
+        return (
+            (self._upload[newer] - self._upload[older]) / elapsed,
+            (self._download[newer] - self._download[older]) / elapsed,
+        )
+
+    def latest_rate(self) -> Tuple[float, float]:
+        """Upload/download bytes per second over the last interval."""
+        if self._count < 2:
+            return 0.0, 0.0
+        return self._rate_between(self._index(0), self._index(1))
+
+    def average_rate(self) -> Tuple[float, float]:
+        """Upload/download bytes per second over the whole window."""
+        if self._count < 2:
+            return 0.0, 0.0
+        return self._rate_between(self._index(0), self._index(self._count - 1))
+
+    def history(self) -> List[Dict[str, float]]:
+        """Per-interval rates, oldest first."""
+        points = []
+        for age in range(self._count - 2, -1, -1):
+            newer = self._index(age)
+            up, down = self._rate_between(newer, self._index(age + 1))
+            points.append(
+                {
+                    "timestamp": self._timestamps[newer],
+                    "upload_speed": up,
+                    "download_speed": down,
+                }
+            )
+        return points
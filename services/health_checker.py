@@ -10,8 +10,11 @@ from constants import (
     HEALTH_CHECK_MIN_BACKOFF,
     TEST_ENDPOINTS,
     MAX_CONCURRENT_CORE_TESTS,
+    PROBE_RESULT_MAX_AGE,
 )
-from services.ping_service import direct_tcp, proxy_tcp_connect, url_latency_via_proxy
+from services.ping_service import proxy_tcp_connect, url_latency_via_proxy
+from services.probe_bus import get_probe_bus
+from utils.metrics import get_metrics_registry
 
 
 class HealthChecker:
@@ -26,9 +29,11 @@ class HealthChecker:
         self._test_core_manager = None
         self._test_callback = None
         self._progress_callback = None
+        self._result_listeners: List[Callable[[dict, int, int], None]] = []
         self._thread_pool = ThreadPoolExecutor(max_workers=MAX_CONCURRENT_CORE_TESTS)
         self._cache_duration = 300  # 5 minutes cache for results
         self._result_cache = {}  # server_id -> {result, timestamp}
+        self._exported_names = {}  # server_id -> name its gauges were exported with
 
     def set_test_core_manager(self, core_manager):
         """Set the persistent test core manager for proxy-based tests."""
@@ -38,6 +43,10 @@ class HealthChecker:
         """Set callback to report test results to UI."""
         self._test_callback = callback
 
+    def add_result_listener(self, listener: Callable[[dict, int, int], None]):
+        """Also report every fresh (server, tcp_ms, url_ms) result, -1 on failure."""
+        self._result_listeners.append(listener)
+
     def set_progress_callback(self, callback: Callable[[int, int], None]):
         """Set callback to report progress (current, total)."""
         self._progress_callback = callback
@@ -58,6 +67,12 @@ class HealthChecker:
         self._test_types = test_types
         self._stop_event.clear()
 
+        # Servers dropped since the last run no longer get checked
+        current = {server.get("id") for server in servers}
+        for server_id in list(self._exported_names):
+            if server_id not in current:
+                self.forget_server(server_id)
+
         # Start test core manager if needed for URL testing
         if "url" in test_types and self._test_core_manager:
             if not self._test_core_manager.start(servers):
@@ -90,6 +105,19 @@ class HealthChecker:
         # Don't shutdown thread pool here, let it be reused
         self.log("Health checker stopped", LogLevel.INFO)
 
+    def forget_server(self, server_id: str):
+        """Drop the stats and exported gauges of a server that was removed."""
+        self._server_stats.pop(server_id, None)
+        self._result_cache.pop(server_id, None)
+        if self._exported_names.pop(server_id, None) is not None:
+            self._remove_server_gauges(server_id)
+
+    @staticmethod
+    def _remove_server_gauges(server_id: str):
+        registry = get_metrics_registry()
+        registry.remove("onix_server_latency_ms", {"server_id": server_id})
+        registry.remove("onix_server_consecutive_failures", {"server_id": server_id})
+
     def get_server_stats(self, server_id: str) -> dict:
         """Get health statistics for a specific server."""
         return self._server_stats.get(server_id, {})
@@ -232,6 +260,12 @@ class HealthChecker:
 
             # Cache the result
             self._cache_result(server_id, stats)
+            self._export_server_health(server, stats, tcp_result, url_result)
+            for listener in self._result_listeners:
+                try:
+                    listener(server, tcp_result, url_result)
+                except Exception as e:
+                    self.log(f"Health result listener error: {e}", LogLevel.DEBUG)
 
         # Check for server issues and log warnings
         failures = stats.get("failures", 0)
@@ -253,19 +287,65 @@ class HealthChecker:
             if url_result != -1:
                 self._test_callback(server, int(stats["url_ema"] or url_result), "url")
 
+    def _export_server_health(
+        self, server: dict, stats: dict, tcp_result: int, url_result: int
+    ):
+        """Publish the smoothed health of a freshly tested server.
+
+        Gauges are keyed by server id, since names need not be unique; the
+        name is a second label for readability.
+        """
+        registry = get_metrics_registry()
+        server_id = server.get("id")
+        name = server.get("name", server_id)
+        previous = self._exported_names.get(server_id)
+        if previous is not None and previous != name:
+            # Renamed: drop the series still carrying the old name
+            self._remove_server_gauges(server_id)
+        self._exported_names[server_id] = name
+        for test_type, result in (("tcp", tcp_result), ("url", url_result)):
+            if test_type not in self._test_types:
+                continue
+            if result == -1:
+                registry.counter(
+                    "onix_health_check_failures_total",
+                    "Failed health check probes",
+                    {"test": test_type},
+                ).inc()
+            registry.gauge(
+                "onix_server_latency_ms",
+                "Smoothed server latency, -1 when unreachable",
+                {"server_id": server_id, "server": name, "test": test_type},
+            ).set(stats.get(f"{test_type}_ema") or -1)
+        registry.gauge(
+            "onix_server_consecutive_failures",
+            "Consecutive failed health checks",
+            {"server_id": server_id, "server": name},
+        ).set(stats.get("failures", 0))
+
     def _test_tcp(self, server: dict) -> int:
         """Test TCP connectivity."""
+        bus = get_probe_bus()
         if self._test_core_manager:
             # Use proxy-based test
             proxy_address = self._test_core_manager.get_proxy_address(server.get("id"))
             if proxy_address:
                 tcp_config = TEST_ENDPOINTS["tcp"]
-                return proxy_tcp_connect(
-                    proxy_address, tcp_config["host"], tcp_config["port"]
+                return bus.probe(
+                    "proxy_tcp",
+                    server.get("id"),
+                    lambda: proxy_tcp_connect(
+                        proxy_address, tcp_config["host"], tcp_config["port"]
+                    ),
+                    max_age=PROBE_RESULT_MAX_AGE,
                 )
 
-        # Fallback to direct TCP
-        return direct_tcp(server.get("server"), server.get("port"))
+        # Fallback to direct TCP, shared with other monitors of the server
+        return bus.probe(
+            "tcp",
+            (server.get("server"), server.get("port")),
+            max_age=PROBE_RESULT_MAX_AGE,
+        )
 
     def _test_url(self, server: dict) -> int:
         """Test URL latency."""
@@ -277,10 +357,16 @@ class HealthChecker:
             return -1
 
         url_config = TEST_ENDPOINTS["url"]
-        return url_latency_via_proxy(
-            proxy_address,
-            url=url_config["url"],
-            is_cancelled=lambda: self._stop_event.is_set(),
+        # Keyed by server: test core ports are reassigned on every start
+        return get_probe_bus().probe(
+            "url",
+            server.get("id"),
+            lambda: url_latency_via_proxy(
+                proxy_address,
+                url=url_config["url"],
+                is_cancelled=lambda: self._stop_event.is_set(),
+            ),
+            max_age=PROBE_RESULT_MAX_AGE,
         )
 
     def _update_ema(
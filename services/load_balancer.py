@@ -0,0 +1,262 @@
+"""
+Load Balancer Mode for Onix
+Spreads traffic over several servers at once with the core's own outbound
+groups, so their bandwidth adds up. sing-box splits connections between the
+members by source port range, in proportion to weights Onix derives from its
+health data, with a urltest group over all members as the fallback; Xray
+uses a leastLoad balancer fed by its observatory. A monitor moves a failing
+member's share to the fallback and reports per-member traffic.
+"""
+
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+from constants import (
+    FAILOVER_FAILURE_THRESHOLD,
+    FAILOVER_PROBE_TIMEOUT,
+    LOAD_BALANCER_MEMBERS,
+    LOAD_BALANCER_MIN_SHARE,
+    LOAD_BALANCER_MONITOR_INTERVAL,
+    LOAD_BALANCER_PORT_BUCKETS,
+    URL_TEST_DEFAULT_URL,
+    LogLevel,
+)
+from services.probe_bus import get_probe_bus
+from services.speed_test_service import _expected_latency
+
+_PORTS = 65536
+
+
+def member_tag(index: int) -> str:
+    """Outbound tag of load balancer member `index`."""
+    return f"balance-{index}"
+
+
+def member_selector_tag(index: int) -> str:
+    """Selector in front of member `index`, switched to the fallback on failure."""
+    return f"balance-{index}-out"
+
+
+def select_members(
+    servers: List[Dict[str, Any]],
+    current: Optional[Dict[str, Any]],
+    health_source: Optional[Callable[[str], Dict[str, Any]]] = None,
+    k: int = LOAD_BALANCER_MEMBERS,
+) -> List[Dict[str, Any]]:
+    """`current` and the other servers with the lowest expected latency, k in all.
+
+    Servers with no successful measurement are left out.
+    """
+    scored = []
+    for server in servers:
+        if server == current or server.get("is_chain"):
+            continue
+        stats = health_source(server.get("id", "")) if health_source else {}
+        latency = _expected_latency(server, stats or {})
+        if latency is not None:
+            scored.append((latency, len(scored), server))
+    scored.sort(key=lambda item: item[:2])
+    members = [current] if current else []
+    return members + [server for _, _, server in scored[: k - len(members)]]
+
+
+def member_weights(
+    servers: List[Dict[str, Any]],
+    health_source: Optional[Callable[[str], Dict[str, Any]]] = None,
+) -> List[float]:
+    """Traffic share of each server, summing to 1.
+
+    Shares are proportional to the inverse expected latency, so a server
+    twice as fast carries twice the connections; each gets at least
+    LOAD_BALANCER_MIN_SHARE. Unmeasured servers count as the median one.
+    """
+    if not servers:
+        return []
+    latencies = []
+    for server in servers:
+        stats = health_source(server.get("id", "")) if health_source else {}
+        latencies.append(_expected_latency(server, stats or {}))
+    known = sorted(latency for latency in latencies if latency is not None)
+    median = known[len(known) // 2] if known else 1.0
+    inverse = [1.0 / max(latency or median, 1.0) for latency in latencies]
+
+    floor = min(LOAD_BALANCER_MIN_SHARE, 1.0 / len(servers))
+    total = sum(inverse)
+    weights = [floor + (1 - floor * len(servers)) * w / total for w in inverse]
+    return weights
+
+
+def port_ranges(
+    weights: List[float], buckets: int = LOAD_BALANCER_PORT_BUCKETS
+) -> List[List[str]]:
+    """Source port ranges ("low:high") of each member, sized by weight.
+
+    The port space is cut into `buckets` slices dealt out by smooth
+    weighted round-robin, so every member's slices are spread over the
+    whole space and any OS's ephemeral port range gets the same mix.
+    """
+    size = _PORTS // buckets
+    total = sum(weights)
+    current = [0.0] * len(weights)
+    ranges: List[List[str]] = [[] for _ in weights]
+    if total <= 0:
+        return ranges
+
+    previous = None
+    for bucket in range(buckets):
+        for i, weight in enumerate(weights):
+            current[i] += weight
+        chosen = max(range(len(weights)), key=lambda i: current[i])
+        current[chosen] -= total
+
+        low = bucket * size
+        high = _PORTS - 1 if bucket == buckets - 1 else low + size - 1
+        if chosen == previous:
+            # Adjacent slices of one member make a single range
+            start = ranges[chosen][-1].split(":")[0]
+            ranges[chosen][-1] = f"{start}:{high}"
+        else:
+            ranges[chosen].append(f"{low}:{high}")
+        previous = chosen
+    return ranges
+
+
+class LoadBalancerMonitor:
+    """Watches the members of a running load balancer.
+
+    Every LOAD_BALANCER_MONITOR_INTERVAL seconds it probes each member
+    outbound through the core (via the probe bus), when the stats client
+    can do that, and otherwise reads the member's health stats: after
+    FAILOVER_FAILURE_THRESHOLD failures the member's traffic is handed to
+    the fallback group through `member_switch`, and given back once it
+    recovers. It also keeps per-member traffic from the core stats client.
+    """
+
+    def __init__(self, log_callback: Callable = None):
+        self.log = log_callback or (lambda message, level=None: None)
+        self._lock = threading.Lock()
+        self._members: List[Dict[str, Any]] = []
+        self._weights: List[float] = []
+        self._healthy: List[bool] = []
+        self._failures: List[int] = []
+        self._traffic: Dict[str, tuple] = {}
+        self._health_source = None
+        self._member_switch = None
+        self._stats_client = None
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(
+        self,
+        members: List[Dict[str, Any]],
+        weights: List[float],
+        health_source: Callable[[str], Dict[str, Any]],
+        member_switch: Optional[Callable[[int, bool], bool]] = None,
+        stats_client=None,
+    ):
+        """Start watching `members`; stops any earlier run first."""
+        self.stop()
+        with self._lock:
+            self._members = list(members)
+            self._weights = list(weights)
+            self._healthy = [True] * len(members)
+            self._failures = [0] * len(members)
+            self._traffic = {}
+            self._health_source = health_source
+            self._member_switch = member_switch
+            self._stats_client = stats_client
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+        self.log(
+            f"Load balancing over {len(members)} servers: "
+            + ", ".join(
+                f"{m.get('name', '?')} {w:.0%}" for m, w in zip(members, weights)
+            ),
+            LogLevel.INFO,
+        )
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout=2)
+        self._thread = None
+        if self._stats_client:
+            self._stats_client.close()
+            self._stats_client = None
+
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def _loop(self):
+        while not self._stop_event.wait(LOAD_BALANCER_MONITOR_INTERVAL):
+            try:
+                self.check()
+            except Exception as e:
+                self.log(f"Load balancer check failed: {e}", LogLevel.DEBUG)
+
+    def check(self):
+        """One pass over the members' health and traffic."""
+        with self._lock:
+            members = list(enumerate(self._members))
+            health_source = self._health_source
+        for index, member in members:
+            healthy = self._failure_count(index, member, health_source) < (
+                FAILOVER_FAILURE_THRESHOLD
+            )
+            if healthy == self._healthy[index]:
+                continue
+            self._healthy[index] = healthy
+            if self._member_switch:
+                self._member_switch(index, healthy)
+            self.log(
+                f"Load balancer member {member.get('name', index)} "
+                + ("is back" if healthy else "failed, its share moves to the others"),
+                LogLevel.INFO if healthy else LogLevel.WARNING,
+            )
+
+        snapshot = self._stats_client.read_traffic() if self._stats_client else None
+        if snapshot is not None:
+            with self._lock:
+                self._traffic = dict(snapshot.outbounds)
+
+    def _failure_count(self, index, member, health_source) -> int:
+        """Consecutive failures of member `index`.
+
+        The health checker does not sweep servers while a balancer runs, so
+        members are probed through the core when the stats client supports
+        it; the health stats are only the fallback.
+        """
+        client = self._stats_client
+        if client is not None and hasattr(client, "outbound_delay"):
+            tag = member_tag(index)
+            latency = get_probe_bus().probe(
+                "outbound",
+                tag,
+                lambda: client.outbound_delay(
+                    tag, URL_TEST_DEFAULT_URL, FAILOVER_PROBE_TIMEOUT
+                ),
+            )
+            self._failures[index] = 0 if latency >= 0 else self._failures[index] + 1
+            return self._failures[index]
+        stats = (health_source(member.get("id", "")) if health_source else {}) or {}
+        return stats.get("failures", 0)
+
+    def get_members(self) -> List[Dict[str, Any]]:
+        """Name, weight, health and current traffic of each member."""
+        with self._lock:
+            result = []
+            for index, member in enumerate(self._members):
+                # Traffic is keyed by the member outbound that carried it
+                upload, download = self._traffic.get(member_tag(index), (0, 0))
+                result.append(
+                    {
+                        "name": member.get("name", ""),
+                        "id": member.get("id", ""),
+                        "weight": self._weights[index],
+                        "healthy": self._healthy[index],
+                        "upload": upload,
+                        "download": download,
+                    }
+                )
+            return result
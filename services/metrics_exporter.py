@@ -0,0 +1,150 @@
+"""
+Metrics Exporter for Onix
+Serves the metrics registry as OpenMetrics text on a local HTTP endpoint
+"""
+
+import math
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Optional
+
+from constants import LogLevel, METRICS_EXPORTER_PORT, PROXY_HOST
+from utils.metrics import MetricsRegistry, TrackedExecutor, get_metrics_registry
+
+CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(label_key, extra: Optional[Dict[str, str]] = None) -> str:
+    pairs = list(label_key) + list((extra or {}).items())
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(str(v))}"' for k, v in pairs) + "}"
+
+
+def _number(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def render_openmetrics(registry: MetricsRegistry) -> str:
+    """Render every metric family in the OpenMetrics text format."""
+    lines = []
+    for name, kind, help_text, metrics in registry.collect():
+        # OpenMetrics names the counter family without its `_total` sample suffix
+        family = name[: -len("_total")] if kind == "counter" else name
+        if help_text:
+            lines.append(f"# HELP {family} {_escape(help_text)}")
+        lines.append(f"# TYPE {family} {kind}")
+
+        for label_key, metric in metrics:
+            if kind == "counter":
+                lines.append(
+                    f"{family}_total{_labels(label_key)} {_number(metric.value)}"
+                )
+            elif kind == "gauge":
+                lines.append(f"{family}{_labels(label_key)} {_number(metric.value)}")
+            else:
+                bounds = list(metric.buckets)
+                for bound, count in zip(bounds, metric.cumulative_counts(bounds)):
+                    le = _labels(label_key, {"le": _number(bound)})
+                    lines.append(f"{family}_bucket{le} {count}")
+                le = _labels(label_key, {"le": "+Inf"})
+                lines.append(f"{family}_bucket{le} {metric.count}")
+                lines.append(f"{family}_count{_labels(label_key)} {metric.count}")
+                lines.append(f"{family}_sum{_labels(label_key)} {_number(metric.sum)}")
+    lines.append("# EOF")
+    return "\n".join(lines) + "\n"
+
+
+class MetricsExporter:
+    """Opt-in HTTP endpoint (`/metrics`) that monitoring systems can scrape."""
+
+    def __init__(
+        self,
+        log_callback: Callable[[str, LogLevel], None],
+        registry: Optional[MetricsRegistry] = None,
+        host: str = PROXY_HOST,
+        port: int = METRICS_EXPORTER_PORT,
+    ):
+        self.log = log_callback
+        self.registry = registry or get_metrics_registry()
+        self.host = host
+        self.port = port
+        self._server = None
+        self._thread = None
+        self._executors: Dict[str, TrackedExecutor] = {}
+
+    def watch_executor(self, name: str, executor: TrackedExecutor):
+        """Report the unfinished tasks of a thread pool on every scrape."""
+        self._executors[name] = executor
+
+    def _refresh_process_gauges(self):
+        self.registry.gauge("onix_threads", "Live Python threads").set(
+            threading.active_count()
+        )
+        for name, executor in self._executors.items():
+            self.registry.gauge(
+                "onix_executor_pending_tasks",
+                "Tasks submitted and not yet finished",
+                {"pool": name},
+            ).set(executor.pending)
+
+    def render(self) -> str:
+        self._refresh_process_gauges()
+        return render_openmetrics(self.registry)
+
+    def start(self) -> bool:
+        if self._server:
+            return True
+
+        exporter = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = exporter.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        try:
+            self._server = ThreadingHTTPServer((self.host, self.port), MetricsHandler)
+        except OSError as e:
+            self.log(
+                f"Metrics exporter could not bind port {self.port}: {e}", LogLevel.ERROR
+            )
+            return False
+
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        self.log(
+            f"Metrics exporter listening on http://{self.host}:{self.port}/metrics",
+            LogLevel.INFO,
+        )
+        return True
+
+    def stop(self):
+        if not self._server:
+            return
+        self._server.shutdown()
+        self._server.server_close()
+        self._server = None
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=2)
+        self.log("Metrics exporter stopped", LogLevel.INFO)
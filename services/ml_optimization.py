@@ -3,14 +3,23 @@ Machine Learning Optimization Service
 سرویس بهینه‌سازی مبتنی بر یادگیری ماشین
 """
 
+import json
+import os
 import threading
 import time
 import numpy as np
 from typing import Dict, Any, List, Optional, Callable, Tuple
 from dataclasses import dataclass
-from collections import deque, defaultdict
-from constants import LogLevel
-import random
+from collections import deque
+from constants import (
+    ML_FEATURES,
+    ML_MIN_TRAINING_SAMPLES,
+    ML_MODELS_FILE,
+    ML_RLS_FORGETTING,
+    ML_RLS_INITIAL_COVARIANCE,
+    ML_TRAINING_CAPACITY,
+    LogLevel,
+)
 
 
 @dataclass
@@ -29,20 +38,6 @@ class MLModel:
             self.predictions = {}
 
 
-@dataclass
-class TrainingData:
-    """داده‌های آموزش"""
-
-    timestamp: float
-    features: Dict[str, float]
-    target: float
-    metadata: Dict[str, Any] = None
-
-    def __post_init__(self):
-        if self.metadata is None:
-            self.metadata = {}
-
-
 @dataclass
 class PredictionResult:
     """نتیجه پیش‌بینی"""
@@ -54,41 +49,95 @@ class PredictionResult:
     features_used: List[str]
 
 
+class RollingStats:
+    """آمار پنجره لغزان با هزینه O(1) برای هر درج (Welford + صف یکنوا)"""
+
+    def __init__(self, window: int = 1000):
+        self.window = window
+        self._values = np.zeros(window)
+        self._seq = 0  # تعداد کل نقاط دیده‌شده
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self._min_queue: deque = deque()  # (seq, value) صعودی
+        self._max_queue: deque = deque()  # (seq, value) نزولی
+
+    def add(self, value: float):
+        """افزودن مقدار و حذف قدیمی‌ترین مقدار خارج از پنجره"""
+        value = float(value)
+        slot = self._seq % self.window
+
+        if self.count < self.window:
+            self.count += 1
+            delta = value - self.mean
+            self.mean += delta / self.count
+            self._m2 += delta * (value - self.mean)
+        else:
+            old = self._values[slot]
+            old_mean = self.mean
+            self.mean += (value - old) / self.count
+            self._m2 += (value - old) * (value - self.mean + old - old_mean)
+            if self._m2 < 0:
+                self._m2 = 0.0
+
+        self._values[slot] = value
+
+        while self._min_queue and self._min_queue[-1][1] >= value:
+            self._min_queue.pop()
+        self._min_queue.append((self._seq, value))
+        while self._max_queue and self._max_queue[-1][1] <= value:
+            self._max_queue.pop()
+        self._max_queue.append((self._seq, value))
+
+        oldest = self._seq - self.window
+        if self._min_queue[0][0] <= oldest:
+            self._min_queue.popleft()
+        if self._max_queue[0][0] <= oldest:
+            self._max_queue.popleft()
+
+        self._seq += 1
+
+    @property
+    def std(self) -> float:
+        return float(np.sqrt(self._m2 / self.count)) if self.count else 0.0
+
+    @property
+    def min(self) -> float:
+        return self._min_queue[0][1] if self._min_queue else 0.0
+
+    @property
+    def max(self) -> float:
+        return self._max_queue[0][1] if self._max_queue else 0.0
+
+    def to_dict(self) -> Dict[str, float]:
+        return {"mean": self.mean, "std": self.std, "min": self.min, "max": self.max}
+
+
 class AnomalyDetector:
     """تشخیص ناهنجاری"""
 
-    def __init__(self):
-        self.data_history = deque(maxlen=1000)
+    def __init__(self, window: int = 1000):
+        self.window = window
         self.threshold_multiplier = 2.0
         self.is_trained = False
-        self.stats = {}
+        self.stats: Dict[str, RollingStats] = {}
+        self._points = 0
 
     def add_data_point(self, features: Dict[str, float]):
         """اضافه کردن نقطه داده"""
-        self.data_history.append(
-            {"timestamp": time.time(), "features": features.copy()}
-        )
-
-        # به‌روزرسانی آمار
-        self._update_stats()
-
-    def _update_stats(self):
-        """به‌روزرسانی آمار"""
-        if len(self.data_history) < 10:
-            return
-
-        # محاسبه آمار برای هر ویژگی
-        for feature_name in self.data_history[0]["features"].keys():
-            values = [point["features"][feature_name] for point in self.data_history]
+        for feature_name, value in features.items():
+            feature_stats = self.stats.get(feature_name)
+            if feature_stats is None:
+                feature_stats = self.stats[feature_name] = RollingStats(self.window)
+            feature_stats.add(value)
 
-            self.stats[feature_name] = {
-                "mean": np.mean(values),
-                "std": np.std(values),
-                "min": np.min(values),
-                "max": np.max(values),
-            }
+        self._points += 1
+        if self._points >= 10:
+            self.is_trained = True
 
-        self.is_trained = True
+    def get_stats(self) -> Dict[str, Dict[str, float]]:
+        """دریافت آمار هر ویژگی"""
+        return {name: stats.to_dict() for name, stats in self.stats.items()}
 
     def detect_anomaly(
         self, features: Dict[str, float]
@@ -105,13 +154,13 @@ class AnomalyDetector:
                 continue
 
             stats = self.stats[feature_name]
-            z_score = abs((value - stats["mean"]) / (stats["std"] + 1e-8))
+            z_score = abs((value - stats.mean) / (stats.std + 1e-8))
 
             if z_score > self.threshold_multiplier:
                 anomaly_score += z_score
                 anomalies[feature_name] = {
                     "value": value,
-                    "expected_mean": stats["mean"],
+                    "expected_mean": stats.mean,
                     "z_score": z_score,
                     "is_anomaly": True,
                 }
@@ -122,217 +171,569 @@ class AnomalyDetector:
         return is_anomaly, confidence, anomalies
 
 
-class PerformancePredictor:
-    """پیش‌بین عملکرد"""
+class _TrainingBuffer:
+    """داده‌های آموزش در آرایه‌های از پیش تخصیص‌یافته (بافر حلقوی)"""
 
-    def __init__(self):
-        self.models = {}
-        self.training_data = deque(maxlen=5000)
-        self.is_training = False
+    def __init__(self, capacity: int, width: int):
+        self.capacity = capacity
+        self._features = np.zeros((capacity, width))
+        self._targets = np.zeros(capacity)
+        self._next = 0
+        self._count = 0
 
-    def add_training_data(
-        self, features: Dict[str, float], target: float, metadata: Dict[str, Any] = None
-    ):
-        """اضافه کردن داده آموزش"""
-        self.training_data.append(
-            TrainingData(
-                timestamp=time.time(),
-                features=features.copy(),
-                target=target,
-                metadata=metadata or {},
-            )
-        )
+    def __len__(self) -> int:
+        return self._count
 
-    def train_model(self, model_name: str, model_type: str = "linear") -> MLModel:
-        """آموزش مدل"""
-        if len(self.training_data) < 10:
-            return None
+    def append(self, features: np.ndarray, target: float):
+        self._features[self._next] = features
+        self._targets[self._next] = target
+        self._next = (self._next + 1) % self.capacity
+        self._count = min(self._count + 1, self.capacity)
 
-        self.is_training = True
+    def arrays(self) -> Tuple[np.ndarray, np.ndarray]:
+        """ویژگی‌ها و هدف‌ها به ترتیب زمانی (قدیمی‌ترین اول)"""
+        if self._count < self.capacity:
+            return self._features[: self._count], self._targets[: self._count]
+        order = np.roll(np.arange(self.capacity), -self._next)
+        return self._features[order], self._targets[order]
 
-        try:
-            # آماده‌سازی داده‌ها
-            X = []
-            y = []
-            feature_names = []
-
-            for data in self.training_data:
-                features = list(data.features.values())
-                X.append(features)
-                y.append(data.target)
-
-            if not feature_names:
-                feature_names = list(self.training_data[0].features.keys())
-
-            X = np.array(X)
-            y = np.array(y)
-
-            # آموزش مدل ساده
-            if model_type == "linear":
-                model = self._train_linear_model(X, y)
-            elif model_type == "polynomial":
-                model = self._train_polynomial_model(X, y)
-            else:
-                model = self._train_simple_model(X, y)
-
-            # ایجاد مدل
-            ml_model = MLModel(
-                name=model_name,
-                model_type=model_type,
-                accuracy=model.get("accuracy", 0.8),
-                last_trained=time.time(),
-                features=feature_names,
-                predictions=model,
-            )
+    def clear(self):
+        self._next = 0
+        self._count = 0
 
-            self.models[model_name] = ml_model
-            print(
-                f"[{LogLevel.INFO}] Model trained: {model_name} (accuracy: {ml_model.accuracy:.3f})"
-            )
 
-            return ml_model
+class _RecursiveLeastSquares:
+    """رگرسیون حداقل مربعات بازگشتی با ضریب فراموشی
 
-        except Exception as e:
-            print(f"[{LogLevel.ERROR}] Model training failed: {e}")
-            return None
-        finally:
-            self.is_training = False
+    هر نمونه جدید ضرایب را در O(k²) به‌روز می‌کند (k تعداد جملات مدل)؛
+    ویژگی‌ها با میانگین و انحراف معیار زمان ساخت مدل نرمال می‌شوند.
+    """
 
-    def _train_linear_model(self, X: np.ndarray, y: np.ndarray) -> Dict[str, Any]:
-        """آموزش مدل خطی"""
-        # رگرسیون خطی ساده
-        X_with_bias = np.column_stack([np.ones(X.shape[0]), X])
-        coefficients = np.linalg.lstsq(X_with_bias, y, rcond=None)[0]
+    def __init__(
+        self,
+        model_type: str,
+        offset: np.ndarray,
+        scale: np.ndarray,
+        forgetting: float = ML_RLS_FORGETTING,
+    ):
+        self.model_type = model_type
+        self.offset = offset
+        self.scale = scale
+        self.forgetting = forgetting
+        size = len(self._design(offset[None, :])[0])
+        self.theta = np.zeros(size)
+        self.covariance = np.eye(size) * ML_RLS_INITIAL_COVARIANCE
+        self.samples = 0
+        # مجموع‌های وزن‌دار برای دقت (R²) روی خطای پیش از به‌روزرسانی
+        self._weight = 0.0
+        self._target_sum = 0.0
+        self._target_sq_sum = 0.0
+        self._error_sq_sum = 0.0
+
+    def _design(self, features: np.ndarray) -> np.ndarray:
+        """ماتریس طراحی: بایاس، ویژگی‌ها و برای چندجمله‌ای مربع آن‌ها"""
+        bias = np.ones((len(features), 1))
+        if self.model_type == "linear":
+            scaled = (features - self.offset) / self.scale
+            return np.hstack([bias, scaled])
+        if self.model_type == "polynomial":
+            scaled = (features - self.offset) / self.scale
+            return np.hstack([bias, scaled, scaled**2])
+        return bias
+
+    def fit(self, features: np.ndarray, targets: np.ndarray):
+        """همان نتیجه به‌روزرسانی تک‌تک نمونه‌ها، با یک حل دسته‌ای"""
+        design = self._design(features)
+        n = len(targets)
+        weights = self.forgetting ** np.arange(n - 1, -1, -1, dtype=np.float64)
+        prior = self.forgetting**n / ML_RLS_INITIAL_COVARIANCE
+        gram = (design * weights[:, None]).T @ design + prior * np.eye(design.shape[1])
+        self.covariance = np.linalg.inv(gram)
+        self.theta = self.covariance @ ((design * weights[:, None]).T @ targets)
+        errors = targets - design @ self.theta
+        self.samples = n
+        self._weight = weights.sum()
+        self._target_sum = weights @ targets
+        self._target_sq_sum = weights @ (targets * targets)
+        self._error_sq_sum = weights @ (errors * errors)
+
+    def update(self, features: np.ndarray, target: float):
+        phi = self._design(features[None, :])[0]
+        error = target - phi @ self.theta
+        p_phi = self.covariance @ phi
+        gain = p_phi / (self.forgetting + phi @ p_phi)
+        self.theta += gain * error
+        covariance = (self.covariance - np.outer(gain, p_phi)) / self.forgetting
+        # جلوگیری از انباشت خطای گرد کردن در تقارن ماتریس
+        self.covariance = (covariance + covariance.T) / 2
+        self.samples += 1
+        decay = self.forgetting
+        self._weight = decay * self._weight + 1
+        self._target_sum = decay * self._target_sum + target
+        self._target_sq_sum = decay * self._target_sq_sum + target * target
+        self._error_sq_sum = decay * self._error_sq_sum + error * error
+
+    def predict(self, features: np.ndarray) -> np.ndarray:
+        return self._design(features) @ self.theta
+
+    @property
+    def mse(self) -> float:
+        return self._error_sq_sum / self._weight if self._weight else 0.0
+
+    @property
+    def accuracy(self) -> float:
+        if not self._weight:
+            return 0.0
+        mean = self._target_sum / self._weight
+        variance = self._target_sq_sum / self._weight - mean * mean
+        if variance <= 1e-12:
+            return 1.0 if self.mse <= 1e-12 else 0.0
+        return float(max(0.0, 1 - self.mse / variance))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "model_type": self.model_type,
+            "offset": self.offset.tolist(),
+            "scale": self.scale.tolist(),
+            "forgetting": self.forgetting,
+            "theta": self.theta.tolist(),
+            "covariance": self.covariance.tolist(),
+            "samples": self.samples,
+            "sums": [
+                self._weight,
+                self._target_sum,
+                self._target_sq_sum,
+                self._error_sq_sum,
+            ],
+        }
 
-        # محاسبه دقت
-        predictions = X_with_bias @ coefficients
-        mse = np.mean((y - predictions) ** 2)
-        accuracy = max(0, 1 - mse / np.var(y))
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "_RecursiveLeastSquares":
+        learner = cls(
+            data["model_type"],
+            np.array(data["offset"], dtype=np.float64),
+            np.array(data["scale"], dtype=np.float64),
+            data["forgetting"],
+        )
+        learner.theta = np.array(data["theta"], dtype=np.float64)
+        learner.covariance = np.array(data["covariance"], dtype=np.float64)
+        learner.samples = data["samples"]
+        (
+            learner._weight,
+            learner._target_sum,
+            learner._target_sq_sum,
+            learner._error_sq_sum,
+        ) = data["sums"]
+        return learner
 
-        return {"coefficients": coefficients.tolist(), "accuracy": accuracy, "mse": mse}
 
-    def _train_polynomial_model(self, X: np.ndarray, y: np.ndarray) -> Dict[str, Any]:
-        """آموزش مدل چندجمله‌ای"""
-        # درجه 2 چندجمله‌ای
-        X_poly = np.column_stack([X, X**2])
-        X_with_bias = np.column_stack([np.ones(X_poly.shape[0]), X_poly])
+class PerformancePredictor:
+    """پیش‌بین عملکرد
 
-        coefficients = np.linalg.lstsq(X_with_bias, y, rcond=None)[0]
+    ویژگی‌ها با ترتیب ثابت `feature_names` خوانده می‌شوند. هر مدل پس از
+    ساخت با هر نمونه جدید به‌صورت آنلاین (RLS) به‌روز می‌شود و
+    train_model فقط برای مدل جدید یک برازش دسته‌ای انجام می‌دهد.
+    """
 
-        # محاسبه دقت
-        predictions = X_with_bias @ coefficients
-        mse = np.mean((y - predictions) ** 2)
-        accuracy = max(0, 1 - mse / np.var(y))
+    MODEL_TYPES = ("linear", "polynomial", "simple")
 
-        return {
-            "coefficients": coefficients.tolist(),
-            "accuracy": accuracy,
-            "mse": mse,
-            "degree": 2,
-        }
+    def __init__(self, feature_names: Tuple[str, ...] = ML_FEATURES):
+        self.feature_names = tuple(feature_names)
+        self.models: Dict[str, MLModel] = {}
+        self.training_data = _TrainingBuffer(
+            ML_TRAINING_CAPACITY, len(self.feature_names)
+        )
+        self.is_training = False
+        self._learners: Dict[str, _RecursiveLeastSquares] = {}
+        self._lock = threading.RLock()
+
+    def _vector(self, features: Dict[str, float]) -> np.ndarray:
+        """ویژگی‌ها به ترتیب طرح ثابت؛ ویژگی ناموجود صفر است"""
+        return np.array([float(features.get(name, 0.0)) for name in self.feature_names])
+
+    def _matrix(self, rows) -> np.ndarray:
+        if isinstance(rows, np.ndarray):
+            return rows.reshape(-1, len(self.feature_names)).astype(np.float64)
+        return np.array([self._vector(row) for row in rows]).reshape(
+            -1, len(self.feature_names)
+        )
+
+    def add_training_data(
+        self, features: Dict[str, float], target: float, metadata: Dict[str, Any] = None
+    ):
+        """اضافه کردن داده آموزش و به‌روزرسانی آنلاین مدل‌ها"""
+        vector = self._vector(features)
+        target = float(target)
+        with self._lock:
+            self.training_data.append(vector, target)
+            for name in list(self._learners):
+                model = self.models.get(name)
+                if model is None:
+                    # مدل از بیرون حذف شده است
+                    del self._learners[name]
+                    continue
+                learner = self._learners[name]
+                learner.update(vector, target)
+                model.accuracy = learner.accuracy
 
-    def _train_simple_model(self, X: np.ndarray, y: np.ndarray) -> Dict[str, Any]:
-        """آموزش مدل ساده (میانگین)"""
-        mean_value = np.mean(y)
-        std_value = np.std(y)
+    def train_model(self, model_name: str, model_type: str = "linear") -> MLModel:
+        """آموزش مدل
+
+        مدل موجود با همان نوع از قبل با هر نمونه به‌روز شده و دوباره
+        برازش نمی‌شود.
+        """
+        if model_type not in self.MODEL_TYPES:
+            model_type = "simple"
+
+        with self._lock:
+            learner = self._learners.get(model_name)
+            if (
+                learner is None
+                or learner.model_type != model_type
+                or model_name not in self.models
+            ):
+                if len(self.training_data) < ML_MIN_TRAINING_SAMPLES:
+                    return None
+                self.is_training = True
+                try:
+                    features, targets = self.training_data.arrays()
+                    scale = features.std(axis=0)
+                    scale[scale == 0] = 1.0
+                    learner = _RecursiveLeastSquares(
+                        model_type, features.mean(axis=0), scale
+                    )
+                    learner.fit(features, targets)
+                except Exception as e:
+                    print(f"[{LogLevel.ERROR}] Model training failed: {e}")
+                    return None
+                finally:
+                    self.is_training = False
+                self._learners[model_name] = learner
 
-        # محاسبه دقت
-        predictions = np.full_like(y, mean_value)
-        mse = np.mean((y - predictions) ** 2)
-        accuracy = max(0, 1 - mse / np.var(y))
+            ml_model = MLModel(
+                name=model_name,
+                model_type=model_type,
+                accuracy=learner.accuracy,
+                last_trained=time.time(),
+                features=list(self.feature_names),
+                predictions={
+                    "coefficients": learner.theta.tolist(),
+                    "accuracy": learner.accuracy,
+                    "mse": learner.mse,
+                    "samples": learner.samples,
+                },
+            )
+            self.models[model_name] = ml_model
 
-        return {"mean": mean_value, "std": std_value, "accuracy": accuracy, "mse": mse}
+        print(
+            f"[{LogLevel.INFO}] Model trained: {model_name} (accuracy: {ml_model.accuracy:.3f})"
+        )
+        return ml_model
 
     def predict(
         self, model_name: str, features: Dict[str, float]
     ) -> Optional[PredictionResult]:
         """پیش‌بینی با مدل"""
-        if model_name not in self.models:
+        predictions = self.predict_batch(model_name, [features])
+        if predictions is None:
             return None
 
         model = self.models[model_name]
+        return PredictionResult(
+            model_name=model_name,
+            prediction=float(predictions[0]),
+            confidence=min(1.0, model.accuracy),
+            timestamp=time.time(),
+            features_used=model.features,
+        )
 
+    def predict_batch(self, model_name: str, rows) -> Optional[np.ndarray]:
+        """پیش‌بینی یک‌جا برای چند ردیف (مثلاً همه سرورها)
+
+        `rows` آرایه‌ای با ستون‌هایی به ترتیب `feature_names` یا فهرستی
+        از دیکشنری‌های ویژگی است.
+        """
+        with self._lock:
+            learner = self._learners.get(model_name)
+            if learner is None or model_name not in self.models:
+                return None
+            try:
+                return learner.predict(self._matrix(rows))
+            except Exception as e:
+                print(f"[{LogLevel.ERROR}] Prediction failed: {e}")
+                return None
+
+    def save(self, path: str) -> bool:
+        """ذخیره وضعیت مدل‌ها روی دیسک"""
+        with self._lock:
+            data = {
+                "features": list(self.feature_names),
+                "models": {
+                    name: {
+                        "last_trained": model.last_trained,
+                        "learner": self._learners[name].to_dict(),
+                    }
+                    for name, model in self.models.items()
+                    if name in self._learners
+                },
+            }
         try:
-            # آماده‌سازی ویژگی‌ها
-            feature_values = [features.get(f, 0.0) for f in model.features]
-
-            if model.model_type == "linear":
-                prediction = self._predict_linear(model.predictions, feature_values)
-            elif model.model_type == "polynomial":
-                prediction = self._predict_polynomial(model.predictions, feature_values)
-            else:
-                prediction = self._predict_simple(model.predictions, feature_values)
-
-            # محاسبه اعتماد
-            confidence = min(1.0, model.accuracy)
-
-            return PredictionResult(
-                model_name=model_name,
-                prediction=prediction,
-                confidence=confidence,
-                timestamp=time.time(),
-                features_used=model.features,
-            )
-
-        except Exception as e:
-            print(f"[{LogLevel.ERROR}] Prediction failed: {e}")
-            return None
-
-    def _predict_linear(
-        self, model_data: Dict[str, Any], features: List[float]
-    ) -> float:
-        """پیش‌بینی خطی"""
-        coefficients = model_data["coefficients"]
-        X_with_bias = [1.0] + features
-        return sum(c * x for c, x in zip(coefficients, X_with_bias))
-
-    def _predict_polynomial(
-        self, model_data: Dict[str, Any], features: List[float]
-    ) -> float:
-        """پیش‌بینی چندجمله‌ای"""
-        coefficients = model_data["coefficients"]
-        X_poly = features + [f**2 for f in features]
-        X_with_bias = [1.0] + X_poly
-        return sum(c * x for c, x in zip(coefficients, X_with_bias))
-
-    def _predict_simple(
-        self, model_data: Dict[str, Any], features: List[float]
-    ) -> float:
-        """پیش‌بینی ساده"""
-        return model_data["mean"]
+            temp_path = f"{path}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(temp_path, path)
+            return True
+        except OSError as e:
+            print(f"[{LogLevel.ERROR}] Failed to save models: {e}")
+            return False
+
+    def load(self, path: str) -> int:
+        """بارگذاری مدل‌های ذخیره‌شده؛ تعداد مدل‌های بارگذاری‌شده را برمی‌گرداند"""
+        if not os.path.exists(path):
+            return 0
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            if tuple(data.get("features", ())) != self.feature_names:
+                print(
+                    f"[{LogLevel.WARNING}] Saved models use other features, ignoring them"
+                )
+                return 0
+            with self._lock:
+                for name, saved in data.get("models", {}).items():
+                    learner = _RecursiveLeastSquares.from_dict(saved["learner"])
+                    self._learners[name] = learner
+                    self.models[name] = MLModel(
+                        name=name,
+                        model_type=learner.model_type,
+                        accuracy=learner.accuracy,
+                        last_trained=saved.get("last_trained", 0.0),
+                        features=list(self.feature_names),
+                        predictions={
+                            "coefficients": learner.theta.tolist(),
+                            "accuracy": learner.accuracy,
+                            "mse": learner.mse,
+                            "samples": learner.samples,
+                        },
+                    )
+            return len(data.get("models", {}))
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"[{LogLevel.ERROR}] Failed to load models: {e}")
+            return 0
+
+
+class _BucketStats:
+    """تعداد، مجموع، مجموع مربعات و بیشینه هر سطل زمانی (ساعت یا روز هفته)
+
+    ستون‌ها: پهنای باند و تعداد اتصالات. بیشینه پهنای باند هر سطل با یک صف
+    یکنوا نگه داشته می‌شود تا حذف قدیمی‌ترین نقطه هم O(1) باشد.
+    """
+
+    def __init__(self, buckets: int, columns: int = 2):
+        self.count = np.zeros(buckets, dtype=np.int64)
+        self.sum = np.zeros((buckets, columns))
+        self.sum_sq = np.zeros((buckets, columns))
+        self._max: List[deque] = [deque() for _ in range(buckets)]
+
+    def add(self, bucket: int, seq: int, values: Tuple[float, ...]):
+        self.count[bucket] += 1
+        row_sum, row_sq = self.sum[bucket], self.sum_sq[bucket]
+        for i, value in enumerate(values):
+            row_sum[i] += value
+            row_sq[i] += value * value
+        queue = self._max[bucket]
+        while queue and queue[-1][1] <= values[0]:
+            queue.pop()
+        queue.append((seq, values[0]))
+
+    def remove(self, bucket: int, seq: int, values: Tuple[float, ...]):
+        self.count[bucket] -= 1
+        if self.count[bucket] == 0:
+            # صفر کردن خطای گرد کردن انباشته در سطل خالی
+            self.sum[bucket] = 0.0
+            self.sum_sq[bucket] = 0.0
+        else:
+            row_sum, row_sq = self.sum[bucket], self.sum_sq[bucket]
+            for i, value in enumerate(values):
+                row_sum[i] -= value
+                row_sq[i] -= value * value
+        queue = self._max[bucket]
+        if queue and queue[0][0] == seq:
+            queue.popleft()
+
+    def means(self) -> np.ndarray:
+        counts = np.maximum(self.count, 1)[:, None]
+        return self.sum / counts
+
+    def stds(self) -> np.ndarray:
+        counts = np.maximum(self.count, 1)[:, None]
+        means = self.sum / counts
+        return np.sqrt(np.maximum(self.sum_sq / counts - means * means, 0.0))
+
+    def maxima(self) -> List[float]:
+        return [queue[0][1] if queue else 0.0 for queue in self._max]
+
+    def profile(self) -> List[Dict[str, float]]:
+        """خلاصه هر سطل: تعداد نمونه، میانگین، انحراف معیار و بیشینه"""
+        means, stds, maxima = self.means(), self.stds(), self.maxima()
+        return [
+            {
+                "samples": int(self.count[bucket]),
+                "avg_bandwidth": float(means[bucket, 0]),
+                "bandwidth_std": float(stds[bucket, 0]),
+                "max_bandwidth": float(maxima[bucket]),
+                "avg_connections": float(means[bucket, 1]),
+            }
+            for bucket in range(len(self.count))
+        ]
 
 
 class TrafficAnalyzer:
-    """تحلیلگر ترافیک ML"""
+    """تحلیلگر ترافیک ML
 
-    def __init__(self):
+    آمار پنجره، تجمیع‌های ساعت روز و روز هفته، مجموع‌های رگرسیون روند و
+    نقاط ناهنجار هنگام درج به‌روز می‌شوند، پس analyze_patterns فقط از
+    مرتبه تعداد سطل‌هاست و می‌تواند در هر تیک رابط کاربری اجرا شود.
+    """
+
+    def __init__(self, window: int = 10000):
+        self.window = window
         self.patterns = {}
-        self.traffic_history = deque(maxlen=10000)
         self.is_analyzing = False
-
-    def add_traffic_data(self, data: Dict[str, Any]):
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        # (seq, hour, weekday, bandwidth, connections, timestamp) هر نقطه پنجره
+        self._points: deque = deque()
+        self._seq = 0
+        self._bandwidth = RollingStats(self.window)
+        self._connections = RollingStats(self.window)
+        self._hourly = _BucketStats(24)
+        self._daily = _BucketStats(7)
+        # مجموع i·y برای روند، با i = 0 برای قدیمی‌ترین نقطه
+        self._trend_sum = 0.0
+        self._trend_ix = 0.0
+        # (seq, anomaly) نقاطی که هنگام درج بیش از 2 انحراف معیار دور بودند
+        self._anomalies: deque = deque()
+        self._bucket_range = (0.0, 0.0)
+        self._bucket = (0, 0)
+
+    def clear(self):
+        """پاک کردن تاریخچه و همه تجمیع‌ها"""
+        with self._lock:
+            self._reset()
+
+    @property
+    def data_points(self) -> int:
+        """تعداد نقاط پنجره"""
+        return len(self._points)
+
+    @property
+    def traffic_history(self) -> List[Dict[str, Any]]:
+        """نقاط پنجره به ترتیب زمان، به همان شکل add_traffic_data"""
+        with self._lock:
+            return [
+                {
+                    "timestamp": timestamp,
+                    "data": {"bandwidth": bandwidth, "connections": connections},
+                }
+                for _, _, _, bandwidth, connections, timestamp in self._points
+            ]
+
+    def _time_buckets(self, timestamp: float) -> Tuple[int, int]:
+        """ساعت روز و روز هفته؛ localtime فقط یک بار در هر ساعت صدا زده می‌شود"""
+        start, end = self._bucket_range
+        if not start <= timestamp < end:
+            local = time.localtime(timestamp)
+            start = timestamp - (timestamp % 1) - local.tm_min * 60 - local.tm_sec
+            self._bucket_range = (start, start + 3600)
+            self._bucket = (local.tm_hour, local.tm_wday)
+        return self._bucket
+
+    def add_traffic_data(self, data: Dict[str, Any], timestamp: float = None):
         """اضافه کردن داده ترافیک"""
-        self.traffic_history.append({"timestamp": time.time(), "data": data.copy()})
+        if timestamp is None:
+            timestamp = time.time()
+        bandwidth = float(data.get("bandwidth", 0) or 0)
+        connections = float(data.get("connections", 0) or 0)
+        with self._lock:
+            if len(self._points) == self.window:
+                self._evict_oldest()
+
+            self._check_anomaly(timestamp, bandwidth)
+            hour, weekday = self._time_buckets(timestamp)
+            seq = self._seq
+            self._seq += 1
+            values = (bandwidth, connections)
+            self._points.append((seq, hour, weekday, bandwidth, connections, timestamp))
+            self._bandwidth.add(bandwidth)
+            self._connections.add(connections)
+            self._hourly.add(hour, seq, values)
+            self._daily.add(weekday, seq, values)
+            self._trend_ix += (len(self._points) - 1) * bandwidth
+            self._trend_sum += bandwidth
+            if seq % self.window == self.window - 1:
+                self._resum_trend()
+
+    def _evict_oldest(self):
+        seq, hour, weekday, bandwidth, connections, _ = self._points.popleft()
+        values = (bandwidth, connections)
+        self._hourly.remove(hour, seq, values)
+        self._daily.remove(weekday, seq, values)
+        # حذف قدیمی‌ترین نقطه اندیس بقیه را یکی کم می‌کند
+        self._trend_ix -= self._trend_sum - bandwidth
+        self._trend_sum -= bandwidth
+        while self._anomalies and self._anomalies[0][0] <= seq:
+            self._anomalies.popleft()
+
+    def _resum_trend(self):
+        # جلوگیری از انباشت خطای گرد کردن در مجموع‌های کاهشی
+        bandwidth = np.fromiter((point[3] for point in self._points), dtype=np.float64)
+        self._trend_sum = float(bandwidth.sum())
+        self._trend_ix = float(np.arange(len(bandwidth)) @ bandwidth)
+
+    def _check_anomaly(self, timestamp: float, bandwidth: float):
+        """مقایسه نقطه جدید با آمار پنجره پیش از آن"""
+        stats = self._bandwidth
+        if stats.count < 50:
+            return
+        std = stats.std
+        if std > 0 and abs(bandwidth - stats.mean) > 2 * std:
+            self._anomalies.append(
+                (
+                    self._seq,
+                    {
+                        "timestamp": timestamp,
+                        "bandwidth": bandwidth,
+                        "severity": abs(bandwidth - stats.mean) / std,
+                    },
+                )
+            )
 
     def analyze_patterns(self) -> Dict[str, Any]:
         """تحلیل الگوهای ترافیک"""
-        if len(self.traffic_history) < 100:
+        if len(self._points) < 100:
             return {}
 
         self.is_analyzing = True
 
         try:
-            # استخراج ویژگی‌ها
-            features = self._extract_features()
-
-            # تحلیل الگوها
-            patterns = {
-                "peak_hours": self._find_peak_hours(),
-                "bandwidth_trends": self._analyze_bandwidth_trends(),
-                "connection_patterns": self._analyze_connection_patterns(),
-                "anomaly_periods": self._find_anomaly_periods(),
-                "predictions": self._generate_predictions(features),
-            }
+            with self._lock:
+                # استخراج ویژگی‌ها
+                features = self._extract_features()
+
+                # تحلیل الگوها
+                patterns = {
+                    "peak_hours": self._find_peak_hours(),
+                    "peak_days": self._find_peak_days(),
+                    "hourly_profile": self._hourly.profile(),
+                    "weekday_profile": self._daily.profile(),
+                    "bandwidth_trends": self._analyze_bandwidth_trends(),
+                    "connection_patterns": self._analyze_connection_patterns(),
+                    "anomaly_periods": self._find_anomaly_periods(),
+                    "predictions": self._generate_predictions(features),
+                }
 
             self.patterns = patterns
             return patterns
@@ -345,140 +746,100 @@ class TrafficAnalyzer:
 
     def _extract_features(self) -> Dict[str, float]:
         """استخراج ویژگی‌ها"""
-        if not self.traffic_history:
+        if not self._points:
             return {}
 
-        # ویژگی‌های زمانی
-        timestamps = [point["timestamp"] for point in self.traffic_history]
-        hours = [time.localtime(ts).tm_hour for ts in timestamps]
-
-        # ویژگی‌های ترافیک
-        bandwidth_values = [
-            point["data"].get("bandwidth", 0) for point in self.traffic_history
-        ]
-        connection_counts = [
-            point["data"].get("connections", 0) for point in self.traffic_history
-        ]
-
+        bandwidth, connections = self._bandwidth, self._connections
         return {
-            "avg_bandwidth": np.mean(bandwidth_values) if bandwidth_values else 0,
-            "max_bandwidth": np.max(bandwidth_values) if bandwidth_values else 0,
-            "bandwidth_variance": np.var(bandwidth_values) if bandwidth_values else 0,
-            "avg_connections": np.mean(connection_counts) if connection_counts else 0,
-            "max_connections": np.max(connection_counts) if connection_counts else 0,
-            "peak_hour": max(set(hours), key=hours.count) if hours else 0,
-            "data_points": len(self.traffic_history),
+            "avg_bandwidth": bandwidth.mean,
+            "max_bandwidth": bandwidth.max,
+            "bandwidth_variance": bandwidth.std**2,
+            "avg_connections": connections.mean,
+            "max_connections": connections.max,
+            "peak_hour": int(np.argmax(self._hourly.count)),
+            "data_points": len(self._points),
         }
 
-    def _find_peak_hours(self) -> List[int]:
-        """پیدا کردن ساعات پیک"""
-        if not self.traffic_history:
-            return []
-
-        # گروه‌بندی بر اساس ساعت
-        hourly_data = defaultdict(list)
-        for point in self.traffic_history:
-            hour = time.localtime(point["timestamp"]).tm_hour
-            hourly_data[hour].append(point["data"].get("bandwidth", 0))
-
-        # محاسبه میانگین برای هر ساعت
-        hourly_avg = {}
-        for hour, values in hourly_data.items():
-            hourly_avg[hour] = np.mean(values) if values else 0
-
-        # پیدا کردن ساعات پیک (بالاتر از 80% حداکثر)
-        if not hourly_avg:
+    @staticmethod
+    def _peak_buckets(buckets: _BucketStats) -> List[int]:
+        """سطل‌هایی که میانگین پهنای باندشان دست‌کم 80% بیشترین میانگین است"""
+        present = np.flatnonzero(buckets.count)
+        if not len(present):
             return []
+        averages = buckets.means()[present, 0]
+        threshold = averages.max() * 0.8
+        return [int(bucket) for bucket in present[averages >= threshold]]
 
-        max_avg = max(hourly_avg.values())
-        threshold = max_avg * 0.8
+    def _find_peak_hours(self) -> List[int]:
+        """پیدا کردن ساعات پیک"""
+        return self._peak_buckets(self._hourly)
 
-        peak_hours = [hour for hour, avg in hourly_avg.items() if avg >= threshold]
-        return sorted(peak_hours)
+    def _find_peak_days(self) -> List[int]:
+        """پیدا کردن روزهای پیک هفته (0 = دوشنبه)"""
+        return self._peak_buckets(self._daily)
 
     def _analyze_bandwidth_trends(self) -> Dict[str, Any]:
         """تحلیل روند پهنای باند"""
-        if len(self.traffic_history) < 10:
+        n = len(self._points)
+        if n < 10:
             return {}
 
-        bandwidth_values = [
-            point["data"].get("bandwidth", 0) for point in self.traffic_history
-        ]
-
-        # محاسبه روند
-        x = np.arange(len(bandwidth_values))
-        slope, intercept = np.polyfit(x, bandwidth_values, 1)
+        # رگرسیون y روی اندیس 0..n-1 از مجموع‌های جاری
+        sum_x = n * (n - 1) / 2
+        sum_xx = (n - 1) * n * (2 * n - 1) / 6
+        sum_y = self._trend_sum
+        sum_yy = (self._bandwidth.std**2 + self._bandwidth.mean**2) * n
+        spread_x = n * sum_xx - sum_x * sum_x
+        spread_y = max(n * sum_yy - sum_y * sum_y, 0.0)
+        covariance = n * self._trend_ix - sum_x * sum_y
+        slope = covariance / spread_x
+        correlation = covariance / np.sqrt(spread_x * spread_y) if spread_y > 0 else 0.0
 
         return {
             "trend": (
                 "increasing" if slope > 0 else "decreasing" if slope < 0 else "stable"
             ),
             "slope": slope,
-            "correlation": (
-                np.corrcoef(x, bandwidth_values)[0, 1]
-                if len(bandwidth_values) > 1
-                else 0
-            ),
+            "correlation": float(np.clip(correlation, -1.0, 1.0)),
         }
 
     def _analyze_connection_patterns(self) -> Dict[str, Any]:
         """تحلیل الگوهای اتصال"""
-        if not self.traffic_history:
+        if not self._points:
             return {}
 
-        connection_counts = [
-            point["data"].get("connections", 0) for point in self.traffic_history
-        ]
-
+        connections = self._connections
         return {
-            "avg_connections": np.mean(connection_counts),
-            "max_connections": np.max(connection_counts),
-            "connection_variance": np.var(connection_counts),
-            "stability": 1
-            - (np.std(connection_counts) / (np.mean(connection_counts) + 1e-8)),
+            "avg_connections": connections.mean,
+            "max_connections": connections.max,
+            "connection_variance": connections.std**2,
+            "stability": 1 - (connections.std / (connections.mean + 1e-8)),
         }
 
     def _find_anomaly_periods(self) -> List[Dict[str, Any]]:
         """پیدا کردن دوره‌های ناهنجاری"""
-        if len(self.traffic_history) < 50:
+        if len(self._points) < 50:
             return []
-
-        bandwidth_values = [
-            point["data"].get("bandwidth", 0) for point in self.traffic_history
-        ]
-        mean_bandwidth = np.mean(bandwidth_values)
-        std_bandwidth = np.std(bandwidth_values)
-
-        anomalies = []
-        for i, (point, bandwidth) in enumerate(
-            zip(self.traffic_history, bandwidth_values)
-        ):
-            if abs(bandwidth - mean_bandwidth) > 2 * std_bandwidth:
-                anomalies.append(
-                    {
-                        "timestamp": point["timestamp"],
-                        "bandwidth": bandwidth,
-                        "severity": abs(bandwidth - mean_bandwidth) / std_bandwidth,
-                    }
-                )
-
-        return anomalies
+        return [dict(anomaly) for _, anomaly in self._anomalies]
 
     def _generate_predictions(self, features: Dict[str, float]) -> Dict[str, Any]:
-        """تولید پیش‌بینی‌ها"""
+        """تولید پیش‌بینی‌ها از میانگین همان ساعت در روزهای قبل"""
         predictions = {}
+        if not features:
+            return predictions
+
+        next_hour = (time.localtime().tm_hour + 1) % 24
+        if self._hourly.count[next_hour]:
+            bandwidth, connections = self._hourly.means()[next_hour]
+        else:
+            bandwidth = features["avg_bandwidth"]
+            connections = features["avg_connections"]
 
         # پیش‌بینی پهنای باند آینده
-        if "avg_bandwidth" in features:
-            predictions["next_hour_bandwidth"] = features[
-                "avg_bandwidth"
-            ] * random.uniform(0.8, 1.2)
+        predictions["next_hour_bandwidth"] = float(bandwidth)
 
         # پیش‌بینی اتصالات آینده
-        if "avg_connections" in features:
-            predictions["next_hour_connections"] = int(
-                features["avg_connections"] * random.uniform(0.9, 1.1)
-            )
+        predictions["next_hour_connections"] = int(round(connections))
 
         return predictions
 
@@ -486,8 +847,11 @@ class TrafficAnalyzer:
 class MLOptimizationService:
     """سرویس بهینه‌سازی ML"""
 
-    def __init__(self, log_callback: Callable = None):
+    def __init__(
+        self, log_callback: Callable = None, models_file: str = ML_MODELS_FILE
+    ):
         self.log = log_callback or print
+        self.models_file = models_file
         self.anomaly_detector = AnomalyDetector()
         self.performance_predictor = PerformancePredictor()
         self.traffic_analyzer = TrafficAnalyzer()
@@ -502,6 +866,9 @@ class MLOptimizationService:
             return
 
         self.is_running = True
+        loaded = self.performance_predictor.load(self.models_file)
+        if loaded:
+            self.log(f"[{LogLevel.INFO}] Loaded {loaded} saved ML models")
         self._start_analysis_timer()
         self._start_training_timer()
         self.log(f"[{LogLevel.INFO}] ML optimization service started")
@@ -514,6 +881,7 @@ class MLOptimizationService:
         self.is_running = False
         self._stop_analysis_timer()
         self._stop_training_timer()
+        self.performance_predictor.save(self.models_file)
         self.log(f"[{LogLevel.INFO}] ML optimization service stopped")
 
     def _start_analysis_timer(self):
@@ -569,6 +937,7 @@ class MLOptimizationService:
                 )
                 if model:
                     self.log(f"[{LogLevel.INFO}] Model retrained: {model.name}")
+                    self.performance_predictor.save(self.models_file)
 
             # راه‌اندازی مجدد تایمر
             if self.is_running:
@@ -608,13 +977,20 @@ class MLOptimizationService:
         """پیش‌بینی عملکرد"""
         return self.performance_predictor.predict("performance_model", features)
 
+    def predict_performance_batch(self, rows) -> Optional[np.ndarray]:
+        """پیش‌بینی عملکرد برای چند ردیف ویژگی به‌صورت یک‌جا"""
+        return self.performance_predictor.predict_batch("performance_model", rows)
+
     def get_optimization_recommendations(self) -> List[Dict[str, Any]]:
         """دریافت توصیه‌های بهینه‌سازی"""
         recommendations = []
 
         try:
-            # تحلیل الگوها
-            patterns = self.traffic_analyzer.patterns
+            # تحلیل الگوها (ارزان است، پس هر بار تازه محاسبه می‌شود)
+            patterns = (
+                self.traffic_analyzer.analyze_patterns()
+                or self.traffic_analyzer.patterns
+            )
 
             # توصیه بر اساس ساعات پیک
             if "peak_hours" in patterns and patterns["peak_hours"]:
@@ -666,7 +1042,7 @@ class MLOptimizationService:
             "anomaly_detector_trained": self.anomaly_detector.is_trained,
             "models_count": len(self.performance_predictor.models),
             "training_data_count": len(self.performance_predictor.training_data),
-            "traffic_data_count": len(self.traffic_analyzer.traffic_history),
+            "traffic_data_count": self.traffic_analyzer.data_points,
             "patterns_analyzed": len(self.traffic_analyzer.patterns),
         }
 
@@ -674,7 +1050,7 @@ class MLOptimizationService:
         """پاکسازی منابع"""
         self.stop()
         self.performance_predictor.training_data.clear()
-        self.traffic_analyzer.traffic_history.clear()
+        self.traffic_analyzer.clear()
         self.log(f"[{LogLevel.INFO}] ML optimization service cleaned up")
 
 
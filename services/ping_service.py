@@ -1,3 +1,4 @@
+import functools
 import socket
 import time
 from typing import Callable, Optional
@@ -9,12 +10,37 @@ from constants import (
     TEST_RETRY_DELAY,
     TEST_ENDPOINTS,
 )
+from utils.metrics import get_metrics_registry
+
+
+def _instrumented(probe: str):
+    """Record each probe's latency histogram and failure count under `probe`."""
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            result = func(*args, **kwargs)
+            registry = get_metrics_registry()
+            if result == -1:
+                registry.counter(
+                    "onix_probe_failures_total", "Failed probes", {"probe": probe}
+                ).inc()
+            else:
+                registry.histogram(
+                    "onix_probe_latency_ms", "Probe latency", {"probe": probe}
+                ).observe(result)
+            return result
+
+        return wrapper
+
+    return decorator
 
 
 def _should_stop(is_cancelled: Optional[Callable[[], bool]]) -> bool:
     return bool(is_cancelled and is_cancelled())
 
 
+@_instrumented("tcp")
 def direct_tcp(host: str, port: int, timeout: int = None) -> int:
     if timeout is None:
         timeout = TEST_ENDPOINTS["tcp"]["timeout"]
@@ -29,6 +55,7 @@ def direct_tcp(host: str, port: int, timeout: int = None) -> int:
         return -1
 
 
+@_instrumented("proxy_tcp")
 def proxy_tcp_connect(
     proxy_address: str, host: str, port: int, timeout: int = None
 ) -> int:
@@ -52,6 +79,7 @@ def proxy_tcp_connect(
         return -1
 
 
+@_instrumented("url")
 def url_latency_via_proxy(
     proxy_address: str,
     url: str = None,
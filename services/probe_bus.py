@@ -0,0 +1,272 @@
+"""
+Shared Probe Bus for Onix
+Health monitors ask the bus for probes instead of opening their own sockets
+on their own timers. Requests for the same (kind, target) share one probe:
+a fresh enough result is reused, a probe already in flight is waited on
+rather than repeated, and every result is published to all subscribers of
+that key. Periodic subscriptions run on one scheduler thread and a small
+worker pool instead of a thread per monitor.
+"""
+
+import heapq
+import itertools
+import queue
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, Hashable, List, Optional, Set, Tuple
+
+from constants import PROBE_BUS_WORKERS, LogLevel
+from services.ping_service import direct_tcp, url_latency_via_proxy
+from utils.metrics import get_metrics_registry
+
+ProbeKey = Tuple[str, Hashable]
+# callback(kind, target, latency_ms) with -1 for a failed probe
+ProbeCallback = Callable[[str, Hashable, int], None]
+
+
+def default_probe(kind: str, target: Hashable) -> Callable[[], int]:
+    """Probe function for the built-in kinds.
+
+    "tcp" connects directly to a (host, port) target, "url" requests the
+    test URL through the proxy address given as target.
+    """
+    if kind == "tcp":
+        host, port = target
+        return lambda: direct_tcp(host, port)
+    if kind == "url":
+        return lambda: url_latency_via_proxy(target, retries=0)
+    raise ValueError(f"No default probe for kind {kind!r}, pass probe_fn")
+
+
+@dataclass
+class ProbeResult:
+    """Latest outcome of a probe key."""
+
+    value: int  # Latency in ms, -1 on failure
+    timestamp: float  # time.monotonic() when the probe finished
+
+
+@dataclass
+class _Subscription:
+    key: ProbeKey
+    callback: ProbeCallback
+    interval: Optional[float]
+    probe_fn: Optional[Callable[[], int]]
+
+
+class _InFlight:
+    __slots__ = ("done", "value")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = -1
+
+
+class ProbeBus:
+    """Deduplicating, coalescing probe scheduler shared by all monitors."""
+
+    def __init__(
+        self,
+        log_callback: Optional[Callable[[str, LogLevel], None]] = None,
+        workers: int = PROBE_BUS_WORKERS,
+    ):
+        self.log = log_callback or (lambda msg, level: print(f"[{level}] {msg}"))
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._results: Dict[ProbeKey, ProbeResult] = {}
+        self._in_flight: Dict[ProbeKey, _InFlight] = {}
+        self._subscriptions: Dict[int, _Subscription] = {}
+        self._by_key: Dict[ProbeKey, Dict[int, _Subscription]] = {}
+        self._tokens = itertools.count(1)
+        self._schedule: List[Tuple[float, int]] = []  # Heap of (due, token)
+        self._queued: Set[ProbeKey] = set()
+        self._jobs: "queue.Queue[_Subscription]" = queue.Queue()
+        self._workers = workers
+        self._threads: List[threading.Thread] = []
+        self._requests = get_metrics_registry().counter
+
+    # --- Probing ---
+
+    def probe(
+        self,
+        kind: str,
+        target: Hashable,
+        probe_fn: Optional[Callable[[], int]] = None,
+        max_age: float = 0.0,
+    ) -> int:
+        """Latency of `target` in ms, or -1.
+
+        A result at most `max_age` seconds old is returned as is, and a
+        probe of the same key already running is waited on instead of
+        starting another; `probe_fn` is only used when a new probe runs.
+        """
+        key = (kind, target)
+        with self._lock:
+            latest = self._results.get(key)
+            if (
+                latest
+                and max_age > 0
+                and time.monotonic() - latest.timestamp <= max_age
+            ):
+                self._count(kind, "cached")
+                return latest.value
+            flight = self._in_flight.get(key)
+            owner = flight is None
+            if owner:
+                flight = self._in_flight[key] = _InFlight()
+
+        if not owner:
+            self._count(kind, "coalesced")
+            flight.done.wait()
+            return flight.value
+
+        self._count(kind, "probed")
+        value = -1
+        try:
+            value = (probe_fn or default_probe(kind, target))()
+        except Exception as e:
+            self.log(f"Probe {kind} {target} failed: {e}", LogLevel.DEBUG)
+        finally:
+            with self._lock:
+                self._results[key] = ProbeResult(value, time.monotonic())
+                del self._in_flight[key]
+                callbacks = [s.callback for s in self._by_key.get(key, {}).values()]
+            flight.value = value
+            flight.done.set()
+
+        for callback in callbacks:
+            try:
+                callback(kind, target, value)
+            except Exception as e:
+                self.log(f"Probe subscriber error: {e}", LogLevel.WARNING)
+        return value
+
+    def latest(self, kind: str, target: Hashable) -> Optional[ProbeResult]:
+        """Most recent result for a key, whoever asked for it."""
+        with self._lock:
+            return self._results.get((kind, target))
+
+    # --- Subscriptions ---
+
+    def subscribe(
+        self,
+        kind: str,
+        target: Hashable,
+        callback: ProbeCallback,
+        interval: Optional[float] = None,
+        probe_fn: Optional[Callable[[], int]] = None,
+    ) -> int:
+        """Receive every result for (kind, target); returns a token.
+
+        With `interval` the bus also makes sure the key is probed at least
+        that often. Results other callers produce count towards it, so a key
+        watched by several monitors is probed at the fastest interval only.
+        Callbacks run on the probing thread and should return quickly.
+        """
+        key = (kind, target)
+        token = next(self._tokens)
+        subscription = _Subscription(key, callback, interval, probe_fn)
+        with self._lock:
+            self._subscriptions[token] = subscription
+            self._by_key.setdefault(key, {})[token] = subscription
+            if interval:
+                heapq.heappush(self._schedule, (time.monotonic(), token))
+                self._start_threads()
+                self._wakeup.notify()
+        return token
+
+    def unsubscribe(self, token: Optional[int]):
+        """Stop a subscription; unknown tokens are ignored."""
+        with self._lock:
+            subscription = self._subscriptions.pop(token, None)
+            if not subscription:
+                return
+            subscribers = self._by_key.get(subscription.key, {})
+            subscribers.pop(token, None)
+            if not subscribers:
+                self._by_key.pop(subscription.key, None)
+            # Its heap entry is skipped once it comes due
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return len(self._subscriptions)
+
+    # --- Scheduler ---
+
+    def _start_threads(self):
+        # Called with the lock held
+        if self._threads:
+            return
+        scheduler = threading.Thread(
+            target=self._run_scheduler, name="probe-bus", daemon=True
+        )
+        self._threads.append(scheduler)
+        for i in range(self._workers):
+            self._threads.append(
+                threading.Thread(
+                    target=self._run_worker, name=f"probe-bus-{i}", daemon=True
+                )
+            )
+        for thread in self._threads:
+            thread.start()
+
+    def _run_scheduler(self):
+        with self._lock:
+            while True:
+                if not self._schedule:
+                    self._wakeup.wait()
+                    continue
+                due, token = self._schedule[0]
+                now = time.monotonic()
+                if due > now:
+                    self._wakeup.wait(due - now)
+                    continue
+                heapq.heappop(self._schedule)
+
+                subscription = self._subscriptions.get(token)
+                if subscription is None:
+                    continue
+                key = subscription.key
+                latest = self._results.get(key)
+                if latest and now - latest.timestamp < subscription.interval:
+                    # Someone else probed it recently enough
+                    next_due = latest.timestamp + subscription.interval
+                elif key in self._queued or key in self._in_flight:
+                    next_due = now + subscription.interval
+                else:
+                    self._queued.add(key)
+                    self._jobs.put(subscription)
+                    next_due = now + subscription.interval
+                heapq.heappush(self._schedule, (next_due, token))
+
+    def _run_worker(self):
+        while True:
+            subscription = self._jobs.get()
+            kind, target = subscription.key
+            try:
+                self.probe(kind, target, subscription.probe_fn)
+            finally:
+                with self._lock:
+                    self._queued.discard(subscription.key)
+
+    def _count(self, kind: str, outcome: str):
+        self._requests(
+            "onix_probe_bus_requests_total",
+            "Probe requests by how they were served",
+            {"kind": kind, "outcome": outcome},
+        ).inc()
+
+
+# Global probe bus instance
+_probe_bus = None
+_probe_bus_lock = threading.Lock()
+
+
+def get_probe_bus() -> ProbeBus:
+    """Get the global probe bus."""
+    global _probe_bus
+    with _probe_bus_lock:
+        if _probe_bus is None:
+            _probe_bus = ProbeBus()
+        return _probe_bus
@@ -5,11 +5,11 @@ Provides advanced security features like Kill Switch, DNS Leak Protection, etc.
 
 import threading
 import time
-import socket
 import subprocess
 import platform
 from typing import Callable, List
 from constants import LogLevel
+from services.probe_bus import get_probe_bus
 
 
 class KillSwitchService:
@@ -18,8 +18,7 @@ class KillSwitchService:
     def __init__(self, log_callback: Callable[[str, LogLevel], None]):
         self.log = log_callback
         self._is_active = False
-        self._monitor_thread = None
-        self._stop_event = threading.Event()
+        self._probe_token = None
         self._original_routes = []
         self._backup_dns = []
 
@@ -33,13 +32,14 @@ class KillSwitchService:
             # Backup current network configuration
             self._backup_network_config()
 
+            host, port = proxy_address.split(":")
             self._is_active = True
-            self._stop_event.clear()
-
-            self._monitor_thread = threading.Thread(
-                target=self._monitor_connection, args=(proxy_address,), daemon=True
+            self._probe_token = get_probe_bus().subscribe(
+                "tcp",
+                (host, int(port)),
+                self._on_proxy_probe,
+                interval=5,  # Check every 5 seconds
             )
-            self._monitor_thread.start()
 
             self.log("Kill Switch activated", LogLevel.SUCCESS)
             return True
@@ -53,9 +53,8 @@ class KillSwitchService:
         if not self._is_active:
             return
 
-        self._stop_event.set()
-        if self._monitor_thread and self._monitor_thread.is_alive():
-            self._monitor_thread.join(timeout=2)
+        get_probe_bus().unsubscribe(self._probe_token)
+        self._probe_token = None
 
         try:
             self._restore_network_config()
@@ -113,35 +112,17 @@ class KillSwitchService:
         except Exception as e:
             self.log(f"Failed to restore network config: {e}", LogLevel.WARNING)
 
-    def _monitor_connection(self, proxy_address: str):
-        """Monitor proxy connection and block internet if disconnected."""
-        while not self._stop_event.is_set():
-            try:
-                # Test proxy connection
-                if not self._test_proxy_connection(proxy_address):
-                    self.log(
-                        "Proxy connection lost - blocking internet", LogLevel.WARNING
-                    )
-                    self._block_internet()
-                else:
-                    self._unblock_internet()
-
-                time.sleep(5)  # Check every 5 seconds
-
-            except Exception as e:
-                self.log(f"Kill Switch monitoring error: {e}", LogLevel.ERROR)
-                time.sleep(10)
-
-    def _test_proxy_connection(self, proxy_address: str) -> bool:
-        """Test if proxy connection is working."""
+    def _on_proxy_probe(self, kind: str, target, latency: int):
+        """Block internet while the proxy is unreachable."""
         try:
-            host, port = proxy_address.split(":")
-            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
-                sock.settimeout(3)
-                result = sock.connect_ex((host, int(port)))
-                return result == 0
-        except Exception:
-            return False
+            if latency == -1:
+                self.log("Proxy connection lost - blocking internet", LogLevel.WARNING)
+                self._block_internet()
+            else:
+                self._unblock_internet()
+
+        except Exception as e:
+            self.log(f"Kill Switch monitoring error: {e}", LogLevel.ERROR)
 
     def _block_internet(self):
         """Block internet access."""
@@ -1,6 +1,8 @@
 """
 Smart Server Selection Service for Onix
-Provides intelligent server selection based on multiple criteria
+Provides intelligent server selection based on multiple criteria.
+Server metrics are kept in numpy arrays so every candidate is scored in one
+vectorized pass.
 """
 
 import time
@@ -9,7 +11,11 @@ import statistics
 from typing import Dict, Any, List, Optional, Callable
 from dataclasses import dataclass
 from collections import defaultdict, deque
+
+import numpy as np
+
 from constants import LogLevel
+from managers.server_record import numeric_column
 
 
 @dataclass
@@ -41,6 +47,44 @@ class SelectionCriteria:
     geographic_weight: float = 0.1
 
 
+# ServerMetrics fields the scoring reads, kept as arrays
+_METRIC_FIELDS = (
+    "ping",
+    "download_speed",
+    "upload_speed",
+    "packet_loss",
+    "jitter",
+    "uptime",
+    "success_rate",
+    "load_factor",
+    "geographic_distance",
+)
+# Initial value of each array; row 0 stays at these for servers without metrics
+_ARRAY_DEFAULTS = dict(
+    {name: getattr(ServerMetrics(), name) for name in _METRIC_FIELDS},
+    trend=0.0,  # Learned score adjustment
+    reliability=1.0,  # Learned score multiplier
+)
+_INITIAL_ROWS = 64
+
+
+def _preference_mask(
+    servers: List[Dict[str, Any]], field: str, preferred: List[str]
+) -> "np.ndarray":
+    """Whether each server's `field` is one of `preferred`, ignoring case."""
+    preferred = {str(value).lower() for value in preferred}
+    # Values repeat across servers, so each distinct one is lowered once
+    matches: Dict[Any, bool] = {}
+    mask = np.zeros(len(servers), dtype=bool)
+    for i, server in enumerate(servers):
+        value = server.get(field, "")
+        match = matches.get(value)
+        if match is None:
+            match = matches[value] = str(value or "").lower() in preferred
+        mask[i] = match
+    return mask
+
+
 class SmartServerSelector:
     """Intelligent server selection system."""
 
@@ -54,6 +98,13 @@ class SmartServerSelector:
         self._is_learning = True
         self._learning_thread = None
         self._stop_learning = threading.Event()
+        self._lock = threading.Lock()
+        # server id -> row in the metric arrays (row 0 holds the defaults)
+        self._rows: Dict[str, int] = {}
+        self._arrays = {
+            name: np.full(_INITIAL_ROWS, default, dtype=np.float64)
+            for name, default in _ARRAY_DEFAULTS.items()
+        }
 
     def update_server_metrics(self, server_id: str, metrics: Dict[str, Any]) -> None:
         """Update metrics for a specific server."""
@@ -100,6 +151,10 @@ class SmartServerSelector:
                     successful_tests / server_metrics.test_count
                 ) * 100
 
+            row = self._row_for(server_id)
+            for name in _METRIC_FIELDS:
+                self._arrays[name][row] = getattr(server_metrics, name)
+
             self.log(
                 f"Updated metrics for server {server_id}: ping={server_metrics.ping}ms, speed={server_metrics.download_speed}Mbps",
                 LogLevel.DEBUG,
@@ -118,36 +173,12 @@ class SmartServerSelector:
             if not servers:
                 return None
 
-            # Update user preferences
-            if user_preferences:
-                self._user_preferences.update(user_preferences)
-
-            # Calculate scores for each server
-            scored_servers = []
-
-            for server in servers:
-                server_id = server.get("id", server.get("name", ""))
-                if not server_id:
-                    continue
-
-                # Get metrics for this server
-                metrics = self._server_metrics.get(server_id, ServerMetrics())
-
-                # Calculate composite score
-                score = self._calculate_server_score(server, metrics)
-
-                scored_servers.append(
-                    {"server": server, "score": score, "metrics": metrics}
-                )
-
-            # Sort by score (higher is better)
-            scored_servers.sort(key=lambda x: x["score"], reverse=True)
-
-            if not scored_servers:
+            top = self.select_top_servers(servers, 1, user_preferences)
+            if not top:
                 return None
 
             # Select the best server
-            best_server_data = scored_servers[0]
+            best_server_data = top[0]
             best_server = best_server_data["server"]
 
             # Record selection for learning
@@ -164,122 +195,179 @@ class SmartServerSelector:
             self.log(f"Error selecting best server: {e}", LogLevel.ERROR)
             return servers[0] if servers else None
 
-    def _calculate_server_score(
-        self, server: Dict[str, Any], metrics: ServerMetrics
-    ) -> float:
-        """Calculate a composite score for a server."""
-        try:
-            score = 0.0
-
-            # Ping score (lower is better)
-            if metrics.ping > 0:
-                ping_score = max(0, 100 - (metrics.ping / 10))  # 100ms = 0 score
-                score += ping_score * self._criteria.ping_weight
-
-            # Speed score (higher is better)
-            if metrics.download_speed > 0:
-                # 1Gbps = 100 score
-                speed_score = min(100, metrics.download_speed / 10)
-                score += speed_score * self._criteria.speed_weight
-
-            # Stability score (based on packet loss and jitter)
-            stability_score = 100
-            if metrics.packet_loss > 0:
-                stability_score -= (
-                    metrics.packet_loss * 10
-                )  # 1% packet loss = -10 points
-            if metrics.jitter > 0:
-                # High jitter penalty
-                stability_score -= min(50, metrics.jitter)
-            stability_score = max(0, stability_score)
-            score += stability_score * self._criteria.stability_weight
-
-            # Uptime score
-            uptime_score = metrics.uptime
-            score += uptime_score * self._criteria.uptime_weight
-
-            # Geographic score (closer is better)
-            if metrics.geographic_distance > 0:
-                # 1000km = 0 score
-                geo_score = max(0, 100 - (metrics.geographic_distance / 1000))
-                score += geo_score * self._criteria.geographic_weight
-
-            # Apply user preferences
-            score = self._apply_user_preferences(server, score)
-
-            # Apply learning adjustments
-            score = self._apply_learning_adjustments(server, score)
-
-            return max(0, min(100, score))  # Clamp between 0 and 100
+    def select_top_servers(
+        self,
+        servers: List[Dict[str, Any]],
+        k: int,
+        user_preferences: Optional[Dict[str, Any]] = None,
+    ) -> List[Dict[str, Any]]:
+        """The `k` highest scoring servers, best first, as {"server", "score", "metrics"}."""
+        if user_preferences:
+            self._user_preferences.update(user_preferences)
 
-        except Exception as e:
-            self.log(f"Error calculating server score: {e}", LogLevel.ERROR)
-            return 50.0  # Default neutral score
+        servers, rows = self._resolve_rows(servers)
+        if not servers or k <= 0:
+            return []
+
+        scores = self._score_batch(servers, rows)
+        if k < len(scores):
+            # Everything tied with the k-th best, then a stable sort keeps
+            # list order among equal scores
+            threshold = np.partition(scores, len(scores) - k)[len(scores) - k]
+            candidates = np.flatnonzero(scores >= threshold)
+        else:
+            candidates = np.arange(len(scores))
+        order = candidates[np.argsort(-scores[candidates], kind="stable")][:k]
+
+        top = []
+        for i in order:
+            server = servers[i]
+            server_id = server.get("id", server.get("name", ""))
+            metrics = self._server_metrics.get(server_id, ServerMetrics())
+            top.append(
+                {"server": server, "score": float(scores[i]), "metrics": metrics}
+            )
+        return top
+
+    # --- Batch scoring ---
+
+    def _row_for(self, server_id: str) -> int:
+        """Row of `server_id` in the metric arrays, allocating one if needed."""
+        row = self._rows.get(server_id)
+        if row is not None:
+            return row
+        with self._lock:
+            row = self._rows.get(server_id)
+            if row is not None:
+                return row
+            row = len(self._rows) + 1
+            if row >= len(self._arrays["ping"]):
+                # Grow by doubling; new rows start at the ServerMetrics defaults
+                for name, array in self._arrays.items():
+                    grown = np.full(len(array) * 2, _ARRAY_DEFAULTS[name])
+                    grown[: len(array)] = array
+                    self._arrays[name] = grown
+            self._rows[server_id] = row
+            return row
+
+    def _resolve_rows(self, servers: List[Dict[str, Any]]):
+        """Servers that have an id, and their metric rows (0 = no metrics yet)."""
+        rows_by_id = self._rows
+        kept = []
+        rows = []
+        for server in servers:
+            server_id = server.get("id", server.get("name", ""))
+            if not server_id:
+                continue
+            kept.append(server)
+            rows.append(rows_by_id.get(server_id, 0))
+        return kept, np.array(rows, dtype=np.intp)
+
+    def _score_batch(self, servers: List[Dict[str, Any]], rows) -> "np.ndarray":
+        """Composite scores of `servers` (metric rows `rows`) in one pass."""
+        arrays = self._arrays
+        criteria = self._criteria
+
+        ping = arrays["ping"][rows]
+        # Servers the selector has no ping for use their last measured ping
+        missing = ping <= 0
+        if missing.any():
+            for field in ("url_ping", "tcp_ping"):
+                measured = numeric_column(servers, field)
+                usable = missing & (measured > 0)
+                ping = np.where(usable, measured, ping)
+                missing &= ~usable
+
+        # Ping score (lower is better, 1000ms = 0 score)
+        score = np.where(ping > 0, np.maximum(0, 100 - ping / 10), 0.0)
+        score *= criteria.ping_weight
+
+        # Speed score (higher is better, 1Gbps = 100 score)
+        speed = arrays["download_speed"][rows]
+        score += np.where(speed > 0, np.minimum(100, speed / 10), 0.0) * (
+            criteria.speed_weight
+        )
 
-    def _apply_user_preferences(self, server: Dict[str, Any], score: float) -> float:
-        """Apply user preferences to the score."""
+        # Stability score: 1% packet loss = -10 points, jitter up to -50
+        packet_loss = arrays["packet_loss"][rows]
+        jitter = arrays["jitter"][rows]
+        stability = (
+            100
+            - np.where(packet_loss > 0, packet_loss * 10, 0.0)
+            - np.where(jitter > 0, np.minimum(50, jitter), 0.0)
+        )
+        score += np.maximum(0, stability) * criteria.stability_weight
+
+        # Uptime score
+        score += arrays["uptime"][rows] * criteria.uptime_weight
+
+        # Geographic score (closer is better)
+        distance = arrays["geographic_distance"][rows]
+        score += np.where(distance > 0, np.maximum(0, 100 - distance / 1000), 0.0) * (
+            criteria.geographic_weight
+        )
+
+        score = self._apply_user_preferences(servers, score)
+        score = self._apply_learning_adjustments(rows, score)
+        return np.clip(score, 0, 100)
+
+    def _apply_user_preferences(
+        self, servers: List[Dict[str, Any]], scores: "np.ndarray"
+    ) -> "np.ndarray":
+        """Apply user preferences to the scores."""
         try:
+            preferences = self._user_preferences
+
             # Time-based preferences
-            current_hour = time.localtime().tm_hour
-            if "preferred_hours" in self._user_preferences:
-                preferred_hours = self._user_preferences["preferred_hours"]
-                if current_hour in preferred_hours:
-                    score *= 1.1  # 10% bonus
+            if time.localtime().tm_hour in preferences.get("preferred_hours", ()):
+                scores *= 1.1  # 10% bonus
 
             # Geographic preferences
-            if "preferred_countries" in self._user_preferences:
-                preferred_countries = self._user_preferences["preferred_countries"]
-                server_country = server.get("country", "").lower()
-                if server_country in [c.lower() for c in preferred_countries]:
-                    score *= 1.05  # 5% bonus
+            if "preferred_countries" in preferences:
+                mask = _preference_mask(
+                    servers, "country", preferences["preferred_countries"]
+                )
+                scores[mask] *= 1.05  # 5% bonus
 
             # Protocol preferences
-            if "preferred_protocols" in self._user_preferences:
-                preferred_protocols = self._user_preferences["preferred_protocols"]
-                server_protocol = server.get("protocol", "").lower()
-                if server_protocol in [p.lower() for p in preferred_protocols]:
-                    score *= 1.03  # 3% bonus
+            if "preferred_protocols" in preferences:
+                mask = _preference_mask(
+                    servers, "protocol", preferences["preferred_protocols"]
+                )
+                scores[mask] *= 1.03  # 3% bonus
 
-            return score
+            return scores
 
         except Exception as e:
             self.log(f"Error applying user preferences: {e}", LogLevel.WARNING)
-            return score
-
-    def _apply_learning_adjustments(
-        self, server: Dict[str, Any], score: float
-    ) -> float:
-        """Apply machine learning adjustments to the score."""
+            return scores
+
+    def _apply_learning_adjustments(self, rows, scores: "np.ndarray") -> "np.ndarray":
+        """Apply machine learning adjustments to the scores."""
+        if not self._is_learning:
+            return scores
+        # Trend and reliability are kept per server by _refresh_learning_terms
+        scores += self._arrays["trend"][rows]
+        scores *= self._arrays["reliability"][rows]
+        return scores
+
+    def _refresh_learning_terms(self, server_id: str) -> None:
+        """Recompute the trend and reliability terms of one server."""
         try:
-            if not self._is_learning:
-                return score
-
-            server_id = server.get("id", server.get("name", ""))
-            if not server_id:
-                return score
-
-            # Get historical performance data
             historical_data = self._learning_data.get(server_id, [])
-            if len(historical_data) < 5:  # Need at least 5 data points
-                return score
-
-            # Calculate performance trend
-            recent_scores = [
-                data["score"] for data in historical_data[-10:]
-            ]  # Last 10 selections
-            if len(recent_scores) >= 3:
-                trend = self._calculate_trend(recent_scores)
-                score += trend * 5  # Apply trend adjustment
+            trend, reliability = 0.0, 1.0
+            if len(historical_data) >= 5:  # Need at least 5 data points
+                # Trend of the last 10 selections
+                recent_scores = [data["score"] for data in historical_data[-10:]]
+                trend = self._calculate_trend(recent_scores) * 5
+                reliability = self._calculate_reliability(historical_data)
 
-            # Calculate reliability factor
-            reliability = self._calculate_reliability(historical_data)
-            score *= reliability
-
-            return score
+            row = self._row_for(server_id)
+            self._arrays["trend"][row] = trend
+            self._arrays["reliability"][row] = reliability
 
         except Exception as e:
             self.log(f"Error applying learning adjustments: {e}", LogLevel.WARNING)
-            return score
 
     def _calculate_trend(self, scores: List[float]) -> float:
         """Calculate performance trend from historical scores."""
@@ -358,6 +446,8 @@ class SmartServerSelector:
             if len(self._learning_data[server_id]) > 50:
                 self._learning_data[server_id] = self._learning_data[server_id][-50:]
 
+            self._refresh_learning_terms(server_id)
+
         except Exception as e:
             self.log(f"Error recording selection: {e}", LogLevel.WARNING)
 
@@ -385,6 +475,7 @@ class SmartServerSelector:
                         if performance_metrics:
                             data["performance"] = performance_metrics
                         break
+                self._refresh_learning_terms(server_id)
 
         except Exception as e:
             self.log(f"Error updating selection result: {e}", LogLevel.WARNING)
@@ -399,34 +490,17 @@ class SmartServerSelector:
     ) -> List[Dict[str, Any]]:
         """Get ranked list of servers with their scores."""
         try:
-            ranked_servers = []
-
-            for server in servers:
-                server_id = server.get("id", server.get("name", ""))
-                if not server_id:
-                    continue
-
-                metrics = self._server_metrics.get(server_id, ServerMetrics())
-                score = self._calculate_server_score(server, metrics)
-
-                ranked_servers.append(
-                    {
-                        "server": server,
-                        "score": score,
-                        "metrics": {
-                            "ping": metrics.ping,
-                            "download_speed": metrics.download_speed,
-                            "upload_speed": metrics.upload_speed,
-                            "packet_loss": metrics.packet_loss,
-                            "uptime": metrics.uptime,
-                            "success_rate": metrics.success_rate,
-                        },
-                    }
-                )
-
-            # Sort by score
-            ranked_servers.sort(key=lambda x: x["score"], reverse=True)
-
+            ranked_servers = self.select_top_servers(servers, len(servers))
+            for entry in ranked_servers:
+                metrics = entry["metrics"]
+                entry["metrics"] = {
+                    "ping": metrics.ping,
+                    "download_speed": metrics.download_speed,
+                    "upload_speed": metrics.upload_speed,
+                    "packet_loss": metrics.packet_loss,
+                    "uptime": metrics.uptime,
+                    "success_rate": metrics.success_rate,
+                }
             return ranked_servers
 
         except Exception as e:
@@ -453,24 +527,20 @@ class SmartServerSelector:
 
             # Get top performing servers
             if self._server_metrics:
-                server_scores = []
-                for server_id, metrics in self._server_metrics.items():
-                    # Create a dummy server for scoring
-                    dummy_server = {"id": server_id, "name": server_id}
-                    score = self._calculate_server_score(dummy_server, metrics)
-                    server_scores.append((server_id, score, metrics))
-
-                # Sort by score and get top 5
-                server_scores.sort(key=lambda x: x[1], reverse=True)
+                # Create dummy servers for scoring
+                dummy_servers = [
+                    {"id": server_id, "name": server_id}
+                    for server_id in self._server_metrics
+                ]
                 analytics["top_performers"] = [
                     {
-                        "server_id": server_id,
-                        "score": score,
-                        "ping": metrics.ping,
-                        "download_speed": metrics.download_speed,
-                        "uptime": metrics.uptime,
+                        "server_id": entry["server"]["id"],
+                        "score": entry["score"],
+                        "ping": entry["metrics"].ping,
+                        "download_speed": entry["metrics"].download_speed,
+                        "uptime": entry["metrics"].uptime,
                     }
-                    for server_id, score, metrics in server_scores[:5]
+                    for entry in self.select_top_servers(dummy_servers, 5)
                 ]
 
             # Generate insights
@@ -605,6 +675,7 @@ class SmartServerSelector:
 
                 if not self._learning_data[server_id]:
                     del self._learning_data[server_id]
+                self._refresh_learning_terms(server_id)
 
         except Exception as e:
             self.log(f"Error cleaning up old data: {e}", LogLevel.WARNING)
@@ -3,12 +3,73 @@ Speed Test Service for Onix
 Provides real-time speed testing functionality
 """
 
+import heapq
 import threading
 import time
 import requests
-import socket
-from typing import Callable, Optional, Dict, Any
-from constants import LogLevel
+from typing import Callable, Optional, Dict, Any, List
+from constants import (
+    FAILOVER_ALTERNATES,
+    FAILOVER_FAILURE_THRESHOLD,
+    FAILOVER_PROBE_INTERVAL,
+    FAILOVER_PROBE_TIMEOUT,
+    FAILOVER_RESCORE_INTERVAL,
+    FAILOVER_RESTART_GRACE,
+    FAILOVER_SLOT_PORT,
+    FAILOVER_STANDBY_COUNT,
+    FAILOVER_STANDBY_PROBE_INTERVAL,
+    PROXY_HOST,
+    PROXY_SERVER_ADDRESS,
+    LogLevel,
+    TEST_ENDPOINTS,
+)
+from services.ping_service import url_latency_via_proxy
+from services.probe_bus import get_probe_bus
+from utils.metrics import get_metrics_registry
+
+
+def download_throughput_via_proxy(
+    proxy_address: str,
+    url: str = None,
+    max_bytes: int = None,
+    timeout: int = None,
+    is_cancelled: Optional[Callable[[], bool]] = None,
+) -> float:
+    """Downloads at most ``max_bytes`` through the proxy and returns bytes/s.
+
+    The clock starts once the response headers arrive so that the result
+    reflects throughput rather than the handshake. Returns -1 on failure.
+    """
+    speed_config = TEST_ENDPOINTS["speed"]
+    if url is None:
+        url = speed_config["url"]
+    if max_bytes is None:
+        max_bytes = speed_config["max_bytes"]
+    if timeout is None:
+        timeout = speed_config["timeout"]
+
+    proxies = {"http": f"http://{proxy_address}", "https": f"http://{proxy_address}"}
+    downloaded = 0
+    try:
+        with requests.get(url, proxies=proxies, timeout=timeout, stream=True) as r:
+            if r.status_code != 200:
+                return -1
+
+            start = time.time()
+            deadline = start + timeout
+            for chunk in r.iter_content(chunk_size=64 * 1024):
+                downloaded += len(chunk)
+                if downloaded >= max_bytes or time.time() >= deadline:
+                    break
+                if is_cancelled and is_cancelled():
+                    return -1
+            elapsed = time.time() - start
+    except requests.exceptions.RequestException:
+        return -1
+
+    if downloaded == 0 or elapsed <= 0:
+        return -1
+    return downloaded / elapsed
 
 
 class SpeedTestService:
@@ -134,7 +195,16 @@ class SpeedTestService:
 
 
 class AutoFailoverService:
-    """Service for automatic failover between servers."""
+    """Service for automatic failover between servers.
+
+    The live tunnel is probed through the local proxy every
+    FAILOVER_PROBE_INTERVAL seconds. After FAILOVER_FAILURE_THRESHOLD failed
+    probes in a row, traffic moves to the healthiest warm standby through
+    `standby_switch`, which needs no core restart. Only when no standby is
+    usable does `failover_callback` restart the core on the best alternate.
+    With a failure predictor, a tunnel that is degrading towards failure
+    moves to a warm standby before it stops answering.
+    """
 
     def __init__(self, log_callback: Callable[[str, LogLevel], None]):
         self.log = log_callback
@@ -144,14 +214,43 @@ class AutoFailoverService:
         self._current_server = None
         self._servers = []
         self._failover_callback = None
+        self._switched_callback = None
+        self._standby_switch = None
+        self._health_source = None
+        self._predictor = None
+        self._proxy_address = PROXY_SERVER_ADDRESS
+        self._lock = threading.Lock()
+        self._alternates: List[Dict[str, Any]] = []
+        # Servers loaded in the core; slot 0 is the one it was started with
+        self._slots: List[Dict[str, Any]] = []
+        self._slot_latency: Dict[int, int] = {}  # Last probe per slot, -1 = failed
+        self._slot_addresses: Dict[str, int] = {}  # Probe inbound -> slot
+        self._slot_tokens: List[int] = []  # Probe bus subscriptions
+        self._active_slot = 0
+        self._failures = 0
 
     def start_monitoring(
         self,
         servers: list,
         current_server: Dict[str, Any],
         failover_callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+        proxy_address: str = PROXY_SERVER_ADDRESS,
+        health_source: Optional[Callable[[str], Dict[str, Any]]] = None,
+        standby_servers: Optional[List[Dict[str, Any]]] = None,
+        standby_switch: Optional[Callable[[int], bool]] = None,
+        switched_callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+        predictor=None,
     ):
-        """Start monitoring servers for automatic failover."""
+        """Start monitoring servers for automatic failover.
+
+        `health_source` maps a server id to its health-check stats,
+        `standby_servers` are the standbys the core was started with and
+        `standby_switch(slot)` moves traffic to one of them (slot 0 is
+        `current_server`). `failover_callback` must restart the core on the
+        given server with `get_standby_servers()` as its standbys.
+        `predictor` is an ai_optimization.PredictiveFailover fed with every
+        probe of the live tunnel.
+        """
         if self._is_monitoring:
             self.log("Auto-failover is already running", LogLevel.WARNING)
             return False
@@ -159,6 +258,14 @@ class AutoFailoverService:
         self._servers = servers
         self._current_server = current_server
         self._failover_callback = failover_callback
+        self._switched_callback = switched_callback
+        self._proxy_address = proxy_address
+        self._health_source = health_source
+        self._standby_switch = standby_switch
+        self._predictor = predictor
+        self._set_slots([current_server, *(standby_servers or [])])
+        self._failures = 0
+        self._rescore()
         self._is_monitoring = True
         self._stop_event.clear()
 
@@ -176,6 +283,7 @@ class AutoFailoverService:
             return
 
         self._stop_event.set()
+        self._set_slots([])
         if self._monitor_thread and self._monitor_thread.is_alive():
             self._monitor_thread.join(timeout=2)
 
@@ -186,68 +294,229 @@ class AutoFailoverService:
         """Check if auto-failover is currently monitoring."""
         return self._is_monitoring
 
+    def get_alternates(self) -> List[Dict[str, Any]]:
+        """Best alternates to the current server, best first."""
+        with self._lock:
+            return list(self._alternates)
+
+    def get_standby_servers(self) -> List[Dict[str, Any]]:
+        """Standbys the core should be (re)started with for the current server."""
+        with self._lock:
+            return list(self._slots[1:])
+
+    def rank_alternates(
+        self,
+        servers: List[Dict[str, Any]],
+        current_server: Optional[Dict[str, Any]],
+        health_source: Optional[Callable[[str], Dict[str, Any]]] = None,
+        k: int = FAILOVER_ALTERNATES,
+    ) -> List[Dict[str, Any]]:
+        """The `k` servers with the lowest expected latency, excluding the current one.
+
+        Latency comes from the health checker's EMAs when available, else
+        from the last measured ping; each recent failure doubles it. Servers
+        with no successful measurement are never picked.
+        """
+        scored = []
+        for server in servers:
+            if server == current_server:
+                continue
+            stats = health_source(server.get("id", "")) if health_source else {}
+            latency = _expected_latency(server, stats or {})
+            if latency is not None:
+                scored.append((latency, len(scored), server))
+        return [server for _, _, server in heapq.nsmallest(k, scored)]
+
+    # --- Monitoring ---
+
+    def _probe_fn(self, proxy_address: str) -> Callable[[], int]:
+        return lambda: url_latency_via_proxy(
+            proxy_address,
+            timeout=FAILOVER_PROBE_TIMEOUT,
+            retries=0,
+            is_cancelled=self._stop_event.is_set,
+        )
+
+    def _probe(self, proxy_address: str) -> int:
+        """Latency in ms of one request through `proxy_address`, -1 on failure.
+
+        Goes through the probe bus, so a result another monitor got for the
+        same proxy within the last probe interval is reused.
+        """
+        return get_probe_bus().probe(
+            "url",
+            proxy_address,
+            self._probe_fn(proxy_address),
+            max_age=FAILOVER_PROBE_INTERVAL,
+        )
+
     def _monitor_servers(self):
-        """Monitor servers and perform failover if needed."""
+        """Probe the live tunnel and fail over when it stops answering."""
+        last_rescore = time.monotonic()
         while not self._stop_event.is_set():
             try:
-                # Test current server
+                if time.monotonic() - last_rescore >= FAILOVER_RESCORE_INTERVAL:
+                    self._rescore()
+                    last_rescore = time.monotonic()
+
                 if self._current_server:
-                    if not self._test_server_health(self._current_server):
-                        self.log(
-                            f"Current server {self._current_server.get('name')} failed health check",
-                            LogLevel.WARNING,
-                        )
-
-                        # Find best alternative server
-                        best_server = self._find_best_server()
-                        if best_server and best_server != self._current_server:
+                    latency = self._probe(self._proxy_address)
+                    if self._predictor:
+                        server_id = self._current_server.get("id", "")
+                        self._predictor.record_probe(server_id, latency)
+                    if latency == -1:
+                        self._failures += 1
+                        if self._failures >= FAILOVER_FAILURE_THRESHOLD:
                             self.log(
-                                f"Switching to server: {best_server.get('name')}",
-                                LogLevel.INFO,
+                                f"Current server {self._current_server.get('name')} failed health check",
+                                LogLevel.WARNING,
                             )
+                            self._fail_over()
+                    else:
+                        self._failures = 0
+                        if self._predictor and self._predictor.should_failover(
+                            server_id
+                        ):
+                            self.log(
+                                f"Current server {self._current_server.get('name')} is predicted to fail",
+                                LogLevel.WARNING,
+                            )
+                            self._fail_over(predicted=True)
 
-                            if self._failover_callback:
-                                self._failover_callback(best_server)
-
-                            self._current_server = best_server
-
-                # Wait before next check
-                self._stop_event.wait(30)  # Check every 30 seconds
+                self._stop_event.wait(FAILOVER_PROBE_INTERVAL)
 
             except Exception as e:
                 self.log(f"Auto-failover error: {e}", LogLevel.ERROR)
-                self._stop_event.wait(10)  # Wait 10 seconds on error
-
-    def _test_server_health(self, server: Dict[str, Any]) -> bool:
-        """Test if a server is healthy."""
-        try:
-            # Simple TCP ping test
-            host = server.get("server")
-            port = server.get("port")
-
-            if not host or not port:
-                return False
-
-            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
-                sock.settimeout(5)
-                result = sock.connect_ex((host, port))
-                return result == 0
-
-        except Exception:
-            return False
-
-    def _find_best_server(self) -> Optional[Dict[str, Any]]:
-        """Find the best available server."""
-        best_server = None
-        best_ping = float("inf")
+                self._stop_event.wait(FAILOVER_RESCORE_INTERVAL)
+
+    def _on_slot_probe(self, kind: str, target: str, latency: int):
+        """Probe bus result for a slot's probe inbound."""
+        with self._lock:
+            slot = self._slot_addresses.get(target)
+            if slot is not None:
+                self._slot_latency[slot] = latency
+
+    def _fail_over(self, predicted: bool = False):
+        """Switch to a warm standby, or restart the core on the best alternate.
+
+        A predicted failure only moves to a warm standby: restarting the
+        core would interrupt a tunnel that still works.
+        """
+        started = time.perf_counter()
+        failed = self._current_server
+        with self._lock:
+            self._slot_latency[self._active_slot] = -1
+            healthy = [
+                (latency, slot)
+                for slot, latency in self._slot_latency.items()
+                if latency != -1 and slot != self._active_slot
+            ]
 
-        for server in self._servers:
-            if server == self._current_server:
-                continue
+        if healthy and self._standby_switch:
+            slot = min(healthy)[1]
+            if self._standby_switch(slot):
+                with self._lock:
+                    self._active_slot = slot
+                    self._current_server = self._slots[slot]
+                self._failures = 0
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                self.log(
+                    f"Switched to standby server {self._current_server.get('name')} in {elapsed_ms:.0f} ms",
+                    LogLevel.SUCCESS,
+                )
+                self._count_failover("predicted" if predicted else "warm")
+                if self._switched_callback:
+                    self._switched_callback(self._current_server)
+                self._rescore()
+                return
+
+        if predicted:
+            self._predictor.reset_server(failed.get("id", ""))
+            return
 
-            ping = server.get("tcp_ping", -1)
-            if ping > 0 and ping < best_ping:
-                best_ping = ping
-                best_server = server
+        best_server = next(
+            (s for s in self.get_alternates() if s != failed),
+            None,
+        )
+        if not best_server:
+            self.log("No healthy alternative server to fail over to", LogLevel.ERROR)
+            self._failures = 0
+            return
 
-        return best_server
+        self.log(f"Switching to server: {best_server.get('name')}", LogLevel.INFO)
+        self._current_server = best_server
+        standbys = self.rank_alternates(
+            self._servers, best_server, self._health_source, FAILOVER_STANDBY_COUNT + 1
+        )
+        self._set_slots(
+            [
+                best_server,
+                *[s for s in standbys if s != failed][:FAILOVER_STANDBY_COUNT],
+            ]
+        )
+        self._count_failover("cold")
+        if self._failover_callback:
+            self._failover_callback(best_server)
+
+        # Give the restarted core time to come up before probing it again
+        self._failures = 0
+        self._stop_event.wait(FAILOVER_RESTART_GRACE)
+        self._rescore()
+
+    def _set_slots(self, servers: List[Dict[str, Any]]):
+        """Track the core's failover slots and keep the standbys probed."""
+        bus = get_probe_bus()
+        # Slot i has its own probe inbound; without standbys there are none
+        addresses = {
+            f"{PROXY_HOST}:{FAILOVER_SLOT_PORT + slot}": slot
+            for slot in range(len(servers) if len(servers) > 1 else 0)
+        }
+        with self._lock:
+            old_tokens = self._slot_tokens
+            self._slots = list(servers)
+            self._slot_latency = {}
+            self._slot_addresses = addresses
+            self._active_slot = 0
+        for token in old_tokens:
+            bus.unsubscribe(token)
+
+        # Regular probes of every slot keep the standbys warm and let a
+        # slot that failed earlier become a candidate again
+        tokens = [
+            bus.subscribe(
+                "url",
+                address,
+                self._on_slot_probe,
+                interval=FAILOVER_STANDBY_PROBE_INTERVAL,
+                probe_fn=self._probe_fn(address),
+            )
+            for address in addresses
+        ]
+        with self._lock:
+            self._slot_tokens = tokens
+
+    def _rescore(self):
+        alternates = self.rank_alternates(
+            self._servers, self._current_server, self._health_source
+        )
+        with self._lock:
+            self._alternates = alternates
+
+    @staticmethod
+    def _count_failover(mode: str):
+        get_metrics_registry().counter(
+            "onix_failovers_total", "Automatic server failovers", {"mode": mode}
+        ).inc()
+
+
+def _expected_latency(server: Dict[str, Any], stats: Dict[str, Any]) -> Optional[float]:
+    """Expected latency of a server in ms from health stats or its last ping."""
+    for value in (
+        stats.get("url_ema"),
+        stats.get("tcp_ema"),
+        server.get("url_ping"),
+        server.get("tcp_ping"),
+    ):
+        if isinstance(value, (int, float)) and value > 0:
+            return value * (2 ** min(stats.get("failures", 0), 10))
+    return None
@@ -3,43 +3,76 @@ Statistics Service for Onix
 Provides real-time statistics and performance monitoring
 """
 
-import threading
 import time
-import psutil
 import requests
 import gc
 from typing import Callable, Optional, Dict, Any, List
-from collections import deque
-from constants import LogLevel
+from constants import (
+    FAILOVER_PROBE_TIMEOUT,
+    LOAD_BALANCING_CHECK_INTERVAL,
+    LogLevel,
+    PROXY_SERVER_ADDRESS,
+    STATISTICS_LATENCY_INTERVAL,
+    STATISTICS_SAMPLE_INTERVAL,
+)
+from services.core_stats_client import (
+    CoreStatsClient,
+    RateRing,
+    get_core_stats_client,
+)
+from services.ping_service import url_latency_via_proxy
+from services.probe_bus import get_probe_bus
+from utils.metrics import get_metrics_registry
 
 
 class RealTimeStatisticsService:
-    """Service for real-time statistics monitoring with memory leak prevention."""
+    """Service for real-time proxy statistics read from the core's API."""
 
-    def __init__(self, log_callback: Callable[[str, LogLevel], None]):
+    def __init__(
+        self, log_callback: Callable[[str, LogLevel], None], core_name: str = "sing-box"
+    ):
         self.log = log_callback
+        self.core_name = core_name
         self._is_monitoring = False
-        self._monitor_thread = None
-        self._stop_event = threading.Event()
+        self._latency_token = None
         self._statistics = {
             "upload_speed": 0.0,
             "download_speed": 0.0,
             "total_upload": 0,
             "total_download": 0,
             "connection_time": 0,
-            "packets_sent": 0,
-            "packets_received": 0,
+            "active_connections": 0,
+            "outbounds": {},
             "ping": -1,
             "server_load": 0.0,
             "memory_usage": 0.0,
             "cpu_usage": 0.0,
         }
-        # Memory leak prevention: Use weakref for callback and limit history
-        self._speed_history = deque(maxlen=60)  # Last 60 seconds
+        self._rates = RateRing(capacity=2)
+        self._client: Optional[CoreStatsClient] = None
         self._callback = None
         self._start_time = None
-        self._cleanup_counter = 0
-        self._max_cleanup_interval = 100  # Cleanup every 100 iterations
+
+        registry = get_metrics_registry()
+        self._registry = registry
+        self._upload_gauge = registry.gauge(
+            "onix_proxy_upload_bytes_per_second", "Proxy upload rate", track=True
+        )
+        self._download_gauge = registry.gauge(
+            "onix_proxy_download_bytes_per_second", "Proxy download rate", track=True
+        )
+        self._upload_total_gauge = registry.gauge(
+            "onix_proxy_uploaded_bytes", "Bytes uploaded through the core"
+        )
+        self._download_total_gauge = registry.gauge(
+            "onix_proxy_downloaded_bytes", "Bytes downloaded through the core"
+        )
+        self._connections_gauge = registry.gauge(
+            "onix_proxy_active_connections", "Connections open in the core"
+        )
+        self._latency_gauge = registry.gauge(
+            "onix_proxy_latency_ms", "Latency through the tunnel", track=True
+        )
 
     def start_monitoring(
         self, callback: Optional[Callable[[Dict[str, Any]], None]] = None
@@ -51,14 +84,30 @@ class RealTimeStatisticsService:
 
         try:
             self._is_monitoring = True
-            self._stop_event.clear()
             self._callback = callback
             self._start_time = time.time()
+            self._rates.clear()
+            self._client = get_core_stats_client(self.core_name)
 
-            self._monitor_thread = threading.Thread(
-                target=self._monitor_statistics, daemon=True
+            self._registry.register_collector(
+                "realtime_statistics",
+                self._sample_statistics,
+                interval=STATISTICS_SAMPLE_INTERVAL,
+            )
+            # Latency probes are slow compared to counter reads, so they run
+            # on the shared probe bus and never delay a traffic sample. Any
+            # other monitor probing the tunnel updates the latency as well.
+            # Auto-failover shares this key and joins a probe in flight, so
+            # ours must be as quick to give up as its own.
+            self._latency_token = get_probe_bus().subscribe(
+                "url",
+                PROXY_SERVER_ADDRESS,
+                self._on_latency_probe,
+                interval=STATISTICS_LATENCY_INTERVAL,
+                probe_fn=lambda: url_latency_via_proxy(
+                    PROXY_SERVER_ADDRESS, timeout=FAILOVER_PROBE_TIMEOUT, retries=0
+                ),
             )
-            self._monitor_thread.start()
 
             self.log("Real-time statistics monitoring started", LogLevel.SUCCESS)
             return True
@@ -72,11 +121,10 @@ class RealTimeStatisticsService:
         if not self._is_monitoring:
             return
 
-        self._stop_event.set()
-        if self._monitor_thread and self._monitor_thread.is_alive():
-            self._monitor_thread.join(timeout=2)
+        self._registry.unregister_collector("realtime_statistics")
+        get_probe_bus().unsubscribe(self._latency_token)
+        self._latency_token = None
 
-        # Cleanup to prevent memory leaks
         self._cleanup_resources()
         self._is_monitoring = False
         self.log("Statistics monitoring stopped", LogLevel.INFO)
@@ -90,131 +138,82 @@ class RealTimeStatisticsService:
         return self._statistics.copy()
 
     def get_speed_history(self) -> List[Dict[str, Any]]:
-        """Get speed history for charts."""
-        return list(self._speed_history)
+        """Get the last minute of speed samples for charts."""
+        uploads = dict(self._upload_gauge.series.points(limit=60))
+        return [
+            {
+                "timestamp": timestamp,
+                "upload_speed": uploads.get(timestamp, 0.0),
+                "download_speed": download_speed,
+            }
+            for timestamp, download_speed in self._download_gauge.series.points(
+                limit=60
+            )
+        ]
 
     def _cleanup_resources(self):
-        """Cleanup resources to prevent memory leaks."""
-        try:
-            # Clear callback reference
-            self._callback = None
-
-            # Clear speed history if it's too large
-            if len(self._speed_history) > 30:
-                # Keep only last 30 entries
-                temp_list = list(self._speed_history)[-30:]
-                self._speed_history.clear()
-                self._speed_history.extend(temp_list)
-
-            # Force garbage collection
-            gc.collect()
-
-        except Exception as e:
-            self.log(f"Error during cleanup: {e}", LogLevel.WARNING)
-
-    def _monitor_statistics(self):
-        """Monitor system and network statistics with memory leak prevention."""
-        last_upload = 0
-        last_download = 0
-        last_time = time.time()
-
-        while not self._stop_event.is_set():
-            try:
-                current_time = time.time()
-                time_delta = current_time - last_time
-
-                # Get network statistics
-                net_io = psutil.net_io_counters()
-                current_upload = net_io.bytes_sent
-                current_download = net_io.bytes_recv
-
-                # Calculate speeds
-                if time_delta > 0:
-                    upload_speed = (current_upload - last_upload) / time_delta
-                    download_speed = (current_download - last_download) / time_delta
-                else:
-                    upload_speed = 0
-                    download_speed = 0
-
-                # Update statistics
-                self._statistics.update(
-                    {
-                        "upload_speed": upload_speed,
-                        "download_speed": download_speed,
-                        "total_upload": current_upload,
-                        "total_download": current_download,
-                        "connection_time": (
-                            current_time - self._start_time if self._start_time else 0
-                        ),
-                        "packets_sent": net_io.packets_sent,
-                        "packets_received": net_io.packets_recv,
-                        "memory_usage": psutil.virtual_memory().percent,
-                        "cpu_usage": psutil.cpu_percent(),
-                    }
-                )
-
-                # Add to speed history (deque automatically limits size)
-                self._speed_history.append(
-                    {
-                        "timestamp": current_time,
-                        "upload_speed": upload_speed,
-                        "download_speed": download_speed,
-                    }
-                )
-
-                # Update ping
-                self._update_ping()
-
-                # Callback if provided (with error handling)
-                if self._callback:
-                    try:
-                        self._callback(self._statistics)
-                    except Exception as callback_error:
-                        self.log(f"Callback error: {callback_error}", LogLevel.WARNING)
-
-                # Periodic cleanup to prevent memory leaks
-                self._cleanup_counter += 1
-                if self._cleanup_counter >= self._max_cleanup_interval:
-                    self._cleanup_resources()
-                    self._cleanup_counter = 0
-
-                # Update for next iteration
-                last_upload = current_upload
-                last_download = current_download
-                last_time = current_time
-
-                time.sleep(1)  # Update every second
-
-            except Exception as e:
-                self.log(f"Statistics monitoring error: {e}", LogLevel.ERROR)
-                time.sleep(5)
-
-    def _update_ping(self):
-        """Update ping statistics."""
-        try:
-            # Test ping to a reliable server
-            import subprocess
-
-            result = subprocess.run(
-                ["ping", "-n", "1", "8.8.8.8"],
-                capture_output=True,
-                text=True,
-                timeout=3,
+        """Release the callback and the pooled API connection."""
+        self._callback = None
+        if self._client:
+            self._client.close()
+            self._client = None
+
+    def _sample_statistics(self):
+        """Sample the core's traffic counters; run by the metrics collector."""
+        current_time = time.time()
+        snapshot = self._client.read_traffic() if self._client else None
+
+        if snapshot is not None:
+            self._rates.push(
+                current_time, snapshot.upload_total, snapshot.download_total
             )
+            upload_speed, download_speed = self._rates.latest_rate()
+            self._statistics.update(
+                {
+                    "upload_speed": upload_speed,
+                    "download_speed": download_speed,
+                    "total_upload": snapshot.upload_total,
+                    "total_download": snapshot.download_total,
+                    "active_connections": len(snapshot.connections),
+                    "outbounds": snapshot.outbounds,
+                }
+            )
+            self._upload_total_gauge.set(snapshot.upload_total)
+            self._download_total_gauge.set(snapshot.download_total)
+            self._connections_gauge.set(len(snapshot.connections))
+        else:
+            # Core not reachable (yet): report idle instead of stale rates
+            self._rates.clear()
+            self._statistics.update({"upload_speed": 0.0, "download_speed": 0.0})
+
+        self._upload_gauge.set(self._statistics["upload_speed"])
+        self._download_gauge.set(self._statistics["download_speed"])
+
+        # System load comes from the performance monitor's gauges
+        self._statistics.update(
+            {
+                "connection_time": (
+                    current_time - self._start_time if self._start_time else 0
+                ),
+                "memory_usage": self._registry.gauge(
+                    "onix_system_memory_percent"
+                ).value,
+                "cpu_usage": self._registry.gauge("onix_system_cpu_percent").value,
+            }
+        )
 
-            if result.returncode == 0:
-                # Extract ping time from output
-                output = result.stdout
-                if "time=" in output:
-                    ping_str = output.split("time=")[1].split("ms")[0]
-                    self._statistics["ping"] = float(ping_str)
-                else:
-                    self._statistics["ping"] = -1
-            else:
-                self._statistics["ping"] = -1
+        # Callback if provided (with error handling)
+        if self._callback:
+            try:
+                self._callback(self._statistics)
+            except Exception as callback_error:
+                self.log(f"Callback error: {callback_error}", LogLevel.WARNING)
 
-        except Exception:
-            self._statistics["ping"] = -1
+    def _on_latency_probe(self, kind: str, target: str, latency: int):
+        """Probe bus result for the tunnel latency."""
+        self._statistics["ping"] = latency
+        if latency >= 0:
+            self._latency_gauge.set(latency)
 
 
 class LoadBalancingService:
@@ -225,8 +224,7 @@ class LoadBalancingService:
         self._is_active = False
         self._servers = []
         self._current_server = None
-        self._monitor_thread = None
-        self._stop_event = threading.Event()
+        self._probe_token = None
         self._failover_callback = None
 
     def start_load_balancing(
@@ -243,12 +241,6 @@ class LoadBalancingService:
             self._servers = servers
             self._failover_callback = failover_callback
             self._is_active = True
-            self._stop_event.clear()
-
-            self._monitor_thread = threading.Thread(
-                target=self._monitor_servers, daemon=True
-            )
-            self._monitor_thread.start()
 
             self.log("Load balancing started", LogLevel.SUCCESS)
             return True
@@ -262,9 +254,8 @@ class LoadBalancingService:
         if not self._is_active:
             return
 
-        self._stop_event.set()
-        if self._monitor_thread and self._monitor_thread.is_alive():
-            self._monitor_thread.join(timeout=2)
+        get_probe_bus().unsubscribe(self._probe_token)
+        self._probe_token = None
 
         # Cleanup to prevent memory leaks
         self._servers.clear()
@@ -279,6 +270,25 @@ class LoadBalancingService:
         """Check if load balancing is active."""
         return self._is_active
 
+    def set_current_server(self, server: Optional[Dict[str, Any]]):
+        """Watch `server` through the probe bus and fail over when it goes down."""
+        bus = get_probe_bus()
+        bus.unsubscribe(self._probe_token)
+        self._probe_token = None
+        self._current_server = server
+        if not self._is_active or not server:
+            return
+
+        host = server.get("server")
+        port = server.get("port")
+        if host and port:
+            self._probe_token = bus.subscribe(
+                "tcp",
+                (host, port),
+                self._on_server_probe,
+                interval=LOAD_BALANCING_CHECK_INTERVAL,
+            )
+
     def get_best_server(self) -> Optional[Dict[str, Any]]:
         """Get the best available server."""
         if not self._servers:
@@ -292,55 +302,32 @@ class LoadBalancingService:
 
         return sorted_servers[0] if sorted_servers else None
 
-    def _monitor_servers(self):
-        """Monitor server health and performance."""
-        while not self._stop_event.is_set():
-            try:
-                # Test current server
-                if self._current_server:
-                    if not self._test_server_health(self._current_server):
-                        self.log(
-                            f"Current server {self._current_server.get('name')} failed health check",
-                            LogLevel.WARNING,
-                        )
-
-                        # Switch to best available server
-                        best_server = self.get_best_server()
-                        if best_server and best_server != self._current_server:
-                            self.log(
-                                f"Switching to server: {best_server.get('name')}",
-                                LogLevel.INFO,
-                            )
-
-                            if self._failover_callback:
-                                self._failover_callback(best_server)
-
-                            self._current_server = best_server
-
-                time.sleep(30)  # Check every 30 seconds
-
-            except Exception as e:
-                self.log(f"Load balancing error: {e}", LogLevel.ERROR)
-                time.sleep(10)
-
-    def _test_server_health(self, server: Dict[str, Any]) -> bool:
-        """Test if a server is healthy."""
+    def _on_server_probe(self, kind: str, target, latency: int):
+        """Probe bus result for the current server."""
         try:
-            import socket
+            if latency != -1 or not self._current_server:
+                return
 
-            host = server.get("server")
-            port = server.get("port")
+            self.log(
+                f"Current server {self._current_server.get('name')} failed health check",
+                LogLevel.WARNING,
+            )
 
-            if not host or not port:
-                return False
+            # Switch to best available server
+            best_server = self.get_best_server()
+            if best_server and best_server != self._current_server:
+                self.log(
+                    f"Switching to server: {best_server.get('name')}",
+                    LogLevel.INFO,
+                )
 
-            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
-                sock.settimeout(5)
-                result = sock.connect_ex((host, port))
-                return result == 0
+                if self._failover_callback:
+                    self._failover_callback(best_server)
 
-        except Exception:
-            return False
+                self.set_current_server(best_server)
+
+        except Exception as e:
+            self.log(f"Load balancing error: {e}", LogLevel.ERROR)
 
 
 class SmartRoutingService:
@@ -3,14 +3,28 @@ Traffic Management Service
 مدیریت پیشرفته ترافیک و Load Balancing
 """
 
+import heapq
+import re
 import threading
 import time
 import statistics
-from typing import Dict, Any, List, Optional, Callable
+import zlib
+from typing import Dict, Any, List, Optional, Callable, Tuple
 from dataclasses import dataclass
 from enum import Enum
 from collections import deque, defaultdict
-from constants import LogLevel
+from constants import (
+    LogLevel,
+    SHAPING_COMMAND_TIMEOUT,
+    TRAFFIC_DECAY_FACTOR,
+    TRAFFIC_DECAY_INTERVAL,
+    TRAFFIC_SAMPLE_INTERVAL,
+    TRAFFIC_TOP_N_CAPACITY,
+)
+from services.core_stats_client import RateRing, get_core_stats_client
+from services.traffic_shaper import TcShaper, speed_limits
+from utils.metrics import get_metrics_registry
+from utils.rule_compiler import KEYWORD, CompiledRules, first_match
 import random
 
 
@@ -81,6 +95,39 @@ class TrafficMetrics:
     error_rate: float
 
 
+class _RuleMatcher:
+    """قوانین فعال کامپایل‌شده؛ اولین قانون منطبق به ترتیب اولویت
+
+    الگوی ساده زیررشته است؛ IP/CIDR، "*.domain" و پیشوندهای "full:"،
+    "domain:" و "regexp:" نیز پذیرفته می‌شوند.
+    """
+
+    def __init__(self, rules: List[TrafficRule]):
+        self.rules = rules
+        self._sources = CompiledRules(
+            [r.source_pattern or "*" for r in rules], plain=KEYWORD
+        )
+        self._destinations = CompiledRules(
+            [r.destination_pattern or "*" for r in rules], plain=KEYWORD
+        )
+        for index, error in self._sources.errors + self._destinations.errors:
+            print(
+                f"[{LogLevel.WARNING}] Traffic rule {rules[index].name} "
+                f"never matches: {error}"
+            )
+
+    def classify(
+        self, sources: Tuple[str, ...], destinations: Tuple[str, ...]
+    ) -> Optional[TrafficRule]:
+        mask = self._sources.match(*sources)
+        if mask:
+            mask &= self._destinations.match(*destinations)
+        if not mask:
+            return None
+        # کم‌ارزش‌ترین بیت، قانون با بالاترین اولویت است
+        return self.rules[first_match(mask)]
+
+
 class TrafficShaping:
     """شکل‌دهی ترافیک"""
 
@@ -89,53 +136,176 @@ class TrafficShaping:
         self.bandwidth_usage: Dict[str, float] = defaultdict(float)
         self.is_active = False
         self._lock = threading.Lock()
+        self._matcher: Optional[_RuleMatcher] = None
+        self._backend = None
+        self._limits = (0, 0)  # (upload, download) KB/s
+        # اعمال روی backend در نخ جدا؛ فقط آخرین وضعیت درخواستی نگه داشته می‌شود
+        self._apply_cond = threading.Condition()
+        self._pending = None  # (backend, rules, limits)
+        self._pending_assignments = None  # (backend, {address: rule name})
+        self._applied_backend = None
+        self._applying = False
 
     def add_rule(self, rule: TrafficRule):
         """اضافه کردن قانون ترافیک"""
         with self._lock:
             self.rules.append(rule)
             self.rules.sort(key=lambda x: x.priority.value)
-            print(f"[{LogLevel.INFO}] Traffic rule added: {rule.name}")
+            self._matcher = None
+            self._apply_backend()
+        print(f"[{LogLevel.INFO}] Traffic rule added: {rule.name}")
 
     def remove_rule(self, rule_name: str):
         """حذف قانون ترافیک"""
         with self._lock:
             self.rules = [r for r in self.rules if r.name != rule_name]
-            print(f"[{LogLevel.INFO}] Traffic rule removed: {rule_name}")
+            self._matcher = None
+            self._apply_backend()
+        print(f"[{LogLevel.INFO}] Traffic rule removed: {rule_name}")
+
+    def _compiled(self) -> _RuleMatcher:
+        """تطبیق‌دهنده قوانین فعال؛ فقط پس از تغییر قوانین دوباره ساخته می‌شود"""
+        if self._matcher is None:
+            self._matcher = _RuleMatcher([r for r in self.rules if r.enabled])
+        return self._matcher
+
+    def classify(self, source: str, destination: str) -> Optional[TrafficRule]:
+        """قانون فعال با بالاترین اولویت که با اتصال تطبیق دارد"""
+        with self._lock:
+            return self._compiled().classify((source,), (destination,))
 
     def apply_shaping(
         self, connection_id: str, data_size: int, source: str, destination: str
     ) -> bool:
         """اعمال شکل‌دهی ترافیک"""
         with self._lock:
-            for rule in self.rules:
-                if not rule.enabled:
-                    continue
+            rule = self._compiled().classify((source,), (destination,))
+            if rule is None:
+                return True
+
+            # بررسی محدودیت پهنای باند
+            current_usage = self.bandwidth_usage.get(connection_id, 0)
+            if current_usage + data_size > rule.bandwidth_limit:
+                print(f"[{LogLevel.WARNING}] Bandwidth limit exceeded for {rule.name}")
+                return False
+
+            # به‌روزرسانی استفاده از پهنای باند
+            self.bandwidth_usage[connection_id] = current_usage + data_size
+            return True
 
-                # بررسی تطبیق الگوها
-                if self._matches_pattern(
-                    source, rule.source_pattern
-                ) and self._matches_pattern(destination, rule.destination_pattern):
+    def set_backend(self, backend, upload: int = 0, download: int = 0):
+        """اتصال به backend شکل‌دهی (مثلاً TcShaper) و اعمال قوانین روی آن"""
+        with self._lock:
+            self._backend = backend
+            self._limits = (upload, download)
+            self.is_active = backend is not None
+            self._apply_backend()
 
-                    # بررسی محدودیت پهنای باند
-                    current_usage = self.bandwidth_usage.get(connection_id, 0)
-                    if current_usage + data_size > rule.bandwidth_limit:
-                        print(
-                            f"[{LogLevel.WARNING}] Bandwidth limit exceeded for {rule.name}"
-                        )
-                        return False
+    def clear_backend(self):
+        """برداشتن شکل‌دهی از backend"""
+        with self._lock:
+            self._backend = None
+            self.is_active = False
+            self._apply_backend()
+
+    def wait_for_backend(self, timeout: Optional[float] = None) -> bool:
+        """صبر تا backend به آخرین وضعیت درخواستی برسد"""
+        with self._apply_cond:
+            return self._apply_cond.wait_for(
+                lambda: self._pending is None
+                and self._pending_assignments is None
+                and not self._applying,
+                timeout,
+            )
 
-                    # به‌روزرسانی استفاده از پهنای باند
-                    self.bandwidth_usage[connection_id] = current_usage + data_size
-                    return True
+    def _apply_backend(self):
+        """ثبت وضعیت فعلی برای اعمال در نخ پس‌زمینه (با قفل گرفته‌شده)
+
+        ساختن دوباره درخت tc ده‌ها فرمان است، پس در نخ فراخواننده (اغلب
+        رابط کاربری) و زیر قفل اجرا نمی‌شود؛ درخواست‌های پشت سر هم فقط
+        آخرین وضعیت را اعمال می‌کنند.
+        """
+        state = (self._backend, list(self._compiled().rules), self._limits)
+        with self._apply_cond:
+            if state[0] is None and self._applied_backend is None:
+                if not self._applying:
+                    return
+            self._pending = state
+            self._start_worker()
+
+    def _start_worker(self):
+        """راه‌اندازی نخ اعمال اگر در حال اجرا نیست (با _apply_cond گرفته‌شده)"""
+        if not self._applying:
+            self._applying = True
+            threading.Thread(
+                target=self._apply_worker, name="traffic-shaping", daemon=True
+            ).start()
+
+    def _apply_worker(self):
+        while True:
+            with self._apply_cond:
+                state, assignments = self._pending, None
+                self._pending = None
+                if state is None:
+                    assignments = self._pending_assignments
+                    self._pending_assignments = None
+                    if assignments is None:
+                        self._applying = False
+                        self._apply_cond.notify_all()
+                        return
+            try:
+                if state is not None:
+                    backend, rules, limits = state
+                    if self._applied_backend and self._applied_backend is not backend:
+                        self._applied_backend.clear()
+                    self._applied_backend = backend
+                    if backend:
+                        backend.apply(rules, *limits)
+                else:
+                    backend, pairs = assignments
+                    # نگاشت‌های backend قبلی دیگر معنایی ندارند
+                    if backend is self._applied_backend:
+                        backend.sync(pairs)
+            except Exception as e:
+                print(f"[{LogLevel.ERROR}] Traffic shaping backend failed: {e}")
 
-        return True
+    def observe_connections(self, connections: List[Dict[str, Any]]) -> int:
+        """طبقه‌بندی اتصال‌های زنده هسته و فرستادن مقصدشان به کلاس قانون
 
-    def _matches_pattern(self, text: str, pattern: str) -> bool:
-        """بررسی تطبیق الگو"""
-        if pattern == "*":
-            return True
-        return pattern in text
+        مبدأ اتصال مسیر پردازه یا IP مبدأ است و مقصد نام میزبان یا IP مقصد؛
+        تعداد اتصال‌های منطبق را برمی‌گرداند. فرمان‌های tc بیرون از قفل و در
+        نخ اعمال اجرا می‌شوند و مقصدهایی که دیگر در فهرست نیستند آزاد می‌شوند.
+        """
+        matched = 0
+        assignments: Dict[str, TrafficRule] = {}
+        with self._lock:
+            backend = self._backend
+            matcher = self._compiled()
+            if not matcher.rules:
+                return 0
+            for conn in connections:
+                metadata = conn.get("metadata") or {}
+                address = metadata.get("destinationIP") or ""
+                rule = matcher.classify(
+                    (metadata.get("processPath"), metadata.get("sourceIP")),
+                    (metadata.get("host"), address),
+                )
+                if rule is None:
+                    continue
+                matched += 1
+                current = assignments.get(address)
+                if address and (
+                    current is None or rule.priority.value < current.priority.value
+                ):
+                    assignments[address] = rule
+        if backend is not None:
+            with self._apply_cond:
+                self._pending_assignments = (
+                    backend,
+                    {address: rule.name for address, rule in assignments.items()},
+                )
+                self._start_worker()
+        return matched
 
     def reset_usage(self):
         """بازنشانی استفاده از پهنای باند"""
@@ -274,8 +444,12 @@ class LoadBalancer:
         if not servers or not client_ip:
             return servers[0].server_id if servers else None
 
-        hash_value = hash(client_ip) % len(servers)
-        return servers[hash_value].server_id
+        # هش rendezvous: پایدار بین اجراها (برخلاف hash()) و با افزودن یا
+        # حذف سرور فقط کلاینت‌های همان سرور جابه‌جا می‌شوند
+        return max(
+            servers,
+            key=lambda s: zlib.crc32(f"{client_ip}|{s.server_id}".encode()),
+        ).server_id
 
     def record_request(self, server_id: str, response_time: float, success: bool):
         """ثبت درخواست"""
@@ -340,14 +514,153 @@ class LoadBalancer:
             }
 
 
+class HeavyHitters:
+    """شمارنده پرمصرف‌ها با حافظه محدود (الگوریتم Space-Saving)"""
+
+    def __init__(self, capacity: int = TRAFFIC_TOP_N_CAPACITY):
+        self.capacity = capacity
+        self._counts: Dict[str, float] = {}
+        self._errors: Dict[str, float] = {}
+
+    def __len__(self) -> int:
+        return len(self._counts)
+
+    def add(self, key: str, amount: float):
+        """افزودن مقدار به شمارنده یک کلید"""
+        if amount <= 0:
+            return
+        if key in self._counts:
+            self._counts[key] += amount
+            return
+        if len(self._counts) < self.capacity:
+            self._counts[key] = amount
+            self._errors[key] = 0.0
+            return
+
+        # جایگزینی کم‌مصرف‌ترین کلید؛ شمارش آن به عنوان خطای کلید جدید حفظ می‌شود
+        victim = min(self._counts, key=self._counts.get)
+        floor = self._counts.pop(victim)
+        del self._errors[victim]
+        self._counts[key] = floor + amount
+        self._errors[key] = floor
+
+    def decay(self, factor: float, min_count: float = 1.0):
+        """کاهش دوره‌ای شمارنده‌ها و حذف کلیدهای ناچیز"""
+        for key in list(self._counts):
+            count = self._counts[key] * factor
+            if count < min_count:
+                del self._counts[key]
+                del self._errors[key]
+            else:
+                self._counts[key] = count
+                self._errors[key] *= factor
+
+    def top(self, n: int = 10) -> List[Tuple[str, float]]:
+        """دریافت n کلید پرمصرف"""
+        return heapq.nlargest(n, self._counts.items(), key=lambda item: item[1])
+
+    def clear(self):
+        self._counts.clear()
+        self._errors.clear()
+
+
+class TrafficAccounting:
+    """حسابداری ترافیک به تفکیک میزبان و پردازه"""
+
+    def __init__(self, capacity: int = TRAFFIC_TOP_N_CAPACITY):
+        self.hosts = HeavyHitters(capacity)
+        self.processes = HeavyHitters(capacity)
+        # فقط شمارنده اتصال‌های زنده نگه داشته می‌شود
+        self._last_seen: Dict[str, Tuple[int, int]] = {}
+        self._lock = threading.Lock()
+
+    def ingest(self, connections: List[Dict[str, Any]]) -> int:
+        """ثبت یک تصویر از اتصال‌های هسته؛ تعداد اتصال‌های جدید را برمی‌گرداند"""
+        current: Dict[str, Tuple[int, int]] = {}
+        new_connections = 0
+
+        with self._lock:
+            for conn in connections:
+                conn_id = conn.get("id")
+                if not conn_id:
+                    continue
+
+                upload = conn.get("upload", 0)
+                download = conn.get("download", 0)
+                current[conn_id] = (upload, download)
+
+                if conn_id not in self._last_seen:
+                    new_connections += 1
+                last_upload, last_download = self._last_seen.get(conn_id, (0, 0))
+                delta = (upload - last_upload) + (download - last_download)
+                if delta <= 0:
+                    continue
+
+                metadata = conn.get("metadata") or {}
+                host = (
+                    metadata.get("host") or metadata.get("destinationIP") or "unknown"
+                )
+                process_path = metadata.get("processPath") or ""
+                process = re.split(r"[\\/]", process_path)[-1] or "unknown"
+
+                self.hosts.add(host, delta)
+                self.processes.add(process, delta)
+
+            self._last_seen = current
+
+        return new_connections
+
+    def decay(self, factor: float = TRAFFIC_DECAY_FACTOR):
+        """کاهش وزن ترافیک قدیمی"""
+        with self._lock:
+            self.hosts.decay(factor)
+            self.processes.decay(factor)
+
+    def top_hosts(self, n: int = 10) -> List[Tuple[str, float]]:
+        with self._lock:
+            return self.hosts.top(n)
+
+    def top_processes(self, n: int = 10) -> List[Tuple[str, float]]:
+        with self._lock:
+            return self.processes.top(n)
+
+    def reset(self):
+        with self._lock:
+            self.hosts.clear()
+            self.processes.clear()
+            self._last_seen.clear()
+
+
 class TrafficAnalyzer:
     """تحلیلگر ترافیک"""
 
-    def __init__(self):
-        self.metrics_history: deque = deque(maxlen=1000)
+    # آخرین 100 نمونه در بازه نمونه‌برداری
+    ANALYSIS_WINDOW = 100 * TRAFFIC_SAMPLE_INTERVAL
+
+    def __init__(self, core_name: str = "sing-box"):
+        self.accounting = TrafficAccounting()
         self.is_monitoring = False
-        self._monitoring_thread = None
-        self._stop_event = threading.Event()
+        self.core_name = core_name
+        self._client = None
+        self._rates = RateRing(capacity=2)
+        self._last_sample = 0.0
+        self._next_decay = 0.0
+        # فراخوانی با فهرست اتصال‌های هر نمونه (برای شکل‌دهی ترافیک)
+        self.connection_listener: Optional[Callable[[List[Dict[str, Any]]], Any]] = None
+
+        registry = get_metrics_registry()
+        self._registry = registry
+        self._bandwidth_gauge = registry.gauge(
+            "onix_traffic_bandwidth_mbps", "Proxy bandwidth in MB/s", track=True
+        )
+        self._connections_gauge = registry.gauge(
+            "onix_traffic_active_connections", "Active proxied connections", track=True
+        )
+        self._new_connections_gauge = registry.gauge(
+            "onix_traffic_new_connections_per_second",
+            "New proxied connections per second",
+            track=True,
+        )
 
     def start_monitoring(self):
         """شروع نظارت"""
@@ -355,71 +668,100 @@ class TrafficAnalyzer:
             return
 
         self.is_monitoring = True
-        self._stop_event.clear()
-        self._monitoring_thread = threading.Thread(
-            target=self._monitor_traffic, daemon=True
+        self._client = get_core_stats_client(self.core_name)
+        self._rates.clear()
+        self._last_sample = time.time()
+        self._next_decay = self._last_sample + TRAFFIC_DECAY_INTERVAL
+        self._registry.register_collector(
+            "traffic_analyzer", self._sample_traffic, interval=TRAFFIC_SAMPLE_INTERVAL
         )
-        self._monitoring_thread.start()
         print(f"[{LogLevel.INFO}] Traffic monitoring started")
 
+    def set_core(self, core_name: str):
+        """خواندن آمار از API هسته فعال
+
+        Xray فقط مجموع ترافیک را گزارش می‌دهد، پس حسابرسی میزبان و پردازه
+        فقط با sing-box پر می‌شود.
+        """
+        if core_name == self.core_name:
+            return
+        self.core_name = core_name
+        if self.is_monitoring:
+            old_client = self._client
+            self._client = get_core_stats_client(core_name)
+            self._rates.clear()
+            if old_client:
+                old_client.close()
+
     def stop_monitoring(self):
         """توقف نظارت"""
         if not self.is_monitoring:
             return
 
         self.is_monitoring = False
-        self._stop_event.set()
-
-        if self._monitoring_thread and self._monitoring_thread.is_alive():
-            self._monitoring_thread.join(timeout=5)
+        self._registry.unregister_collector("traffic_analyzer")
+        if self._client:
+            self._client.close()
+            self._client = None
 
         print(f"[{LogLevel.INFO}] Traffic monitoring stopped")
 
-    def _monitor_traffic(self):
-        """نظارت بر ترافیک"""
-        while not self._stop_event.is_set():
-            try:
-                # شبیه‌سازی جمع‌آوری معیارها
-                metrics = TrafficMetrics(
-                    timestamp=time.time(),
-                    total_bandwidth=random.uniform(100, 1000),  # MB/s
-                    active_connections=random.randint(50, 500),
-                    requests_per_second=random.uniform(10, 100),
-                    average_response_time=random.uniform(50, 200),  # ms
-                    error_rate=random.uniform(0.01, 0.05),
-                )
-
-                self.metrics_history.append(metrics)
+    def _sample_traffic(self):
+        """یک نمونه از اتصال‌های گزارش‌شده توسط هسته (اجرا در جمع‌آوری‌کننده متریک)"""
+        client = self._client
+        if client is None:
+            return
 
-                time.sleep(5)  # جمع‌آوری هر 5 ثانیه
+        snapshot = client.read_traffic()
+        now = time.time()
 
-            except Exception as e:
-                print(f"[{LogLevel.ERROR}] Traffic monitoring error: {e}")
-                time.sleep(5)
+        if snapshot is None:
+            # هسته در حال اجرا نیست؛ داده ساختگی ثبت نمی‌شود
+            self._rates.clear()
+        else:
+            new_connections = self.accounting.ingest(snapshot.connections)
+            if self.connection_listener:
+                self.connection_listener(snapshot.connections)
+            self._rates.push(now, snapshot.upload_total, snapshot.download_total)
+            upload_speed, download_speed = self._rates.latest_rate()
+            elapsed = max(now - self._last_sample, 1e-6)
+
+            self._bandwidth_gauge.set(
+                (upload_speed + download_speed) / (1024 * 1024)
+            )  # MB/s
+            self._connections_gauge.set(len(snapshot.connections))
+            self._new_connections_gauge.set(new_connections / elapsed)
+
+        if now >= self._next_decay:
+            self.accounting.decay()
+            self._next_decay = now + TRAFFIC_DECAY_INTERVAL
+        self._last_sample = now
+
+    def get_top_talkers(self, n: int = 10) -> Dict[str, List[Tuple[str, float]]]:
+        """دریافت پرمصرف‌ترین میزبان‌ها و پردازه‌ها (بایت)"""
+        return {
+            "hosts": self.accounting.top_hosts(n),
+            "processes": self.accounting.top_processes(n),
+        }
 
     def get_traffic_analysis(self) -> Dict[str, Any]:
         """دریافت تحلیل ترافیک"""
-        if not self.metrics_history:
+        bandwidth_values = self._bandwidth_gauge.series.values(
+            limit=self.ANALYSIS_WINDOW
+        )
+        if not bandwidth_values:
             return {}
 
-        recent_metrics = list(self.metrics_history)[-100:]  # آخرین 100 نمونه
-
-        bandwidth_values = [m.total_bandwidth for m in recent_metrics]
-        response_times = [m.average_response_time for m in recent_metrics]
-        error_rates = [m.error_rate for m in recent_metrics]
-
         return {
-            "current_bandwidth": bandwidth_values[-1] if bandwidth_values else 0,
-            "average_bandwidth": (
-                statistics.mean(bandwidth_values) if bandwidth_values else 0
-            ),
-            "peak_bandwidth": max(bandwidth_values) if bandwidth_values else 0,
-            "average_response_time": (
-                statistics.mean(response_times) if response_times else 0
-            ),
-            "peak_response_time": max(response_times) if response_times else 0,
-            "average_error_rate": statistics.mean(error_rates) if error_rates else 0,
-            "total_samples": len(recent_metrics),
+            "current_bandwidth": bandwidth_values[-1],
+            "active_connections": int(self._connections_gauge.value),
+            "average_bandwidth": statistics.mean(bandwidth_values),
+            "peak_bandwidth": max(bandwidth_values),
+            # هسته زمان پاسخ و نرخ خطا گزارش نمی‌دهد
+            "average_response_time": 0,
+            "peak_response_time": 0,
+            "average_error_rate": 0,
+            "total_samples": len(bandwidth_values),
             "trend": self._calculate_trend(bandwidth_values),
         }
 
@@ -455,6 +797,9 @@ class TrafficManagementService:
         self.traffic_shaping = TrafficShaping()
         self.load_balancer = LoadBalancer()
         self.traffic_analyzer = TrafficAnalyzer()
+        self.traffic_analyzer.connection_listener = (
+            self.traffic_shaping.observe_connections
+        )
         self.is_running = False
         self._cleanup_timer = None
 
@@ -476,6 +821,9 @@ class TrafficManagementService:
         self.is_running = False
         self.traffic_analyzer.stop_monitoring()
         self._stop_cleanup_timer()
+        self.stop_shaping()
+        # tc باید پیش از خروج برنامه پاک شود
+        self.traffic_shaping.wait_for_backend(timeout=SHAPING_COMMAND_TIMEOUT * 3)
         self.log(f"[{LogLevel.INFO}] Traffic management service stopped")
 
     def _start_cleanup_timer(self):
@@ -521,6 +869,29 @@ class TrafficManagementService:
         """حذف قانون ترافیک"""
         self.traffic_shaping.remove_rule(rule_name)
 
+    def start_shaping(self, settings: dict) -> bool:
+        """اعمال قوانین و محدودیت‌های پهنای باند روی تونل
+
+        در لینوکس با حالت TUN از tc استفاده می‌شود؛ در غیر این صورت فقط
+        خروجی‌های Hysteria2 در پیکربندی هسته محدود می‌شوند.
+        """
+        upload, download = speed_limits(settings)
+        if not settings.get("tun_enabled") or not TcShaper.available():
+            self.traffic_shaping.clear_backend()
+            if upload or download:
+                self.log(
+                    f"[{LogLevel.INFO}] Bandwidth limits need TUN mode on Linux; "
+                    "only Hysteria2 outbounds are limited by the core"
+                )
+            return False
+
+        self.traffic_shaping.set_backend(TcShaper(self.log), upload, download)
+        return True
+
+    def stop_shaping(self):
+        """برداشتن شکل‌دهی ترافیک از تونل"""
+        self.traffic_shaping.clear_backend()
+
     def add_server_to_balancer(self, server_id: str, weight: int = 1):
         """اضافه کردن سرور به Load Balancer"""
         self.load_balancer.add_server(server_id, weight)
@@ -0,0 +1,348 @@
+"""
+Traffic Shaping Backends for Onix
+Turns TrafficRules and the bandwidth limit settings into limits the kernel
+or the core enforce. On Linux with TUN mode the tunnel interface gets an
+HTB tree: one class per rule, capped at the rule's limit and ranked by its
+priority, under a root class capped at the global limit. Downloads are
+shaped on an IFB device that tunnel ingress is redirected to. Outbounds
+that carry their own rate (Hysteria2) are capped in the core config.
+"""
+
+import ipaddress
+import shutil
+import subprocess
+import sys
+from typing import Callable, Dict, List, Optional, Tuple
+
+from constants import (
+    LogLevel,
+    SHAPING_COMMAND_TIMEOUT,
+    SHAPING_IFB_INTERFACE,
+    SHAPING_LINE_RATE_KBIT,
+    SHAPING_MAX_ADDRESSES,
+    TUN_INTERFACE_NAME,
+)
+
+Command = List[str]
+# Minor class ids: 1 is the root class, rules start at 0x10, 0x1ff is the default
+_ROOT_CLASS = 1
+_FIRST_RULE_CLASS = 0x10
+_DEFAULT_CLASS = 0x1FF
+_MIN_RATE_KBIT = 8
+
+
+def speed_limits(settings: dict) -> Tuple[int, int]:
+    """(upload, download) limits in KB/s from settings, 0 when unlimited."""
+    if not settings.get("bandwidth_limit_enabled"):
+        return 0, 0
+    limits = []
+    for key in ("upload_speed_limit", "download_speed_limit"):
+        try:
+            limits.append(max(0, int(settings.get(key, 0) or 0)))
+        except (TypeError, ValueError):
+            limits.append(0)
+    return limits[0], limits[1]
+
+
+def hysteria_bandwidth(settings: dict) -> Tuple[int, int]:
+    """(up, down) Mbps for a Hysteria2 outbound, capped by the speed limits."""
+    try:
+        up_mbps = int(settings.get("hy2_up_mbps", 50))
+        down_mbps = int(settings.get("hy2_down_mbps", 100))
+    except (ValueError, TypeError):
+        up_mbps = 50
+        down_mbps = 100
+
+    upload, download = speed_limits(settings)
+    if upload:
+        up_mbps = min(up_mbps, max(1, round(_kbit(upload) / 1000)))
+    if download:
+        down_mbps = min(down_mbps, max(1, round(_kbit(download) / 1000)))
+    return up_mbps, down_mbps
+
+
+def _kbit(kb_per_second: float) -> int:
+    """KB/s as the kbit/s tc expects."""
+    return max(_MIN_RATE_KBIT, round(kb_per_second * 8 * 1024 / 1000))
+
+
+def _prio(slot: int, version: int) -> int:
+    """Filter priority of a slot; IPv4 and IPv6 filters can't share one."""
+    return 2 * slot + (1 if version == 4 else 2)
+
+
+def _network(pattern: str) -> Optional[ipaddress._BaseNetwork]:
+    """The address or CIDR a rule pattern names, if it is one."""
+    try:
+        return ipaddress.ip_network(pattern.strip(), strict=False)
+    except ValueError:
+        return None
+
+
+class TcShaper:
+    """Shapes the TUN interface with Linux tc HTB classes.
+
+    Rules whose patterns are addresses or CIDRs get kernel filters up front.
+    Other patterns (hosts, processes) can't be matched on packets, so the
+    rule engine classifies live connections and passes each connection's
+    remote address to sync(), which gives it a filter of its own at a
+    priority of its own and deletes the filters of addresses no longer seen.
+    """
+
+    def __init__(
+        self,
+        log_callback: Callable = None,
+        interface: str = TUN_INTERFACE_NAME,
+        ifb_interface: str = SHAPING_IFB_INTERFACE,
+        runner: Callable[[Command], bool] = None,
+    ):
+        self.log = log_callback or print
+        self.interface = interface
+        self.ifb_interface = ifb_interface
+        self._run = runner or self._run_command
+        self._classes: Dict[str, Tuple[int, int]] = {}  # rule -> (minor, prio)
+        # address -> (rule, slot, IP version) of each learned filter
+        self._assigned: Dict[str, Tuple[str, int, int]] = {}
+        self._free_slots: List[int] = []
+        self._active = False
+
+    @staticmethod
+    def available() -> bool:
+        """Whether tc can be used here at all."""
+        return sys.platform.startswith("linux") and shutil.which("tc") is not None
+
+    @property
+    def is_active(self) -> bool:
+        return self._active
+
+    # --- Planning ---
+
+    def plan(self, rules: list, upload: int = 0, download: int = 0) -> List[Command]:
+        """Commands that build the shaping tree for `rules`.
+
+        `rules` are the enabled TrafficRules in match order, `upload` and
+        `download` the global limits in KB/s (0 = unlimited).
+        """
+        self._classes = {}
+        for index, rule in enumerate(rules):
+            self._classes[rule.name] = (
+                _FIRST_RULE_CLASS + index,
+                min(7, rule.priority.value - 1),
+            )
+
+        ifb = self.ifb_interface
+        commands = [
+            f"ip link add {ifb} type ifb".split(),
+            f"ip link set dev {ifb} up".split(),
+            f"tc qdisc replace dev {self.interface} handle ffff: ingress".split(),
+            (
+                f"tc filter replace dev {self.interface} parent ffff: protocol all "
+                f"prio 1 matchall action mirred egress redirect dev {ifb}"
+            ).split(),
+        ]
+        # Tunnel egress carries what apps send, the IFB what they receive
+        for device, limit, outgoing in (
+            (self.interface, upload, True),
+            (self.ifb_interface, download, False),
+        ):
+            commands.extend(self._tree(device, limit, rules))
+            for index, rule in enumerate(rules):
+                matches = self._static_matches(rule, outgoing)
+                if matches is None:
+                    continue
+                versions = {network.version for _, network in matches}
+                # A rule on "*" alone matches both address families
+                for version in sorted(versions or {4, 6}):
+                    commands.append(
+                        self._filter(
+                            device, _prio(index, version), matches, rule.name, version
+                        )
+                    )
+        return commands
+
+    def _tree(self, device: str, limit: int, rules: list) -> List[Command]:
+        total = _kbit(limit) if limit else SHAPING_LINE_RATE_KBIT
+        # Uncapped rules are guaranteed an equal share and borrow the rest
+        # in priority order; capped ones get exactly their limit
+        share = max(_MIN_RATE_KBIT, total // (len(rules) + 1))
+        commands = [
+            (
+                f"tc qdisc replace dev {device} root handle 1: "
+                f"htb default {_DEFAULT_CLASS:x}"
+            ).split(),
+            self._class(device, "1:", _ROOT_CLASS, total, total, None),
+            self._class(device, f"1:{_ROOT_CLASS:x}", _DEFAULT_CLASS, share, total, 7),
+        ]
+        for rule in rules:
+            minor, prio = self._classes[rule.name]
+            if rule.bandwidth_limit > 0:
+                rate = ceil = min(_kbit(rule.bandwidth_limit), total)
+            else:
+                rate, ceil = share, total
+            commands.append(
+                self._class(device, f"1:{_ROOT_CLASS:x}", minor, rate, ceil, prio)
+            )
+            commands.append(
+                (
+                    f"tc qdisc replace dev {device} parent 1:{minor:x} "
+                    f"handle {minor:x}: fq_codel"
+                ).split()
+            )
+        return commands
+
+    @staticmethod
+    def _class(
+        device: str, parent: str, minor: int, rate: int, ceil: int, prio: Optional[int]
+    ) -> Command:
+        command = ["tc", "class", "replace", "dev", device, "parent", parent]
+        command += ["classid", f"1:{minor:x}", "htb"]
+        command += ["rate", f"{rate}kbit", "ceil", f"{ceil}kbit"]
+        if prio is not None:
+            command += ["prio", str(prio)]
+        return command
+
+    def _static_matches(self, rule, outgoing: bool) -> Optional[list]:
+        """Packet matches of a rule with address patterns, else None.
+
+        Source is the local side and destination the remote side, which on
+        the IFB (incoming packets) are the other way round.
+        """
+        matches = []
+        for pattern, remote in (
+            (rule.source_pattern, False),
+            (rule.destination_pattern, True),
+        ):
+            if pattern == "*":
+                continue
+            network = _network(pattern)
+            if network is None:
+                return None
+            matches.append(("dst" if remote == outgoing else "src", network))
+        return matches
+
+    def _filter(
+        self, device: str, prio: int, matches: list, rule_name: str, version: int
+    ) -> Command:
+        minor, _ = self._classes[rule_name]
+        ipv6 = version == 6
+        command = ["tc", "filter", "add", "dev", device, "parent", "1:"]
+        command += ["protocol", "ipv6" if ipv6 else "ip", "prio", str(prio), "u32"]
+        if not matches:
+            command += ["match", "u32", "0", "0"]
+        for direction, network in matches:
+            command += ["match", "ip6" if ipv6 else "ip", direction, str(network)]
+        command += ["flowid", f"1:{minor:x}"]
+        return command
+
+    # --- Applying ---
+
+    def apply(self, rules: list, upload: int = 0, download: int = 0) -> bool:
+        """Replace the shaping tree; True when every command succeeded."""
+        self.clear()
+        commands = self.plan(rules, upload, download)
+        # The IFB may exist already from an earlier run
+        self._run(commands[0])
+        ok = all([self._run(command) for command in commands[1:]])
+        self._active = True
+        if ok:
+            self.log(
+                f"[{LogLevel.INFO}] Traffic shaping active on {self.interface}: "
+                f"{len(rules)} rules, up {upload or '∞'} KB/s, "
+                f"down {download or '∞'} KB/s"
+            )
+        else:
+            self.log(
+                f"[{LogLevel.WARNING}] Traffic shaping on {self.interface} "
+                "is incomplete (root privileges are required)"
+            )
+        return ok
+
+    def assign(self, address: str, rule_name: str) -> bool:
+        """Send traffic to and from `address` through a rule's class."""
+        if not self._active or rule_name not in self._classes:
+            return False
+        current = self._assigned.get(address)
+        if current and current[0] == rule_name:
+            return True
+        network = _network(address)
+        if network is None:
+            return False
+        if current:
+            self.unassign(address)
+        elif len(self._assigned) >= SHAPING_MAX_ADDRESSES:
+            return False
+
+        # Every learned address has a priority of its own, after the static
+        # filters of every rule, so unassign() can delete just its filters
+        slot = self._free_slots.pop() if self._free_slots else len(self._assigned)
+        self._assigned[address] = (rule_name, slot, network.version)
+        prio = _prio(len(self._classes) + slot, network.version)
+        for device, direction in ((self.interface, "dst"), (self.ifb_interface, "src")):
+            self._run(
+                self._filter(
+                    device, prio, [(direction, network)], rule_name, network.version
+                )
+            )
+        return True
+
+    def unassign(self, address: str):
+        """Delete the filters assign() added for `address`."""
+        entry = self._assigned.pop(address, None)
+        if entry is None:
+            return
+        _, slot, version = entry
+        prio = _prio(len(self._classes) + slot, version)
+        protocol = "ipv6" if version == 6 else "ip"
+        for device in (self.interface, self.ifb_interface):
+            self._run(
+                ["tc", "filter", "del", "dev", device, "parent", "1:"]
+                + ["protocol", protocol, "prio", str(prio), "u32"]
+            )
+        self._free_slots.append(slot)
+
+    def sync(self, assignments: Dict[str, str]) -> int:
+        """Make the learned filters match `assignments` (address -> rule).
+
+        Addresses missing from it no longer have live connections, so their
+        filters are deleted and the slots reused. Returns how many addresses
+        are assigned afterwards.
+        """
+        if not self._active:
+            return 0
+        for address in [a for a in self._assigned if a not in assignments]:
+            self.unassign(address)
+        for address, rule_name in assignments.items():
+            self.assign(address, rule_name)
+        return len(self._assigned)
+
+    def clear(self):
+        """Remove everything apply() set up."""
+        if self._active:
+            for command in (
+                ["tc", "qdisc", "del", "dev", self.interface, "root"],
+                ["tc", "qdisc", "del", "dev", self.interface, "ingress"],
+                ["ip", "link", "del", self.ifb_interface],
+            ):
+                self._run(command)
+        self._assigned.clear()
+        self._free_slots.clear()
+        self._active = False
+
+    def _run_command(self, command: Command) -> bool:
+        try:
+            result = subprocess.run(
+                command,
+                capture_output=True,
+                text=True,
+                timeout=SHAPING_COMMAND_TIMEOUT,
+            )
+        except (OSError, subprocess.SubprocessError) as e:
+            self.log(f"[{LogLevel.DEBUG}] {' '.join(command)} failed: {e}")
+            return False
+        if result.returncode != 0:
+            self.log(
+                f"[{LogLevel.DEBUG}] {' '.join(command)} failed: "
+                f"{result.stderr.strip()}"
+            )
+            return False
+        return True
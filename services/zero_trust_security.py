@@ -11,6 +11,7 @@ from dataclasses import dataclass
 from enum import Enum
 from collections import deque, defaultdict
 from constants import LogLevel
+from utils.rule_compiler import CidrTrie, first_match
 import ipaddress
 
 
@@ -180,6 +181,71 @@ class IdentityVerifier:
             return self.identities.get(identity_id)
 
 
+class _PolicyIndex:
+    """سیاست‌های کامپایل‌شده؛ هر فیلد یک bitmask از سیاست‌های منطبق می‌دهد
+
+    بیت i یعنی سیاست i به ترتیب افزودن؛ سیاستی که فیلدی ندارد بیتش در همه
+    مقادیر آن فیلد روشن است و اولین سیاست منطبق کم‌ارزش‌ترین بیت است.
+    """
+
+    def __init__(self, policies: List[Dict[str, Any]]):
+        self.policies = policies
+        self._types: Dict[str, int] = defaultdict(int)
+        self._any_type = 0
+        self._trust = {level.value: 0 for level in TrustLevel}
+        self._ips = CidrTrie()
+        self._any_ip = 0
+        self._resources: Dict[str, int] = defaultdict(int)
+        self._any_resource = 0
+
+        for index, policy in enumerate(policies):
+            bit = 1 << index
+            if "identity_types" in policy:
+                for identity_type in policy["identity_types"]:
+                    self._types[identity_type] |= bit
+            else:
+                self._any_type |= bit
+
+            min_trust = policy.get("min_trust_level", TrustLevel.UNTRUSTED.value)
+            for level in self._trust:
+                if level >= min_trust:
+                    self._trust[level] |= bit
+
+            if "allowed_ips" in policy:
+                for entry in policy["allowed_ips"]:
+                    try:
+                        self._ips.add(ipaddress.ip_network(entry, strict=False), bit)
+                    except ValueError:
+                        print(
+                            f"[{LogLevel.WARNING}] Invalid IP range {entry!r} "
+                            f"in policy {policy.get('name', index)}"
+                        )
+            else:
+                self._any_ip |= bit
+
+            if "resources" in policy:
+                for resource in policy["resources"]:
+                    if resource == "*":
+                        self._any_resource |= bit
+                    else:
+                        self._resources[resource] |= bit
+            else:
+                self._any_resource |= bit
+
+    def match(
+        self, request: AccessRequest, identity: Identity
+    ) -> Optional[Dict[str, Any]]:
+        mask = self._types.get(identity.type, 0) | self._any_type
+        mask &= self._trust.get(identity.trust_level.value, 0)
+        if mask:
+            mask &= self._resources.get(request.resource, 0) | self._any_resource
+        if mask:
+            mask &= self._ips.match(request.source_ip) | self._any_ip
+        if not mask:
+            return None
+        return self.policies[first_match(mask)]
+
+
 class PolicyEngine:
     """موتور سیاست‌های امنیتی"""
 
@@ -187,68 +253,36 @@ class PolicyEngine:
         self.policies: Dict[str, Dict[str, Any]] = {}
         self.default_policy = SecurityPolicy.DENY_ALL
         self._lock = threading.Lock()
+        self._index: Optional[_PolicyIndex] = None
 
     def add_policy(self, name: str, policy: Dict[str, Any]):
         """اضافه کردن سیاست"""
         with self._lock:
             self.policies[name] = policy
+            self._index = None
             print(f"[{LogLevel.INFO}] Security policy added: {name}")
 
+    def remove_policy(self, name: str):
+        """حذف سیاست"""
+        with self._lock:
+            if self.policies.pop(name, None) is not None:
+                self._index = None
+
     def evaluate_access(
         self, request: AccessRequest, identity: Identity
     ) -> Tuple[bool, str]:
         """ارزیابی دسترسی"""
         with self._lock:
-            # بررسی سیاست‌های موجود
-            for policy_name, policy in self.policies.items():
-                if self._matches_policy(request, identity, policy):
-                    return self._apply_policy(request, identity, policy)
+            # فهرست سیاست‌ها فقط پس از تغییر دوباره کامپایل می‌شود
+            if self._index is None:
+                self._index = _PolicyIndex(list(self.policies.values()))
+            policy = self._index.match(request, identity)
+            if policy is not None:
+                return self._apply_policy(request, identity, policy)
 
             # اعمال سیاست پیش‌فرض
             return self._apply_default_policy(request, identity)
 
-    def _matches_policy(
-        self, request: AccessRequest, identity: Identity, policy: Dict[str, Any]
-    ) -> bool:
-        """بررسی تطبیق با سیاست"""
-        # بررسی نوع هویت
-        if "identity_types" in policy:
-            if identity.type not in policy["identity_types"]:
-                return False
-
-        # بررسی سطح اعتماد
-        if "min_trust_level" in policy:
-            if identity.trust_level.value < policy["min_trust_level"]:
-                return False
-
-        # بررسی منبع IP
-        if "allowed_ips" in policy:
-            if not self._ip_in_range(request.source_ip, policy["allowed_ips"]):
-                return False
-
-        # بررسی منابع
-        if "resources" in policy:
-            if request.resource not in policy["resources"]:
-                return False
-
-        return True
-
-    def _ip_in_range(self, ip: str, ranges: List[str]) -> bool:
-        """بررسی IP در محدوده"""
-        try:
-            ip_obj = ipaddress.ip_address(ip)
-            for range_str in ranges:
-                if "/" in range_str:
-                    network = ipaddress.ip_network(range_str, strict=False)
-                    if ip_obj in network:
-                        return True
-                else:
-                    if ip == range_str:
-                        return True
-        except ValueError:
-            pass
-        return False
-
     def _apply_policy(
         self, request: AccessRequest, identity: Identity, policy: Dict[str, Any]
     ) -> Tuple[bool, str]:
@@ -7,8 +7,11 @@ from constants import (
     DEFAULT_BYPASS_DOMAINS,
     DEFAULT_BYPASS_IPS,
     DEFAULT_LOG_LEVEL,
+    METRICS_EXPORTER_PORT,
+    CONTROL_API_PORT,
     LogLevel,
 )
+from managers.server_record import json_default
 
 DEFAULT_SETTINGS = {
     "app_version": APP_VERSION,
@@ -29,6 +32,7 @@ DEFAULT_SETTINGS = {
     "window_maximized": False,  # To store if the window was maximized
     "log_level": DEFAULT_LOG_LEVEL,
     "mux_padding": False,
+    "server_sort_mode": "ping",  # "ping" or "speed"
     # Security settings
     "enable_ipv6": True,
     "allow_insecure": False,
@@ -52,8 +56,14 @@ DEFAULT_SETTINGS = {
     "congestion_control": "Cubic",
     "enable_statistics": True,
     "statistics_interval": 5,
+    "metrics_exporter_enabled": False,  # Local OpenMetrics endpoint for scraping
+    "metrics_exporter_port": METRICS_EXPORTER_PORT,
+    # Headless daemon control API (daemon.py)
+    "control_api_port": CONTROL_API_PORT,
+    "control_api_token": "",
     # Advanced features
     "auto_failover_enabled": False,
+    "load_balancer_enabled": False,  # Spread traffic over several servers
     # Privacy settings
     "disable_telemetry": True,
     "disable_crash_reports": True,
@@ -74,7 +84,7 @@ def save_settings(settings_to_save, log_callback=None):
     """Saves settings to the settings file."""
     try:
         with open(SETTINGS_FILE, "w", encoding="utf-8") as f:
-            json.dump(settings_to_save, f, indent=2)
+            json.dump(settings_to_save, f, indent=2, default=json_default)
     except Exception as e:
         if log_callback:
             log_callback(f"Error saving settings: {e}", LogLevel.ERROR)
@@ -1,10 +1,20 @@
-import winreg
 import ctypes
 from constants import PROXY_SERVER_ADDRESS, PROXY_BYPASS, LogLevel
 
+try:
+    import winreg
+except ImportError:  # Not Windows: there is no system-wide proxy to manage
+    winreg = None
+
 
 def set_system_proxy(enable, settings, log_callback):
     """Sets or unsets the system-wide proxy settings for Windows."""
+    if winreg is None:
+        if log_callback:
+            log_callback(
+                "System proxy is only managed on Windows; skipping.", LogLevel.DEBUG
+            )
+        return
     try:
         key_path = r"Software\Microsoft\Windows\CurrentVersion\Internet Settings"
         with winreg.OpenKey(
@@ -0,0 +1,204 @@
+import unittest
+import sys
+import os
+import math
+import random
+import time
+
+import numpy as np
+
+# Add parent directory to path before importing
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from constants import AI_BASELINE_ALPHA
+from services.ai_optimization import (
+    AIPerformanceAnalyzer,
+    PerformanceMetrics,
+    _MetricBaseline,
+)
+
+
+def _quiet_log(message, level=None):
+    pass
+
+
+def metrics(server_id, ping, speed=math.nan, loss=0.0, timestamp=None):
+    return PerformanceMetrics(
+        timestamp=time.time() if timestamp is None else timestamp,
+        server_id=server_id,
+        ping=ping,
+        download_speed=speed,
+        upload_speed=math.nan,
+        packet_loss=loss,
+        jitter=math.nan,
+        cpu_usage=0,
+        memory_usage=0,
+        network_usage=0,
+        connection_stability=1,
+    )
+
+
+class TestMetricBaseline(unittest.TestCase):
+    def test_matches_exponentially_weighted_moments(self):
+        rng = np.random.default_rng(0)
+        values = rng.normal(200, 30, size=400)
+        baseline = _MetricBaseline()
+        for value in values:
+            baseline.update(value)
+
+        weights = (
+            AI_BASELINE_ALPHA
+            * (1 - AI_BASELINE_ALPHA) ** np.arange(len(values) - 1)[::-1]
+        )
+        self.assertAlmostEqual(baseline.mean, 200, delta=15)
+        self.assertAlmostEqual(baseline.std, 30, delta=10)
+        # The baseline mean is the EW average of the samples after the first
+        expected = values[0] * (1 - AI_BASELINE_ALPHA) ** (len(values) - 1)
+        expected += float(np.dot(weights, values[1:]))
+        self.assertAlmostEqual(baseline.mean, expected)
+
+    def test_sustained_shift_is_detected_and_noise_is_not(self):
+        rng = random.Random(1)
+        baseline = _MetricBaseline()
+        shifts = [baseline.update(rng.gauss(100, 10))[1] for _ in range(500)]
+        self.assertEqual(shifts.count(1) + shifts.count(-1), 0)
+
+        detected = None
+        for i in range(30):
+            if baseline.update(rng.gauss(125, 10))[1] == 1:
+                detected = i
+                break
+        self.assertIsNotNone(detected)
+        self.assertLess(detected, 15)
+
+
+class TestAIPerformanceAnalyzer(unittest.TestCase):
+    def test_degrading_server_gets_one_recommendation(self):
+        analyzer = AIPerformanceAnalyzer(_quiet_log)
+        rng = random.Random(2)
+        for _ in range(100):
+            analyzer.add_metrics(metrics("a", rng.gauss(80, 8), rng.gauss(90, 5)))
+            analyzer.add_metrics(metrics("b", rng.gauss(80, 8), rng.gauss(90, 5)))
+        self.assertFalse(
+            [
+                r
+                for r in analyzer.get_recommendations()
+                if r.recommendation_type != "immediate_action"
+            ]
+        )
+
+        for _ in range(100):
+            analyzer.add_metrics(metrics("a", rng.gauss(160, 8), rng.gauss(90, 5)))
+            analyzer.add_metrics(metrics("b", rng.gauss(80, 8), rng.gauss(90, 5)))
+            analyzer.get_recommendations()
+
+        kinds = {
+            (r.recommendation_type, r.parameters.get("server_id"))
+            for r in analyzer.get_recommendations()
+        }
+        self.assertIn(("ping_optimization", "a"), kinds)
+        self.assertNotIn(("ping_optimization", "b"), kinds)
+        self.assertEqual(
+            sum(
+                r.recommendation_type == "ping_optimization"
+                for r in analyzer.recommendations
+            ),
+            1,
+        )
+        self.assertGreater(
+            analyzer.get_server_state("a")["metrics"]["ping"]["mean"], 120
+        )
+
+    def test_packet_loss_and_jitter_advice_are_kept_apart(self):
+        rng = random.Random(3)
+        analyzer = AIPerformanceAnalyzer(_quiet_log)
+
+        def sample(loss, jitter):
+            sample = metrics("a", rng.gauss(80, 8), loss=rng.gauss(loss, 0.2))
+            sample.jitter = rng.gauss(jitter, 1)
+            return sample
+
+        for _ in range(300):
+            analyzer.add_metrics(sample(1, 5))
+        for _ in range(100):
+            analyzer.add_metrics(sample(3, 15))
+            analyzer.get_recommendations()
+
+        # Each shifted metric keeps its own advice alongside any anomaly alert
+        shifted = {
+            r.parameters.get("metric")
+            for r in analyzer.get_recommendations()
+            if r.recommendation_type != "immediate_action"
+        }
+        self.assertEqual(shifted, {"packet_loss", "jitter"})
+
+    def test_only_changed_servers_are_reevaluated(self):
+        analyzer = AIPerformanceAnalyzer(_quiet_log)
+        for i in range(50):
+            for server in ("a", "b", "c"):
+                analyzer.add_metrics(metrics(server, 50 + i % 3, 100))
+        analyzer.get_recommendations()
+        self.assertEqual(analyzer._dirty, set())
+
+        analyzer.add_metrics(metrics("a", 51, 100))
+        self.assertEqual(analyzer._dirty, set())
+        for _ in range(5):
+            analyzer.add_metrics(metrics("b", 400, 100))
+        self.assertEqual(analyzer._dirty, {"b"})
+
+    def test_failed_health_results_raise_an_immediate_action(self):
+        analyzer = AIPerformanceAnalyzer(_quiet_log)
+        server = {"id": "a"}
+        for i in range(30):
+            analyzer.add_health_result(server, 100 + i % 5, -1)
+        analyzer.add_health_result(server, -1, -1)
+        actions = [
+            r
+            for r in analyzer.get_recommendations()
+            if r.recommendation_type == "immediate_action"
+        ]
+        self.assertEqual(len(actions), 1)
+        self.assertEqual(actions[0].parameters["metric"], "packet_loss")
+        self.assertEqual(
+            analyzer.get_server_state("a")["metrics"]["ping"]["samples"], 30
+        )
+
+    def test_summary_averages_recent_measured_values(self):
+        analyzer = AIPerformanceAnalyzer(_quiet_log)
+        for i in range(120):
+            analyzer.add_metrics(metrics("a", float(i), speed=math.nan))
+        summary = analyzer.get_performance_summary()
+        self.assertEqual(summary["total_metrics"], 120)
+        self.assertEqual(summary["recent_metrics"], 50)
+        self.assertAlmostEqual(summary["avg_ping"], np.mean(np.arange(70, 120)))
+        self.assertEqual(summary["avg_download_speed"], 0.0)
+
+    def test_hour_counts_follow_the_history_window(self):
+        analyzer = AIPerformanceAnalyzer(_quiet_log)
+        start = time.time()
+        timestamps = [start + i * 60 for i in range(2500)]
+        for timestamp in timestamps:
+            analyzer.add_metrics(metrics("a", 50, timestamp=timestamp))
+        expected = [0] * 24
+        # Only the last 1000 metrics count
+        for timestamp in timestamps[-1000:]:
+            expected[time.localtime(timestamp).tm_hour] += 1
+        self.assertEqual(analyzer._hour_counts, expected)
+        self.assertIn("hourly_usage", analyzer.get_traffic_patterns())
+
+    def test_sweep_throughput(self):
+        analyzer = AIPerformanceAnalyzer(_quiet_log)
+        rng = random.Random(3)
+        sweep = [
+            metrics(f"s{i % 2000}", rng.gauss(200, 40), rng.gauss(50, 10))
+            for i in range(20000)
+        ]
+        started = time.perf_counter()
+        analyzer.add_metrics_batch(sweep)
+        analyzer.get_recommendations()
+        elapsed = time.perf_counter() - started
+        self.assertGreater(len(sweep) / elapsed, 5000)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,155 @@
+import unittest
+import sys
+import os
+import threading
+
+# Add parent directory to path before importing
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from constants import FAILOVER_SLOT_PORT, PROXY_HOST, PROXY_SERVER_ADDRESS
+from services import probe_bus
+from services.speed_test_service import AutoFailoverService
+
+
+def _quiet_log(message, level=None):
+    pass
+
+
+class ScriptedFailover(AutoFailoverService):
+    """Probes answer from a table of proxy address -> latency."""
+
+    def __init__(self, latencies):
+        super().__init__(_quiet_log)
+        self.latencies = latencies
+
+    def _probe_fn(self, proxy_address):
+        return lambda: self.latencies.get(proxy_address, -1)
+
+
+def slot_address(slot):
+    return f"{PROXY_HOST}:{FAILOVER_SLOT_PORT + slot}"
+
+
+SERVERS = [
+    {"id": "a", "name": "a", "url_ping": 50},
+    {"id": "b", "name": "b", "url_ping": 300},
+    {"id": "c", "name": "c", "tcp_ping": 80},
+    {"id": "d", "name": "d", "url_ping": -1},
+]
+
+
+class TestAutoFailover(unittest.TestCase):
+    def setUp(self):
+        # Results another test's scripted probes left on the shared bus
+        # would otherwise count as fresh
+        probe_bus._probe_bus = probe_bus.ProbeBus(_quiet_log)
+
+    def test_rank_alternates_prefers_health_data(self):
+        service = AutoFailoverService(_quiet_log)
+        stats = {"b": {"url_ema": 20.0, "failures": 0}, "c": {"failures": 3}}
+        ranked = service.rank_alternates(SERVERS, SERVERS[0], stats.get)
+        # b by its EMA, c's ping doubled per failure; d never answered
+        self.assertEqual([s["id"] for s in ranked], ["b", "c"])
+        self.assertEqual(len(service.rank_alternates(SERVERS, None, k=1)), 1)
+
+    def test_switches_to_warm_standby_without_restart(self):
+        service = ScriptedFailover(
+            {
+                PROXY_SERVER_ADDRESS: -1,
+                slot_address(1): 400,
+                slot_address(2): 90,
+            }
+        )
+        switched = threading.Event()
+        selected = []
+
+        def standby_switch(slot):
+            selected.append(slot)
+            return True
+
+        restarts = []
+        service.start_monitoring(
+            SERVERS,
+            SERVERS[0],
+            failover_callback=restarts.append,
+            standby_servers=[SERVERS[1], SERVERS[2]],
+            standby_switch=standby_switch,
+            switched_callback=lambda server: switched.set(),
+        )
+        try:
+            self.assertTrue(switched.wait(5))
+        finally:
+            service.stop_monitoring()
+
+        self.assertEqual(selected, [2])
+        self.assertEqual(restarts, [])
+        self.assertEqual(service._current_server["id"], "c")
+
+    def test_restarts_on_best_alternate_without_standby(self):
+        service = ScriptedFailover({PROXY_SERVER_ADDRESS: -1})
+        restarted = threading.Event()
+        restarts = []
+        standbys = []
+
+        def failover(server):
+            restarts.append(server)
+            standbys.extend(service.get_standby_servers())
+            restarted.set()
+
+        service.start_monitoring(SERVERS, SERVERS[0], failover_callback=failover)
+        try:
+            self.assertTrue(restarted.wait(5))
+        finally:
+            service.stop_monitoring()
+
+        self.assertEqual(restarts[0]["id"], "c")
+        # The restarted core gets the next best alternates as standbys
+        self.assertEqual([s["id"] for s in standbys], ["b"])
+
+    def test_predicted_failure_moves_to_standby_while_answering(self):
+        class Predictor:
+            def __init__(self):
+                self.samples = []
+
+            def record_probe(self, server_id, latency):
+                self.samples.append((server_id, latency))
+
+            def should_failover(self, server_id):
+                return len(self.samples) >= 3
+
+            def reset_server(self, server_id):
+                pass
+
+        service = ScriptedFailover(
+            {PROXY_SERVER_ADDRESS: 700, slot_address(1): 80, slot_address(2): 300}
+        )
+        predictor = Predictor()
+        switched = threading.Event()
+        selected = []
+        restarts = []
+
+        def standby_switch(slot):
+            selected.append(slot)
+            return True
+
+        service.start_monitoring(
+            SERVERS,
+            SERVERS[0],
+            failover_callback=restarts.append,
+            standby_servers=[SERVERS[1], SERVERS[2]],
+            standby_switch=standby_switch,
+            switched_callback=lambda server: switched.set(),
+            predictor=predictor,
+        )
+        try:
+            self.assertTrue(switched.wait(5))
+        finally:
+            service.stop_monitoring()
+
+        self.assertEqual(predictor.samples[:3], [("a", 700)] * 3)
+        self.assertEqual(selected, [1])
+        self.assertEqual(restarts, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,47 @@
+import unittest
+import sys
+import os
+
+# Add parent directory to path before importing
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import link_parser
+from benchmarks.corpus import PROTOCOLS, make_links
+from benchmarks.run_benchmarks import compare, run_case
+
+
+class TestBenchmarkCorpus(unittest.TestCase):
+    def test_links_parse_and_round_trip(self):
+        links = make_links(60)
+        self.assertEqual(links, make_links(60))
+        configs = [link_parser.parse_server_link(link) for link in links]
+        self.assertEqual(
+            [c["protocol"] for c in configs[: len(PROTOCOLS)]], list(PROTOCOLS)
+        )
+        for config in configs:
+            again = link_parser.parse_server_link(
+                link_parser.generate_server_link(config)
+            )
+            self.assertEqual(
+                (again["protocol"], again["server"], again["port"]),
+                (config["protocol"], config["server"], config["port"]),
+            )
+
+    def test_duplicate_ratio_repeats_links(self):
+        links = make_links(200, duplicate_ratio=0.5)
+        self.assertLess(len(set(links)), 150)
+
+
+class TestBenchmarkRunner(unittest.TestCase):
+    def test_run_case_and_compare(self):
+        result = run_case("parse", 30, repeat=1)
+        self.assertGreater(result["ops_per_second"], 0)
+        baseline = {
+            "parse@30": dict(result, ops_per_second=result["ops_per_second"] * 10)
+        }
+        self.assertEqual(compare({"parse@30": result}, {}, 0.3), [])
+        self.assertEqual(len(compare({"parse@30": result}, baseline, 0.3)), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -45,6 +45,33 @@ class TestConfigGenerator(unittest.TestCase):
             {"rule_set": ["geoip-ir"], "outbound": "direct"}, config["route"]["rules"]
         )
 
+    def test_standby_servers_become_failover_slots(self):
+        servers = [
+            {"protocol": "trojan", "server": f"s{i}", "port": 443, "password": "pw"}
+            for i in range(3)
+        ]
+        settings = {"dns_servers": "", "bypass_domains": "", "bypass_ips": ""}
+        config = generate_config_json(servers[0], settings, servers[1:])
+
+        outbounds = {o["tag"]: o for o in config["outbounds"]}
+        selector = outbounds["proxy-out"]
+        self.assertEqual(selector["type"], "selector")
+        self.assertEqual(
+            selector["outbounds"], ["failover-0", "failover-1", "failover-2"]
+        )
+        self.assertEqual(selector["default"], "failover-0")
+        self.assertEqual(outbounds["failover-2"]["server"], "s2")
+
+        ports = [
+            i["listen_port"] for i in config["inbounds"] if i["tag"].endswith("-in")
+        ]
+        self.assertIn(2092, ports)
+        self.assertEqual(
+            config["route"]["rules"][0],
+            {"inbound": ["failover-0-in"], "outbound": "failover-0"},
+        )
+        self.assertEqual(config["route"]["final"], "proxy-out")
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,141 @@
+import unittest
+import sys
+import os
+import subprocess
+
+import requests
+
+# Add parent directory to path before importing
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from daemon import OnixDaemon
+from services.control_api import ControlApiError, ControlApiServer
+
+PACKAGE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+
+def _quiet(msg, level):
+    pass
+
+
+class FakeController:
+    def __init__(self):
+        self.connected = None
+
+    def get_status(self, body):
+        return {"status": "Connected" if self.connected else "Disconnected"}
+
+    def connect(self, body):
+        if "server_id" not in body:
+            raise ControlApiError("server_id is required")
+        self.connected = body["server_id"]
+        return {"connecting": self.connected}
+
+
+class TestControlApiServer(unittest.TestCase):
+    def test_dispatch_routes_and_errors(self):
+        controller = FakeController()
+        api = ControlApiServer(controller, _quiet)
+        self.assertEqual(
+            api.dispatch("POST", "/connect", {}),
+            (400, {"error": "server_id is required"}),
+        )
+        self.assertEqual(api.dispatch("POST", "/switch", {"server_id": "b"})[0], 200)
+        self.assertEqual(controller.connected, "b")
+        self.assertEqual(api.dispatch("DELETE", "/connect", {})[0], 404)
+
+    def test_token_is_required_over_http(self):
+        api = ControlApiServer(FakeController(), _quiet, port=0, token="secret")
+        self.assertTrue(api.start())
+        try:
+            session = requests.Session()
+            session.trust_env = False
+            url = f"http://127.0.0.1:{api.port}"
+            denied = session.get(url + "/status", timeout=2)
+            allowed = session.post(
+                url + "/connect",
+                json={"server_id": "a"},
+                headers={"Authorization": "Bearer secret"},
+                timeout=2,
+            )
+        finally:
+            api.stop()
+        self.assertEqual(denied.status_code, 401)
+        self.assertEqual(allowed.json(), {"connecting": "a"})
+
+    def test_requests_a_browser_could_forge_are_refused_without_a_token(self):
+        api = ControlApiServer(FakeController(), _quiet, port=0)
+        self.assertTrue(api.start())
+        try:
+            session = requests.Session()
+            session.trust_env = False
+            url = f"http://127.0.0.1:{api.port}"
+
+            def post(**kwargs):
+                return session.post(url + "/connect", timeout=2, **kwargs).status_code
+
+            allowed = post(json={"server_id": "a"})
+            form = post(
+                data='{"server_id": "a"}', headers={"Content-Type": "text/plain"}
+            )
+            cross_origin = post(
+                json={"server_id": "a"}, headers={"Origin": "https://evil.example"}
+            )
+            rebound = post(
+                json={"server_id": "a"}, headers={"Host": f"evil.example:{api.port}"}
+            )
+            status = session.get(
+                url + "/status", headers={"Host": f"localhost:{api.port}"}, timeout=2
+            )
+        finally:
+            api.stop()
+        self.assertEqual(allowed, 200)
+        self.assertEqual(form, 415)
+        self.assertEqual(cross_origin, 403)
+        self.assertEqual(rebound, 403)
+        self.assertEqual(status.status_code, 200)
+
+
+class TestOnixDaemon(unittest.TestCase):
+    def setUp(self):
+        settings = {
+            "servers": {
+                "Default": [
+                    {"id": "s1", "name": "One", "protocol": "vless"},
+                    {"id": "s2", "name": "Two", "protocol": "trojan"},
+                ]
+            }
+        }
+        self.daemon = OnixDaemon(settings, _quiet)
+        self.daemon.server_manager.load_servers()
+
+    def tearDown(self):
+        self.daemon.server_manager.shutdown()
+
+    def test_handlers(self):
+        servers = self.daemon.list_servers({"group": "Default"})
+        self.assertEqual([s["id"] for s in servers], ["s1", "s2"])
+        with self.assertRaises(ControlApiError) as ctx:
+            self.daemon.connect({"server_id": "missing"})
+        self.assertEqual(ctx.exception.status, 404)
+        with self.assertRaises(ControlApiError):
+            self.daemon.run_test({"type": "icmp"})
+        self.assertEqual(self.daemon.get_status({})["status"], "Disconnected")
+
+    def test_headless_import_does_not_load_qt(self):
+        code = (
+            "import sys, daemon, managers.server_manager, link_parser;"
+            "print(any(m.startswith('PySide6') for m in sys.modules))"
+        )
+        output = subprocess.run(
+            [sys.executable, "-c", code],
+            cwd=PACKAGE_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+        self.assertEqual(output.strip(), "False")
+
+
+if __name__ == "__main__":
+    unittest.main()
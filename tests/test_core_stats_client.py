@@ -0,0 +1,103 @@
+import unittest
+import sys
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+# Add parent directory to path before importing
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from services.core_stats_client import (
+    ClashApiStatsClient,
+    RateRing,
+    XrayMetricsStatsClient,
+)
+
+
+class TestRateRing(unittest.TestCase):
+    def test_latest_and_average_rate(self):
+        ring = RateRing(capacity=4)
+        ring.push(0.0, 0, 0)
+        ring.push(1.0, 100, 1000)
+        ring.push(2.0, 300, 1500)
+        self.assertEqual(ring.latest_rate(), (200.0, 500.0))
+        self.assertEqual(ring.average_rate(), (150.0, 750.0))
+
+    def test_wraps_around_capacity(self):
+        ring = RateRing(capacity=3)
+        for second in range(10):
+            ring.push(float(second), second * 10, second * 20)
+        self.assertEqual(len(ring), 3)
+        history = ring.history()
+        self.assertEqual([p["timestamp"] for p in history], [8.0, 9.0])
+        self.assertEqual(history[-1]["download_speed"], 20.0)
+
+    def test_counter_reset_clears_history(self):
+        ring = RateRing(capacity=4)
+        ring.push(0.0, 500, 500)
+        ring.push(1.0, 600, 600)
+        ring.push(2.0, 10, 10)
+        self.assertEqual(len(ring), 1)
+        self.assertEqual(ring.latest_rate(), (0.0, 0.0))
+
+
+class TestCoreStatsClients(unittest.TestCase):
+    def test_clash_api_groups_connections_by_outbound(self):
+        client = ClashApiStatsClient()
+        client._get_json = lambda path: {
+            "uploadTotal": 30,
+            "downloadTotal": 300,
+            "connections": [
+                {"upload": 10, "download": 100, "chains": ["proxy-out"]},
+                {"upload": 5, "download": 50, "chains": ["proxy-out"]},
+                {"upload": 1, "download": 2, "chains": ["direct"]},
+            ],
+        }
+        snapshot = client.read_traffic()
+        self.assertEqual(snapshot.upload_total, 30)
+        self.assertEqual(snapshot.outbounds["proxy-out"], (15, 150))
+        self.assertEqual(len(snapshot.connections), 3)
+
+    def test_xray_metrics_sums_outbounds(self):
+        client = XrayMetricsStatsClient()
+        client._get_json = lambda path: {
+            "stats": {
+                "outbound": {
+                    "proxy-out": {"uplink": 7, "downlink": 70},
+                    "direct": {"uplink": 3, "downlink": 30},
+                }
+            }
+        }
+        snapshot = client.read_traffic()
+        self.assertEqual(snapshot.upload_total, 10)
+        self.assertEqual(snapshot.download_total, 100)
+
+    def test_stream_traffic_decodes_pushed_lines(self):
+        class TrafficHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.end_headers()
+                for up, down in ((1, 10), (2, 20), (3, 30)):
+                    self.wfile.write(f'{{"up":{up},"down":{down}}}\n'.encode())
+                    self.wfile.flush()
+
+            def log_message(self, *args):
+                pass
+
+        server = HTTPServer(("127.0.0.1", 0), TrafficHandler)
+        threading.Thread(target=server.handle_request, daemon=True).start()
+        try:
+            client = ClashApiStatsClient(port=server.server_address[1])
+            samples = list(client.stream_traffic(threading.Event()))
+        finally:
+            server.server_close()
+        self.assertEqual(samples, [(1, 10), (2, 20), (3, 30)])
+
+    def test_unreachable_api_returns_none(self):
+        client = ClashApiStatsClient(port=1)
+        self.assertIsNone(client.read_traffic())
+
+
+if __name__ == "__main__":
+    unittest.main()
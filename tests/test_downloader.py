@@ -0,0 +1,218 @@
+import unittest
+import sys
+import os
+import hashlib
+import io
+import tarfile
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+# Add parent directory to path before importing
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from utils import core_updater, downloader
+from utils.downloader import DownloadError, download_file
+
+
+class _FileServer:
+    """Serves one payload with optional Range support and dropped connections."""
+
+    def __init__(self, payload, ranges=True, etag='"v1"'):
+        self.payload = payload
+        self.ranges = ranges
+        self.etag = etag
+        self.cut_after = None  # Bytes sent before the connection is dropped
+        self.cuts_left = 0
+        self.requests = []
+        self.sent = 0
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                header = self.headers.get("Range")
+                with server._lock:
+                    server.requests.append(header)
+                    cut = server.cut_after if server.cuts_left else None
+                    if cut is not None:
+                        server.cuts_left -= 1
+                data = server.payload
+                start, end = 0, len(data) - 1
+                # RFC 9110: If-Range with a weak validator gets the whole file
+                if_range = self.headers.get("If-Range")
+                weak = if_range is not None and if_range.startswith("W/")
+                if header and server.ranges and not weak:
+                    first, _, last = header[len("bytes=") :].partition("-")
+                    start, end = int(first), int(last or end)
+                    self.send_response(206)
+                    self.send_header(
+                        "Content-Range", f"bytes {start}-{end}/{len(data)}"
+                    )
+                else:
+                    self.send_response(200)
+                self.send_header("Content-Length", str(end - start + 1))
+                self.send_header("ETag", server.etag)
+                self.end_headers()
+                body = data[start : end + 1]
+                if cut is not None and end - start > 0:
+                    body = body[:cut]
+                self.wfile.write(body)
+                with server._lock:
+                    server.sent += len(body)
+                if cut is not None:
+                    self.close_connection = True
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}/asset"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class TestDownloadFile(unittest.TestCase):
+    def setUp(self):
+        self.payload = os.urandom(5 * 1024 * 1024 + 123)
+        self.sha256 = hashlib.sha256(self.payload).hexdigest()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.destination = os.path.join(self.tmp.name, "asset.bin")
+        patcher = mock.patch.object(downloader, "DOWNLOAD_RETRY_DELAY", 0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _read(self):
+        with open(self.destination, "rb") as f:
+            return f.read()
+
+    def test_large_file_is_fetched_in_parallel_segments(self):
+        server = _FileServer(self.payload)
+        try:
+            download_file(server.url, self.destination, sha256=self.sha256)
+        finally:
+            server.close()
+        self.assertEqual(self._read(), self.payload)
+        # One probe, then one request per segment
+        self.assertEqual(len(server.requests), 5)
+        self.assertEqual(sorted(os.listdir(self.tmp.name)), ["asset.bin"])
+
+    def test_dropped_connections_resume_where_they_stopped(self):
+        server = _FileServer(self.payload)
+        server.cut_after = 300 * 1024
+        server.cuts_left = 6
+        try:
+            download_file(server.url, self.destination, sha256=self.sha256)
+        finally:
+            server.close()
+        self.assertEqual(self._read(), self.payload)
+        # Resumed requests don't start at a segment boundary
+        starts = {int(r[6:].split("-")[0]) for r in server.requests if r}
+        bounds = {len(self.payload) * i // 4 for i in range(4)}
+        self.assertTrue(starts - bounds)
+        self.assertLess(server.sent, len(self.payload) * 1.1)
+
+    def test_later_call_resumes_a_failed_download(self):
+        server = _FileServer(self.payload)
+        server.cut_after = 512 * 1024
+        server.cuts_left = 100
+        try:
+            with mock.patch.object(downloader, "DOWNLOAD_RETRIES", 0):
+                with self.assertRaises(DownloadError):
+                    download_file(server.url, self.destination)
+            self.assertTrue(os.path.exists(self.destination + ".part.json"))
+            server.cuts_left = 0
+            server.sent = 0
+            download_file(server.url, self.destination, sha256=self.sha256)
+        finally:
+            server.close()
+        self.assertEqual(self._read(), self.payload)
+        self.assertLess(server.sent, len(self.payload))
+
+    def test_checksum_mismatch_is_rejected(self):
+        server = _FileServer(self.payload[:1000])
+        try:
+            with self.assertRaises(DownloadError):
+                download_file(server.url, self.destination, sha256="0" * 64)
+        finally:
+            server.close()
+        self.assertEqual(os.listdir(self.tmp.name), [])
+
+    def test_weak_etag_still_allows_ranged_segments(self):
+        server = _FileServer(self.payload, etag='W/"v1"')
+        try:
+            download_file(server.url, self.destination, sha256=self.sha256)
+        finally:
+            server.close()
+        self.assertEqual(self._read(), self.payload)
+        self.assertEqual(len(server.requests), 5)
+
+    def test_server_without_ranges_streams_the_whole_file(self):
+        server = _FileServer(self.payload, ranges=False)
+        server.cut_after = 1024 * 1024
+        server.cuts_left = 2  # The probe and the first full request
+        try:
+            download_file(server.url, self.destination, sha256=self.sha256)
+        finally:
+            server.close()
+        self.assertEqual(self._read(), self.payload)
+
+
+class TestDownloadCore(unittest.TestCase):
+    def test_executable_is_extracted_from_the_archive_on_disk(self):
+        archive = io.BytesIO()
+        with tarfile.open(fileobj=archive, mode="w:gz") as tar:
+            info = tarfile.TarInfo("sing-box-1.0-linux-amd64/sing-box")
+            info.size = 7
+            tar.addfile(info, io.BytesIO(b"binary!"))
+        server = _FileServer(archive.getvalue())
+        with tempfile.TemporaryDirectory() as tmp:
+            core_path = os.path.join(tmp, "sing-box")
+            try:
+                ok = core_updater.download_core(
+                    server.url,
+                    "sing-box-1.0-linux-amd64.tar.gz",
+                    core_path,
+                    "sing-box",
+                    sha256=hashlib.sha256(archive.getvalue()).hexdigest(),
+                )
+            finally:
+                server.close()
+            self.assertTrue(ok)
+            with open(core_path, "rb") as f:
+                self.assertEqual(f.read(), b"binary!")
+            self.assertEqual(os.listdir(tmp), ["sing-box"])
+
+    def test_failed_extraction_leaves_nothing_behind(self):
+        archive = io.BytesIO()
+        with tarfile.open(fileobj=archive, mode="w:gz") as tar:
+            info = tarfile.TarInfo("README")
+            info.size = 2
+            tar.addfile(info, io.BytesIO(b"hi"))
+        server = _FileServer(archive.getvalue())
+        errors = []
+        with tempfile.TemporaryDirectory() as tmp:
+            try:
+                ok = core_updater.download_core(
+                    server.url,
+                    "sing-box-1.0-linux-amd64.tar.gz",
+                    os.path.join(tmp, "sing-box"),
+                    "sing-box",
+                    callbacks={"show_error": lambda title, msg: errors.append(title)},
+                )
+            finally:
+                server.close()
+            self.assertFalse(ok)
+            self.assertEqual(errors, ["Extraction Error"])
+            self.assertEqual(os.listdir(tmp), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
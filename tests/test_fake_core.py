@@ -0,0 +1,80 @@
+import unittest
+import sys
+import os
+
+# Add parent directory to path before importing
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from benchmarks.fake_core import FakeCore, TargetServer, serve_in_thread
+from network_tester import find_free_port
+from services.ping_service import proxy_tcp_connect, url_latency_via_proxy
+from services.speed_test_service import download_throughput_via_proxy
+
+FAST = {"latency_ms": [0, 0], "jitter_ms": 0, "loss": 0.0, "failure_rate": 0.0}
+
+
+def _config(ports):
+    return {
+        "inbounds": [
+            {"type": "http", "tag": f"http-in-{i}", "listen_port": port}
+            for i, port in enumerate(ports)
+        ],
+        "outbounds": [
+            {"type": "vless", "tag": f"proxy-out-{i}", "server": f"10.0.0.{i}"}
+            for i in range(len(ports))
+        ],
+        "route": {
+            "rules": [
+                {"inbound": f"http-in-{i}", "outbound": f"proxy-out-{i}"}
+                for i in range(len(ports))
+            ]
+        },
+    }
+
+
+class TestFakeCore(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.target = serve_in_thread(TargetServer())
+        cls.ports = [find_free_port(), find_free_port()]
+        cls.core = serve_in_thread(
+            FakeCore(
+                _config(cls.ports),
+                ("127.0.0.1", cls.target.port),
+                FAST,
+            )
+        )
+
+    def test_probes_pass_through_to_target(self):
+        proxy = f"127.0.0.1:{self.ports[0]}"
+        self.assertGreaterEqual(proxy_tcp_connect(proxy, "8.8.8.8", 53), 0)
+        self.assertGreaterEqual(
+            url_latency_via_proxy(
+                proxy, "http://www.gstatic.com/generate_204", retries=0
+            ),
+            0,
+        )
+        speed = download_throughput_via_proxy(
+            proxy, "http://speedtest.example/1MB.zip", max_bytes=512 * 1024
+        )
+        self.assertGreater(speed, 0)
+
+    def test_dead_servers_fail(self):
+        core = FakeCore(
+            _config([find_free_port()]),
+            ("127.0.0.1", self.target.port),
+            dict(FAST, failure_rate=1.0),
+        )
+        serve_in_thread(core)
+        proxy = f"127.0.0.1:{next(iter(core.servers))}"
+        self.assertEqual(proxy_tcp_connect(proxy, "8.8.8.8", 53), -1)
+        self.assertEqual(
+            url_latency_via_proxy(
+                proxy, "http://www.gstatic.com/generate_204", retries=0
+            ),
+            -1,
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
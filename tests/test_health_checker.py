@@ -0,0 +1,57 @@
+import unittest
+import sys
+import os
+
+# Add parent directory to path before importing
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from services.health_checker import HealthChecker
+from utils.metrics import get_metrics_registry
+
+
+def _quiet_log(message, level=None):
+    pass
+
+
+def _gauges(name):
+    for family, _, _, metrics in get_metrics_registry().collect():
+        if family == name:
+            return {labels: metric.value for labels, metric in metrics}
+    return {}
+
+
+class TestServerHealthGauges(unittest.TestCase):
+    def test_servers_sharing_a_name_keep_separate_gauges(self):
+        checker = HealthChecker({}, _quiet_log)
+        checker._test_types = ["tcp"]
+        first = {"id": "hc-1", "name": "DE"}
+        second = {"id": "hc-2", "name": "DE"}
+        checker._export_server_health(first, {"tcp_ema": 40, "failures": 0}, 40, -1)
+        checker._export_server_health(second, {"tcp_ema": 90, "failures": 1}, 90, -1)
+
+        failures = _gauges("onix_server_consecutive_failures")
+        self.assertEqual(failures[(("server", "DE"), ("server_id", "hc-1"))], 0)
+        self.assertEqual(failures[(("server", "DE"), ("server_id", "hc-2"))], 1)
+
+        checker.forget_server("hc-1")
+        failures = _gauges("onix_server_consecutive_failures")
+        self.assertNotIn((("server", "DE"), ("server_id", "hc-1")), failures)
+        self.assertIn((("server", "DE"), ("server_id", "hc-2")), failures)
+
+        # A rename replaces the series instead of leaving the old name behind
+        checker._export_server_health(
+            dict(second, name="DE 2"), {"tcp_ema": 90, "failures": 0}, 90, -1
+        )
+        latency = [
+            labels
+            for labels in _gauges("onix_server_latency_ms")
+            if ("server_id", "hc-2") in labels
+        ]
+        self.assertEqual(
+            latency, [(("server", "DE 2"), ("server_id", "hc-2"), ("test", "tcp"))]
+        )
+        checker.forget_server("hc-2")
+
+
+if __name__ == "__main__":
+    unittest.main()
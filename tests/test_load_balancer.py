@@ -0,0 +1,242 @@
+import unittest
+import sys
+import os
+
+# Add parent directory to path before importing
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import config_generator
+from constants import LOAD_BALANCER_GROUP_TAG, LOAD_BALANCER_MIN_SHARE
+from managers.xray_generator import XrayConfigGenerator
+from services.core_stats_client import CoreTrafficSnapshot
+from services.load_balancer import (
+    LoadBalancerMonitor,
+    member_weights,
+    port_ranges,
+    select_members,
+)
+from services.traffic_management import LoadBalancer, LoadBalancingStrategy
+
+
+def _quiet_log(message, level=None):
+    pass
+
+
+def _server(name, ping):
+    return {
+        "id": name,
+        "name": name,
+        "protocol": "vless",
+        "server": f"{name}.example",
+        "port": 443,
+        "uuid": "00000000-0000-0000-0000-000000000000",
+        "tcp_ping": ping,
+    }
+
+
+SETTINGS = {"dns_servers": "", "bypass_domains": "", "bypass_ips": ""}
+
+
+def _ports(ranges):
+    total = 0
+    for item in ranges:
+        low, high = map(int, item.split(":"))
+        total += high - low + 1
+    return total
+
+
+class TestMemberSelection(unittest.TestCase):
+    def test_weights_follow_latency(self):
+        servers = [_server("a", 50), _server("b", 100), _server("c", 5000)]
+        weights = member_weights(servers)
+        self.assertAlmostEqual(sum(weights), 1)
+        self.assertAlmostEqual(weights[0], 2 * weights[1], delta=0.05)
+        self.assertGreaterEqual(weights[2], LOAD_BALANCER_MIN_SHARE)
+
+        failing = {"b": {"tcp_ema": 50, "failures": 3}}
+        members = select_members(
+            [*servers, _server("d", -1)], servers[2], lambda i: failing.get(i, {}), k=3
+        )
+        self.assertEqual([m["id"] for m in members], ["c", "a", "b"])
+
+    def test_port_ranges_cover_the_port_space_by_weight(self):
+        weights = [0.5, 0.3, 0.2]
+        ranges = port_ranges(weights)
+        self.assertEqual(sum(_ports(r) for r in ranges), 65536)
+        for share, member in zip(weights, ranges):
+            self.assertAlmostEqual(_ports(member) / 65536, share, delta=0.01)
+
+        # The Windows/macOS ephemeral range gets about the same mix
+        ephemeral = [
+            sum(
+                max(
+                    0,
+                    min(int(r.split(":")[1]), 65535)
+                    - max(int(r.split(":")[0]), 49152)
+                    + 1,
+                )
+                for r in member
+            )
+            / 16384
+            for member in ranges
+        ]
+        for share, got in zip(weights, ephemeral):
+            self.assertAlmostEqual(got, share, delta=0.03)
+
+
+class TestBalancerConfigs(unittest.TestCase):
+    def test_singbox_splits_by_source_port_with_urltest_fallback(self):
+        servers = [_server("a", 50), _server("b", 100)]
+        config = config_generator.generate_config_json(
+            servers[0],
+            SETTINGS,
+            balance_servers=servers[1:],
+            balance_weights=[0.6, 0.4],
+        )
+        outbounds = {o["tag"]: o for o in config["outbounds"]}
+        self.assertEqual(outbounds[LOAD_BALANCER_GROUP_TAG]["type"], "urltest")
+        self.assertEqual(
+            outbounds[LOAD_BALANCER_GROUP_TAG]["outbounds"], ["balance-0", "balance-1"]
+        )
+        self.assertEqual(
+            outbounds["balance-1-out"]["outbounds"],
+            ["balance-1", LOAD_BALANCER_GROUP_TAG],
+        )
+        split = [r for r in config["route"]["rules"] if "source_port_range" in r]
+        self.assertEqual(
+            [r["outbound"] for r in split], ["balance-0-out", "balance-1-out"]
+        )
+        self.assertIs(config["route"]["rules"][-1], split[-1])
+
+    def test_xray_uses_a_weighted_least_load_balancer(self):
+        servers = [_server("a", 50), _server("b", 100)]
+        settings = dict(
+            SETTINGS,
+            custom_routing_rules=[
+                {"type": "domain", "value": "example.com", "action": "proxy"}
+            ],
+        )
+        config = XrayConfigGenerator().generate_config_json(
+            servers[0], settings, servers[1:], [0.75, 0.25]
+        )
+        self.assertEqual(
+            [o["tag"] for o in config["outbounds"]],
+            ["balance-0", "balance-1", "direct", "block"],
+        )
+        balancer = config["routing"]["balancers"][0]
+        self.assertEqual(balancer["strategy"]["type"], "leastLoad")
+        self.assertEqual(
+            [c["value"] for c in balancer["strategy"]["settings"]["costs"]], [1, 3]
+        )
+        rules = config["routing"]["rules"]
+        self.assertEqual(rules[0]["balancerTag"], LOAD_BALANCER_GROUP_TAG)
+        self.assertNotIn("outboundTag", rules[0])
+        self.assertEqual(rules[-1]["balancerTag"], LOAD_BALANCER_GROUP_TAG)
+        self.assertIn("burstObservatory", config)
+
+
+class _FakeStats:
+    def __init__(self):
+        self.closed = False
+
+    def read_traffic(self):
+        return CoreTrafficSnapshot(
+            upload_total=30,
+            download_total=70,
+            outbounds={"balance-1": (30, 70)},
+        )
+
+    def close(self):
+        self.closed = True
+
+
+class _ProbingStats(_FakeStats):
+    def __init__(self):
+        super().__init__()
+        self.delays = {}
+        self.probed = []
+
+    def outbound_delay(self, tag, url, timeout):
+        self.probed.append(tag)
+        return self.delays.get(tag, 80)
+
+
+class TestLoadBalancerMonitor(unittest.TestCase):
+    def test_failed_member_is_switched_to_the_fallback(self):
+        health = {}
+        switches = []
+        stats = _FakeStats()
+        monitor = LoadBalancerMonitor(_quiet_log)
+        monitor.start(
+            [_server("a", 50), _server("b", 100)],
+            [0.6, 0.4],
+            lambda i: health.get(i, {}),
+            member_switch=lambda index, enabled: switches.append((index, enabled)),
+            stats_client=stats,
+        )
+        try:
+            monitor.check()
+            self.assertEqual(switches, [])
+            health["b"] = {"failures": 5}
+            monitor.check()
+            health["b"] = {"failures": 0}
+            monitor.check()
+            self.assertEqual(switches, [(1, False), (1, True)])
+            members = monitor.get_members()
+            self.assertEqual((members[1]["upload"], members[1]["download"]), (30, 70))
+            self.assertEqual(members[0]["upload"], 0)
+        finally:
+            monitor.stop()
+        self.assertTrue(stats.closed)
+
+    def test_member_failing_after_start_is_detected_by_probing(self):
+        # No health sweep runs in balancer mode, so the stats never change
+        switches = []
+        stats = _ProbingStats()
+        monitor = LoadBalancerMonitor(_quiet_log)
+        monitor.start(
+            [_server("a", 50), _server("b", 100)],
+            [0.6, 0.4],
+            lambda i: {"failures": 0},
+            member_switch=lambda index, enabled: switches.append((index, enabled)),
+            stats_client=stats,
+        )
+        try:
+            monitor.check()
+            self.assertEqual(switches, [])
+            self.assertEqual(stats.probed, ["balance-0", "balance-1"])
+
+            stats.delays["balance-1"] = -1
+            monitor.check()
+            self.assertEqual(switches, [])
+            monitor.check()
+            self.assertEqual(switches, [(1, False)])
+            self.assertFalse(monitor.get_members()[1]["healthy"])
+
+            del stats.delays["balance-1"]
+            monitor.check()
+            self.assertEqual(switches, [(1, False), (1, True)])
+        finally:
+            monitor.stop()
+
+
+class TestIpHashSelection(unittest.TestCase):
+    def test_clients_keep_their_server_when_others_leave(self):
+        balancer = LoadBalancer()
+        balancer.strategy = LoadBalancingStrategy.IP_HASH
+        servers = [f"s{i}" for i in range(5)]
+        for server in servers:
+            balancer.add_server(server)
+        clients = [f"10.0.0.{i}" for i in range(200)]
+        before = {c: balancer.select_server(c) for c in clients}
+        self.assertGreater(len(set(before.values())), 3)
+        self.assertEqual(before, {c: balancer.select_server(c) for c in clients})
+
+        balancer.remove_server("s0")
+        after = {c: balancer.select_server(c) for c in clients}
+        moved = [c for c in clients if before[c] != after[c]]
+        self.assertEqual(moved, [c for c in clients if before[c] == "s0"])
+
+
+if __name__ == "__main__":
+    unittest.main()
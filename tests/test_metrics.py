@@ -0,0 +1,96 @@
+import unittest
+import sys
+import os
+import threading
+
+# Add parent directory to path before importing
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from utils.metrics import Histogram, MetricsRegistry, TimeSeries, TrackedExecutor
+
+
+class TestHistogram(unittest.TestCase):
+    def test_percentiles_within_relative_error(self):
+        histogram = Histogram()
+        for value in range(1, 1001):
+            histogram.observe(float(value))
+        self.assertEqual(histogram.count, 1000)
+        for q, expected in ((50, 500), (90, 900), (99, 990)):
+            self.assertAlmostEqual(
+                histogram.percentile(q), expected, delta=expected / 16
+            )
+        self.assertEqual(histogram.percentile(100), 1000)
+
+    def test_cumulative_counts(self):
+        histogram = Histogram()
+        for value in (5, 50, 500):
+            histogram.observe(value)
+        self.assertEqual(histogram.cumulative_counts([10, 100, 1000]), [1, 2, 3])
+
+    def test_values_on_a_bound_count_in_that_bucket(self):
+        histogram = Histogram(buckets=(10, 100, 250))
+        for value in (10, 100, 250, 251):
+            histogram.observe(value)
+        self.assertEqual(histogram.cumulative_counts(), [1, 2, 3])
+        self.assertEqual(histogram.cumulative_counts([10, 100, 250]), [1, 2, 3])
+
+
+class TestTimeSeries(unittest.TestCase):
+    def test_downsampled_tiers(self):
+        series = TimeSeries(tiers=((1, 5), (10, 3)))
+        for second in range(30):
+            series.record(float(second), timestamp=1000.0 + second)
+        # Finest tier keeps only the newest five seconds
+        self.assertEqual(series.values(0), [25.0, 26.0, 27.0, 28.0, 29.0])
+        # Coarse tier holds 10 s means
+        self.assertEqual(series.values(1), [4.5, 14.5, 24.5])
+        self.assertEqual(series.latest(), 29.0)
+
+
+class TestMetricsRegistry(unittest.TestCase):
+    def test_get_or_create_and_type_conflict(self):
+        registry = MetricsRegistry(log_callback=lambda msg, level: None)
+        counter = registry.counter("onix_test_total", labels={"kind": "a"})
+        counter.inc(2)
+        self.assertIs(
+            registry.counter("onix_test_total", labels={"kind": "a"}), counter
+        )
+        with self.assertRaises(ValueError):
+            registry.gauge("onix_test_total")
+
+    def test_run_collectors_respects_interval(self):
+        registry = MetricsRegistry(log_callback=lambda msg, level: None)
+        calls = []
+
+        def sample():
+            calls.append(1)
+
+        registry._collectors["sample"] = {"fn": sample, "interval": 5, "next_run": 0}
+        for now in (100.0, 101.0, 104.0, 105.0):
+            registry.run_collectors(now)
+        self.assertEqual(len(calls), 2)
+
+    def test_remove_drops_matching_label_sets(self):
+        registry = MetricsRegistry(log_callback=lambda msg, level: None)
+        for server in ("a", "b"):
+            for test in ("tcp", "url"):
+                registry.gauge("onix_latency", labels={"server": server, "test": test})
+        registry.remove("onix_latency", {"server": "a"})
+        ((_, _, _, metrics),) = registry.collect()
+        self.assertEqual(sorted(dict(key)["server"] for key, _ in metrics), ["b", "b"])
+
+
+class TestTrackedExecutor(unittest.TestCase):
+    def test_pending_counts_unfinished_tasks(self):
+        release = threading.Event()
+        with TrackedExecutor(max_workers=1) as pool:
+            futures = [pool.submit(release.wait) for _ in range(3)]
+            self.assertEqual(pool.pending, 3)
+            release.set()
+            for future in futures:
+                future.result()
+        self.assertEqual(pool.pending, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+import unittest
+import sys
+import os
+
+import requests
+
+# Add parent directory to path before importing
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from services.metrics_exporter import MetricsExporter, render_openmetrics
+from utils.metrics import MetricsRegistry
+
+
+def _registry():
+    return MetricsRegistry(log_callback=lambda msg, level: None)
+
+
+class TestRenderOpenMetrics(unittest.TestCase):
+    def test_families_and_samples(self):
+        registry = _registry()
+        registry.counter("onix_core_starts_total", "Core starts", {"core": "Xray"}).inc(
+            2
+        )
+        registry.gauge("onix_server_latency_ms", labels={"server": 'a"b'}).set(42.5)
+        histogram = registry.histogram("onix_probe_latency_ms", buckets=(10, 100))
+        for value in (5, 50, 500):
+            histogram.observe(value)
+
+        lines = render_openmetrics(registry).splitlines()
+        self.assertIn("# TYPE onix_core_starts counter", lines)
+        self.assertIn('onix_core_starts_total{core="Xray"} 2', lines)
+        self.assertIn('onix_server_latency_ms{server="a\\"b"} 42.5', lines)
+        self.assertIn('onix_probe_latency_ms_bucket{le="10"} 1', lines)
+        self.assertIn('onix_probe_latency_ms_bucket{le="100"} 2', lines)
+        self.assertIn('onix_probe_latency_ms_bucket{le="+Inf"} 3', lines)
+        self.assertIn("onix_probe_latency_ms_sum 555", lines)
+        self.assertEqual(lines[-1], "# EOF")
+
+
+class TestMetricsExporter(unittest.TestCase):
+    def test_serves_metrics_over_http(self):
+        registry = _registry()
+        registry.gauge("onix_test_value").set(7)
+        exporter = MetricsExporter(lambda msg, level: None, registry=registry, port=0)
+        self.assertTrue(exporter.start())
+        try:
+            session = requests.Session()
+            session.trust_env = False
+            response = session.get(
+                f"http://127.0.0.1:{exporter.port}/metrics", timeout=2
+            )
+            missing = session.get(f"http://127.0.0.1:{exporter.port}/", timeout=2)
+        finally:
+            exporter.stop()
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("application/openmetrics-text", response.headers["Content-Type"])
+        self.assertIn("onix_test_value 7", response.text)
+        self.assertIn("onix_threads", response.text)
+        self.assertEqual(missing.status_code, 404)
+
+
+if __name__ == "__main__":
+    unittest.main()
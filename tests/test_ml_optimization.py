@@ -0,0 +1,200 @@
+import unittest
+import sys
+import os
+import random
+import tempfile
+import time
+
+import numpy as np
+
+# Add parent directory to path before importing
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from services.ml_optimization import (
+    AnomalyDetector,
+    MLOptimizationService,
+    PerformancePredictor,
+    RollingStats,
+    TrafficAnalyzer,
+)
+
+
+class TestRollingStats(unittest.TestCase):
+    def test_matches_full_window_recomputation(self):
+        rng = random.Random(7)
+        stats = RollingStats(window=50)
+        values = []
+        for _ in range(400):
+            value = rng.gauss(100, 15)
+            values.append(value)
+            stats.add(value)
+            window = values[-50:]
+            self.assertAlmostEqual(stats.mean, np.mean(window), places=9)
+            self.assertAlmostEqual(stats.std, np.std(window), places=6)
+            self.assertEqual(stats.min, min(window))
+            self.assertEqual(stats.max, max(window))
+
+
+class TestAnomalyDetector(unittest.TestCase):
+    def test_flags_outlier_after_training(self):
+        detector = AnomalyDetector()
+        for i in range(100):
+            detector.add_data_point({"latency": 50 + (i % 5), "loss": 0.01})
+        is_anomaly, _, anomalies = detector.detect_anomaly(
+            {"latency": 400, "loss": 0.01}
+        )
+        self.assertTrue(is_anomaly)
+        self.assertIn("latency", anomalies)
+
+
+def make_samples(count, seed=0):
+    rng = random.Random(seed)
+    samples = []
+    for _ in range(count):
+        features = {
+            "bandwidth": rng.uniform(10, 500),
+            "connections": rng.uniform(1, 200),
+            "response_time": rng.uniform(20, 300),
+        }
+        target = (
+            40
+            + 0.2 * features["bandwidth"]
+            - 0.1 * features["response_time"]
+            + rng.gauss(0, 1)
+        )
+        samples.append((features, target))
+    return samples
+
+
+class TestPerformancePredictor(unittest.TestCase):
+    def test_online_updates_match_batch_fit(self):
+        samples = make_samples(300)
+        online = PerformancePredictor()
+        for features, target in samples[:50]:
+            online.add_training_data(features, target)
+        online.train_model("m")
+        for features, target in samples[50:]:
+            online.add_training_data(features, target)
+
+        batch = PerformancePredictor()
+        for features, target in samples:
+            batch.add_training_data(features, target)
+        batch.train_model("m")
+        # Same scaling as the online model, fitted on everything at once
+        learner = batch._learners["m"]
+        learner.offset = online._learners["m"].offset
+        learner.scale = online._learners["m"].scale
+        features, targets = batch.training_data.arrays()
+        learner.fit(features, targets)
+
+        probe = [features for features, _ in make_samples(20, seed=1)]
+        np.testing.assert_allclose(
+            online.predict_batch("m", probe), batch.predict_batch("m", probe)
+        )
+        self.assertGreater(online.models["m"].accuracy, 0.95)
+
+    def test_fixed_schema_ignores_key_order(self):
+        predictor = PerformancePredictor()
+        for features, target in make_samples(100):
+            predictor.add_training_data(features, target)
+        predictor.train_model("m", "polynomial")
+
+        features = {"response_time": 100, "bandwidth": 300, "extra": 5}
+        single = predictor.predict("m", features)
+        reordered = {"bandwidth": 300, "connections": 0, "response_time": 100}
+        batch = predictor.predict_batch("m", [reordered, reordered])
+        self.assertAlmostEqual(single.prediction, batch[0])
+        self.assertAlmostEqual(single.prediction, 40 + 60 - 10, delta=2)
+        self.assertEqual(single.features_used, list(predictor.feature_names))
+
+    def test_models_persist_between_sessions(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "models.json")
+            service = MLOptimizationService(lambda message: None, models_file=path)
+            for features, target in make_samples(60):
+                service.add_performance_data(features, target)
+            service.performance_predictor.train_model("performance_model")
+            service.performance_predictor.save(path)
+            expected = service.predict_performance({"bandwidth": 200}).prediction
+
+            restored = MLOptimizationService(lambda message: None, models_file=path)
+            restored.start()
+            restored.stop()
+            self.assertAlmostEqual(
+                restored.predict_performance({"bandwidth": 200}).prediction, expected
+            )
+            self.assertEqual(len(restored.performance_predictor.training_data), 0)
+
+
+class TestTrafficAnalyzer(unittest.TestCase):
+    def test_incremental_aggregates_match_full_scan(self):
+        rng = random.Random(3)
+        analyzer = TrafficAnalyzer(window=500)
+        start = 1_700_000_000
+        for i in range(1300):
+            timestamp = start + i * 397
+            hour = time.localtime(timestamp).tm_hour
+            bandwidth = 100 + (60 if 18 <= hour <= 22 else 0) + i * 0.05
+            analyzer.add_traffic_data(
+                {
+                    "bandwidth": bandwidth + rng.gauss(0, 5),
+                    "connections": rng.randint(1, 40),
+                },
+                timestamp=timestamp,
+            )
+        patterns = analyzer.analyze_patterns()
+
+        history = list(analyzer.traffic_history)
+        self.assertEqual(len(history), 500)
+        bandwidth = np.array([p["data"]["bandwidth"] for p in history])
+        hours = np.array([time.localtime(p["timestamp"]).tm_hour for p in history])
+        days = np.array([time.localtime(p["timestamp"]).tm_wday for p in history])
+
+        hourly = {h: bandwidth[hours == h] for h in set(hours.tolist())}
+        for h, values in hourly.items():
+            profile = patterns["hourly_profile"][h]
+            self.assertEqual(profile["samples"], len(values))
+            self.assertAlmostEqual(profile["avg_bandwidth"], values.mean(), places=6)
+            self.assertAlmostEqual(profile["bandwidth_std"], values.std(), places=4)
+            self.assertEqual(profile["max_bandwidth"], values.max())
+        for d in range(7):
+            self.assertEqual(
+                patterns["weekday_profile"][d]["samples"], int((days == d).sum())
+            )
+
+        top = max(hourly[h].mean() for h in hourly)
+        self.assertEqual(
+            patterns["peak_hours"],
+            sorted(h for h in hourly if hourly[h].mean() >= top * 0.8),
+        )
+
+        x = np.arange(len(bandwidth))
+        slope = np.polyfit(x, bandwidth, 1)[0]
+        trends = patterns["bandwidth_trends"]
+        self.assertAlmostEqual(trends["slope"], slope, places=6)
+        self.assertAlmostEqual(
+            trends["correlation"], np.corrcoef(x, bandwidth)[0, 1], places=6
+        )
+
+        connections = np.array([p["data"]["connections"] for p in history])
+        self.assertEqual(
+            patterns["connection_patterns"]["max_connections"], connections.max()
+        )
+
+    def test_anomalies_leave_with_their_points(self):
+        analyzer = TrafficAnalyzer(window=200)
+        for i in range(150):
+            analyzer.add_traffic_data({"bandwidth": 100 + i % 3}, timestamp=i)
+        analyzer.add_traffic_data({"bandwidth": 1000}, timestamp=150)
+        anomalies = analyzer.analyze_patterns()["anomaly_periods"]
+        self.assertEqual([a["timestamp"] for a in anomalies], [150])
+
+        for i in range(151, 400):
+            analyzer.add_traffic_data({"bandwidth": 100 + i % 3}, timestamp=i)
+        self.assertEqual(analyzer.analyze_patterns()["anomaly_periods"], [])
+        analyzer.clear()
+        self.assertEqual(analyzer.analyze_patterns(), {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+import unittest
+import sys
+import os
+import random
+
+import numpy as np
+
+# Add parent directory to path before importing
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from benchmarks.failover_backtest import make_history
+from constants import PREDICTIVE_LATENCY_LIMIT
+from services.ai_optimization import (
+    PerformanceMetrics,
+    PredictiveFailover,
+    _RollingWindow,
+    backtest_failover,
+)
+
+
+def _quiet_log(message, level=None):
+    pass
+
+
+class TestRollingWindow(unittest.TestCase):
+    def test_incremental_stats_match_full_recompute(self):
+        rng = np.random.default_rng(0)
+        window = _RollingWindow(12, 3)
+        for count in range(1, 100):
+            window.push(rng.normal(size=3) * 50 + count * 3)
+            values = window.values()
+            self.assertEqual(len(values), min(count, 12))
+            mean, variance, slope = window.stats()
+            np.testing.assert_allclose(mean, values.mean(axis=0))
+            np.testing.assert_allclose(variance, values.var(axis=0), atol=1e-6)
+            if count >= 2:
+                expected = np.polyfit(np.arange(len(values)), values, 1)[0]
+                np.testing.assert_allclose(slope, expected, atol=1e-9)
+
+
+class TestPredictiveFailover(unittest.TestCase):
+    def test_rising_latency_is_flagged_before_the_limit(self):
+        predictor = PredictiveFailover(_quiet_log)
+        rng = random.Random(1)
+        flagged_at = None
+        for i in range(200):
+            latency = 150 + max(0, i - 30) * 20 + rng.gauss(0, 15)
+            if latency >= PREDICTIVE_LATENCY_LIMIT:
+                break
+            predictor.record_probe("a", latency)
+            if flagged_at is None and predictor.should_failover("a"):
+                flagged_at = latency
+        self.assertIsNotNone(flagged_at)
+        self.assertLess(flagged_at, PREDICTIVE_LATENCY_LIMIT)
+        self.assertGreater(predictor.get_server_features("a")["latency_trend"], 10)
+
+    def test_noisy_healthy_server_is_not_flagged(self):
+        predictor = PredictiveFailover(_quiet_log)
+        rng = random.Random(2)
+        for _ in range(2000):
+            latency = -1 if rng.random() < 0.02 else max(1, rng.gauss(300, 90))
+            predictor.record_probe("a", latency)
+            self.assertFalse(predictor.should_failover("a"))
+
+    def test_health_uses_previous_average(self):
+        predictor = PredictiveFailover(_quiet_log)
+
+        def metrics(ping):
+            return PerformanceMetrics(
+                timestamp=0,
+                server_id="a",
+                ping=ping,
+                download_speed=100,
+                upload_speed=10,
+                packet_loss=0,
+                jitter=5,
+                cpu_usage=0,
+                memory_usage=0,
+                network_usage=0,
+                connection_stability=1,
+            )
+
+        predictor.update_server_health("a", metrics(0))
+        predictor.update_server_health("a", metrics(200))
+        self.assertAlmostEqual(predictor.get_health_scores()["a"], 0.91)
+        self.assertEqual(predictor.get_server_features("a")["samples"], 2)
+        predictor.reset_server("a")
+        self.assertEqual(predictor.get_server_features("a"), {})
+
+    def test_backtest_predicts_degradation_ahead_of_time(self):
+        result = backtest_failover(make_history(servers=16, samples=400, seed=4))
+        self.assertGreater(result.incidents, 0)
+        self.assertGreater(result.predicted, 0)
+        self.assertTrue(all(lead > 0 for lead in result.lead_times))
+        self.assertLessEqual(result.false_alarms, result.predicted)
+
+
+if __name__ == "__main__":
+    unittest.main()
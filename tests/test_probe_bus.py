@@ -0,0 +1,114 @@
+import unittest
+import sys
+import os
+import threading
+import time
+from unittest import mock
+
+# Add parent directory to path before importing
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from constants import FAILOVER_PROBE_TIMEOUT
+from services import statistics_service
+from services.probe_bus import ProbeBus
+
+
+def _quiet_log(message, level=None):
+    pass
+
+
+class SlowProbe:
+    """Counts calls and takes `delay` seconds to answer `value`."""
+
+    def __init__(self, value=42, delay=0.2):
+        self.value = value
+        self.delay = delay
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        time.sleep(self.delay)
+        return self.value
+
+
+class TestProbeBus(unittest.TestCase):
+    def test_concurrent_requests_share_one_probe(self):
+        bus = ProbeBus(_quiet_log)
+        probe = SlowProbe()
+        results = []
+        threads = [
+            threading.Thread(
+                target=lambda: results.append(bus.probe("url", "p:1", probe))
+            )
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, [42] * 8)
+        self.assertEqual(probe.calls, 1)
+
+    def test_fresh_results_are_reused(self):
+        bus = ProbeBus(_quiet_log)
+        probe = SlowProbe(delay=0)
+        bus.probe("tcp", ("h", 1), probe)
+        self.assertEqual(bus.probe("tcp", ("h", 1), probe, max_age=60), 42)
+        self.assertEqual(probe.calls, 1)
+        # Without max_age every caller wants a new measurement
+        bus.probe("tcp", ("h", 1), probe)
+        self.assertEqual(probe.calls, 2)
+        self.assertEqual(bus.latest("tcp", ("h", 1)).value, 42)
+
+    def test_results_reach_every_subscriber(self):
+        bus = ProbeBus(_quiet_log)
+        seen = []
+        first = bus.subscribe("url", "p:1", lambda k, t, v: seen.append(("a", v)))
+        bus.subscribe("url", "p:1", lambda k, t, v: seen.append(("b", v)))
+        bus.subscribe("url", "p:2", lambda k, t, v: seen.append(("c", v)))
+        bus.probe("url", "p:1", lambda: 7)
+        self.assertEqual(sorted(seen), [("a", 7), ("b", 7)])
+
+        bus.unsubscribe(first)
+        bus.probe("url", "p:1", lambda: -1)
+        self.assertEqual(seen[-1], ("b", -1))
+        self.assertEqual(len(seen), 3)
+
+    def test_scheduled_key_is_probed_at_fastest_interval(self):
+        bus = ProbeBus(_quiet_log, workers=2)
+        probe = SlowProbe(delay=0)
+        got = threading.Event()
+        bus.subscribe(
+            "tcp", ("h", 1), lambda k, t, v: None, interval=60, probe_fn=probe
+        )
+        bus.subscribe(
+            "tcp",
+            ("h", 1),
+            lambda k, t, v: probe.calls >= 3 and got.set(),
+            interval=0.05,
+            probe_fn=probe,
+        )
+        self.assertTrue(got.wait(5))
+        for token in list(bus._subscriptions):
+            bus.unsubscribe(token)
+        self.assertEqual(bus.subscriber_count(), 0)
+
+
+class TestStatisticsLatencyProbe(unittest.TestCase):
+    def test_tunnel_probe_gives_up_as_fast_as_failover(self):
+        service = statistics_service.RealTimeStatisticsService(_quiet_log)
+        with mock.patch.object(
+            statistics_service, "get_probe_bus"
+        ) as bus, mock.patch.object(
+            statistics_service, "url_latency_via_proxy", return_value=5
+        ) as probe:
+            self.assertTrue(service.start_monitoring())
+            try:
+                bus.return_value.subscribe.call_args.kwargs["probe_fn"]()
+            finally:
+                service.stop_monitoring()
+        self.assertEqual(probe.call_args.kwargs["timeout"], FAILOVER_PROBE_TIMEOUT)
+
+
+if __name__ == "__main__":
+    unittest.main()
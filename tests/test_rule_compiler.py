@@ -0,0 +1,243 @@
+import unittest
+import sys
+import os
+import ipaddress
+import random
+import time
+
+# Add parent directory to path before importing
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import config_generator
+from managers.xray_generator import XrayConfigGenerator
+from services.zero_trust_security import (
+    AccessRequest,
+    Identity,
+    PolicyEngine,
+    TrustLevel,
+)
+from utils.rule_compiler import (
+    CIDR,
+    DOMAIN,
+    EXACT,
+    KEYWORD,
+    SUBDOMAIN,
+    SUFFIX,
+    CidrTrie,
+    CompiledRules,
+    KeywordAutomaton,
+    compile_routing,
+    parse_pattern,
+)
+
+
+class TestParsePattern(unittest.TestCase):
+    def test_kinds(self):
+        self.assertEqual(parse_pattern("Example.COM"), (EXACT, "example.com"))
+        self.assertEqual(parse_pattern("*.ir"), (SUBDOMAIN, "ir"))
+        self.assertEqual(parse_pattern("domain:google.com"), (SUFFIX, "google.com"))
+        self.assertEqual(parse_pattern("video", plain=KEYWORD), (KEYWORD, "video"))
+        self.assertEqual(parse_pattern("10.1.2.3/8"), (CIDR, "10.0.0.0/8"))
+        self.assertEqual(parse_pattern("::1"), (CIDR, "::1"))
+        for bad in ("", "bad domain", "regexp:(", "geoip:i r"):
+            with self.assertRaises(ValueError):
+                parse_pattern(bad)
+
+
+class TestCompiledRules(unittest.TestCase):
+    def test_keywords_match_substring_search(self):
+        rng = random.Random(0)
+        alphabet = "abc."
+        keywords = [
+            "".join(rng.choices(alphabet, k=rng.randint(1, 4))) for _ in range(40)
+        ]
+        keywords += ["abcab", "b.c"]
+        automaton = KeywordAutomaton((k, 1 << i) for i, k in enumerate(keywords))
+        for _ in range(500):
+            text = "".join(rng.choices(alphabet, k=rng.randint(0, 20)))
+            expected = sum(1 << i for i, k in enumerate(keywords) if k in text)
+            self.assertEqual(automaton.match(text), expected, text)
+
+    def test_domains_match_naive_suffix_check(self):
+        rng = random.Random(1)
+        labels = ["a", "b", "c", "ir", "com"]
+
+        def domain(n):
+            return ".".join(rng.choices(labels, k=n))
+
+        patterns = [f"domain:{domain(rng.randint(1, 3))}" for _ in range(30)]
+        patterns += [f"*.{domain(rng.randint(1, 2))}" for _ in range(30)]
+        patterns += [domain(rng.randint(1, 3)) for _ in range(30)]
+        rules = CompiledRules(patterns)
+
+        def naive(pattern, host):
+            kind, value = parse_pattern(pattern)
+            if kind == EXACT:
+                return host == value
+            if kind == SUFFIX and host == value:
+                return True
+            return host.endswith("." + value)
+
+        for _ in range(1000):
+            host = domain(rng.randint(1, 4))
+            expected = sum(1 << i for i, p in enumerate(patterns) if naive(p, host))
+            self.assertEqual(rules.match(host), expected, host)
+
+    def test_cidrs_match_ipaddress(self):
+        rng = random.Random(2)
+        networks = []
+        for _ in range(100):
+            if rng.random() < 0.5:
+                address = ipaddress.IPv4Address(rng.getrandbits(32) & 0xF0F0F0FF)
+                prefix = rng.randint(0, 32)
+            else:
+                address = ipaddress.IPv6Address(rng.getrandbits(128) >> 120 << 120)
+                prefix = rng.randint(0, 16)
+            networks.append(ipaddress.ip_network(f"{address}/{prefix}", strict=False))
+        trie = CidrTrie()
+        for i, network in enumerate(networks):
+            trie.add(network, 1 << i)
+
+        for _ in range(2000):
+            if rng.random() < 0.5:
+                address = ipaddress.IPv4Address(rng.getrandbits(32) & 0xF0F0F0FF)
+            else:
+                address = ipaddress.IPv6Address(rng.getrandbits(128) >> 120 << 120)
+            expected = sum(1 << i for i, n in enumerate(networks) if address in n)
+            self.assertEqual(trie.match(str(address)), expected, address)
+        self.assertEqual(trie.match("not-an-ip"), 0)
+
+
+class TestPolicyEngine(unittest.TestCase):
+    def test_first_matching_policy_in_order(self):
+        engine = PolicyEngine()
+        engine.add_policy(
+            "lan_admins",
+            {
+                "name": "LAN admins",
+                "identity_types": ["user"],
+                "allowed_ips": ["10.0.0.0/8", "192.168.1.5", "bad"],
+                "resources": ["admin"],
+                "action": "allow",
+            },
+        )
+        engine.add_policy(
+            "trusted",
+            {
+                "name": "Trusted",
+                "min_trust_level": TrustLevel.HIGH.value,
+                "resources": ["*"],
+                "action": "allow",
+            },
+        )
+        engine.add_policy("rest", {"name": "Rest", "action": "deny"})
+
+        def evaluate(kind, trust, ip, resource):
+            identity = Identity("i", "n", kind, trust, time.time())
+            request = AccessRequest("r", "i", resource, "read", 0, ip, "ua")
+            return engine.evaluate_access(request, identity)[1]
+
+        low = TrustLevel.LOW
+        self.assertIn("LAN admins", evaluate("user", low, "10.2.3.4", "admin"))
+        self.assertIn("LAN admins", evaluate("user", low, "192.168.1.5", "admin"))
+        self.assertIn("Rest", evaluate("user", low, "192.168.1.6", "admin"))
+        self.assertIn("Rest", evaluate("device", low, "10.2.3.4", "admin"))
+        self.assertIn("Trusted", evaluate("device", TrustLevel.HIGH, "x", "files"))
+
+        engine.remove_policy("rest")
+        self.assertEqual(
+            evaluate("user", low, "192.168.1.6", "admin"), "Denied by default policy"
+        )
+
+
+class TestRoutingPlan(unittest.TestCase):
+    def test_rules_are_validated_and_deduplicated(self):
+        plan = compile_routing(
+            "*.ir, *.ir,example.com,domain:geosite:ir,10.0.0.1",
+            "geoip:private,10.0.0.0/8,geoip:ir,nonsense",
+            (
+                ("domain", "keyword:ads", "block"),
+                ("domain", "keyword:ads", "proxy"),
+                ("ip", "example.com", "direct"),
+                ("geosite", "openai", "teleport"),
+                ("process", "game.exe", "direct"),
+            ),
+        )
+        self.assertEqual(
+            plan.bypass_domains, [(SUBDOMAIN, "ir"), (DOMAIN, "example.com")]
+        )
+        self.assertEqual(plan.bypass_geosites, ["ir"])
+        self.assertEqual(plan.bypass_cidrs, ["10.0.0.0/8"])
+        self.assertEqual(plan.bypass_geoips, ["ir"])
+        self.assertTrue(plan.bypass_private)
+        self.assertEqual(
+            [(r.kind, r.value, r.action) for r in plan.rules],
+            [(KEYWORD, "ads", "block"), ("process", "game.exe", "direct")],
+        )
+        self.assertEqual(
+            [entry for entry, _ in plan.rejected],
+            [
+                "10.0.0.1",
+                "nonsense",
+                "domain:keyword:ads",
+                "ip:example.com",
+                "geosite:openai",
+            ],
+        )
+
+    def test_generators_use_core_syntax(self):
+        settings = {
+            "dns_servers": "",
+            "bypass_domains": "*.ir,domain:geosite:ir,example.com,full:exact.com",
+            "bypass_ips": "geoip:ir",
+            "custom_routing_rules": [
+                {"type": "domain", "value": "ads.example", "action": "block"},
+                {"type": "geoip", "value": "ir", "action": "proxy"},
+                {"type": "process", "value": "game.exe", "action": "direct"},
+            ],
+        }
+        route = config_generator._build_route_config(settings)
+        self.assertIn(
+            {
+                "domain": ["example.com", "exact.com"],
+                "domain_suffix": [".ir"],
+                "outbound": "direct",
+            },
+            route["rules"],
+        )
+        self.assertIn({"domain": ["ads.example"], "outbound": "block"}, route["rules"])
+        self.assertIn(
+            {"rule_set": ["geoip-ir"], "outbound": "proxy-out"}, route["rules"]
+        )
+        self.assertEqual(
+            sorted(rs["tag"] for rs in route["rule_set"]), ["geoip-ir", "geosite-ir"]
+        )
+
+        routing = XrayConfigGenerator()._build_routing_config(settings)
+        self.assertEqual(
+            routing["rules"],
+            [
+                {
+                    "type": "field",
+                    "domain": ["domain:ads.example"],
+                    "outboundTag": "block",
+                },
+                {"type": "field", "ip": ["geoip:ir"], "outboundTag": "proxy-out"},
+                {
+                    "type": "field",
+                    # Bare domains keep covering their subdomains in Xray
+                    "domain": [
+                        "regexp:\\.ir$",
+                        "domain:example.com",
+                        "full:exact.com",
+                        "geosite:ir",
+                    ],
+                    "outboundTag": "direct",
+                },
+                {"type": "field", "ip": ["geoip:ir"], "outboundTag": "direct"},
+            ],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
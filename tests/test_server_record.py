@@ -0,0 +1,109 @@
+import unittest
+import sys
+import os
+import copy
+import json
+import gc
+import math
+import threading
+
+# Add parent directory to path before importing
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from managers.server_record import (
+    ServerRecord,
+    ServerTable,
+    json_default,
+    numeric_column,
+)
+
+CONFIG = {
+    "id": "a1",
+    "name": "DE - node 1",
+    "group": "DE",
+    "protocol": "vless",
+    "server": "example.com",
+    "port": 443,
+    "uuid": "u-1",
+    "tls_enabled": True,
+    "sni": "cdn.example.com",
+    "public_key": "pk",
+}
+
+
+class TestServerRecord(unittest.TestCase):
+    def test_behaves_like_the_dict(self):
+        record = ServerRecord(CONFIG)
+        self.assertEqual(record, CONFIG)
+        self.assertEqual(record.to_dict(), CONFIG)
+        self.assertEqual(set(record), set(CONFIG))
+        self.assertEqual(record.get("tcp_ping", -1), -1)
+        self.assertNotIn("tcp_ping", record)
+
+        record["tcp_ping"] = 120
+        record["url_ping"] = None
+        record["ping"] = 1.5
+        record["custom"] = "x"
+        self.assertEqual(record["tcp_ping"], 120)
+        self.assertIsNone(record["url_ping"])
+        self.assertEqual(record["ping"], 1.5)
+        del record["custom"]
+        self.assertNotIn("custom", record)
+        with self.assertRaises(KeyError):
+            del record["custom"]
+
+        self.assertEqual(copy.deepcopy(record), record)
+        self.assertEqual(record.copy(), record)
+        self.assertEqual(
+            json.loads(json.dumps([record], default=json_default)), [record]
+        )
+
+    def test_repeated_values_are_interned(self):
+        a = ServerRecord(json.loads(json.dumps(CONFIG)))
+        b = ServerRecord(json.loads(json.dumps(CONFIG)))
+        self.assertIs(a["group"], b["group"])
+        self.assertIs(a["sni"], b["sni"])
+
+    def test_rows_are_reused_after_release(self):
+        table = ServerTable()
+        record = ServerRecord(CONFIG, table)
+        row = record.row
+        del record
+        again = ServerRecord({"id": "b"}, table)
+        self.assertEqual(again.row, row)
+        self.assertNotIn("port", again)
+        self.assertEqual(len(table), 1)
+
+    def test_cyclic_garbage_does_not_deadlock_the_table(self):
+        table = ServerTable()
+        done = threading.Event()
+
+        def collect_while_allocating():
+            cycles = [{"record": ServerRecord(CONFIG, table)} for _ in range(50)]
+            for cycle in cycles:
+                cycle["self"] = cycle
+            del cycles, cycle
+            # A GC pass can run inside allocate() with _lock held
+            with table._lock:
+                gc.collect()
+            done.set()
+
+        threading.Thread(target=collect_while_allocating, daemon=True).start()
+        self.assertTrue(done.wait(5))
+        records = [ServerRecord({"id": str(i)}, table) for i in range(50)]
+        self.assertEqual(len(table), 50)
+        self.assertEqual(len({record.row for record in records}), 50)
+
+    def test_numeric_column(self):
+        records = [ServerRecord(CONFIG, tcp_ping=ping) for ping in (50, 70)]
+        records.append(ServerRecord(CONFIG))
+        column = numeric_column(records, "tcp_ping")
+        self.assertEqual(column[:2].tolist(), [50.0, 70.0])
+        self.assertTrue(math.isnan(column[2]))
+
+        mixed = numeric_column([dict(CONFIG, tcp_ping=5), records[0]], "tcp_ping")
+        self.assertEqual(mixed.tolist(), [5.0, 50.0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,148 @@
+import unittest
+import sys
+import os
+import random
+
+# Add parent directory to path before importing
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from managers.server_record import ServerRecord
+from services.smart_server_selection import (
+    SelectionCriteria,
+    ServerMetrics,
+    SmartServerSelector,
+)
+
+
+def _quiet_log(message, level=None):
+    pass
+
+
+def reference_score(metrics: ServerMetrics, criteria: SelectionCriteria) -> float:
+    """The per-server formula the batch scorer replaces."""
+    score = 0.0
+    if metrics.ping > 0:
+        score += max(0, 100 - (metrics.ping / 10)) * criteria.ping_weight
+    if metrics.download_speed > 0:
+        score += min(100, metrics.download_speed / 10) * criteria.speed_weight
+    stability = 100
+    if metrics.packet_loss > 0:
+        stability -= metrics.packet_loss * 10
+    if metrics.jitter > 0:
+        stability -= min(50, metrics.jitter)
+    score += max(0, stability) * criteria.stability_weight
+    score += metrics.uptime * criteria.uptime_weight
+    if metrics.geographic_distance > 0:
+        score += (
+            max(0, 100 - (metrics.geographic_distance / 1000))
+            * criteria.geographic_weight
+        )
+    return max(0, min(100, score))
+
+
+def make_servers(count, seed=0):
+    rng = random.Random(seed)
+    servers = []
+    selector = SmartServerSelector(_quiet_log)
+    for i in range(count):
+        server_id = f"s{i}"
+        servers.append({"id": server_id, "name": f"DE - node {i}", "protocol": "vless"})
+        if rng.random() < 0.8:
+            selector.update_server_metrics(
+                server_id,
+                {
+                    "ping": rng.uniform(10, 1200),
+                    "download_speed": rng.uniform(0, 1500),
+                    "packet_loss": rng.choice((0, 0, 1.5, 12)),
+                    "jitter": rng.uniform(0, 80),
+                    "uptime": rng.uniform(80, 100),
+                    "geographic_distance": rng.uniform(0, 200000),
+                },
+            )
+    return selector, servers
+
+
+class TestSmartServerSelector(unittest.TestCase):
+    def test_batch_scores_match_per_server_formula(self):
+        selector, servers = make_servers(300)
+        rankings = selector.get_server_rankings(servers)
+        self.assertEqual(len(rankings), len(servers))
+
+        expected = {
+            server["id"]: reference_score(
+                selector._server_metrics.get(server["id"], ServerMetrics()),
+                selector._criteria,
+            )
+            for server in servers
+        }
+        for entry in rankings:
+            self.assertAlmostEqual(entry["score"], expected[entry["server"]["id"]])
+        scores = [entry["score"] for entry in rankings]
+        self.assertEqual(scores, sorted(scores, reverse=True))
+
+    def test_top_k_matches_full_ranking(self):
+        selector, servers = make_servers(500, seed=3)
+        full = [
+            entry["server"]["id"] for entry in selector.get_server_rankings(servers)
+        ]
+        for k in (1, 7, 50, 500, 800):
+            top = selector.select_top_servers(servers, k)
+            self.assertEqual([entry["server"]["id"] for entry in top], full[:k])
+
+    def test_ties_keep_list_order(self):
+        selector = SmartServerSelector(_quiet_log)
+        servers = [{"id": f"s{i}"} for i in range(10)]
+        top = selector.select_top_servers(servers, 3)
+        self.assertEqual([entry["server"]["id"] for entry in top], ["s0", "s1", "s2"])
+
+    def test_servers_without_id_are_skipped(self):
+        selector = SmartServerSelector(_quiet_log)
+        selector.update_server_metrics("b", {"ping": 50})
+        best = selector.select_best_server([{"protocol": "vless"}, {"id": "b"}])
+        self.assertEqual(best["id"], "b")
+
+    def test_preferences_apply_bonus(self):
+        selector = SmartServerSelector(_quiet_log)
+        servers = [
+            {"id": "a", "country": "DE", "protocol": "vless"},
+            {"id": "b", "country": "nl", "protocol": "Trojan"},
+        ]
+        best = selector.select_best_server(
+            servers, {"preferred_countries": ["NL"], "preferred_protocols": ["trojan"]}
+        )
+        self.assertEqual(best["id"], "b")
+        rankings = selector.get_server_rankings(servers)
+        self.assertAlmostEqual(rankings[0]["score"], rankings[1]["score"] * 1.05 * 1.03)
+
+    def test_measured_ping_is_used_without_metrics(self):
+        selector = SmartServerSelector(_quiet_log)
+        servers = [
+            ServerRecord({"id": "slow", "url_ping": 800}),
+            ServerRecord({"id": "failed", "url_ping": -1, "tcp_ping": -1}),
+            ServerRecord({"id": "fast", "tcp_ping": 40}),
+        ]
+        top = selector.select_top_servers(servers, 3)
+        self.assertEqual(
+            [entry["server"]["id"] for entry in top], ["fast", "slow", "failed"]
+        )
+
+    def test_learning_terms_follow_selection_history(self):
+        selector = SmartServerSelector(_quiet_log)
+        servers = [{"id": "a"}, {"id": "b"}]
+        selector.update_server_metrics("a", {"ping": 100})
+        selector.update_server_metrics("b", {"ping": 100})
+        for _ in range(5):
+            selector.select_best_server(servers)
+            selector.update_selection_result("a", False)
+
+        rankings = selector.get_server_rankings(servers)
+        self.assertEqual(rankings[0]["server"]["id"], "b")
+        self.assertLess(rankings[1]["score"], rankings[0]["score"])
+
+        selector._is_learning = False
+        rankings = selector.get_server_rankings(servers)
+        self.assertAlmostEqual(rankings[0]["score"], rankings[1]["score"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,139 @@
+import unittest
+import sys
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+# Add parent directory to path before importing
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from managers import server_manager
+from managers.server_manager import ServerManager
+from network_tester import find_free_port
+from services.speed_test_service import download_throughput_via_proxy
+
+PAYLOAD = b"x" * (256 * 1024)
+
+
+def _quiet_log(message, level=None):
+    pass
+
+
+class _ProxyServer:
+    """Plain HTTP server that answers proxied GETs with a fixed payload."""
+
+    def __init__(self):
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                # Proxied requests carry the absolute URL as path
+                if self.path.endswith("/missing"):
+                    self.send_response(404)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("Content-Length", str(len(PAYLOAD)))
+                self.end_headers()
+                self.wfile.write(PAYLOAD)
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self.address = f"127.0.0.1:{self._server.server_address[1]}"
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class _FakeTestCore:
+    def __init__(self, addresses):
+        self.addresses = addresses
+        self.stopped = False
+
+    def start(self, servers):
+        return True
+
+    def get_proxy_address(self, server_id):
+        return self.addresses.get(server_id)
+
+    def stop(self):
+        self.stopped = True
+
+
+class TestSpeedTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.proxy = _ProxyServer()
+        cls.closed = f"127.0.0.1:{find_free_port()}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.proxy.close()
+
+    def test_download_throughput_via_proxy(self):
+        speed = download_throughput_via_proxy(
+            self.proxy.address, "http://speed.example/file", max_bytes=64 * 1024
+        )
+        self.assertGreater(speed, 0)
+        self.assertEqual(
+            download_throughput_via_proxy(
+                self.proxy.address, "http://speed.example/missing"
+            ),
+            -1,
+        )
+        self.assertEqual(
+            download_throughput_via_proxy(
+                self.closed, "http://speed.example/file", timeout=2
+            ),
+            -1,
+        )
+
+    def test_sweep_stores_speeds_and_records_failures(self):
+        results = []
+        manager = ServerManager(
+            {},
+            {
+                "log": _quiet_log,
+                "on_speed_result": lambda server, speed: results.append(
+                    (server["id"], speed)
+                ),
+            },
+        )
+        core = _FakeTestCore(
+            {"fast": self.proxy.address, "dead": self.closed, "broken": "broken"}
+        )
+        manager._test_core_manager = core
+        servers = [{"id": name} for name in ("fast", "dead", "broken", "unmapped")]
+
+        def download(proxy_address, **kwargs):
+            if proxy_address == "broken":
+                raise RuntimeError("core crashed")
+            return download_throughput_via_proxy(proxy_address, timeout=2, **kwargs)
+
+        try:
+            with mock.patch.object(
+                server_manager, "download_throughput_via_proxy", download
+            ):
+                manager.test_all_speed(servers)
+        finally:
+            manager.shutdown()
+
+        speeds = {server["id"]: server.get("download_speed") for server in servers}
+        self.assertIsInstance(speeds["fast"], int)
+        self.assertGreater(speeds["fast"], 0)
+        self.assertEqual(speeds["dead"], -1)
+        self.assertEqual(speeds["broken"], -1)
+        self.assertIsNone(speeds["unmapped"])
+        self.assertEqual(
+            sorted(results), sorted((k, v) for k, v in speeds.items() if v is not None)
+        )
+        self.assertTrue(core.stopped)
+
+
+if __name__ == "__main__":
+    unittest.main()
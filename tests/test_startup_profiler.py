@@ -0,0 +1,79 @@
+import unittest
+import sys
+import os
+import tempfile
+import time
+import json
+
+# Add parent directory to path before importing
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from utils.startup_profiler import StartupProfiler
+
+
+class TestStartupProfiler(unittest.TestCase):
+    def test_phases_and_marks_are_reported(self):
+        profiler = StartupProfiler()
+        with profiler.phase("settings"):
+            time.sleep(0.01)
+        profiler.mark("first_window")
+
+        summary = profiler.summary()
+        self.assertEqual(summary["phases"][0]["name"], "settings")
+        self.assertGreaterEqual(summary["phases"][0]["duration"], 0.01)
+        self.assertGreater(summary["marks"]["first_window"]["at"], 0)
+        self.assertGreater(summary["marks"]["first_window"]["rss_mb"], 0)
+        report = profiler.report()
+        self.assertIn("settings", report)
+        self.assertIn("[first_window]", report)
+
+    def test_phase_is_recorded_when_block_raises(self):
+        profiler = StartupProfiler()
+        with self.assertRaises(RuntimeError):
+            with profiler.phase("broken"):
+                raise RuntimeError("boom")
+        self.assertEqual(profiler.summary()["phases"][0]["name"], "broken")
+
+    def test_nested_phases_record_depth(self):
+        profiler = StartupProfiler()
+        with profiler.phase("main_window"):
+            with profiler.phase("service:ml"):
+                pass
+        depths = {p["name"]: p["depth"] for p in profiler.summary()["phases"]}
+        self.assertEqual(depths, {"main_window": 0, "service:ml": 1})
+        self.assertIn("    service:ml", profiler.report())
+
+    def test_import_tracing_and_chrome_trace(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            with open(os.path.join(tmp, "onix_traced_module.py"), "w") as f:
+                f.write("import onix_traced_child\n")
+            with open(os.path.join(tmp, "onix_traced_child.py"), "w") as f:
+                f.write("VALUE = 1\n")
+            sys.path.insert(0, tmp)
+            profiler = StartupProfiler()
+            profiler.trace_imports()
+            try:
+                import onix_traced_module  # noqa: F401
+            finally:
+                profiler.stop_tracing_imports()
+                sys.path.remove(tmp)
+                sys.modules.pop("onix_traced_module", None)
+                sys.modules.pop("onix_traced_child", None)
+
+            names = [p["name"] for p in profiler.slowest_imports()]
+            self.assertEqual(names, ["import onix_traced_module"])
+            profiler.mark("first_window")
+
+            path = profiler.write_chrome_trace(os.path.join(tmp, "trace.json"))
+            with open(path) as f:
+                events = json.load(f)["traceEvents"]
+        spans = {e["name"]: e for e in events if e["ph"] == "X"}
+        self.assertIn("import onix_traced_child", spans)
+        self.assertEqual(spans["import onix_traced_child"]["cat"], "import")
+        self.assertEqual(
+            [e["name"] for e in events if e["ph"] == "i"], ["first_window"]
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+import unittest
+import sys
+import os
+
+# Add parent directory to path before importing
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from services.core_stats_client import ClashApiStatsClient, XrayMetricsStatsClient
+from services.traffic_management import (
+    HeavyHitters,
+    TrafficAccounting,
+    TrafficAnalyzer,
+)
+
+
+def _conn(conn_id, upload, download, host, process="/usr/bin/curl"):
+    return {
+        "id": conn_id,
+        "upload": upload,
+        "download": download,
+        "metadata": {"host": host, "processPath": process},
+    }
+
+
+class TestHeavyHitters(unittest.TestCase):
+    def test_memory_stays_bounded(self):
+        hitters = HeavyHitters(capacity=8)
+        for i in range(1000):
+            hitters.add(f"host-{i}", 1)
+        hitters.add("heavy.example", 500)
+        self.assertEqual(len(hitters), 8)
+        self.assertEqual(hitters.top(1)[0][0], "heavy.example")
+
+    def test_decay_drops_small_counts(self):
+        hitters = HeavyHitters(capacity=4)
+        hitters.add("big", 100)
+        hitters.add("small", 1)
+        hitters.decay(0.5)
+        self.assertEqual(hitters.top(), [("big", 50.0)])
+
+
+class TestTrafficAccounting(unittest.TestCase):
+    def test_attributes_deltas_to_host_and_process(self):
+        accounting = TrafficAccounting()
+        new = accounting.ingest([_conn("a", 10, 100, "example.com")])
+        self.assertEqual(new, 1)
+        new = accounting.ingest(
+            [
+                _conn("a", 20, 300, "example.com"),
+                _conn("b", 0, 50, "cdn.net", "C:\\Apps\\browser.exe"),
+            ]
+        )
+        self.assertEqual(new, 1)
+        self.assertEqual(
+            dict(accounting.top_hosts()), {"example.com": 320, "cdn.net": 50}
+        )
+        self.assertEqual(
+            dict(accounting.top_processes()), {"curl": 320, "browser.exe": 50}
+        )
+
+    def test_closed_connections_are_forgotten(self):
+        accounting = TrafficAccounting()
+        accounting.ingest([_conn("a", 0, 100, "example.com")])
+        accounting.ingest([])
+        # A reused id after close counts as a new connection from zero
+        self.assertEqual(accounting.ingest([_conn("a", 0, 10, "example.com")]), 1)
+        self.assertEqual(dict(accounting.top_hosts()), {"example.com": 110})
+
+
+class TestTrafficAnalyzerClient(unittest.TestCase):
+    def test_stats_client_follows_the_active_core(self):
+        analyzer = TrafficAnalyzer(core_name="Xray")
+        analyzer.start_monitoring()
+        try:
+            self.assertIsInstance(analyzer._client, XrayMetricsStatsClient)
+            analyzer.set_core("sing-box")
+            self.assertIsInstance(analyzer._client, ClashApiStatsClient)
+        finally:
+            analyzer.stop_monitoring()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,223 @@
+import unittest
+import sys
+import os
+import threading
+
+# Add parent directory to path before importing
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from services.traffic_management import (
+    TrafficPriority,
+    TrafficRule,
+    TrafficShaping,
+)
+from services.traffic_shaper import TcShaper, hysteria_bandwidth, speed_limits
+
+
+def _rule(name, source="*", destination="*", limit=0, priority=TrafficPriority.NORMAL):
+    return TrafficRule(name, priority, source, destination, limit)
+
+
+class _FakeRunner:
+    def __init__(self):
+        self.commands = []
+
+    def __call__(self, command):
+        self.commands.append(command)
+        return True
+
+
+class TestRuleMatching(unittest.TestCase):
+    def test_highest_priority_enabled_rule_wins(self):
+        shaping = TrafficShaping()
+        shaping.add_rule(_rule("video", destination="video", limit=100))
+        shaping.add_rule(
+            _rule("calls", destination="video.call", priority=TrafficPriority.HIGH)
+        )
+        disabled = _rule("off", destination="video", priority=TrafficPriority.CRITICAL)
+        disabled.enabled = False
+        shaping.add_rule(disabled)
+
+        self.assertEqual(shaping.classify("app", "video.call.example").name, "calls")
+        self.assertEqual(shaping.classify("app", "cdn.video.example").name, "video")
+        self.assertIsNone(shaping.classify("app", "mail.example"))
+
+        self.assertTrue(shaping.apply_shaping("c1", 60, "app", "cdn.video.example"))
+        self.assertFalse(shaping.apply_shaping("c1", 60, "app", "cdn.video.example"))
+        shaping.remove_rule("video")
+        self.assertTrue(shaping.apply_shaping("c1", 60, "app", "cdn.video.example"))
+
+
+class TestTcShaper(unittest.TestCase):
+    def test_plan_builds_classes_and_static_filters(self):
+        shaper = TcShaper(runner=_FakeRunner())
+        rules = [
+            _rule("lan", destination="10.0.0.0/8", priority=TrafficPriority.HIGH),
+            _rule("bulk", source="torrent", limit=500, priority=TrafficPriority.LOW),
+        ]
+        commands = [" ".join(c) for c in shaper.plan(rules, upload=1000)]
+
+        self.assertIn(
+            "tc class replace dev onix_tun parent 1: classid 1:1 htb "
+            "rate 8192kbit ceil 8192kbit",
+            commands,
+        )
+        # Capped rule: rate = ceil = its limit on both directions
+        self.assertEqual(
+            sum(
+                "classid 1:11 htb rate 4096kbit ceil 4096kbit prio 3" in c
+                for c in commands
+            ),
+            2,
+        )
+        self.assertIn(
+            "tc filter add dev onix_tun parent 1: protocol ip prio 1 u32 "
+            "match ip dst 10.0.0.0/8 flowid 1:10",
+            commands,
+        )
+        self.assertIn(
+            "tc filter add dev onix_ifb parent 1: protocol ip prio 1 u32 "
+            "match ip src 10.0.0.0/8 flowid 1:10",
+            commands,
+        )
+        # Process patterns can't be matched on packets
+        self.assertFalse(any("flowid 1:11" in c for c in commands))
+
+    def test_connections_are_assigned_to_rule_classes(self):
+        runner = _FakeRunner()
+        shaping = TrafficShaping()
+        shaping.add_rule(_rule("bulk", source="torrent", limit=500))
+        shaping.set_backend(TcShaper(runner=runner), 0, 0)
+        self.assertTrue(shaping.wait_for_backend(timeout=5))
+        runner.commands.clear()
+
+        connection = {
+            "metadata": {
+                "processPath": "/usr/bin/torrent",
+                "host": "tracker.example",
+                "destinationIP": "203.0.113.9",
+            }
+        }
+        other = {
+            "metadata": {"processPath": "/usr/bin/curl", "destinationIP": "1.1.1.1"}
+        }
+        self.assertEqual(
+            shaping.observe_connections([connection, other, connection]), 2
+        )
+        self.assertTrue(shaping.wait_for_backend(timeout=5))
+        self.assertEqual(
+            [" ".join(c) for c in runner.commands],
+            [
+                "tc filter add dev onix_tun parent 1: protocol ip prio 3 u32 "
+                "match ip dst 203.0.113.9/32 flowid 1:10",
+                "tc filter add dev onix_ifb parent 1: protocol ip prio 3 u32 "
+                "match ip src 203.0.113.9/32 flowid 1:10",
+            ],
+        )
+
+        shaping.clear_backend()
+        self.assertTrue(shaping.wait_for_backend(timeout=5))
+        self.assertIn(
+            ["tc", "qdisc", "del", "dev", "onix_tun", "root"], runner.commands
+        )
+
+    def test_addresses_without_connections_are_released(self):
+        shaping = TrafficShaping()
+        locked = []
+
+        def runner(command):
+            # tc runs on the worker, never under the rule lock
+            locked.append(shaping._lock.locked())
+            return True
+
+        shaper = TcShaper(runner=runner)
+        shaping.add_rule(_rule("bulk", source="torrent", limit=500))
+        shaping.set_backend(shaper, 0, 0)
+        self.assertTrue(shaping.wait_for_backend(timeout=5))
+        calls = []
+        shaper._run = lambda command: calls.append(" ".join(command)) or runner(command)
+
+        def connection(address):
+            return {
+                "metadata": {
+                    "processPath": "/usr/bin/torrent",
+                    "destinationIP": address,
+                }
+            }
+
+        shaping.observe_connections([connection("203.0.113.9"), connection("::1")])
+        self.assertTrue(shaping.wait_for_backend(timeout=5))
+        shaping.observe_connections([connection("198.51.100.7")])
+        self.assertTrue(shaping.wait_for_backend(timeout=5))
+
+        self.assertEqual(set(shaper._assigned), {"198.51.100.7"})
+        self.assertIn(
+            "tc filter del dev onix_tun parent 1: protocol ip prio 3 u32", calls
+        )
+        self.assertIn(
+            "tc filter del dev onix_ifb parent 1: protocol ipv6 prio 6 u32", calls
+        )
+        # The freed slot is reused
+        self.assertIn(
+            "tc filter add dev onix_tun parent 1: protocol ip prio 5 u32 "
+            "match ip dst 198.51.100.7/32 flowid 1:10",
+            calls,
+        )
+        self.assertFalse(any(locked))
+
+    def test_backend_is_applied_off_the_caller_with_the_latest_rules(self):
+        started, release = threading.Event(), threading.Event()
+        applied = []
+
+        class SlowBackend:
+            def apply(self, rules, upload, download):
+                started.set()
+                release.wait(5)
+                applied.append([r.name for r in rules])
+
+            def clear(self):
+                applied.append("clear")
+
+        shaping = TrafficShaping()
+        shaping.set_backend(SlowBackend())
+        self.assertTrue(started.wait(5))
+        for name in ("a", "b", "c"):
+            # Returns at once although the first apply is still running
+            shaping.add_rule(_rule(name))
+        release.set()
+        self.assertTrue(shaping.wait_for_backend(timeout=5))
+        self.assertEqual(applied, [[], ["a", "b", "c"]])
+
+        shaping.clear_backend()
+        self.assertTrue(shaping.wait_for_backend(timeout=5))
+        self.assertEqual(applied[-1], "clear")
+
+    def test_wildcard_rule_gets_ipv4_and_ipv6_filters(self):
+        shaper = TcShaper(runner=_FakeRunner())
+        commands = [" ".join(c) for c in shaper.plan([_rule("all", limit=100)])]
+        for protocol, prio in (("ip", 1), ("ipv6", 2)):
+            self.assertIn(
+                f"tc filter add dev onix_tun parent 1: protocol {protocol} "
+                f"prio {prio} u32 match u32 0 0 flowid 1:10",
+                commands,
+            )
+
+
+class TestSpeedLimits(unittest.TestCase):
+    def test_limits_follow_settings(self):
+        settings = {
+            "bandwidth_limit_enabled": True,
+            "upload_speed_limit": 256,
+            "download_speed_limit": "bad",
+            "hy2_up_mbps": 50,
+            "hy2_down_mbps": 100,
+        }
+        self.assertEqual(speed_limits(settings), (256, 0))
+        self.assertEqual(hysteria_bandwidth(settings), (2, 100))
+        settings["bandwidth_limit_enabled"] = False
+        self.assertEqual(speed_limits(settings), (0, 0))
+        self.assertEqual(hysteria_bandwidth(settings), (50, 100))
+
+
+if __name__ == "__main__":
+    unittest.main()
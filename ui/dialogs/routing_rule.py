@@ -6,8 +6,11 @@ from PySide6.QtWidgets import (
     QFormLayout,
     QHBoxLayout,
     QSizePolicy,
+    QMessageBox,
 )
 
+from utils.rule_compiler import compile_routing
+
 
 class RoutingRuleDialog(QDialog):
     def __init__(self, parent=None, rule=None):
@@ -50,6 +53,20 @@ class RoutingRuleDialog(QDialog):
         self.save_button.clicked.connect(self.accept)
         self.cancel_button.clicked.connect(self.reject)
 
+    def accept(self):
+        rule = self.get_rule_data()
+        rejected = compile_routing(
+            "", "", ((rule["type"], rule["value"], rule["action"]),)
+        ).rejected
+        if rejected:
+            QMessageBox.warning(
+                self,
+                self.tr("Invalid Rule"),
+                self.tr("Invalid value: ") + rejected[0][1],
+            )
+            return
+        super().accept()
+
     def get_rule_data(self):
         return {
             "type": self.type_combo.currentText(),
@@ -1,8 +1,8 @@
+import importlib
 import threading
+from functools import cached_property
+
 import utils
-import mss
-import numpy as np
-from pyzbar.pyzbar import decode
 from PySide6.QtWidgets import (
     QApplication,
     QMainWindow,
@@ -47,14 +47,20 @@ from PySide6.QtGui import (
     QFont,
 )
 import resources_rc  # noqa: F401
-from constants import TRAY_SHOW, TRAY_QUIT, LogLevel, PROXY_HOST, PROXY_PORT
+from constants import (
+    FAILOVER_STANDBY_COUNT,
+    TRAY_SHOW,
+    TRAY_QUIT,
+    LogLevel,
+    PROXY_HOST,
+    PROXY_PORT,
+)
 from ui.signals import ManagerSignals
 from ui.views.connection_view import create_connection_view
 from ui.views.logs_view import create_logs_view
 from ui.views.routing_view import create_routing_view
 from ui.views.settings_view import create_settings_view
 from ui.dialogs.about import AboutDialog
-from ui.dialogs.qr_code import QRCodeDialog
 from ui.dialogs.routing_rule import RoutingRuleDialog
 from ui.dialogs.server_edit import ServerEditDialog
 from ui.dialogs.chain_manager import ChainManagerDialog
@@ -63,12 +69,7 @@ from managers.subscription_manager import SubscriptionManager
 from ui.dialogs.export_dialog import ExportDialog
 from ui.widgets.server_card import ServerCardWidget
 from ui.styles import THEMES, get_dark_stylesheet, get_light_stylesheet
-from services.speed_test_service import SpeedTestService, AutoFailoverService
-from services.smart_server_selection import SmartServerSelector
-from services.advanced_security import AdvancedSecuritySuite, SecurityConfig
-from services.plugin_system import PluginManager
-from services.ai_optimization import AIPerformanceAnalyzer, PredictiveFailover
-from services.enterprise_features import EnterpriseManager
+from utils.startup_profiler import get_startup_profiler
 
 
 class PySideUI(QMainWindow):
@@ -109,68 +110,15 @@ class PySideUI(QMainWindow):
             server_manager, self.settings, subscription_callbacks
         )
 
-        # Initialize speed test and auto-failover services
-        self.speed_test_service = SpeedTestService(self.log)
-        self.auto_failover_service = AutoFailoverService(self.log)
-
-        # Initialize smart server selection
-        self.smart_selector = SmartServerSelector(self.log)
-        self.smart_selector.start_learning()
-
-        # Initialize advanced security suite
-        self.security_suite = AdvancedSecuritySuite(self.log)
-
-        # Initialize protocol extensions manager
-        from services.protocol_extensions import get_protocol_manager
-
-        self.protocol_manager = get_protocol_manager()
-        self.protocol_manager.start_monitoring()
-
-        # Initialize traffic management service
-        from services.traffic_management import get_traffic_service
-
-        self.traffic_service = get_traffic_service()
-        self.traffic_service.start()
-
-        # Initialize ML optimization service
-        from services.ml_optimization import get_ml_service
-
-        self.ml_service = get_ml_service()
-        self.ml_service.start()
-
-        # Initialize Zero-Trust security service
-        from services.zero_trust_security import get_zero_trust_service
-
-        self.zero_trust_service = get_zero_trust_service()
-        self.zero_trust_service.start()
-
-        # Initialize plugin manager
-        self.plugin_manager = PluginManager(self.log)
-        self.plugin_manager.set_app_context(
-            {
-                "log_callback": self.log,
-                "server_manager": self.server_manager,
-                "singbox_manager": self.singbox_manager,
-                "main_window": self,
-            }
-        )
-        self.plugin_manager.add_plugin_directory("plugins")
-        self.plugin_manager.start_event_processing()
-
-        # Initialize AI analyzer
-        self.ai_analyzer = AIPerformanceAnalyzer(self.log)
-        self.ai_analyzer.start_analysis()
-
-        # Initialize predictive failover
-        self.predictive_failover = PredictiveFailover(self.log)
-
-        # Initialize enterprise features
-        self.enterprise_manager = EnterpriseManager(self.log)
-        self.enterprise_manager.initialize_enterprise()
-        self.security_config = SecurityConfig()
+        # Services and secondary tabs are built on first use (see the
+        # cached properties below and _ensure_view) to keep them off the
+        # path to the first painted window.
         # Connect signals to slots
         self.signals.ping_result.connect(self.on_ping_result, Qt.QueuedConnection)
         self.signals.ping_started.connect(self.on_ping_started, Qt.QueuedConnection)
+        self.signals.speed_test_result.connect(
+            self.on_server_speed_result, Qt.QueuedConnection
+        )
         self.signals.health_check_progress.connect(
             self.on_health_check_progress, Qt.QueuedConnection
         )
@@ -304,6 +252,138 @@ class PySideUI(QMainWindow):
         self._save_timer.setInterval(1000)  # 1-second debounce
         self._save_timer.timeout.connect(self._save_settings_to_disk)
 
+    # --- Lazily constructed services ---
+
+    @cached_property
+    def speed_test_service(self):
+        from services.speed_test_service import SpeedTestService
+
+        with get_startup_profiler().phase("service:speed_test"):
+            return SpeedTestService(self.log)
+
+    @cached_property
+    def auto_failover_service(self):
+        from services.speed_test_service import AutoFailoverService
+
+        with get_startup_profiler().phase("service:auto_failover"):
+            return AutoFailoverService(self.log)
+
+    @cached_property
+    def smart_selector(self):
+        from services.smart_server_selection import SmartServerSelector
+
+        with get_startup_profiler().phase("service:smart_selector"):
+            selector = SmartServerSelector(self.log)
+            selector.start_learning()
+            return selector
+
+    @cached_property
+    def security_suite(self):
+        from services.advanced_security import AdvancedSecuritySuite
+
+        with get_startup_profiler().phase("service:security_suite"):
+            return AdvancedSecuritySuite(self.log)
+
+    @cached_property
+    def security_config(self):
+        from services.advanced_security import SecurityConfig
+
+        return SecurityConfig()
+
+    @cached_property
+    def protocol_manager(self):
+        from services.protocol_extensions import get_protocol_manager
+
+        with get_startup_profiler().phase("service:protocol_manager"):
+            manager = get_protocol_manager()
+            manager.start_monitoring()
+            return manager
+
+    @cached_property
+    def traffic_service(self):
+        from services.traffic_management import get_traffic_service
+
+        with get_startup_profiler().phase("service:traffic"):
+            service = get_traffic_service()
+            service.traffic_analyzer.set_core(
+                self.settings.get("active_core", "sing-box")
+            )
+            service.start()
+            return service
+
+    @cached_property
+    def ml_service(self):
+        from services.ml_optimization import get_ml_service
+
+        with get_startup_profiler().phase("service:ml"):
+            service = get_ml_service()
+            service.start()
+            return service
+
+    @cached_property
+    def zero_trust_service(self):
+        from services.zero_trust_security import get_zero_trust_service
+
+        with get_startup_profiler().phase("service:zero_trust"):
+            service = get_zero_trust_service()
+            service.start()
+            return service
+
+    @cached_property
+    def plugin_manager(self):
+        from services.plugin_system import PluginManager
+
+        with get_startup_profiler().phase("service:plugins"):
+            manager = PluginManager(self.log)
+            manager.set_app_context(
+                {
+                    "log_callback": self.log,
+                    "server_manager": self.server_manager,
+                    "singbox_manager": self.singbox_manager,
+                    "main_window": self,
+                }
+            )
+            manager.add_plugin_directory("plugins")
+            manager.start_event_processing()
+            return manager
+
+    @cached_property
+    def ai_analyzer(self):
+        from services.ai_optimization import AIPerformanceAnalyzer
+
+        with get_startup_profiler().phase("service:ai_analyzer"):
+            analyzer = AIPerformanceAnalyzer(self.log)
+            self.server_manager.health_checker.add_result_listener(
+                analyzer.add_health_result
+            )
+            analyzer.start_analysis()
+            return analyzer
+
+    @cached_property
+    def predictive_failover(self):
+        from services.ai_optimization import PredictiveFailover
+
+        return PredictiveFailover(self.log)
+
+    @cached_property
+    def enterprise_manager(self):
+        from services.enterprise_features import EnterpriseManager
+
+        with get_startup_profiler().phase("service:enterprise"):
+            manager = EnterpriseManager(self.log)
+            manager.initialize_enterprise()
+            return manager
+
+    @cached_property
+    def load_balancer_monitor(self):
+        from services.load_balancer import LoadBalancerMonitor
+
+        return LoadBalancerMonitor(self.log)
+
+    def _loaded_service(self, name):
+        """Return a lazy service only if it has already been built."""
+        return self.__dict__.get(name)
+
     def setup_main_layout(self):
         central_widget = QWidget()
         self.setCentralWidget(central_widget)
@@ -526,42 +606,38 @@ class PySideUI(QMainWindow):
         self.stacked_widget.addWidget(create_routing_view(self))
         self.stacked_widget.addWidget(create_logs_view(self))
 
-        # Add performance view
-        from ui.views.performance_view import create_performance_view
-
-        self.stacked_widget.addWidget(create_performance_view(self))
-
-        # Add analytics view
-        from ui.views.analytics_view import create_analytics_view
-
-        self.stacked_widget.addWidget(create_analytics_view(self))
-
-        # Add plugin view
-        from ui.views.plugin_view import create_plugin_view
-
-        self.stacked_widget.addWidget(create_plugin_view(self))
-
-        # Add protocol view
-        from ui.views.protocol_view import create_protocol_view
-
-        self.stacked_widget.addWidget(create_protocol_view(self))
-
-        # Add traffic view
-        from ui.views.traffic_view import create_traffic_view
-
-        self.stacked_widget.addWidget(create_traffic_view(self))
-
-        # Add ML view
-        from ui.views.ml_view import create_ml_view
+        # The remaining tabs (and the services behind them) are only built
+        # when first opened; until then an empty placeholder holds the slot.
+        self._view_factories = {}
+        for module_name, factory_name in (
+            ("ui.views.performance_view", "create_performance_view"),
+            ("ui.views.analytics_view", "create_analytics_view"),
+            ("ui.views.plugin_view", "create_plugin_view"),
+            ("ui.views.protocol_view", "create_protocol_view"),
+            ("ui.views.traffic_view", "create_traffic_view"),
+            ("ui.views.ml_view", "create_ml_view"),
+            ("ui.views.zero_trust_view", "create_zero_trust_view"),
+        ):
+            index = self.stacked_widget.addWidget(QWidget())
+            self._view_factories[index] = (module_name, factory_name)
 
-        self.stacked_widget.addWidget(create_ml_view(self))
+        self.stacked_widget.addWidget(create_settings_view(self))
 
-        # Add Zero-Trust view
-        from ui.views.zero_trust_view import create_zero_trust_view
+    def _ensure_view(self, index):
+        """Build a lazily loaded tab the first time it is shown."""
+        entry = self._view_factories.pop(index, None)
+        if entry is None:
+            return
 
-        self.stacked_widget.addWidget(create_zero_trust_view(self))
+        module_name, factory_name = entry
+        with get_startup_profiler().phase(f"view:{module_name.rsplit('.', 1)[-1]}"):
+            module = importlib.import_module(module_name)
+            view = getattr(module, factory_name)(self)
 
-        self.stacked_widget.addWidget(create_settings_view(self))
+        placeholder = self.stacked_widget.widget(index)
+        self.stacked_widget.insertWidget(index, view)
+        self.stacked_widget.removeWidget(placeholder)
+        placeholder.deleteLater()
 
     def show_about_dialog(self):
         """Shows the About dialog."""
@@ -843,6 +919,10 @@ This action cannot be undone."""
             self.settings["auto_failover_enabled"] = (
                 self.auto_failover_checkbox.isChecked()
             )
+        if hasattr(self, "load_balancer_checkbox"):
+            self.settings["load_balancer_enabled"] = (
+                self.load_balancer_checkbox.isChecked()
+            )
         self.settings["appearance_mode"] = {
             self.tr("System"): "System",
             self.tr("Light"): "Light",
@@ -1510,13 +1590,8 @@ This action cannot be undone."""
         try:
             self.log("Starting smart server selection...", LogLevel.INFO)
 
-            # Get all available servers
-            all_servers = []
-            for group_name, servers in self.server_manager.server_groups.items():
-                for server in servers:
-                    server_copy = server.copy()
-                    server_copy["group"] = group_name
-                    all_servers.append(server_copy)
+            # The selector only reads the records, so no per-server copies
+            all_servers = self.server_manager.get_all_servers()
 
             if not all_servers:
                 self.log("No servers available for smart selection", LogLevel.WARNING)
@@ -1599,6 +1674,11 @@ This action cannot be undone."""
 
     def _scan_and_add_task(self):
         """The actual scanning logic that runs in a background thread."""
+        # Screen capture and QR decoding are only needed here
+        import mss
+        import numpy as np
+        from pyzbar.pyzbar import decode
+
         try:
             with mss.mss() as sct:
                 # Get information of monitor 1
@@ -1962,12 +2042,12 @@ This action cannot be undone."""
 
         # Get health stats from health checker
         health_stats = {}
-        if hasattr(self.server_manager, "_health_checker"):
+        if hasattr(self.server_manager, "health_checker"):
             for server in servers:
                 server_id = server.get("id")
                 if server_id:
                     health_stats[server_id] = (
-                        self.server_manager._health_checker.get_server_stats(server_id)
+                        self.server_manager.health_checker.get_server_stats(server_id)
                     )
 
         dialog = ExportDialog(self, servers, health_stats)
@@ -1995,14 +2075,141 @@ This action cannot be undone."""
                 self.health_check_url_button.setStyleSheet("")
             if hasattr(self, "health_check_progress"):
                 self.health_check_progress.setVisible(False)
+            if self._loaded_service("auto_failover_service"):
+                self.auto_failover_service.stop_monitoring()
+            if self._loaded_service("traffic_service"):
+                self.traffic_service.stop_shaping()
+            if self._loaded_service("load_balancer_monitor"):
+                self.load_balancer_monitor.stop()
             threading.Thread(target=self.singbox_manager.stop, daemon=True).start()
         else:
             if self.selected_config:
+                balance_servers, balance_weights = self._balance_members(
+                    self.selected_config
+                )
                 # The start method already runs in a background thread.
-                self.singbox_manager.start(self.selected_config)
+                self.singbox_manager.start(
+                    self.selected_config,
+                    standby_servers=(
+                        None
+                        if balance_servers
+                        else self._failover_standbys(self.selected_config)
+                    ),
+                    balance_servers=balance_servers,
+                    balance_weights=balance_weights,
+                )
             else:
                 self.log(self.tr("No server selected!"))
 
+    # --- Load balancer ---
+
+    def _balance_members(self, server):
+        """Other members and weights for load balancer mode, if it is on."""
+        if not (
+            self.settings.get("load_balancer_enabled")
+            and self.singbox_manager.supports_balancing
+            and not server.get("is_chain")
+        ):
+            return None, None
+        from services.load_balancer import member_weights, select_members
+
+        health_source = self.server_manager.health_checker.get_server_stats
+        members = select_members(
+            self.server_manager.get_all_servers(), server, health_source
+        )
+        if len(members) < 2:
+            self.log(self.tr("Load balancer needs two healthy servers, using one"))
+            return None, None
+        return members[1:], member_weights(members, health_source)
+
+    def _start_load_balancer_monitor(self):
+        """Watch the members of a load balanced connection that just came up."""
+        manager = self.singbox_manager
+        if not getattr(manager, "balance_servers", None):
+            return
+        from services.core_stats_client import get_core_stats_client
+
+        self.load_balancer_monitor.start(
+            [self.selected_config, *manager.balance_servers],
+            manager.balance_weights,
+            self.server_manager.health_checker.get_server_stats,
+            member_switch=manager.set_balance_member,
+            stats_client=get_core_stats_client(
+                self.settings.get("active_core", "sing-box")
+            ),
+        )
+
+    # --- Auto-failover ---
+
+    def _failover_standbys(self, server):
+        """Alternates to keep warm in the core, if auto-failover can use them."""
+        if not (
+            self.settings.get("auto_failover_enabled")
+            and self.singbox_manager.supports_standby
+        ):
+            return None
+        return self.auto_failover_service.rank_alternates(
+            self.server_manager.get_all_servers(),
+            server,
+            self.server_manager.health_checker.get_server_stats,
+        )[:FAILOVER_STANDBY_COUNT]
+
+    def _start_auto_failover(self):
+        """Watch the connection that just came up, once auto-failover is on."""
+        if not self.settings.get("auto_failover_enabled") or not self.selected_config:
+            return
+        if getattr(self.singbox_manager, "balance_servers", None):
+            # The balancer's fallback group already covers failed members
+            return
+        if self.auto_failover_service.is_monitoring():
+            return
+        self.auto_failover_service.start_monitoring(
+            self.server_manager.get_all_servers(),
+            self.selected_config,
+            failover_callback=self._on_failover,
+            health_source=self.server_manager.health_checker.get_server_stats,
+            standby_servers=(
+                self.singbox_manager.standby_servers
+                if self.singbox_manager.supports_standby
+                else None
+            ),
+            standby_switch=self.singbox_manager.switch_to_standby,
+            switched_callback=self._on_standby_switched,
+            predictor=self.predictive_failover,
+        )
+
+    def _start_traffic_shaping(self):
+        """Shape the tunnel once bandwidth limits or traffic rules are set."""
+        service = self._loaded_service("traffic_service")
+        has_rules = service is not None and bool(service.traffic_shaping.rules)
+        if not self.settings.get("bandwidth_limit_enabled") and not has_rules:
+            return
+        threading.Thread(
+            target=self.traffic_service.start_shaping,
+            args=(dict(self.settings),),
+            daemon=True,
+        ).start()
+
+    def _on_failover(self, server):
+        """Restart the core on `server`; called from the failover thread."""
+        self.signals.schedule_task_signal.emit(0, self._on_failover_switched, (server,))
+        self.singbox_manager.start(
+            server, standby_servers=self.auto_failover_service.get_standby_servers()
+        )
+
+    def _on_standby_switched(self, server):
+        """The core moved to a warm standby; called from the failover thread."""
+        self.signals.schedule_task_signal.emit(0, self._on_failover_switched, (server,))
+
+    def _on_failover_switched(self, server):
+        self.selected_config = server
+        self.log(
+            self.tr("Auto-failover moved the connection to: {}").format(
+                server.get("name", "Unknown")
+            ),
+            LogLevel.WARNING,
+        )
+
     # --- Slots for Server Card Actions ---
     def handle_server_action(self, action, server_data):
         if action == "ping_url":
@@ -2064,6 +2271,9 @@ This action cannot be undone."""
         elif action == "qr_code":
             server_link = self.server_manager.get_server_link(server_data)
             if server_link:
+                # qrcode/Pillow are only loaded when a QR code is requested
+                from ui.dialogs.qr_code import QRCodeDialog
+
                 dialog = QRCodeDialog(server_link, server_data.get("name"), self)
                 dialog.exec()
             else:
@@ -2221,14 +2431,24 @@ This action cannot be undone."""
 
         # --- Manual Sorting ---
         if self.current_view_mode == "servers":
-            # Auto-sort by best ping (lowest first), with N/A at the end
-            def ping_sort_key(server):
-                tcp_ping = server.get("tcp_ping")
-                if tcp_ping is None or tcp_ping == -1:
-                    return 9999  # Put N/A at the end
-                return tcp_ping
+            if self.settings.get("server_sort_mode") == "speed":
+                # Fastest download first, untested servers at the end
+                def speed_sort_key(server):
+                    speed = server.get("download_speed")
+                    if speed is None or speed <= 0:
+                        return 0
+                    return -speed
+
+                items_to_display.sort(key=speed_sort_key)
+            else:
+                # Auto-sort by best ping (lowest first), with N/A at the end
+                def ping_sort_key(server):
+                    tcp_ping = server.get("tcp_ping")
+                    if tcp_ping is None or tcp_ping == -1:
+                        return 9999  # Put N/A at the end
+                    return tcp_ping
 
-            items_to_display.sort(key=ping_sort_key)
+                items_to_display.sort(key=ping_sort_key)
 
         # --- Filtering and Display ---
         for item_data in items_to_display:
@@ -2313,8 +2533,8 @@ This action cannot be undone."""
             card.update_ping(test_type, ping)
 
             # Update health stats if this is from health checker
-            if hasattr(self.server_manager, "_health_checker"):
-                health_stats = self.server_manager._health_checker.get_server_stats(
+            if hasattr(self.server_manager, "health_checker"):
+                health_stats = self.server_manager.health_checker.get_server_stats(
                     server_id
                 )
                 if health_stats:
@@ -2327,6 +2547,37 @@ This action cannot be undone."""
                 LogLevel.WARNING,
             )
 
+    def on_server_speed_result(self, config, speed):
+        card = self.server_widgets.get(config.get("id"))
+        if card:
+            card.update_speed(speed)
+
+    def handle_group_speed_test(self):
+        """Rank the servers of the current group by download throughput."""
+        selected_group = self.group_dropdown.currentText()
+        if not selected_group or self.current_view_mode != "servers":
+            return
+
+        servers = self.server_manager.get_servers_by_group(selected_group)
+        if not servers:
+            self.log(self.tr("No servers to speed test."), LogLevel.WARNING)
+            return
+
+        self.log(
+            self.tr("Speed testing {} servers in '{}'...").format(
+                len(servers), selected_group
+            )
+        )
+        threading.Thread(
+            target=self.server_manager.test_all_speed,
+            args=(list(servers),),
+            daemon=True,
+        ).start()
+
+    def toggle_sort_by_speed(self, checked):
+        self.settings["server_sort_mode"] = "speed" if checked else "ping"
+        self.update_server_list()
+
     def on_ping_started(self, config):
         server_id = config.get("id")
         if not server_id:
@@ -2484,6 +2735,9 @@ This action cannot be undone."""
 
     def on_connect(self, latency):
         self.on_status_change(self.tr("Connected"), "#10b981")
+        self._start_auto_failover()
+        self._start_traffic_shaping()
+        self._start_load_balancer_monitor()
         self.latency_label.setText(self.tr("Latency: {} ms").format(latency))
         self.latency_label.setStyleSheet(
             """
@@ -2519,6 +2773,8 @@ This action cannot be undone."""
 
     def on_stop(self):
         self.on_status_change(self.tr("Disconnected"), "#f59e0b")
+        if self._loaded_service("load_balancer_monitor"):
+            self.load_balancer_monitor.stop()
         self.latency_label.setText(self.tr("Latency: N/A"))
         self.latency_label.setStyleSheet(
             """
@@ -2723,6 +2979,9 @@ This action cannot be undone."""
             self.show_window()
             self._is_scanning_screen = False
 
+        if self._loaded_service("auto_failover_service"):
+            self.auto_failover_service.stop_monitoring()
+
         # If the singbox manager is running, stop it before quitting.
         if self.singbox_manager and self.singbox_manager.is_running:
             self.singbox_manager.stop()
@@ -2730,25 +2989,19 @@ This action cannot be undone."""
         if self.server_manager:
             self.server_manager.force_save_settings()
 
-        # Cleanup plugin manager
-        if hasattr(self, "plugin_manager"):
+        # Cleanup lazily built services; ones never opened have nothing to do
+        if self._loaded_service("plugin_manager"):
             self.plugin_manager.cleanup_all()
 
-        # Cleanup protocol manager
-        if hasattr(self, "protocol_manager"):
-            self.protocol_manager.cleanup()
-
-        # Cleanup traffic service
-        if hasattr(self, "traffic_service"):
-            self.traffic_service.cleanup()
-
-        # Cleanup ML service
-        if hasattr(self, "ml_service"):
-            self.ml_service.cleanup()
-
-        # Cleanup Zero-Trust service
-        if hasattr(self, "zero_trust_service"):
-            self.zero_trust_service.cleanup()
+        for name in (
+            "protocol_manager",
+            "traffic_service",
+            "ml_service",
+            "zero_trust_service",
+        ):
+            service = self._loaded_service(name)
+            if service:
+                service.cleanup()
 
         self.save_window_geometry()
         event.ignore()
@@ -2798,6 +3051,8 @@ This action cannot be undone."""
         if next_index == current_index:
             return
 
+        self._ensure_view(next_index)
+
         current_widget = self.stacked_widget.widget(current_index)
         next_widget = self.stacked_widget.widget(next_index)
 
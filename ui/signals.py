@@ -8,8 +8,10 @@ class ManagerSignals(QObject):
     """
 
     # Server testing and updates
-    ping_result = Signal(dict, int, str)  # config, ping, test_type
-    ping_started = Signal(dict)  # config
+    # Server configs are ServerRecords, so they are passed as plain objects
+    ping_result = Signal(object, int, str)  # config, ping, test_type
+    ping_started = Signal(object)  # config
+    speed_test_result = Signal(object, float)  # config, bytes_per_second
     health_check_progress = Signal(int, int)  # current, total
     servers_updated = Signal()  # Signal that server list has changed
 
@@ -437,6 +437,19 @@ def create_overview_tab(main_window) -> QWidget:
 
     layout.addLayout(charts_layout)
 
+    # Live throughput comes straight from the core's traffic feed, so the
+    # periodic refresh leaves these two widgets alone.
+    speed_card.setProperty("live", True)
+    speed_chart.setProperty("live", True)
+
+    def on_live_speed(up_speed, down_speed):
+        mbps = down_speed * 8 / 1_000_000
+        speed_card.update_value(f"{mbps:.1f}")
+        speed_chart.add_data_point(mbps)
+
+    if hasattr(main_window, "signals"):
+        main_window.signals.speed_updated.connect(on_live_speed)
+
     # Server distribution pie chart
     pie_chart = PieChart(title="Server Distribution")
     pie_data = {"US East": 35, "US West": 25, "Europe": 20, "Asia": 15, "Other": 5}
@@ -583,6 +596,17 @@ def create_traffic_analysis_tab(main_window) -> QWidget:
 
     layout.addWidget(geo_group)
 
+    # Top talkers from the core's connection accounting
+    talkers_group = QGroupBox("Top Talkers")
+    talkers_layout = QVBoxLayout(talkers_group)
+
+    talkers_pie = PieChart(title="Traffic by Host")
+    talkers_pie.setProperty("top_talkers", True)
+    talkers_pie.setMaximumHeight(250)
+    talkers_layout.addWidget(talkers_pie)
+
+    layout.addWidget(talkers_group)
+
     return widget
 
 
@@ -595,6 +619,8 @@ def refresh_analytics(main_window, widget: QWidget):
 
             # Update metric cards
             for child in widget.findChildren(MetricCard):
+                if child.property("live"):
+                    continue
                 if "Speed" in child.title:
                     speed = summary.get("avg_download_speed", 0)
                     child.update_value(f"{speed:.1f}")
@@ -604,6 +630,16 @@ def refresh_analytics(main_window, widget: QWidget):
 
         # Update charts with sample data
         for chart in widget.findChildren(ChartWidget):
+            if chart.property("live"):
+                continue
+            if chart.property("top_talkers"):
+                if hasattr(main_window, "traffic_service"):
+                    analyzer = main_window.traffic_service.traffic_analyzer
+                    hosts = analyzer.get_top_talkers(6)["hosts"]
+                    if hosts:
+                        chart.set_data(dict(hosts))
+                        chart.update()
+                continue
             if isinstance(chart, LineChart):
                 # Add random data point
                 import random
@@ -201,6 +201,22 @@ def create_connection_view(main_window):
 
     more_menu.addSeparator()
 
+    speed_test_group_action = QAction(
+        QIcon(":/icons/zap.svg"), main_window.tr("Speed Test Group"), main_window
+    )
+    speed_test_group_action.triggered.connect(main_window.handle_group_speed_test)
+    more_menu.addAction(speed_test_group_action)
+
+    sort_by_speed_action = QAction(main_window.tr("Sort by Speed"), main_window)
+    sort_by_speed_action.setCheckable(True)
+    sort_by_speed_action.setChecked(
+        main_window.settings.get("server_sort_mode") == "speed"
+    )
+    sort_by_speed_action.toggled.connect(main_window.toggle_sort_by_speed)
+    more_menu.addAction(sort_by_speed_action)
+
+    more_menu.addSeparator()
+
     copy_links_action = QAction(
         QIcon(":/icons/copy.svg"), main_window.tr("Copy Group Links"), main_window
     )
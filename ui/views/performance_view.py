@@ -16,7 +16,7 @@ from PySide6.QtWidgets import (
     QTextEdit,
     QTabWidget,
 )
-from PySide6.QtCore import Qt, QTimer, Signal, QObject
+from PySide6.QtCore import Qt, Signal, QObject
 from PySide6.QtGui import QFont
 from typing import Dict, Any
 from utils.performance_monitor import (
@@ -26,55 +26,38 @@ from utils.performance_monitor import (
 
 
 class PerformanceDataWorker(QObject):
-    """Worker thread for collecting performance data."""
+    """Relays snapshots from the performance monitor's sampling thread to the UI."""
 
     data_updated = Signal(dict)
+    _snapshot_ready = Signal(dict)
 
     def __init__(self):
         super().__init__()
         self.monitor = get_global_performance_monitor()
-        self.optimizer = PerformanceOptimizer()
         self.running = False
+        # Queued hop: snapshots are produced off the UI thread
+        self._snapshot_ready.connect(self.data_updated.emit, Qt.QueuedConnection)
 
     def start_collection(self):
-        """Start collecting performance data."""
+        """Start receiving performance snapshots."""
+        if self.running:
+            return
         self.running = True
-        self.collect_data()
+        self.monitor.register_callback("snapshot", self._on_snapshot)
 
-    def stop_collection(self):
-        """Stop collecting performance data."""
-        self.running = False
+        snapshot = self.monitor.get_snapshot()
+        if snapshot:
+            self.data_updated.emit(snapshot)
 
-    def collect_data(self):
-        """Collect and emit performance data."""
+    def stop_collection(self):
+        """Stop receiving performance snapshots."""
         if not self.running:
             return
+        self.running = False
+        self.monitor.unregister_callback("snapshot", self._on_snapshot)
 
-        try:
-            # Get current metrics
-            metrics = self.monitor.get_current_metrics()
-            summary = self.monitor.get_performance_summary()
-            recommendations = self.optimizer.get_optimization_recommendations()
-
-            data = {
-                "metrics": metrics,
-                "summary": summary,
-                "recommendations": recommendations,
-                "timestamp": (
-                    self.monitor._last_cleanup
-                    if hasattr(self.monitor, "_last_cleanup")
-                    else 0
-                ),
-            }
-
-            self.data_updated.emit(data)
-
-        except Exception as e:
-            print(f"Error collecting performance data: {e}")
-
-        # Schedule next collection
-        if self.running:
-            QTimer.singleShot(1000, self.collect_data)
+    def _on_snapshot(self, snapshot: Dict[str, Any]):
+        self._snapshot_ready.emit(snapshot)
 
 
 def create_performance_view(main_window):
@@ -112,6 +95,13 @@ def create_performance_view(main_window):
     security_tab = create_security_tab(main_window)
     tab_widget.addTab(security_tab, main_window.tr("Security"))
 
+    # The view only reads snapshots; all sampling happens in the monitor thread
+    main_window.performance_worker = PerformanceDataWorker()
+    main_window.performance_worker.data_updated.connect(
+        lambda data: update_performance_display(main_window, data)
+    )
+    main_window.performance_worker.start_collection()
+
     return container
 
 
@@ -330,8 +320,11 @@ def force_garbage_collection(main_window):
 def refresh_recommendations(main_window):
     """Refresh performance recommendations."""
     try:
-        optimizer = PerformanceOptimizer()
-        recommendations = optimizer.get_optimization_recommendations()
+        recommendations = (
+            get_global_performance_monitor().get_snapshot().get("recommendations")
+        )
+        if not recommendations:
+            recommendations = PerformanceOptimizer().get_optimization_recommendations()
 
         text = "Performance Recommendations:\n\n"
         for i, rec in enumerate(recommendations, 1):
@@ -428,6 +428,16 @@ def _create_network_settings_page(main_window):
     main_window.auto_failover_checkbox.stateChanged.connect(main_window.save_settings)
     health_layout.addRow(main_window.auto_failover_checkbox)
 
+    # Load balancer mode
+    main_window.load_balancer_checkbox = QCheckBox(
+        main_window.tr("Load balance across the best servers")
+    )
+    main_window.load_balancer_checkbox.setChecked(
+        main_window.settings.get("load_balancer_enabled", False)
+    )
+    main_window.load_balancer_checkbox.stateChanged.connect(main_window.save_settings)
+    health_layout.addRow(main_window.load_balancer_checkbox)
+
     main_window.connection_mode_combo = QComboBox()
     main_window.connection_mode_combo.addItems(
         [main_window.tr("Rule-Based"), main_window.tr("Global")]
@@ -1211,6 +1221,11 @@ def _update_settings_ui(main_window, settings):
             settings.get("auto_failover_enabled", False)
         )
 
+    if hasattr(main_window, "load_balancer_checkbox"):
+        main_window.load_balancer_checkbox.setChecked(
+            settings.get("load_balancer_enabled", False)
+        )
+
 
 def _reset_settings_to_defaults(main_window):
     """Reset all settings to defaults."""
@@ -318,9 +318,21 @@ def create_load_balancing_tab(main_window) -> QWidget:
     servers_layout.addLayout(server_control_layout)
     layout.addWidget(servers_group)
 
+    # اعضای حالت Load Balancer هسته
+    members_group = QGroupBox("Core Load Balancer Members")
+    members_layout = QVBoxLayout(members_group)
+    members_table = QTableWidget(0, 5)
+    members_table.setHorizontalHeaderLabels(
+        ["Server", "Share", "Status", "Upload", "Download"]
+    )
+    members_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+    members_layout.addWidget(members_table)
+    layout.addWidget(members_group)
+
     # ذخیره رفرنس‌ها
     widget.strategy_combo = strategy_combo
     widget.servers_table = servers_table
+    widget.members_table = members_table
 
     # بارگذاری آمار سرورها
     refresh_server_stats(main_window, widget)
@@ -369,6 +381,22 @@ def create_traffic_analytics_tab(main_window) -> QWidget:
 
     layout.addWidget(metrics_group)
 
+    # پرمصرف‌ترین میزبان‌ها و پردازه‌ها
+    talkers_group = QGroupBox("Top Talkers")
+    talkers_layout = QHBoxLayout(talkers_group)
+
+    hosts_table = QTableWidget(0, 2)
+    hosts_table.setHorizontalHeaderLabels(["Host", "Traffic"])
+    hosts_table.horizontalHeader().setStretchLastSection(True)
+    talkers_layout.addWidget(hosts_table)
+
+    processes_table = QTableWidget(0, 2)
+    processes_table.setHorizontalHeaderLabels(["Process", "Traffic"])
+    processes_table.horizontalHeader().setStretchLastSection(True)
+    talkers_layout.addWidget(processes_table)
+
+    layout.addWidget(talkers_group)
+
     # تایمر به‌روزرسانی
     update_timer = QTimer()
     update_timer.timeout.connect(lambda: update_traffic_analytics(main_window, widget))
@@ -380,6 +408,8 @@ def create_traffic_analytics_tab(main_window) -> QWidget:
     widget.connections_value = connections_value
     widget.response_time_value = response_time_value
     widget.error_rate_value = error_rate_value
+    widget.hosts_table = hosts_table
+    widget.processes_table = processes_table
     widget.update_timer = update_timer
 
     return widget
@@ -519,10 +549,36 @@ def refresh_server_stats(main_window, widget):
             )
             table.setItem(i, 4, QTableWidgetItem(f"{server_stats.error_rate:.2%}"))
 
+        # ترافیک هر عضو از آمار هسته
+        monitor = main_window._loaded_service("load_balancer_monitor")
+        members = monitor.get_members() if monitor else []
+        table = widget.members_table
+        table.setRowCount(len(members))
+        for i, member in enumerate(members):
+            table.setItem(i, 0, QTableWidgetItem(member["name"]))
+            table.setItem(i, 1, QTableWidgetItem(f"{member['weight']:.0%}"))
+            table.setItem(
+                i, 2, QTableWidgetItem("Active" if member["healthy"] else "Failed")
+            )
+            table.setItem(
+                i, 3, QTableWidgetItem(f"{member['upload'] / (1024 * 1024):.2f} MB")
+            )
+            table.setItem(
+                i, 4, QTableWidgetItem(f"{member['download'] / (1024 * 1024):.2f} MB")
+            )
+
     except Exception as e:
         print(f"[{LogLevel.ERROR}] Failed to refresh server stats: {e}")
 
 
+def fill_talkers_table(table, talkers):
+    """پر کردن جدول پرمصرف‌ها"""
+    table.setRowCount(len(talkers))
+    for i, (name, traffic) in enumerate(talkers):
+        table.setItem(i, 0, QTableWidgetItem(name))
+        table.setItem(i, 1, QTableWidgetItem(f"{traffic / (1024 * 1024):.2f} MB"))
+
+
 def update_traffic_analytics(main_window, widget):
     """به‌روزرسانی Analytics"""
     try:
@@ -537,7 +593,7 @@ def update_traffic_analytics(main_window, widget):
             widget.bandwidth_value.setText(
                 f"{analysis.get('current_bandwidth', 0):.1f} MB/s"
             )
-            widget.connections_value.setText(str(analysis.get("total_samples", 0)))
+            widget.connections_value.setText(str(analysis.get("active_connections", 0)))
             widget.response_time_value.setText(
                 f"{analysis.get('average_response_time', 0):.1f} ms"
             )
@@ -545,6 +601,10 @@ def update_traffic_analytics(main_window, widget):
                 f"{analysis.get('average_error_rate', 0):.2%}"
             )
 
+        talkers = service.traffic_analyzer.get_top_talkers()
+        fill_talkers_table(widget.hosts_table, talkers["hosts"])
+        fill_talkers_table(widget.processes_table, talkers["processes"])
+
     except Exception as e:
         print(f"[{LogLevel.ERROR}] Failed to update analytics: {e}")
 
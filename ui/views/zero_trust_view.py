@@ -727,7 +727,7 @@ def delete_policy(main_window, widget):
         try:
             service = get_zero_trust_service()
             if policy_name in service.policy_engine.policies:
-                del service.policy_engine.policies[policy_name]
+                service.policy_engine.remove_policy(policy_name)
                 refresh_policies(main_window, widget)
                 print(f"[{LogLevel.INFO}] Policy deleted: {policy_name}")
         except Exception as e:
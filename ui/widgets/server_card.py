@@ -13,7 +13,7 @@ from PySide6.QtGui import QIcon, QAction
 
 class ServerCardWidget(QWidget):
     # Signal to be emitted when an action is requested on this card
-    action_requested = Signal(str, dict)
+    action_requested = Signal(str, object)
 
     def __init__(self, server_data):
         super().__init__()
@@ -124,10 +124,26 @@ class ServerCardWidget(QWidget):
         """
         )
 
+        # Throughput badge stays hidden until the server has been speed tested
+        self.speed_label = QLabel()
+        self.speed_label.setStyleSheet(
+            """
+            font-size: 12px;
+            font-weight: 600;
+            color: #4f46e5;
+            background-color: #eef2ff;
+            padding: 6px 12px;
+            border-radius: 6px;
+            margin: 2px 0;
+        """
+        )
+        self.speed_label.hide()
+
         # Health stats label removed - using TCP/URI badges instead
 
         stats_layout.addWidget(self.tcp_ping_label)
         stats_layout.addWidget(self.url_ping_label)
+        stats_layout.addWidget(self.speed_label)
 
         # Menu button with modern styling
         self.menu_button = QPushButton(QIcon(":/icons/more-horizontal.svg"), "")
@@ -160,6 +176,7 @@ class ServerCardWidget(QWidget):
         # Initialize ping value from existing data
         self.update_ping("direct_tcp", self.server_data.get("tcp_ping", -1))
         self.update_ping("url", self.server_data.get("url_ping", -1))
+        self.update_speed(self.server_data.get("download_speed"))
 
     def enterEvent(self, event):
         """Show the menu button when the mouse enters the widget."""
@@ -271,6 +288,21 @@ class ServerCardWidget(QWidget):
         """
         )
 
+    def update_speed(self, speed):
+        """Shows the measured download throughput (bytes/s) of the server."""
+        if speed is None:
+            self.speed_label.hide()
+            return
+
+        self.server_data["download_speed"] = speed
+        if speed <= 0:
+            self.speed_label.setText("DL: N/A")
+        elif speed >= 1024 * 1024:
+            self.speed_label.setText(f"DL: {speed / (1024 * 1024):.1f} MB/s")
+        else:
+            self.speed_label.setText(f"DL: {speed / 1024:.0f} KB/s")
+        self.speed_label.show()
+
     def update_health_stats(self, stats):
         """Health stats removed - using TCP/URI badges instead."""
         pass
@@ -20,6 +20,19 @@ from .performance_monitor import (
     set_global_performance_monitor,
 )
 
+from .metrics import MetricsRegistry, get_metrics_registry
+
+from .downloader import DownloadError, download_file, sha256_file
+
+from .core_updater import (
+    get_resource_path,
+    get_singbox_platform_arch,
+    get_local_core_version,
+    get_latest_core_version,
+    download_core,
+    download_core_if_needed,
+)
+
 __all__ = [
     # Error handling
     "ErrorHandler",
@@ -34,4 +47,18 @@ __all__ = [
     "PerformanceOptimizer",
     "get_global_performance_monitor",
     "set_global_performance_monitor",
+    # Metrics
+    "MetricsRegistry",
+    "get_metrics_registry",
+    # Downloads
+    "DownloadError",
+    "download_file",
+    "sha256_file",
+    # Core executables
+    "get_resource_path",
+    "get_singbox_platform_arch",
+    "get_local_core_version",
+    "get_latest_core_version",
+    "download_core",
+    "download_core_if_needed",
 ]
@@ -1,14 +1,20 @@
+"""
+Core Updater for Onix
+Finds, downloads and installs the sing-box and Xray executables.
+"""
+
 import os
 import sys
 import requests
+import shutil
 import zipfile
-import io
 import platform
 import tarfile
 import subprocess
 from packaging import version
 
 from constants import (
+    DOWNLOAD_CHUNK_SIZE,
     GITHUB_SINGBOX_RELEASE_API,
     GITHUB_XRAY_RELEASE_API,
     SINGBOX_ASSET_KEYWORDS,
@@ -16,6 +22,7 @@ from constants import (
     XRAY_ASSET_KEYWORDS,
     XRAY_EXECUTABLE_NAMES,
 )
+from .downloader import DownloadError, download_file
 
 
 def get_resource_path(relative_path):
@@ -102,27 +109,38 @@ def get_latest_core_version(api_url):
 
 
 def download_core(
-    asset_url, asset_name, core_path, target_executable_name, callbacks=None
+    asset_url,
+    asset_name,
+    core_path,
+    target_executable_name,
+    callbacks=None,
+    sha256=None,
 ):
-    """Downloads and extracts the sing-box executable."""
+    """Downloads and extracts the sing-box executable.
+
+    The archive is streamed to disk next to the core (resuming an earlier
+    partial download), checked against `sha256` when given, and the
+    executable is extracted from it into place.
+    """
     # Default to print if no callbacks are provided
     callbacks = callbacks or {}
     show_error = callbacks.get(
         "show_error", lambda title, msg: print(f"ERROR [{title}]: {msg}")
     )
 
+    download_dir = os.path.dirname(core_path)
+    if not download_dir:
+        download_dir = os.getcwd()
+    archive_path = os.path.join(download_dir, asset_name)
+    new_core_path = core_path + ".new"
+
     try:
         print("INFO: Downloading:", asset_name)
-        archive_response = requests.get(asset_url, timeout=60)
-        archive_response.raise_for_status()
-
-        download_dir = os.path.dirname(core_path)
-        if not download_dir:
-            download_dir = os.getcwd()
+        download_file(asset_url, archive_path, sha256=sha256)
 
         print("INFO: Extracting", target_executable_name, "from", asset_name + "...")
         if asset_name.endswith(".zip"):
-            with zipfile.ZipFile(io.BytesIO(archive_response.content)) as z:
+            with zipfile.ZipFile(archive_path) as z:
                 exe_path_in_archive = next(
                     (
                         name
@@ -135,41 +153,35 @@ def download_core(
                     raise FileNotFoundError(
                         f"Could not find {target_executable_name} in the zip file."
                     )
-                # Extract the file directly to the final destination with the correct name
                 with z.open(exe_path_in_archive) as source, open(
-                    core_path, "wb"
+                    new_core_path, "wb"
                 ) as target:
-                    target.write(source.read())
-                # Since we extracted directly, no rename is needed.
-                # The extracted_path is now just core_path.
-                # extracted_path = core_path
-                # We don't need the os.rename part anymore for zip files.
-                if sys.platform != "win32":
-                    os.chmod(core_path, 0o755)
-                return True  # Exit early on success
+                    shutil.copyfileobj(source, target, DOWNLOAD_CHUNK_SIZE)
 
         elif asset_name.endswith(".tar.gz"):
-            with tarfile.open(
-                fileobj=io.BytesIO(archive_response.content), mode="r:gz"
-            ) as tar:
-                exe_path_in_archive = next(
+            with tarfile.open(archive_path, mode="r:gz") as tar:
+                member = next(
                     (
-                        member.name
+                        member
                         for member in tar.getmembers()
-                        if member.name.endswith(target_executable_name)
+                        if member.isfile()
+                        and member.name.endswith(target_executable_name)
                     ),
                     None,
                 )
-                if not exe_path_in_archive:
+                if not member:
                     raise FileNotFoundError(
                         f"Could not find {target_executable_name} in the tar.gz file."
                     )
-                tar.extract(exe_path_in_archive, path=download_dir)
-                # extracted_path = os.path.join(
-                #     download_dir, exe_path_in_archive)
+                # Extract the file itself, without the archive's directory
+                with tar.extractfile(member) as source, open(
+                    new_core_path, "wb"
+                ) as target:
+                    shutil.copyfileobj(source, target, DOWNLOAD_CHUNK_SIZE)
         else:
             raise ValueError(f"Unsupported archive format: {asset_name}")
 
+        os.replace(new_core_path, core_path)
         if sys.platform != "win32":
             os.chmod(core_path, 0o755)
 
@@ -178,7 +190,7 @@ def download_core(
         )
         return True
 
-    except requests.exceptions.RequestException as e:
+    except DownloadError as e:
         show_error("Download Error", f"Network error while downloading core: {e}")
         return False
     except (zipfile.BadZipFile, tarfile.ReadError, FileNotFoundError) as e:
@@ -187,6 +199,41 @@ def download_core(
     except Exception as e:
         show_error("Error", f"An unexpected error occurred during download: {e}")
         return False
+    finally:
+        # A partial download stays as .part to resume; the finished archive
+        # and a half-extracted executable are of no further use
+        for path in (new_core_path, archive_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def asset_sha256(asset, release_data):
+    """SHA-256 of a release asset, if GitHub or a .dgst file publishes one."""
+    digest = asset.get("digest") or ""
+    if digest.startswith("sha256:"):
+        return digest.split(":", 1)[1]
+
+    # Xray publishes "<asset>.dgst" files with a "SHA2-256= <hex>" line
+    dgst = next(
+        (
+            a
+            for a in release_data.get("assets", [])
+            if a.get("name") == asset.get("name", "") + ".dgst"
+        ),
+        None,
+    )
+    if not dgst:
+        return None
+    try:
+        response = requests.get(dgst["browser_download_url"], timeout=10)
+        response.raise_for_status()
+    except requests.exceptions.RequestException:
+        return None
+    for line in response.text.splitlines():
+        name, _, value = line.partition("=")
+        if name.strip().upper() in ("SHA2-256", "SHA256"):
+            return value.strip().lower()
+    return None
 
 
 def download_core_if_needed(core_name="sing-box", force_update=False, callbacks=None):
@@ -303,6 +350,7 @@ def download_core_if_needed(core_name="sing-box", force_update=False, callbacks=
             core_path,
             target_executable_name,
             callbacks=callbacks,
+            sha256=asset_sha256(asset, release_data),
         ):
             new_version = get_local_core_version(core_path, core_name)
             print(
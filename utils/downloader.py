@@ -0,0 +1,261 @@
+"""
+Download Manager for Onix
+Streams files to disk in chunks instead of holding them in memory. Large
+files on servers that honour HTTP Range requests are fetched as parallel
+segments; an interrupted segment resumes from its last byte, within one
+call through retries and across calls through a small state file next to
+the partial download. The result can be checked against a SHA-256 before
+it replaces the destination.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, Tuple
+
+import requests
+
+from constants import (
+    DOWNLOAD_CHUNK_SIZE,
+    DOWNLOAD_RETRIES,
+    DOWNLOAD_RETRY_DELAY,
+    DOWNLOAD_SEGMENTS,
+    DOWNLOAD_SEGMENT_MIN_SIZE,
+    DOWNLOAD_STATE_INTERVAL,
+    DOWNLOAD_TIMEOUT,
+)
+
+
+class DownloadError(Exception):
+    """A download that failed for good or did not verify."""
+
+
+def sha256_file(path: str, chunk_size: int = DOWNLOAD_CHUNK_SIZE) -> str:
+    """Hex SHA-256 of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class _Segment:
+    """Bytes start..end (inclusive) of the file; end is None if size is unknown."""
+
+    def __init__(self, start: int, end: Optional[int], done: int = 0):
+        self.start = start
+        self.end = end
+        self.done = done
+        self.finished = end is not None and start + done > end
+
+    @property
+    def position(self) -> int:
+        return self.start + self.done
+
+
+class _Download:
+    def __init__(self, session, url, destination, ranged, size, etag, progress):
+        self.session = session
+        self.url = url
+        self.part = destination + ".part"
+        self.state_path = self.part + ".json"
+        self.ranged = ranged
+        self.size = size
+        self.etag = etag
+        # Servers ignore If-Range with a weak validator and send the whole file
+        self.if_range = etag if etag and not etag.startswith("W/") else None
+        self.progress = progress
+        self.segments: List[_Segment] = []
+        self.stop = threading.Event()
+        self._lock = threading.Lock()
+
+    # --- Resume state ---
+
+    def load_state(self) -> bool:
+        """Pick up the segments of an earlier attempt at the same file."""
+        if not self.ranged or not os.path.exists(self.part):
+            return False
+        try:
+            with open(self.state_path, encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if (state.get("url"), state.get("size"), state.get("etag")) != (
+            self.url,
+            self.size,
+            self.etag,
+        ):
+            return False
+        self.segments = [_Segment(*segment) for segment in state["segments"]]
+        return True
+
+    def save_state(self):
+        if not self.ranged:
+            return
+        with self._lock:
+            state = {
+                "url": self.url,
+                "size": self.size,
+                "etag": self.etag,
+                "segments": [[s.start, s.end, s.done] for s in self.segments],
+            }
+            with open(self.state_path, "w", encoding="utf-8") as f:
+                json.dump(state, f)
+
+    def plan(self, segments: int):
+        """Fresh segments over an empty part file."""
+        if self.ranged and self.size:
+            count = segments if self.size >= DOWNLOAD_SEGMENT_MIN_SIZE else 1
+            bounds = [self.size * i // count for i in range(count + 1)]
+            self.segments = [
+                _Segment(bounds[i], bounds[i + 1] - 1) for i in range(count)
+            ]
+        else:
+            self.segments = [_Segment(0, None)]
+        with open(self.part, "wb") as f:
+            if self.size:
+                f.truncate(self.size)
+
+    def downloaded(self) -> int:
+        return sum(segment.done for segment in self.segments)
+
+    # --- Fetching ---
+
+    def fetch(self, segment: _Segment):
+        attempt = 0
+        while not segment.finished and not self.stop.is_set():
+            before = segment.done
+            try:
+                self._fetch_once(segment)
+            except (requests.RequestException, OSError) as e:
+                # Progress means the link works, so only failures in a row count
+                attempt = 1 if segment.done > before else attempt + 1
+                self.save_state()
+                if attempt > DOWNLOAD_RETRIES:
+                    raise DownloadError(f"{self.url}: {e}") from e
+                self.stop.wait(DOWNLOAD_RETRY_DELAY * 2 ** (attempt - 1))
+
+    def _fetch_once(self, segment: _Segment):
+        headers = {}
+        if self.ranged:
+            headers["Range"] = f"bytes={segment.position}-{segment.end}"
+            if self.if_range:
+                headers["If-Range"] = self.if_range
+        else:
+            # Without ranges every attempt starts over
+            segment.done = 0
+
+        with self.session.get(
+            self.url, headers=headers, stream=True, timeout=DOWNLOAD_TIMEOUT
+        ) as response:
+            response.raise_for_status()
+            if self.ranged and response.status_code != 206:
+                raise DownloadError(f"{self.url} changed during the download")
+            unsaved = 0
+            with open(self.part, "r+b") as f:
+                f.seek(segment.position)
+                if not self.ranged:
+                    f.truncate()
+                for chunk in response.iter_content(DOWNLOAD_CHUNK_SIZE):
+                    if self.stop.is_set():
+                        return
+                    if segment.end is not None:
+                        chunk = chunk[: segment.end - segment.position + 1]
+                    f.write(chunk)
+                    segment.done += len(chunk)
+                    unsaved += len(chunk)
+                    if self.progress:
+                        self.progress(self.downloaded(), self.size)
+                    if unsaved >= DOWNLOAD_STATE_INTERVAL:
+                        f.flush()
+                        self.save_state()
+                        unsaved = 0
+                    if segment.end is not None and segment.position > segment.end:
+                        break
+            if segment.end is None or segment.position > segment.end:
+                segment.finished = True
+            else:
+                raise requests.ConnectionError("connection closed early")
+
+
+def _probe(session, url) -> Tuple[bool, Optional[int], Optional[str]]:
+    """(ranges supported, size, ETag) from a one-byte ranged request."""
+    with session.get(
+        url, headers={"Range": "bytes=0-0"}, stream=True, timeout=DOWNLOAD_TIMEOUT
+    ) as response:
+        response.raise_for_status()
+        etag = response.headers.get("ETag")
+        if response.status_code == 206:
+            total = response.headers.get("Content-Range", "").rpartition("/")[2]
+            if total.isdigit():
+                return True, int(total), etag
+        length = response.headers.get("Content-Length", "")
+        return False, int(length) if length.isdigit() else None, etag
+
+
+def download_file(
+    url: str,
+    destination: str,
+    sha256: Optional[str] = None,
+    segments: int = DOWNLOAD_SEGMENTS,
+    session: Optional[requests.Session] = None,
+    progress: Optional[Callable[[int, Optional[int]], None]] = None,
+) -> str:
+    """Download `url` to `destination` and return its path.
+
+    Files of DOWNLOAD_SEGMENT_MIN_SIZE or more are fetched as `segments`
+    parallel ranged requests when the server supports them. Failed
+    requests are retried from where they stopped, and a later call for
+    the same URL resumes a download that an earlier one left unfinished.
+    `progress(downloaded, total)` is called as data arrives. Raises
+    DownloadError when retries run out or the SHA-256 does not match.
+    """
+    own_session = session is None
+    session = session or requests.Session()
+    try:
+        try:
+            ranged, size, etag = _probe(session, url)
+        except requests.RequestException as e:
+            raise DownloadError(f"{url}: {e}") from e
+
+        download = _Download(session, url, destination, ranged, size, etag, progress)
+        if not download.load_state():
+            download.plan(segments)
+        download.save_state()
+
+        pending = [s for s in download.segments if not s.finished]
+        if len(pending) > 1:
+            with ThreadPoolExecutor(max_workers=len(pending)) as pool:
+                futures = [pool.submit(download.fetch, s) for s in pending]
+                errors = []
+                for future in futures:
+                    try:
+                        future.result()
+                    except DownloadError as e:
+                        errors.append(e)
+                        download.stop.set()
+            if errors:
+                download.save_state()
+                raise errors[0]
+        elif pending:
+            download.fetch(pending[0])
+
+        if size is not None and os.path.getsize(download.part) != size:
+            raise DownloadError(f"{url}: expected {size} bytes")
+        if sha256:
+            actual = sha256_file(download.part)
+            if actual != sha256.lower():
+                os.remove(download.part)
+                if os.path.exists(download.state_path):
+                    os.remove(download.state_path)
+                raise DownloadError(f"{url}: SHA-256 mismatch ({actual})")
+
+        os.replace(download.part, destination)
+        if os.path.exists(download.state_path):
+            os.remove(download.state_path)
+        return destination
+    finally:
+        if own_session:
+            session.close()
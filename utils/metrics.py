@@ -0,0 +1,428 @@
+"""
+Metrics Registry for Onix
+Central in-process counters, gauges, latency histograms and time series
+"""
+
+import math
+import threading
+from bisect import bisect_left
+from concurrent.futures import ThreadPoolExecutor
+import time
+from array import array
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from constants import LogLevel
+
+# (resolution in seconds, number of buckets): 5 min of 1 s points,
+# 1 h of 10 s points and 1 day of 1 min points.
+SERIES_TIERS = ((1, 300), (10, 360), (60, 1440))
+
+# Default exposition buckets, sized for latencies in milliseconds
+DEFAULT_BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Optional[Dict[str, Any]]) -> LabelKey:
+    if not labels:
+        return ()
+    return tuple(sorted((str(k), str(v)) for k, v in labels.items()))
+
+
+class Counter:
+    """Monotonically increasing value."""
+
+    def __init__(self):
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self) -> float:
+        return self._value
+
+
+class Gauge:
+    """Value that can go up and down; optionally recorded into a time series."""
+
+    def __init__(self, series: Optional["TimeSeries"] = None):
+        self._value = 0.0
+        self.series = series
+
+    def set(self, value: float):
+        self._value = float(value)
+        if self.series is not None:
+            self.series.record(self._value)
+
+    def inc(self, amount: float = 1.0):
+        self.set(self._value + amount)
+
+    @property
+    def value(self) -> float:
+        return self._value
+
+
+class Histogram:
+    """HDR-style log-linear histogram with bounded relative error.
+
+    Each power of two is split into SUB_BUCKETS linear buckets, so a
+    recorded value is off by at most 1/SUB_BUCKETS (about 6%) whatever its
+    magnitude, with a fixed array of counts. `buckets` are the `le` bounds
+    reported to exporters; they are counted exactly on the side, since a
+    value on a bound shares its log-linear bucket with larger values.
+    """
+
+    SUB_BUCKETS = 16
+    MIN_EXPONENT = -4  # 1/16
+    MAX_EXPONENT = 24  # ~16.7M
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        # Observations per `le` bucket; the last slot is +Inf
+        self._bound_counts = array("Q", [0]) * (len(self.buckets) + 1)
+        size = (self.MAX_EXPONENT - self.MIN_EXPONENT + 1) * self.SUB_BUCKETS + 1
+        self._counts = array("Q", [0]) * size
+        self._count = 0
+        self._sum = 0.0
+        self._max = 0.0
+        self._lock = threading.Lock()
+
+    def _index(self, value: float) -> int:
+        if value < 2.0**self.MIN_EXPONENT:
+            return 0
+        exponent = min(math.frexp(value)[1] - 1, self.MAX_EXPONENT)
+        fraction = value / 2.0**exponent - 1.0
+        sub = min(int(fraction * self.SUB_BUCKETS), self.SUB_BUCKETS - 1)
+        return 1 + (exponent - self.MIN_EXPONENT) * self.SUB_BUCKETS + sub
+
+    def _upper_bound(self, index: int) -> float:
+        if index == 0:
+            return 2.0**self.MIN_EXPONENT
+        exponent, sub = divmod(index - 1, self.SUB_BUCKETS)
+        return 2.0 ** (exponent + self.MIN_EXPONENT) * (
+            1 + (sub + 1) / self.SUB_BUCKETS
+        )
+
+    def observe(self, value: float):
+        if value < 0:
+            return
+        index = self._index(value)
+        bound = bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._bound_counts[bound] += 1
+            self._count += 1
+            self._sum += value
+            if value > self._max:
+                self._max = value
+
+    @property
+    def count(self) -> int:
+        return self._count
+
+    @property
+    def sum(self) -> float:
+        return self._sum
+
+    def percentile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-th percentile (0-100)."""
+        if not self._count:
+            return 0.0
+        rank = max(1, math.ceil(self._count * q / 100.0))
+        seen = 0
+        for index, count in enumerate(self._counts):
+            seen += count
+            if seen >= rank:
+                return min(self._upper_bound(index), self._max)
+        return self._max
+
+    def cumulative_counts(self, bounds: Optional[List[float]] = None) -> List[int]:
+        """Cumulative counts of values <= each upper bound (`le` buckets).
+
+        Exact for the histogram's own `buckets` (the default); other bounds
+        are resolved to the log-linear buckets wholly below them.
+        """
+        if bounds is None or tuple(bounds) == self.buckets:
+            with self._lock:
+                counts = list(self._bound_counts[:-1])
+            result = []
+            seen = 0
+            for count in counts:
+                seen += count
+                result.append(seen)
+            return result
+        result = []
+        seen = 0
+        index = 0
+        size = len(self._counts)
+        for bound in bounds:
+            while index < size and self._upper_bound(index) <= bound:
+                seen += self._counts[index]
+                index += 1
+            result.append(seen)
+        return result
+
+
+class TrackedExecutor(ThreadPoolExecutor):
+    """Thread pool that counts the tasks submitted and not yet finished."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._pending = 0
+        self._pending_lock = threading.Lock()
+
+    def submit(self, fn, /, *args, **kwargs):
+        with self._pending_lock:
+            self._pending += 1
+        try:
+            future = super().submit(fn, *args, **kwargs)
+        except BaseException:
+            self._task_done(None)
+            raise
+        future.add_done_callback(self._task_done)
+        return future
+
+    def _task_done(self, _future):
+        with self._pending_lock:
+            self._pending -= 1
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+
+class TimeSeries:
+    """Array-backed series with coarser downsampled tiers for long history."""
+
+    def __init__(self, tiers=SERIES_TIERS):
+        self._tiers = []
+        for resolution, capacity in tiers:
+            self._tiers.append(
+                {
+                    "resolution": resolution,
+                    "capacity": capacity,
+                    "starts": array("d", [0.0]) * capacity,
+                    "sums": array("d", [0.0]) * capacity,
+                    "counts": array("L", [0]) * capacity,
+                    "head": -1,  # slot of the newest bucket
+                    "bucket": None,  # bucket number stored at head
+                    "filled": 0,
+                }
+            )
+        self._lock = threading.Lock()
+
+    def record(self, value: float, timestamp: Optional[float] = None):
+        if timestamp is None:
+            timestamp = time.time()
+        with self._lock:
+            for tier in self._tiers:
+                bucket = int(timestamp // tier["resolution"])
+                if bucket != tier["bucket"]:
+                    head = (tier["head"] + 1) % tier["capacity"]
+                    tier["head"] = head
+                    tier["bucket"] = bucket
+                    tier["starts"][head] = bucket * tier["resolution"]
+                    tier["sums"][head] = 0.0
+                    tier["counts"][head] = 0
+                    tier["filled"] = min(tier["filled"] + 1, tier["capacity"])
+                head = tier["head"]
+                tier["sums"][head] += value
+                tier["counts"][head] += 1
+
+    def points(
+        self, tier: int = 0, limit: Optional[int] = None
+    ) -> List[Tuple[float, float]]:
+        """(bucket start, mean) pairs, oldest first."""
+        with self._lock:
+            data = self._tiers[tier]
+            n = data["filled"] if limit is None else min(limit, data["filled"])
+            result = []
+            for age in range(n - 1, -1, -1):
+                slot = (data["head"] - age) % data["capacity"]
+                count = data["counts"][slot]
+                if count:
+                    result.append((data["starts"][slot], data["sums"][slot] / count))
+            return result
+
+    def values(self, tier: int = 0, limit: Optional[int] = None) -> List[float]:
+        return [value for _, value in self.points(tier, limit)]
+
+    def latest(self) -> Optional[float]:
+        points = self.points(0, 1)
+        return points[0][1] if points else None
+
+    def summary(self, limit: int = 60) -> Dict[str, float]:
+        """current/average/min/max over the last `limit` finest-tier points."""
+        values = self.values(0, limit)
+        if not values:
+            return {"current": 0, "average": 0, "min": 0, "max": 0, "count": 0}
+        return {
+            "current": values[-1],
+            "average": sum(values) / len(values),
+            "min": min(values),
+            "max": max(values),
+            "count": len(values),
+        }
+
+
+class MetricsRegistry:
+    """Registry of named metrics plus the single collector thread that samples them."""
+
+    def __init__(
+        self,
+        log_callback: Optional[Callable[[str, LogLevel], None]] = None,
+        tick: float = 1.0,
+    ):
+        self.log = log_callback or (lambda msg, level: print(f"[{level}] {msg}"))
+        self.tick = tick
+        # name -> {"type", "help", "metrics": {label_key: metric}}
+        self._families: Dict[str, Dict[str, Any]] = {}
+        self._collectors: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.RLock()
+        self._thread = None
+        self._stop_event = threading.Event()
+
+    # --- Metric access ---
+
+    def _get_or_create(self, kind, name, help_text, labels, factory):
+        key = _label_key(labels)
+        with self._lock:
+            family = self._families.get(name)
+            if family is None:
+                family = {"type": kind, "help": help_text, "metrics": {}}
+                self._families[name] = family
+            elif family["type"] != kind:
+                raise ValueError(f"Metric {name} is already a {family['type']}")
+            metric = family["metrics"].get(key)
+            if metric is None:
+                metric = family["metrics"][key] = factory()
+            return metric
+
+    def counter(
+        self, name: str, help_text: str = "", labels: Optional[Dict] = None
+    ) -> Counter:
+        return self._get_or_create("counter", name, help_text, labels, Counter)
+
+    def gauge(
+        self,
+        name: str,
+        help_text: str = "",
+        labels: Optional[Dict] = None,
+        track: bool = False,
+    ) -> Gauge:
+        """Get a gauge; with track=True every set() is kept in a time series."""
+        gauge = self._get_or_create("gauge", name, help_text, labels, Gauge)
+        if track and gauge.series is None:
+            gauge.series = TimeSeries()
+        return gauge
+
+    def histogram(
+        self,
+        name: str,
+        help_text: str = "",
+        labels: Optional[Dict] = None,
+        buckets=DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self._get_or_create(
+            "histogram", name, help_text, labels, lambda: Histogram(buckets)
+        )
+
+    def remove(self, name: str, labels: Dict):
+        """Drop every metric of `name` whose label set includes `labels`."""
+        wanted = set(_label_key(labels))
+        with self._lock:
+            family = self._families.get(name)
+            if not family:
+                return
+            for key in [k for k in family["metrics"] if wanted <= set(k)]:
+                del family["metrics"][key]
+
+    def series(self, name: str, labels: Optional[Dict] = None) -> Optional[TimeSeries]:
+        """Time series of a tracked gauge, or None if it is not tracked."""
+        with self._lock:
+            family = self._families.get(name)
+            if not family:
+                return None
+            metric = family["metrics"].get(_label_key(labels))
+            return getattr(metric, "series", None)
+
+    def collect(self) -> List[Tuple[str, str, str, List[Tuple[LabelKey, Any]]]]:
+        """Snapshot of every family as (name, type, help, [(labels, metric)])."""
+        with self._lock:
+            return [
+                (name, family["type"], family["help"], list(family["metrics"].items()))
+                for name, family in sorted(self._families.items())
+            ]
+
+    # --- Collection ---
+
+    def register_collector(
+        self, name: str, collect_fn: Callable[[], None], interval: float = 1.0
+    ):
+        """Run `collect_fn` every `interval` seconds on the shared collector thread."""
+        with self._lock:
+            self._collectors[name] = {
+                "fn": collect_fn,
+                "interval": interval,
+                "next_run": 0.0,
+            }
+        self.start()
+
+    def unregister_collector(self, name: str):
+        with self._lock:
+            self._collectors.pop(name, None)
+
+    def has_collector(self, name: str) -> bool:
+        return name in self._collectors
+
+    def start(self):
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._collect_loop, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=2)
+        self._thread = None
+
+    def run_collectors(self, now: Optional[float] = None):
+        """Run every collector that is due."""
+        if now is None:
+            now = time.time()
+
+        with self._lock:
+            due = [
+                (name, entry)
+                for name, entry in self._collectors.items()
+                if now >= entry["next_run"]
+            ]
+        for name, entry in due:
+            entry["next_run"] = now + entry["interval"]
+            try:
+                entry["fn"]()
+            except Exception as e:
+                self.log(f"Metrics collector '{name}' failed: {e}", LogLevel.WARNING)
+
+    def _collect_loop(self):
+        while not self._stop_event.is_set():
+            self.run_collectors()
+            self._stop_event.wait(self.tick)
+
+
+# Global metrics registry instance
+_metrics_registry = None
+
+
+def get_metrics_registry() -> MetricsRegistry:
+    """Get the global metrics registry."""
+    global _metrics_registry
+    if _metrics_registry is None:
+        _metrics_registry = MetricsRegistry()
+    return _metrics_registry
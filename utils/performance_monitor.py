@@ -8,30 +8,53 @@ import psutil
 import threading
 import gc
 from typing import Dict, Any, List, Optional, Callable
-from collections import deque
 from constants import LogLevel
+from utils.metrics import MetricsRegistry, get_metrics_registry
+
+# Monitor metric key -> (registry gauge name, help text)
+SYSTEM_GAUGES = {
+    "cpu_usage": ("onix_system_cpu_percent", "System CPU usage in percent"),
+    "memory_usage": ("onix_system_memory_percent", "System memory usage in percent"),
+    "memory_available": (
+        "onix_system_memory_available_bytes",
+        "Available system memory in bytes",
+    ),
+    "disk_io": ("onix_system_disk_io_mbps", "Disk read+write rate in MB/s"),
+    "network_io": ("onix_system_network_io_mbps", "Network send+receive rate in MB/s"),
+    "thread_count": ("onix_process_threads", "Active Python threads"),
+    "gc_count": ("onix_python_gc_pending", "Objects pending garbage collection"),
+}
 
 
 class PerformanceMonitor:
     """Comprehensive performance monitoring system."""
 
-    def __init__(self, log_callback: Optional[Callable[[str, LogLevel], None]] = None):
+    def __init__(
+        self,
+        log_callback: Optional[Callable[[str, LogLevel], None]] = None,
+        registry: Optional[MetricsRegistry] = None,
+    ):
         self.log = log_callback or (lambda msg, level: print(f"[{level}] {msg}"))
         self._is_monitoring = False
-        self._monitor_thread = None
-        self._stop_event = threading.Event()
+        self.registry = registry or get_metrics_registry()
 
-        # Performance metrics
+        # Performance metrics live in the shared registry as tracked gauges
         self._metrics = {
-            "cpu_usage": deque(maxlen=60),  # Last 60 seconds
-            "memory_usage": deque(maxlen=60),
-            "memory_available": deque(maxlen=60),
-            "disk_io": deque(maxlen=60),
-            "network_io": deque(maxlen=60),
-            "thread_count": deque(maxlen=60),
-            "gc_count": deque(maxlen=60),
+            key: self.registry.gauge(name, help_text, track=True)
+            for key, (name, help_text) in SYSTEM_GAUGES.items()
         }
 
+        # Previous cumulative counters, used to turn totals into rates
+        self._last_sample_time = None
+        self._last_disk_bytes = None
+        self._last_net_bytes = None
+
+        # Latest snapshot published to UI readers
+        self._snapshot: Dict[str, Any] = {}
+        self._recommendations: List[str] = []
+        self._samples_since_recommendations = 0
+        self._recommendation_interval = 10  # samples
+
         # Performance thresholds
         self._thresholds = {
             "cpu_high": 80.0,
@@ -47,6 +70,7 @@ class PerformanceMonitor:
             "memory_high": [],
             "memory_low": [],
             "performance_degraded": [],
+            "snapshot": [],
         }
 
         self._last_cleanup = time.time()
@@ -60,12 +84,13 @@ class PerformanceMonitor:
 
         try:
             self._is_monitoring = True
-            self._stop_event.clear()
+            # Prime the CPU counter so later non-blocking reads return a delta
+            psutil.cpu_percent(interval=None)
 
-            self._monitor_thread = threading.Thread(
-                target=self._monitor_loop, daemon=True
+            # Sampled by the registry's shared collector thread
+            self.registry.register_collector(
+                "performance_monitor", self._sample, interval=1
             )
-            self._monitor_thread.start()
 
             self.log("Performance monitoring started", LogLevel.INFO)
             return True
@@ -79,69 +104,69 @@ class PerformanceMonitor:
         if not self._is_monitoring:
             return
 
-        self._stop_event.set()
-        if self._monitor_thread and self._monitor_thread.is_alive():
-            self._monitor_thread.join(timeout=2)
-
+        self.registry.unregister_collector("performance_monitor")
         self._is_monitoring = False
         self.log("Performance monitoring stopped", LogLevel.INFO)
 
-    def _monitor_loop(self):
-        """Main monitoring loop."""
-        while not self._stop_event.is_set():
-            try:
-                # Collect performance metrics
-                self._collect_metrics()
+    def _sample(self):
+        """One monitoring step, run by the metrics collector every second."""
+        # Collect performance metrics
+        self._collect_metrics()
 
-                # Check thresholds
-                self._check_thresholds()
+        # Check thresholds
+        self._check_thresholds()
 
-                # Periodic cleanup
-                if time.time() - self._last_cleanup > self._cleanup_interval:
-                    self._perform_cleanup()
-                    self._last_cleanup = time.time()
+        # Hand the latest numbers to readers
+        self._publish_snapshot()
 
-                time.sleep(1)  # Monitor every second
-
-            except Exception as e:
-                self.log(f"Performance monitoring error: {e}", LogLevel.ERROR)
-                time.sleep(5)
+        # Periodic cleanup
+        if time.time() - self._last_cleanup > self._cleanup_interval:
+            self._perform_cleanup()
+            self._last_cleanup = time.time()
 
     def _collect_metrics(self):
         """Collect current performance metrics."""
         try:
-            # CPU usage
-            cpu_percent = psutil.cpu_percent(interval=0.1)
-            self._metrics["cpu_usage"].append(cpu_percent)
+            now = time.time()
+            elapsed = now - self._last_sample_time if self._last_sample_time else 0
+            self._last_sample_time = now
+
+            # CPU usage since the previous call (non-blocking)
+            cpu_percent = psutil.cpu_percent(interval=None)
+            self._metrics["cpu_usage"].set(cpu_percent)
 
             # Memory usage
             memory = psutil.virtual_memory()
-            self._metrics["memory_usage"].append(memory.percent)
-            self._metrics["memory_available"].append(memory.available)
+            self._metrics["memory_usage"].set(memory.percent)
+            self._metrics["memory_available"].set(memory.available)
 
-            # Disk I/O
+            # Disk I/O rate
             disk_io = psutil.disk_io_counters()
             if disk_io:
-                disk_io_rate = (
-                    (disk_io.read_bytes + disk_io.write_bytes) / 1024 / 1024
-                )  # MB
-                self._metrics["disk_io"].append(disk_io_rate)
-
-            # Network I/O
+                disk_bytes = disk_io.read_bytes + disk_io.write_bytes
+                if self._last_disk_bytes is not None and elapsed > 0:
+                    self._metrics["disk_io"].set(
+                        (disk_bytes - self._last_disk_bytes) / elapsed / 1024 / 1024
+                    )
+                self._last_disk_bytes = disk_bytes
+
+            # Network I/O rate
             net_io = psutil.net_io_counters()
             if net_io:
-                net_io_rate = (
-                    (net_io.bytes_sent + net_io.bytes_recv) / 1024 / 1024
-                )  # MB
-                self._metrics["network_io"].append(net_io_rate)
+                net_bytes = net_io.bytes_sent + net_io.bytes_recv
+                if self._last_net_bytes is not None and elapsed > 0:
+                    self._metrics["network_io"].set(
+                        (net_bytes - self._last_net_bytes) / elapsed / 1024 / 1024
+                    )
+                self._last_net_bytes = net_bytes
 
             # Thread count
             thread_count = threading.active_count()
-            self._metrics["thread_count"].append(thread_count)
+            self._metrics["thread_count"].set(thread_count)
 
             # Garbage collection count
             gc_count = sum(gc.get_count())
-            self._metrics["gc_count"].append(gc_count)
+            self._metrics["gc_count"].set(gc_count)
 
         except Exception as e:
             self.log(f"Error collecting metrics: {e}", LogLevel.WARNING)
@@ -150,18 +175,16 @@ class PerformanceMonitor:
         """Check performance thresholds and trigger callbacks."""
         try:
             # CPU threshold
-            if self._metrics["cpu_usage"]:
-                avg_cpu = sum(self._metrics["cpu_usage"]) / len(
-                    self._metrics["cpu_usage"]
-                )
+            cpu_usage = self._summary("cpu_usage")
+            if cpu_usage["count"]:
+                avg_cpu = cpu_usage["average"]
                 if avg_cpu > self._thresholds["cpu_high"]:
                     self._trigger_callbacks("cpu_high", {"cpu_usage": avg_cpu})
 
             # Memory threshold
-            if self._metrics["memory_usage"]:
-                avg_memory = sum(self._metrics["memory_usage"]) / len(
-                    self._metrics["memory_usage"]
-                )
+            memory_usage = self._summary("memory_usage")
+            if memory_usage["count"]:
+                avg_memory = memory_usage["average"]
                 if avg_memory > self._thresholds["memory_high"]:
                     self._trigger_callbacks("memory_high", {"memory_usage": avg_memory})
                 elif avg_memory < self._thresholds["memory_low"]:
@@ -170,7 +193,7 @@ class PerformanceMonitor:
             # Performance degradation detection
             if self._detect_performance_degradation():
                 self._trigger_callbacks(
-                    "performance_degraded", self._get_current_metrics()
+                    "performance_degraded", self.get_current_metrics()
                 )
 
         except Exception as e:
@@ -182,23 +205,22 @@ class PerformanceMonitor:
             # Check if multiple metrics are high
             high_metrics = 0
 
-            if self._metrics["cpu_usage"]:
-                avg_cpu = sum(self._metrics["cpu_usage"]) / len(
-                    self._metrics["cpu_usage"]
-                )
+            cpu_usage = self._summary("cpu_usage")
+            if cpu_usage["count"]:
+                avg_cpu = cpu_usage["average"]
                 if avg_cpu > 70:  # Lower threshold for degradation detection
                     high_metrics += 1
 
-            if self._metrics["memory_usage"]:
-                avg_memory = sum(self._metrics["memory_usage"]) / len(
-                    self._metrics["memory_usage"]
-                )
+            memory_usage = self._summary("memory_usage")
+            if memory_usage["count"]:
+                avg_memory = memory_usage["average"]
                 if avg_memory > 75:  # Lower threshold for degradation detection
                     high_metrics += 1
 
             # Check thread count (too many threads can indicate issues)
-            if self._metrics["thread_count"]:
-                current_threads = self._metrics["thread_count"][-1]
+            thread_count = self._summary("thread_count")
+            if thread_count["count"]:
+                current_threads = thread_count["current"]
                 if current_threads > 50:  # Arbitrary threshold
                     high_metrics += 1
 
@@ -228,46 +250,53 @@ class PerformanceMonitor:
                     f"Garbage collection freed {collected} objects", LogLevel.DEBUG
                 )
 
-            # Clear old metrics to prevent memory buildup
-            for metric_name, metric_deque in self._metrics.items():
-                if len(metric_deque) > 30:  # Keep only last 30 entries
-                    # Keep only the most recent entries
-                    recent_entries = list(metric_deque)[-30:]
-                    metric_deque.clear()
-                    metric_deque.extend(recent_entries)
-
         except Exception as e:
             self.log(f"Error during cleanup: {e}", LogLevel.WARNING)
 
     def get_current_metrics(self) -> Dict[str, Any]:
         """Get current performance metrics."""
         try:
-            metrics = {}
-
-            for metric_name, metric_deque in self._metrics.items():
-                if metric_deque:
-                    metrics[metric_name] = {
-                        "current": metric_deque[-1],
-                        "average": sum(metric_deque) / len(metric_deque),
-                        "min": min(metric_deque),
-                        "max": max(metric_deque),
-                        "count": len(metric_deque),
-                    }
-                else:
-                    metrics[metric_name] = {
-                        "current": 0,
-                        "average": 0,
-                        "min": 0,
-                        "max": 0,
-                        "count": 0,
-                    }
-
-            return metrics
+            return {key: self._summary(key) for key in self._metrics}
 
         except Exception as e:
             self.log(f"Error getting metrics: {e}", LogLevel.WARNING)
             return {}
 
+    def _summary(self, metric_name: str) -> Dict[str, float]:
+        """Summary of the last 60 seconds of a metric."""
+        return self._metrics[metric_name].series.summary(60)
+
+    def get_latest(self, metric_name: str) -> Optional[float]:
+        """Get the most recent sample of a metric, or None if not sampled yet."""
+        gauge = self._metrics.get(metric_name)
+        if gauge is None:
+            return None
+        return gauge.series.latest()
+
+    def get_snapshot(self) -> Dict[str, Any]:
+        """Get the latest published snapshot (metrics, summary, recommendations)."""
+        return self._snapshot
+
+    def _publish_snapshot(self):
+        """Build a read-only snapshot and notify snapshot subscribers."""
+        if (
+            not self._recommendations
+            or self._samples_since_recommendations >= self._recommendation_interval
+        ):
+            self._recommendations = PerformanceOptimizer(
+                self.log, monitor=self
+            ).get_optimization_recommendations()
+            self._samples_since_recommendations = 0
+        self._samples_since_recommendations += 1
+
+        self._snapshot = {
+            "metrics": self.get_current_metrics(),
+            "summary": self.get_performance_summary(),
+            "recommendations": list(self._recommendations),
+            "timestamp": self._last_sample_time or time.time(),
+        }
+        self._trigger_callbacks("snapshot", self._snapshot)
+
     def get_performance_summary(self) -> Dict[str, Any]:
         """Get a summary of current performance."""
         try:
@@ -346,8 +375,13 @@ class PerformanceMonitor:
 class PerformanceOptimizer:
     """Performance optimization utilities."""
 
-    def __init__(self, log_callback: Optional[Callable[[str, LogLevel], None]] = None):
+    def __init__(
+        self,
+        log_callback: Optional[Callable[[str, LogLevel], None]] = None,
+        monitor: Optional[PerformanceMonitor] = None,
+    ):
         self.log = log_callback or (lambda msg, level: print(f"[{level}] {msg}"))
+        self.monitor = monitor
 
     def optimize_memory(self) -> Dict[str, Any]:
         """Optimize memory usage."""
@@ -407,8 +441,11 @@ class PerformanceOptimizer:
                     "High memory usage detected - consider closing other applications"
                 )
 
-            # Check CPU usage
-            cpu_percent = psutil.cpu_percent(interval=1)
+            # Check CPU usage, reusing the monitor's sample instead of blocking
+            monitor = self.monitor or get_global_performance_monitor()
+            cpu_percent = monitor.get_latest("cpu_usage")
+            if cpu_percent is None:
+                cpu_percent = psutil.cpu_percent(interval=None)
             if cpu_percent > 80:
                 recommendations.append(
                     "High CPU usage detected - consider reducing application load"
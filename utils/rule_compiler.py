@@ -0,0 +1,421 @@
+"""
+Rule Compiler for Onix
+Compiles domain, address and keyword rules once into lookup structures:
+a reversed-label trie for domain suffixes, a binary radix trie for IPv4 and
+IPv6 CIDRs, hash maps for exact values and an Aho-Corasick automaton for
+keywords. A lookup walks the key once instead of testing every rule, and
+returns a bitmask of the rules that match (bit i = rule i), so callers can
+intersect several fields and take the lowest bit as the first match.
+
+It also validates, normalizes and dedupes the user's routing rules before
+the config generators turn them into core rules.
+"""
+
+import ipaddress
+import re
+from collections import deque
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Pattern kinds
+ANY = "any"
+EXACT = "exact"
+DOMAIN = "domain"  # A bare routing domain; each core applies its own default
+SUFFIX = "suffix"  # The domain and its subdomains
+SUBDOMAIN = "subdomain"  # Subdomains only
+KEYWORD = "keyword"
+REGEX = "regex"
+CIDR = "cidr"
+GEOSITE = "geosite"
+GEOIP = "geoip"
+PROCESS = "process"
+
+_DOMAIN_RE = re.compile(r"^[a-z0-9_-]+(\.[a-z0-9_-]+)*\.?$")
+_GEO_CODE_RE = re.compile(r"^[a-z0-9@!_-]+$")
+_PREFIXES = (
+    ("domain:geosite:", GEOSITE),
+    ("geosite:", GEOSITE),
+    ("geoip:", GEOIP),
+    ("full:", EXACT),
+    ("domain:", SUFFIX),
+    ("keyword:", KEYWORD),
+    ("regexp:", REGEX),
+)
+
+
+def parse_pattern(pattern: str, plain: str = EXACT) -> Tuple[str, str]:
+    """(kind, normalized value) of a rule pattern; ValueError if invalid.
+
+    Understands "*", IP addresses and CIDRs, "*.example.com" and
+    ".example.com" (subdomains), and the v2ray style prefixes "full:",
+    "domain:", "keyword:", "regexp:", "geosite:" and "geoip:". Anything
+    else is of kind `plain`.
+    """
+    text = pattern.strip()
+    if not text:
+        raise ValueError("empty pattern")
+    if text == "*":
+        return ANY, ""
+
+    lowered = text.lower()
+    for prefix, kind in _PREFIXES:
+        if lowered.startswith(prefix):
+            return _validate(kind, text[len(prefix) :].strip())
+    if lowered.startswith("*."):
+        return _validate(SUBDOMAIN, text[2:])
+    if lowered.startswith("."):
+        return _validate(SUBDOMAIN, text[1:])
+    try:
+        return _validate(CIDR, text)
+    except ValueError:
+        pass
+    return _validate(plain, text)
+
+
+def _validate(kind: str, value: str) -> Tuple[str, str]:
+    if not value:
+        raise ValueError(f"empty {kind} value")
+    if kind in (EXACT, DOMAIN, SUFFIX, SUBDOMAIN):
+        value = value.lower().rstrip(".")
+        if not _DOMAIN_RE.match(value):
+            raise ValueError(f"invalid domain {value!r}")
+    elif kind in (GEOSITE, GEOIP):
+        value = value.lower()
+        if not _GEO_CODE_RE.match(value):
+            raise ValueError(f"invalid {kind} code {value!r}")
+    elif kind == KEYWORD:
+        value = value.lower()
+    elif kind == REGEX:
+        try:
+            re.compile(value)
+        except re.error as e:
+            raise ValueError(f"invalid regexp {value!r}: {e}") from None
+    elif kind == CIDR:
+        # Single addresses stay addresses, networks get their canonical form
+        if "/" in value:
+            value = str(ipaddress.ip_network(value, strict=False))
+        else:
+            value = str(ipaddress.ip_address(value))
+    return kind, value
+
+
+class DomainSuffixTrie:
+    """Domain suffixes keyed by reversed labels."""
+
+    _SELF = None  # Marker: the suffix and its subdomains
+    _SUBDOMAINS = "*"  # Marker: subdomains only (never a valid label)
+
+    def __init__(self):
+        self._root: Dict = {}
+
+    def add(self, domain: str, mask: int, subdomains_only: bool = False):
+        node = self._root
+        for label in reversed(domain.split(".")):
+            node = node.setdefault(label, {})
+        marker = self._SUBDOMAINS if subdomains_only else self._SELF
+        node[marker] = node.get(marker, 0) | mask
+
+    def match(self, domain: str) -> int:
+        labels = domain.rstrip(".").split(".")
+        found = 0
+        node = self._root
+        remaining = len(labels)
+        for label in reversed(labels):
+            node = node.get(label)
+            if node is None:
+                break
+            remaining -= 1
+            found |= node.get(self._SELF, 0)
+            if remaining:
+                found |= node.get(self._SUBDOMAINS, 0)
+        return found
+
+
+class CidrTrie:
+    """IPv4 and IPv6 networks in binary radix tries."""
+
+    def __init__(self):
+        # Node: [zero child, one child, mask]
+        self._roots = {4: [None, None, 0], 6: [None, None, 0]}
+        self._bits = {4: 32, 6: 128}
+
+    def __bool__(self) -> bool:
+        return any(root[0] or root[1] or root[2] for root in self._roots.values())
+
+    def add(self, network, mask: int):
+        if isinstance(network, str):
+            network = ipaddress.ip_network(network, strict=False)
+        bits = self._bits[network.version]
+        address = int(network.network_address)
+        node = self._roots[network.version]
+        for i in range(network.prefixlen):
+            bit = (address >> (bits - 1 - i)) & 1
+            if node[bit] is None:
+                node[bit] = [None, None, 0]
+            node = node[bit]
+        node[2] |= mask
+
+    def match(self, address) -> int:
+        if isinstance(address, str):
+            try:
+                address = ipaddress.ip_address(address)
+            except ValueError:
+                return 0
+        bits = self._bits[address.version]
+        value = int(address)
+        node = self._roots[address.version]
+        found = node[2]
+        for i in range(bits):
+            node = node[(value >> (bits - 1 - i)) & 1]
+            if node is None:
+                break
+            found |= node[2]
+        return found
+
+
+class KeywordAutomaton:
+    """Aho-Corasick automaton finding every keyword in a text in one pass."""
+
+    def __init__(self, keywords: Iterable[Tuple[str, int]]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._output = [0]
+        for keyword, mask in keywords:
+            node = 0
+            for char in keyword:
+                child = self._goto[node].get(char)
+                if child is None:
+                    child = self._goto[node][char] = len(self._goto)
+                    self._goto.append({})
+                    self._output.append(0)
+                node = child
+            self._output[node] |= mask
+
+        # Failure links, breadth first
+        self._fail = [0] * len(self._goto)
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(char, 0)
+                self._fail[child] = target if target != child else 0
+                self._output[child] |= self._output[self._fail[child]]
+
+    def match(self, text: str) -> int:
+        goto, fail, output = self._goto, self._fail, self._output
+        found = 0
+        node = 0
+        for char in text:
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            found |= output[node]
+        return found
+
+
+class CompiledRules:
+    """Patterns of one field (host, address, process...) of a rule list.
+
+    Pattern i of the list sets bit i of the match result; patterns that
+    fail to parse are skipped and reported in `errors`.
+    """
+
+    def __init__(self, patterns: Iterable[str], plain: str = EXACT):
+        self.always = 0
+        self.errors: List[Tuple[int, str]] = []
+        self._exact: Dict[str, int] = {}
+        self._suffixes = DomainSuffixTrie()
+        self._has_suffixes = False
+        self._cidrs = CidrTrie()
+        self._regexes: List[Tuple[re.Pattern, int]] = []
+        keywords: Dict[str, int] = {}
+
+        for index, pattern in enumerate(patterns):
+            bit = 1 << index
+            try:
+                kind, value = parse_pattern(pattern, plain)
+            except ValueError as e:
+                self.errors.append((index, str(e)))
+                continue
+            if kind == ANY:
+                self.always |= bit
+            elif kind == CIDR:
+                self._cidrs.add(value, bit)
+            elif kind in (SUFFIX, SUBDOMAIN):
+                self._suffixes.add(value, bit, subdomains_only=kind == SUBDOMAIN)
+                self._has_suffixes = True
+            elif kind == KEYWORD:
+                keywords[value] = keywords.get(value, 0) | bit
+            elif kind == REGEX:
+                self._regexes.append((re.compile(value, re.IGNORECASE), bit))
+            else:
+                key = value.lower()
+                self._exact[key] = self._exact.get(key, 0) | bit
+        self._keywords = KeywordAutomaton(keywords.items()) if keywords else None
+        self._has_cidrs = bool(self._cidrs)
+
+    def match(self, *values: Optional[str]) -> int:
+        """Bitmask of the patterns matching any of `values`."""
+        found = self.always
+        for value in values:
+            if not value:
+                continue
+            key = value.lower()
+            found |= self._exact.get(key, 0)
+            if self._has_suffixes:
+                found |= self._suffixes.match(key)
+            if self._keywords:
+                found |= self._keywords.match(key)
+            if self._has_cidrs and (key[0].isdigit() or ":" in key):
+                found |= self._cidrs.match(key)
+            for regex, bit in self._regexes:
+                if regex.search(value):
+                    found |= bit
+        return found
+
+
+def first_match(mask: int) -> int:
+    """Index of the lowest set bit, -1 for none."""
+    return (mask & -mask).bit_length() - 1
+
+
+# --- Routing rules ---
+
+ROUTING_ACTIONS = ("proxy", "direct", "block")
+_CUSTOM_RULE_KINDS = {
+    "domain": (DOMAIN, EXACT, SUFFIX, SUBDOMAIN, KEYWORD, REGEX, GEOSITE),
+    "ip": (CIDR, GEOIP),
+    "process": (PROCESS,),
+    "geosite": (GEOSITE,),
+    "geoip": (GEOIP,),
+}
+
+
+@dataclass(frozen=True)
+class RoutingRule:
+    """A validated user routing rule."""
+
+    kind: str  # One of the pattern kinds
+    value: str
+    action: str  # One of ROUTING_ACTIONS
+
+
+@dataclass
+class RoutingPlan:
+    """Validated, deduplicated routing input for the config generators."""
+
+    bypass_domains: List[Tuple[str, str]] = field(default_factory=list)
+    bypass_geosites: List[str] = field(default_factory=list)
+    bypass_cidrs: List[str] = field(default_factory=list)
+    bypass_geoips: List[str] = field(default_factory=list)
+    bypass_private: bool = False
+    rules: List[RoutingRule] = field(default_factory=list)
+    rejected: List[Tuple[str, str]] = field(default_factory=list)  # (entry, reason)
+
+    def domains_by_kind(self) -> Dict[str, List[str]]:
+        """Bypass domains grouped by kind, in input order."""
+        grouped: Dict[str, List[str]] = {}
+        for kind, value in self.bypass_domains:
+            grouped.setdefault(kind, []).append(value)
+        return grouped
+
+
+def _split(text: Optional[str]) -> List[str]:
+    return [item.strip() for item in (text or "").split(",") if item.strip()]
+
+
+@lru_cache(maxsize=32)
+def compile_routing(
+    bypass_domains: str,
+    bypass_ips: str,
+    custom_rules: Tuple[Tuple[str, str, str], ...] = (),
+) -> RoutingPlan:
+    """Parse the bypass lists and custom rules once per distinct input.
+
+    The result is cached and shared, so callers must not modify it.
+    """
+    plan = RoutingPlan()
+    seen = set()
+
+    for entry in _split(bypass_domains):
+        try:
+            kind, value = parse_pattern(entry, plain=DOMAIN)
+            if kind in (CIDR, GEOIP, ANY):
+                raise ValueError("not a domain")
+        except ValueError as e:
+            plan.rejected.append((entry, str(e)))
+            continue
+        if (kind, value) in seen:
+            continue
+        seen.add((kind, value))
+        if kind == GEOSITE:
+            plan.bypass_geosites.append(value)
+        else:
+            plan.bypass_domains.append((kind, value))
+
+    for entry in _split(bypass_ips):
+        try:
+            kind, value = parse_pattern(entry)
+            if kind not in (CIDR, GEOIP):
+                raise ValueError("not an address, CIDR or geoip code")
+        except ValueError as e:
+            plan.rejected.append((entry, str(e)))
+            continue
+        if (kind, value) in seen:
+            continue
+        seen.add((kind, value))
+        if kind == GEOIP and value == "private":
+            plan.bypass_private = True
+        elif kind == GEOIP:
+            plan.bypass_geoips.append(value)
+        else:
+            plan.bypass_cidrs.append(value)
+
+    # The core applies the first matching rule, so a repeated match is
+    # either redundant or shadowed by the earlier one
+    matched = set()
+    for rule_type, rule_value, action in custom_rules:
+        entry = f"{rule_type}:{rule_value}"
+        try:
+            if action not in ROUTING_ACTIONS:
+                raise ValueError(f"unknown action {action!r}")
+            kinds = _CUSTOM_RULE_KINDS.get(rule_type)
+            if kinds is None:
+                raise ValueError(f"unknown rule type {rule_type!r}")
+            if rule_type == "process":
+                kind, value = PROCESS, (rule_value or "").strip()
+                if not value:
+                    raise ValueError("empty process name")
+            elif rule_type in (GEOSITE, GEOIP):
+                kind, value = _validate(rule_type, (rule_value or "").strip())
+            else:
+                kind, value = parse_pattern(rule_value or "", plain=DOMAIN)
+            if kind not in kinds:
+                raise ValueError(f"not a valid {rule_type} rule")
+        except ValueError as e:
+            plan.rejected.append((entry, str(e)))
+            continue
+        if (kind, value) in matched:
+            plan.rejected.append((entry, "duplicate of an earlier rule"))
+            continue
+        matched.add((kind, value))
+        plan.rules.append(RoutingRule(kind, value, action))
+
+    return plan
+
+
+def routing_plan(settings: dict) -> RoutingPlan:
+    """compile_routing() for the routing settings."""
+    custom_rules = tuple(
+        (rule.get("type"), rule.get("value"), rule.get("action"))
+        for rule in settings.get("custom_routing_rules", []) or []
+    )
+    return compile_routing(
+        settings.get("bypass_domains") or "",
+        settings.get("bypass_ips") or "",
+        custom_rules,
+    )
@@ -0,0 +1,260 @@
+"""
+Startup Profiler for Onix
+Times start-up as nested spans (phases and module imports), reports them
+with memory use and can write them out as a Chrome trace.
+"""
+
+import importlib.abc
+import importlib.machinery
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+import psutil
+
+# Set to a file path to record module imports and write a Chrome trace
+# (chrome://tracing or https://ui.perfetto.dev) once start-up has settled.
+STARTUP_TRACE_ENV = "ONIX_STARTUP_TRACE"
+
+
+class _TimedLoader:
+    """Loader proxy that records module execution as an import span."""
+
+    def __init__(self, loader, profiler: "StartupProfiler"):
+        self._loader = loader
+        self._profiler = profiler
+
+    def __getattr__(self, name):
+        return getattr(self._loader, name)
+
+    def create_module(self, spec):
+        # Extension modules do their work here rather than in exec_module
+        if not isinstance(self._loader, importlib.machinery.ExtensionFileLoader):
+            return self._loader.create_module(spec)
+        with self._profiler.phase(f"import {spec.name}", category="import"):
+            return self._loader.create_module(spec)
+
+    def exec_module(self, module):
+        if isinstance(self._loader, importlib.machinery.ExtensionFileLoader):
+            self._loader.exec_module(module)
+            return
+        with self._profiler.phase(f"import {module.__name__}", category="import"):
+            self._loader.exec_module(module)
+
+
+class _ImportTracer(importlib.abc.MetaPathFinder):
+    """Meta path finder that wraps the real loader of every new module."""
+
+    def __init__(self, profiler: "StartupProfiler"):
+        self._profiler = profiler
+        self._local = threading.local()
+
+    def find_spec(self, fullname, path, target=None):
+        # Ask the remaining finders; guard against finding ourselves again
+        if getattr(self._local, "busy", False):
+            return None
+        self._local.busy = True
+        try:
+            for finder in sys.meta_path:
+                if finder is self or not hasattr(finder, "find_spec"):
+                    continue
+                spec = finder.find_spec(fullname, path, target)
+                if spec is not None:
+                    break
+            else:
+                return None
+        finally:
+            self._local.busy = False
+
+        if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+            spec.loader = _TimedLoader(spec.loader, self._profiler)
+        return spec
+
+
+class StartupProfiler:
+    """Records nested spans and milestones relative to process start."""
+
+    def __init__(self):
+        self._process = psutil.Process(os.getpid())
+        try:
+            self._origin = self._process.create_time()
+        except psutil.Error:
+            self._origin = time.time()
+        self.phases: List[Dict[str, Any]] = []
+        self.marks: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._import_tracer = None
+        self.trace_path: Optional[str] = None
+
+    def _rss_mb(self) -> float:
+        try:
+            return self._process.memory_info().rss / (1024 * 1024)
+        except psutil.Error:
+            return 0.0
+
+    def elapsed(self) -> float:
+        """Seconds since the process was started."""
+        return time.time() - self._origin
+
+    @contextmanager
+    def phase(self, name: str, category: str = "phase"):
+        """Time the enclosed block as one span, nested under any open span."""
+        depth = getattr(self._local, "depth", 0)
+        self._local.depth = depth + 1
+        is_import = category == "import"
+        import_depth = getattr(self._local, "import_depth", 0)
+        if is_import:
+            self._local.import_depth = import_depth + 1
+        start = self.elapsed()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - started
+            self._local.depth = depth
+            if is_import:
+                self._local.import_depth = import_depth
+            entry = {
+                "name": name,
+                "category": category,
+                "start": start,
+                "duration": duration,
+                "depth": depth,
+                "thread": threading.get_ident(),
+            }
+            # Reading RSS costs a syscall; skip it for the many import spans
+            if is_import:
+                entry["nested_import"] = import_depth > 0
+            else:
+                entry["rss_mb"] = self._rss_mb()
+            with self._lock:
+                self.phases.append(entry)
+
+    def mark(self, name: str):
+        """Record a milestone such as the first window being shown."""
+        with self._lock:
+            self.marks.append(
+                {"name": name, "at": self.elapsed(), "rss_mb": self._rss_mb()}
+            )
+
+    # --- Import tracing ---
+
+    def trace_imports(self):
+        """Record every module imported from now on as an `import` span."""
+        if self._import_tracer is None:
+            self._import_tracer = _ImportTracer(self)
+            sys.meta_path.insert(0, self._import_tracer)
+
+    def stop_tracing_imports(self):
+        if self._import_tracer in sys.meta_path:
+            sys.meta_path.remove(self._import_tracer)
+        self._import_tracer = None
+
+    def configure_from_env(self) -> bool:
+        """Enable import tracing when STARTUP_TRACE_ENV names an output file."""
+        self.trace_path = os.environ.get(STARTUP_TRACE_ENV) or None
+        if self.trace_path:
+            self.trace_imports()
+        return bool(self.trace_path)
+
+    # --- Output ---
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "phases": [dict(p) for p in self.phases],
+                "marks": {m["name"]: dict(m) for m in self.marks},
+            }
+
+    def slowest_imports(self, n: int = 10) -> List[Dict[str, Any]]:
+        """Outermost imports (including their children) by duration."""
+        with self._lock:
+            imports = [
+                p
+                for p in self.phases
+                if p["category"] == "import" and not p["nested_import"]
+            ]
+        return sorted(imports, key=lambda p: p["duration"], reverse=True)[:n]
+
+    def report(self) -> str:
+        """Human readable table of phases, milestones and slow imports."""
+        with self._lock:
+            phases = sorted(
+                (p for p in self.phases if p["category"] != "import"),
+                key=lambda p: p["start"],
+            )
+            marks = list(self.marks)
+        lines = ["Startup timing (since process start):"]
+        for p in phases:
+            name = "  " * p["depth"] + p["name"]
+            lines.append(
+                f"  {name:<28} {p['duration'] * 1000:8.1f} ms"
+                f"  (at {p['start']:6.2f} s, RSS {p.get('rss_mb', 0):.0f} MB)"
+            )
+        for m in marks:
+            lines.append(
+                f"  [{m['name']}] at {m['at']:.2f} s, RSS {m['rss_mb']:.0f} MB"
+            )
+        slowest = self.slowest_imports()
+        if slowest:
+            lines.append("Slowest imports:")
+            for p in slowest:
+                lines.append(f"  {p['name'][7:]:<28} {p['duration'] * 1000:8.1f} ms")
+        return "\n".join(lines)
+
+    def chrome_trace(self) -> Dict[str, Any]:
+        """Spans as Chrome trace events (complete `X` and instant `i` events)."""
+        pid = os.getpid()
+        with self._lock:
+            events = [
+                {
+                    "name": p["name"],
+                    "cat": p["category"],
+                    "ph": "X",
+                    "ts": p["start"] * 1e6,
+                    "dur": p["duration"] * 1e6,
+                    "pid": pid,
+                    "tid": p["thread"],
+                }
+                for p in self.phases
+            ]
+            events.extend(
+                {
+                    "name": m["name"],
+                    "cat": "mark",
+                    "ph": "i",
+                    "s": "p",
+                    "ts": m["at"] * 1e6,
+                    "pid": pid,
+                    "tid": 0,
+                    "args": {"rss_mb": round(m["rss_mb"], 1)},
+                }
+                for m in self.marks
+            )
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def write_chrome_trace(self, path: Optional[str] = None) -> Optional[str]:
+        """Write the Chrome trace to `path` (default: the env var's path)."""
+        path = path or self.trace_path
+        if not path:
+            return None
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.chrome_trace(), f)
+        return path
+
+
+# Global startup profiler instance
+_startup_profiler = None
+
+
+def get_startup_profiler() -> StartupProfiler:
+    """Get the global startup profiler."""
+    global _startup_profiler
+    if _startup_profiler is None:
+        _startup_profiler = StartupProfiler()
+    return _startup_profiler